@@ -1,10 +1,11 @@
 """
 API dependencies
 """
-from .auth import get_current_user, get_current_active_user, get_current_superuser
+from .auth import get_current_user, get_current_active_user, get_current_superuser, authenticate_token
 
 __all__ = [
     "get_current_user",
     "get_current_active_user",
-    "get_current_superuser"
+    "get_current_superuser",
+    "authenticate_token"
 ]
@@ -101,3 +101,30 @@ async def get_current_superuser(
             detail="Not enough privileges"
         )
     return current_user
+
+
+def authenticate_token(token: Optional[str], db: Session) -> Optional[User]:
+    """
+    Resolve a JWT to an active user without raising
+
+    Used by streaming endpoints (WebSocket, Server-Sent Events) where the
+    browser can't send an Authorization header and the token comes in the
+    query string instead.
+
+    Args:
+        token: JWT access token
+        db: Database session
+
+    Returns:
+        User object, or None if the token or user is not valid
+    """
+    if not token:
+        return None
+    payload = decode_access_token(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+
+    user = db.query(User).filter(User.id == payload.get("sub")).first()
+    if user is None or not user.is_active:
+        return None
+    return user
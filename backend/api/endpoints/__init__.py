@@ -13,7 +13,12 @@ from . import (
     financial,
     crm,
     quality,
-    analytics
+    analytics,
+    exports,
+    workflow,
+    inbox,
+    notifications,
+    jobs
 )
 
 __all__ = [
@@ -28,5 +33,10 @@ __all__ = [
     "financial",
     "crm",
     "quality",
-    "analytics"
+    "analytics",
+    "exports",
+    "workflow",
+    "inbox",
+    "notifications",
+    "jobs"
 ]
@@ -8,6 +8,7 @@ from backend.core import get_db
 from backend.models import *
 from backend.api.dependencies.auth import get_current_user
 from backend.models.user import User
+from backend.services.work_items import inbox_counts
 from datetime import datetime, timedelta
 
 router = APIRouter()
@@ -41,11 +42,9 @@ async def get_dashboard_stats(
 
     # Documents stats
     total_documents = db.query(Document).filter(Document.is_deleted == False).count()
-    pending_approvals = db.query(Document).filter(
-        Document.approver_id == current_user.id,
-        Document.status == 'In Review',
-        Document.is_deleted == False
-    ).count()
+
+    # Everything awaiting the current user, from the inbox table
+    inbox = inbox_counts(db, current_user.id)
 
     # Quality stats
     open_ncs = db.query(NonConformance).filter(
@@ -78,7 +77,11 @@ async def get_dashboard_stats(
         },
         "documents": {
             "total": total_documents,
-            "pending_approvals": pending_approvals
+            "pending_approvals": inbox.get("document", 0)
+        },
+        "inbox": {
+            "total": sum(inbox.values()),
+            "by_entity": inbox
         },
         "quality": {
             "open_ncs": open_ncs,
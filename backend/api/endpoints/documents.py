@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from backend.core import get_db
 from backend.models.document import Document, DocumentVersion, DocumentLevelEnum, DocumentStatusEnum
 from backend.api.dependencies.auth import get_current_user
+from backend.api.endpoints.workflow import run_single_transition
 from backend.models.user import User
 from pydantic import BaseModel
 from typing import List, Optional
@@ -118,19 +119,7 @@ async def approve_document(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Approve a document"""
-    document = db.query(Document).filter(Document.id == document_id).first()
-
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Document not found"
-        )
-
-    document.status = DocumentStatusEnum.APPROVED
-    document.approver_id = current_user.id
-    document.approved_at = str(datetime.now())
-
-    db.commit()
+    """Approve a document that is in review"""
+    run_single_transition(db, "document", document_id, "approve", current_user)
 
     return {"message": "Document approved successfully"}
@@ -0,0 +1,152 @@
+"""
+Data Export API endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from backend.core import get_db
+from backend.models.form import FormTemplate
+from backend.models.traceability import EntityTypeEnum, ActionTypeEnum
+from backend.api.dependencies.auth import get_current_user
+from backend.models.user import User
+from backend.services.audit import log_action
+from backend.services.form_engine import get_compiled_template
+from backend.services.exports import (
+    EXPORTS,
+    CSV_MEDIA_TYPE,
+    XLSX_MEDIA_TYPE,
+    entity_rows,
+    form_record_rows,
+    stream_csv,
+    stream_xlsx,
+    xlsx_available
+)
+from typing import Optional
+from datetime import date, datetime
+
+router = APIRouter()
+
+EXPORT_FORMATS = {"csv", "xlsx"}
+
+
+def _export_response(headers, rows, export_format: str, filename: str) -> StreamingResponse:
+    """Wrap a row factory in a streaming CSV or XLSX response"""
+    if export_format == "xlsx":
+        body = stream_xlsx(headers, rows, sheet_title=filename)
+        media_type = XLSX_MEDIA_TYPE
+    else:
+        body = stream_csv(headers, rows)
+        media_type = CSV_MEDIA_TYPE
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}-{stamp}.{export_format}"'}
+    )
+
+
+def _check_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format, use one of: {', '.join(sorted(EXPORT_FORMATS))}"
+        )
+    if export_format == "xlsx" and not xlsx_available():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="XLSX export requires openpyxl to be installed"
+        )
+
+
+@router.get("/form-records")
+async def export_form_records(
+    request: Request,
+    template_id: int,
+    format: str = "csv",
+    status_filter: Optional[str] = Query(None, alias="status"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Export records of a form template, one column per field"""
+    _check_format(format)
+
+    template = db.query(FormTemplate).filter(FormTemplate.id == template_id).first()
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form template not found"
+        )
+
+    compiled = get_compiled_template(db, template)
+    headers, rows = form_record_rows(
+        template.id,
+        compiled.field_names,
+        compiled.field_labels,
+        status=status_filter,
+        start_date=start_date,
+        end_date=end_date
+    )
+
+    log_action(
+        db,
+        current_user.id,
+        EntityTypeEnum.FORM_RECORD,
+        template.id,
+        ActionTypeEnum.EXPORT,
+        description=f"Exported records of form template {template.code} as {format}",
+        new_values={
+            "format": format,
+            "status": status_filter,
+            "start_date": str(start_date) if start_date else None,
+            "end_date": str(end_date) if end_date else None
+        },
+        request=request
+    )
+    db.commit()
+
+    return _export_response(headers, rows, format, template.code)
+
+
+@router.get("/{entity}")
+async def export_entity(
+    entity: str,
+    request: Request,
+    format: str = "csv",
+    status_filter: Optional[str] = Query(None, alias="status"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Export NCs, CAPAs, equipment, calibrations or invoices"""
+    spec = EXPORTS.get(entity)
+    if spec is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown export, use one of: form-records, {', '.join(sorted(EXPORTS))}"
+        )
+    _check_format(format)
+
+    headers, rows = entity_rows(spec, status=status_filter, start_date=start_date, end_date=end_date)
+
+    log_action(
+        db,
+        current_user.id,
+        spec.entity_type,
+        0,
+        ActionTypeEnum.EXPORT,
+        description=f"Exported {entity} as {format}",
+        new_values={
+            "format": format,
+            "status": status_filter,
+            "start_date": str(start_date) if start_date else None,
+            "end_date": str(end_date) if end_date else None
+        },
+        request=request
+    )
+    db.commit()
+
+    return _export_response(headers, rows, format, entity)
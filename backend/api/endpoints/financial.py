@@ -1,15 +1,32 @@
 """
 Financial Management API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from backend.core import get_db
-from backend.models.financial import Expense, Invoice, Payment, ExpenseStatusEnum, InvoiceTypeEnum
-from backend.api.dependencies.auth import get_current_user
+from backend.models.crm import Customer, Order, OrderStatusEnum
+from backend.models.financial import (
+    BankStatementLine, Expense, Invoice, Payment, ExpenseStatusEnum, InvoiceTypeEnum, StatementLineStatusEnum
+)
+from backend.api.dependencies.auth import get_current_user, get_current_superuser
 from backend.models.user import User
+from backend.services.invoicing import (
+    InvoiceDraft, InvoiceError, InvoiceLine, issue_invoices, parse_line, pdf_available, queue_pdf
+)
+from backend.services.project_costs import post_payment
+from backend.services.receivables import (
+    ReconcileError, aging_report, aging_stale, import_statement, match_manually, reconcile, refresh_aging,
+    update_receivables
+)
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import date, datetime
+from decimal import Decimal
+import os
+
+# Most orders invoiced in one batch request
+INVOICE_BATCH_MAX = 1000
 
 router = APIRouter()
 
@@ -22,12 +39,46 @@ class ExpenseCreate(BaseModel):
     project_id: Optional[int] = None
 
 
+class InvoiceLineCreate(BaseModel):
+    description: str
+    quantity: Decimal = Decimal(1)
+    unit_price: Decimal
+    discount_pct: Decimal = Decimal(0)
+    gst_rate: Optional[Decimal] = None
+    hsn_sac: Optional[str] = None
+
+
 class InvoiceCreate(BaseModel):
     invoice_type: InvoiceTypeEnum
     customer_id: int
-    items: List[dict]
-    subtotal: float
-    total_amount: float
+    items: List[InvoiceLineCreate]
+    order_id: Optional[int] = None
+    project_id: Optional[int] = None
+    place_of_supply: Optional[str] = None  # State code; from the customer's GSTIN when not given
+    due_date: Optional[date] = None
+    payment_terms: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class InvoiceBatchCreate(BaseModel):
+    order_ids: List[int]
+    due_date: Optional[date] = None
+    payment_terms: Optional[str] = None
+
+
+class StatementLineMatch(BaseModel):
+    invoice_id: int
+
+
+class PaymentCreate(BaseModel):
+    invoice_id: int
+    payment_date: date
+    amount: float
+    payment_method: Optional[str] = None
+    reference_number: Optional[str] = None
+    bank_name: Optional[str] = None
+    transaction_id: Optional[str] = None
+    notes: Optional[str] = None
 
 
 @router.post("/expenses", response_model=dict)
@@ -101,13 +152,7 @@ async def create_invoice(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Create customer invoice"""
-    year = datetime.now().year
-    count = db.query(Invoice).count() + 1
-    invoice_number = f"INV-{year}-{count:04d}"
-
-    # Get customer details
-    from backend.models.crm import Customer
+    """Create customer invoice; line totals, GST and rounding are computed here"""
     customer = db.query(Customer).filter(Customer.id == invoice.customer_id).first()
 
     if not customer:
@@ -116,25 +161,339 @@ async def create_invoice(
             detail="Customer not found"
         )
 
-    new_invoice = Invoice(
-        invoice_number=invoice_number,
-        invoice_type=invoice.invoice_type,
-        invoice_date=date.today(),
-        customer_id=invoice.customer_id,
-        bill_to_name=customer.company_name,
-        bill_to_address=customer.billing_address,
-        bill_to_gst=customer.gst_number,
-        items=invoice.items,
-        subtotal=invoice.subtotal,
-        total_amount=invoice.total_amount,
-        generated_by_id=current_user.id,
-        created_by_id=current_user.id
+    try:
+        lines = [InvoiceLine(**item.model_dump()) for item in invoice.items]
+        new_invoice, = issue_invoices(db, [InvoiceDraft(
+            invoice.invoice_type,
+            customer,
+            lines,
+            place_of_supply=invoice.place_of_supply,
+            order_id=invoice.order_id,
+            project_id=invoice.project_id,
+            due_date=invoice.due_date,
+            payment_terms=invoice.payment_terms,
+            notes=invoice.notes
+        )], current_user.id)
+    except InvoiceError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    db.commit()
+
+    return {
+        "message": "Invoice created successfully",
+        "id": new_invoice.id,
+        "invoice_number": new_invoice.invoice_number,
+        "subtotal": new_invoice.subtotal,
+        "discount": new_invoice.discount,
+        "cgst_amount": new_invoice.cgst_amount,
+        "sgst_amount": new_invoice.sgst_amount,
+        "igst_amount": new_invoice.igst_amount,
+        "round_off": new_invoice.round_off,
+        "total_amount": new_invoice.total_amount
+    }
+
+
+@router.post("/invoices/batch", response_model=dict)
+async def create_invoices_from_orders(
+    batch: InvoiceBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Tax-invoice completed or delivered orders in one go; orders already invoiced are skipped"""
+    order_ids = list(dict.fromkeys(batch.order_ids))
+    if not order_ids or len(order_ids) > INVOICE_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Give between 1 and {INVOICE_BATCH_MAX} order ids"
+        )
+
+    invoiced = {
+        order_id for (order_id,) in db.query(Invoice.order_id).filter(
+            Invoice.order_id.in_(order_ids),
+            Invoice.invoice_type == InvoiceTypeEnum.TAX_INVOICE,
+            Invoice.is_deleted == False
+        )
+    }
+    rows = db.query(Order, Customer).join(Customer, Customer.id == Order.customer_id).filter(
+        Order.id.in_(order_ids),
+        Order.status.in_([OrderStatusEnum.COMPLETED, OrderStatusEnum.DELIVERED]),
+        Order.is_deleted == False
+    ).order_by(Order.id).all()
+
+    drafts, skipped = [], []
+    found = set()
+    for order, customer in rows:
+        found.add(order.id)
+        if order.id in invoiced:
+            skipped.append({"order_id": order.id, "reason": "Already invoiced"})
+            continue
+        try:
+            lines = [parse_line(item) for item in order.items or [] if isinstance(item, dict)]
+            if not lines:
+                raise InvoiceError("Order has no line items")
+        except InvoiceError as e:
+            skipped.append({"order_id": order.id, "reason": str(e)})
+            continue
+        drafts.append(InvoiceDraft(
+            InvoiceTypeEnum.TAX_INVOICE,
+            customer,
+            lines,
+            order_id=order.id,
+            project_id=order.project_id,
+            due_date=batch.due_date,
+            payment_terms=batch.payment_terms
+        ))
+    skipped += [
+        {"order_id": order_id, "reason": "Order not found, or not completed or delivered"}
+        for order_id in order_ids if order_id not in found
+    ]
+
+    invoices = issue_invoices(db, drafts, current_user.id) if drafts else []
+    db.commit()
+
+    return {
+        "message": f"{len(invoices)} invoices created",
+        "created": [
+            {
+                "order_id": invoice.order_id,
+                "id": invoice.id,
+                "invoice_number": invoice.invoice_number,
+                "total_amount": invoice.total_amount
+            }
+            for invoice in invoices
+        ],
+        "skipped": skipped
+    }
+
+
+def _get_invoice(db: Session, invoice_id: int) -> Invoice:
+    invoice = db.query(Invoice).filter(Invoice.id == invoice_id, Invoice.is_deleted == False).first()
+    if not invoice:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Invoice not found"
+        )
+    return invoice
+
+
+@router.get("/invoices/{invoice_id}/pdf")
+async def download_invoice_pdf(
+    invoice_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Invoice PDF, once the background job has rendered it"""
+    invoice = _get_invoice(db, invoice_id)
+    if not invoice.file_path or not os.path.exists(invoice.file_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Invoice PDF hasn't been generated yet"
+        )
+    return FileResponse(invoice.file_path, media_type="application/pdf", filename=f"{invoice.invoice_number}.pdf")
+
+
+@router.post("/invoices/{invoice_id}/pdf", response_model=dict)
+async def regenerate_invoice_pdf(
+    invoice_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Queue the invoice PDF to be rendered again"""
+    invoice = _get_invoice(db, invoice_id)
+    if not pdf_available():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invoice PDFs require reportlab to be installed"
+        )
+    job_id = queue_pdf(db, invoice)
+    db.commit()
+
+    return {
+        "message": "Invoice PDF queued",
+        "job_id": job_id
+    }
+
+
+@router.post("/payments", response_model=dict)
+async def create_payment(
+    payment: PaymentCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Record a payment received against an invoice"""
+    invoice = db.query(Invoice).filter(
+        Invoice.id == payment.invoice_id,
+        Invoice.is_deleted == False
+    ).first()
+
+    if not invoice:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Invoice not found"
+        )
+    if payment.amount <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Payment amount must be positive"
+        )
+
+    year = datetime.now().year
+    count = db.query(Payment).count() + 1
+    payment_number = f"PAY-{year}-{count:04d}"
+
+    new_payment = Payment(
+        payment_number=payment_number,
+        currency=invoice.currency,
+        received_by_id=current_user.id,
+        created_by_id=current_user.id,
+        **payment.model_dump()
     )
 
-    db.add(new_invoice)
+    db.add(new_payment)
+    db.flush()
+    post_payment(db, new_payment)
+    update_receivables(db, [invoice.id])
     db.commit()
+    db.refresh(invoice)
 
     return {
-        "message": "Invoice created successfully",
-        "invoice_number": invoice_number
+        "message": "Payment recorded successfully",
+        "payment_number": payment_number,
+        "amount_paid": invoice.amount_paid,
+        "payment_status": invoice.payment_status.value
+    }
+
+
+@router.post("/bank-statements/import", response_model=dict)
+async def import_bank_statement(
+    file: UploadFile = File(...),
+    bank_account: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Import a bank statement CSV and match its credits to open invoices; safe to re-run on overlapping statements"""
+    name = (file.filename or "").lower()
+    if not name.endswith((".csv", ".txt")) and file.content_type not in ("text/csv", "application/csv", "text/plain"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload must be a CSV bank statement"
+        )
+
+    summary = import_statement(db, file.file, current_user.id, bank_account=bank_account)
+    matched = reconcile(db, current_user.id, summary.line_ids)
+    db.commit()
+
+    return {
+        "message": "Bank statement imported successfully",
+        **summary.to_dict(),
+        "reconciliation": matched
     }
+
+
+@router.post("/bank-statements/reconcile", response_model=dict)
+async def reconcile_bank_statements(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Match every unmatched or ambiguous statement credit again, e.g. after new invoices were issued"""
+    matched = reconcile(db, current_user.id)
+    db.commit()
+
+    return {
+        "message": "Reconciliation finished",
+        **matched
+    }
+
+
+@router.get("/bank-statements/lines", response_model=List[dict])
+async def list_statement_lines(
+    status: Optional[StatementLineStatusEnum] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Imported statement lines, latest first, with the payments they were matched to"""
+    query = db.query(BankStatementLine).filter(BankStatementLine.is_deleted == False)
+
+    if status:
+        query = query.filter(BankStatementLine.status == status)
+
+    lines = query.order_by(BankStatementLine.value_date.desc(), BankStatementLine.id.desc()).offset(skip).limit(limit).all()
+    payments = {}
+    if lines:
+        for line_id, invoice_id, amount in db.query(Payment.statement_line_id, Payment.invoice_id, Payment.amount).filter(
+            Payment.statement_line_id.in_([line.id for line in lines]),
+            Payment.is_deleted == False
+        ):
+            payments.setdefault(line_id, []).append({"invoice_id": invoice_id, "amount": amount})
+
+    return [
+        {
+            "id": line.id,
+            "bank_account": line.bank_account,
+            "value_date": str(line.value_date),
+            "amount": line.amount,
+            "reference": line.reference,
+            "description": line.description,
+            "status": line.status.value,
+            "match_rule": line.match_rule,
+            "candidate_invoice_ids": line.candidate_invoice_ids or [],
+            "payments": payments.get(line.id, [])
+        }
+        for line in lines
+    ]
+
+
+@router.put("/bank-statements/lines/{line_id}/match", response_model=dict)
+async def match_statement_line(
+    line_id: int,
+    match: StatementLineMatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Settle an invoice with an unmatched or ambiguous statement credit"""
+    line = db.query(BankStatementLine).filter(
+        BankStatementLine.id == line_id,
+        BankStatementLine.is_deleted == False
+    ).with_for_update().first()
+
+    if not line:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Statement line not found"
+        )
+    invoice = _get_invoice(db, match.invoice_id)
+
+    try:
+        payment = match_manually(db, line, invoice, current_user.id)
+    except ReconcileError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    db.commit()
+
+    return {
+        "message": "Statement line matched",
+        "payment_number": payment.payment_number
+    }
+
+
+@router.get("/receivables/aging", response_model=dict)
+async def receivables_aging(
+    customer_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Outstanding receivables per customer in 0-30, 31-60, 61-90 and 90+ days past due"""
+    if aging_stale(db):
+        # The nightly job hasn't re-aged yet today
+        refresh_aging(db)
+        db.commit()
+
+    return aging_report(db, customer_id=customer_id, skip=skip, limit=limit)
@@ -1,15 +1,38 @@
 """
 Form Engine API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from backend.core import get_db
-from backend.models.form import FormTemplate, FormField, FormRecord, FormValue, FieldTypeEnum
-from backend.api.dependencies.auth import get_current_user
+from backend.core.config import settings
+from backend.models.form import FormTemplate, FormTemplateVersion, FormField, FormRecord, FormValue, FieldTypeEnum, TemplateImportBatch
+from backend.api.dependencies.auth import get_current_user, get_current_superuser
 from backend.models.user import User
+from backend.services.form_engine import (
+    get_compiled_template,
+    get_compiled_version,
+    get_compiled_record,
+    working_fields_query
+)
+from backend.services.form_versions import (
+    VersionUnchanged,
+    publish_version,
+    ensure_current_version,
+    update_field,
+    remove_field
+)
+from backend.services.form_formulas import FormulaPlan, FormulaError
+from backend.services.form_records import allocate_record_numbers, detect_format, parse_records, ingest_records
+from backend.services.form_read_model import build_document, record_document, rebuild_documents, field_series
+from backend.services.form_validation import serialize_value
+from backend.services.template_importer import SUPPORTED_EXTENSIONS, list_template_files, run_import_batch
 from pydantic import BaseModel
 from typing import List, Optional, Any
-from datetime import datetime
+from datetime import date
+import os
+import shutil
+import uuid
 
 router = APIRouter()
 
@@ -20,6 +43,8 @@ class FormFieldCreate(BaseModel):
     field_type: FieldTypeEnum
     is_required: bool = False
     options: Optional[List[str]] = None
+    validation_rules: Optional[dict] = None
+    formula: Optional[str] = None
 
 
 class FormTemplateCreate(BaseModel):
@@ -35,6 +60,57 @@ class FormRecordSubmit(BaseModel):
     values: dict
 
 
+class FormRecordValuesUpdate(BaseModel):
+    values: dict
+
+
+class FormCalculateRequest(BaseModel):
+    values: dict
+    changed: Optional[List[str]] = None
+
+
+class FormFieldUpdate(BaseModel):
+    field_name: Optional[str] = None
+    field_label: Optional[str] = None
+    field_type: Optional[FieldTypeEnum] = None
+    order: Optional[int] = None
+    is_required: Optional[bool] = None
+    is_readonly: Optional[bool] = None
+    default_value: Optional[str] = None
+    placeholder: Optional[str] = None
+    help_text: Optional[str] = None
+    options: Optional[List[str]] = None
+    validation_rules: Optional[dict] = None
+    section: Optional[str] = None
+    formula: Optional[str] = None
+
+
+class FormTemplateVersionPublish(BaseModel):
+    notes: Optional[str] = None
+
+
+class TemplateImportDirectory(BaseModel):
+    subdirectory: Optional[str] = None
+
+
+def _import_batch_dict(batch: TemplateImportBatch, include_results: bool = True) -> dict:
+    data = {
+        "id": batch.id,
+        "source": batch.source,
+        "status": batch.status,
+        "total_files": batch.total_files,
+        "processed_files": batch.processed_files,
+        "succeeded": batch.succeeded,
+        "failed": batch.failed,
+        "started_at": batch.started_at,
+        "finished_at": batch.finished_at,
+        "created_at": batch.created_at
+    }
+    if include_results:
+        data["results"] = batch.results or []
+    return data
+
+
 @router.post("/templates", response_model=dict)
 async def create_form_template(
     template: FormTemplateCreate,
@@ -62,6 +138,7 @@ async def create_form_template(
     db.flush()
 
     # Create form fields
+    fields = []
     for idx, field_data in enumerate(template.fields):
         field = FormField(
             template_id=new_template.id,
@@ -70,10 +147,23 @@ async def create_form_template(
             field_type=field_data.field_type,
             is_required=field_data.is_required,
             options=field_data.options,
+            validation_rules=field_data.validation_rules,
+            formula=field_data.formula,
             order=idx,
             created_by_id=current_user.id
         )
         db.add(field)
+        fields.append(field)
+
+    # Reject formulas that don't parse, reference unknown fields or form cycles
+    try:
+        FormulaPlan(fields)
+    except FormulaError as exc:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
 
     db.commit()
     db.refresh(new_template)
@@ -109,6 +199,125 @@ async def list_form_templates(
     ]
 
 
+@router.post("/templates/import", response_model=dict)
+async def import_form_templates(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Import form templates from uploaded Excel/Word files"""
+    unsupported = [
+        f.filename for f in files
+        if os.path.splitext(f.filename or "")[1].lower() not in SUPPORTED_EXTENSIONS
+    ]
+    if unsupported:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported files: {', '.join(unsupported)}"
+        )
+
+    target_dir = os.path.join(settings.UPLOAD_DIR, "template_imports", uuid.uuid4().hex)
+    paths = []
+    for f in files:
+        # A directory per file: same-named uploads don't overwrite each other, and
+        # the file name, which the template code is derived from, stays as uploaded
+        file_dir = os.path.join(target_dir, uuid.uuid4().hex)
+        os.makedirs(file_dir, exist_ok=True)
+        path = os.path.join(file_dir, os.path.basename(f.filename))
+        with open(path, "wb") as out:
+            shutil.copyfileobj(f.file, out)
+        paths.append(path)
+
+    batch = TemplateImportBatch(source="upload", total_files=len(paths), created_by_id=current_user.id)
+    db.add(batch)
+    db.commit()
+    db.refresh(batch)
+
+    background_tasks.add_task(run_import_batch, batch.id, paths, current_user.id)
+
+    return {
+        "message": "Template import started",
+        "batch_id": batch.id,
+        "total_files": len(paths)
+    }
+
+
+@router.post("/templates/import/directory", response_model=dict)
+async def import_form_templates_from_directory(
+    request: TemplateImportDirectory,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Import every Excel/Word file under the server's template import directory"""
+    root = os.path.realpath(settings.TEMPLATE_IMPORT_DIR)
+    directory = os.path.realpath(os.path.join(root, request.subdirectory or ""))
+
+    if os.path.commonpath([root, directory]) != root or not os.path.isdir(directory):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Import directory not found"
+        )
+
+    paths = list_template_files(directory)
+    if not paths:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No Excel or Word files found in import directory"
+        )
+
+    batch = TemplateImportBatch(
+        source=os.path.relpath(directory, root),
+        total_files=len(paths),
+        created_by_id=current_user.id
+    )
+    db.add(batch)
+    db.commit()
+    db.refresh(batch)
+
+    background_tasks.add_task(run_import_batch, batch.id, paths, current_user.id)
+
+    return {
+        "message": "Template import started",
+        "batch_id": batch.id,
+        "total_files": len(paths)
+    }
+
+
+@router.get("/templates/imports", response_model=List[dict])
+async def list_template_imports(
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List template import batches, newest first"""
+    batches = db.query(TemplateImportBatch).order_by(
+        TemplateImportBatch.id.desc()
+    ).offset(skip).limit(limit).all()
+
+    return [_import_batch_dict(b, include_results=False) for b in batches]
+
+
+@router.get("/templates/import/{batch_id}", response_model=dict)
+async def get_template_import(
+    batch_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Progress and per-file results of a template import batch"""
+    batch = db.query(TemplateImportBatch).filter(TemplateImportBatch.id == batch_id).first()
+
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template import not found"
+        )
+
+    return _import_batch_dict(batch)
+
+
 @router.post("/records", response_model=dict)
 async def submit_form_record(
     record_data: FormRecordSubmit,
@@ -126,18 +335,29 @@ async def submit_form_record(
             detail="Form template not found"
         )
 
+    _ensure_current_version(db, template, current_user.id)
+    compiled = get_compiled_template(db, template)
+    values, issues = compiled.validator.validate(record_data.values)
+    if issues:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "message": "Form record failed validation",
+                "errors": [issue.to_dict() for issue in issues]
+            }
+        )
+    values = compiled.compute(values)
+
     # Generate record number
-    year = datetime.now().year
-    count = db.query(FormRecord).filter(
-        FormRecord.template_id == template.id
-    ).count() + 1
-    record_number = f"{template.code}-{year}-{count:04d}"
+    record_number = allocate_record_numbers(db, template, 1)[0]
 
     new_record = FormRecord(
         template_id=template.id,
+        template_version_id=compiled.version_id,
         record_number=record_number,
         status='draft',
         doer_id=current_user.id,
+        data=build_document(values),
         created_by_id=current_user.id
     )
 
@@ -145,11 +365,14 @@ async def submit_form_record(
     db.flush()
 
     # Save form values
-    for field_name, value in record_data.values.items():
+    for field_name, value in values.items():
+        text_value, json_value = serialize_value(value)
         form_value = FormValue(
             record_id=new_record.id,
+            field_id=compiled.field_ids.get(field_name),
             field_name=field_name,
-            value=str(value) if value is not None else None,
+            value=text_value,
+            value_json=json_value,
             created_by_id=current_user.id
         )
         db.add(form_value)
@@ -163,6 +386,62 @@ async def submit_form_record(
     }
 
 
+@router.post("/records/bulk", response_model=dict)
+async def bulk_submit_form_records(
+    template_id: int,
+    file: UploadFile = File(...),
+    all_or_nothing: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Submit many records for one template from an NDJSON or CSV upload"""
+    template = db.query(FormTemplate).filter(
+        FormTemplate.id == template_id
+    ).first()
+
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form template not found"
+        )
+
+    fmt = detect_format(file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload must be CSV or NDJSON"
+        )
+
+    _ensure_current_version(db, template, current_user.id)
+    compiled = get_compiled_template(db, template)
+    content = await file.read()
+    result = ingest_records(
+        db,
+        template,
+        compiled,
+        parse_records(content, fmt),
+        current_user.id,
+        all_or_nothing=all_or_nothing
+    )
+
+    if all_or_nothing and result.errors:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "message": "Bulk submission failed validation",
+                "errors": result.errors
+            }
+        )
+
+    db.commit()
+
+    return {
+        "message": "Form records submitted successfully",
+        **result.to_dict()
+    }
+
+
 @router.get("/records", response_model=List[dict])
 async def list_form_records(
     template_id: Optional[int] = None,
@@ -192,3 +471,461 @@ async def list_form_records(
         }
         for r in records
     ]
+
+
+@router.post("/templates/{template_id}/calculate", response_model=dict)
+async def calculate_form_fields(
+    template_id: int,
+    request: FormCalculateRequest,
+    draft: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Preview calculated fields for values being entered (draft=true for unpublished edits)"""
+    template = db.query(FormTemplate).filter(FormTemplate.id == template_id).first()
+
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form template not found"
+        )
+
+    try:
+        compiled = get_compiled_template(db, template, draft=draft)
+    except FormulaError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    values, issues = compiled.validator.validate(request.values)
+
+    return {
+        "calculated": compiled.formulas.evaluate(values, request.changed),
+        "errors": [issue.to_dict() for issue in issues]
+    }
+
+
+@router.put("/records/{record_id}/values", response_model=dict)
+async def update_form_record_values(
+    record_id: int,
+    update: FormRecordValuesUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Update values of a draft record, recomputing only affected calculated fields"""
+    record = db.query(FormRecord).filter(
+        FormRecord.id == record_id,
+        FormRecord.is_deleted == False
+    ).first()
+
+    if not record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form record not found"
+        )
+    if record.status != 'draft':
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only draft records can be edited"
+        )
+
+    compiled = get_compiled_record(db, record)
+    stored = {v.field_name: v for v in record.values}
+    raw_values = {
+        name: (v.value_json if v.value_json is not None else v.value)
+        for name, v in stored.items()
+    }
+    raw_values.update(update.values)
+
+    values, issues = compiled.validator.validate(raw_values)
+    if issues:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "message": "Form record failed validation",
+                "errors": [issue.to_dict() for issue in issues]
+            }
+        )
+
+    # Previously calculated values feed formulas that depend on them
+    for name in compiled.formulas.order:
+        if name in raw_values:
+            try:
+                values[name] = float(raw_values[name])
+            except (TypeError, ValueError):
+                pass
+
+    calculated = compiled.formulas.evaluate(values, update.values.keys())
+    values.update(calculated)
+
+    changed = set(update.values) | set(calculated)
+    for field_name in changed:
+        text_value, json_value = serialize_value(values.get(field_name))
+        form_value = stored.get(field_name)
+        if text_value is None and json_value is None:
+            if form_value is not None:
+                db.delete(form_value)
+            continue
+        if form_value is None:
+            form_value = FormValue(
+                record_id=record.id,
+                field_id=compiled.field_ids.get(field_name),
+                field_name=field_name,
+                created_by_id=current_user.id
+            )
+            db.add(form_value)
+        form_value.value = text_value
+        form_value.value_json = json_value
+        form_value.updated_by_id = current_user.id
+
+    record.data = build_document(values)
+    record.updated_by_id = current_user.id
+    db.commit()
+
+    return {
+        "message": "Form record updated successfully",
+        "updated_fields": sorted(changed),
+        "calculated": calculated
+    }
+
+
+@router.get("/records/{record_id}", response_model=dict)
+async def get_form_record(
+    record_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a form record with its values"""
+    record = db.query(FormRecord).filter(
+        FormRecord.id == record_id,
+        FormRecord.is_deleted == False
+    ).first()
+
+    if not record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form record not found"
+        )
+
+    compiled = get_compiled_record(db, record)
+
+    return {
+        "id": record.id,
+        "record_number": record.record_number,
+        "template_id": record.template_id,
+        "status": record.status,
+        "created_at": str(record.created_at),
+        "template_version": compiled.version_number,
+        "fields": [
+            {"name": name, "label": compiled.field_labels[name]}
+            for name in compiled.field_names
+        ],
+        "values": record_document(record)
+    }
+
+
+@router.get("/templates/{template_id}/fields/{field_name}/values", response_model=List[dict])
+async def list_field_values(
+    template_id: int,
+    field_name: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 1000,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """All values of one field across a template's records over a date range"""
+    return field_series(db, template_id, field_name, start_date, end_date, skip, limit)
+
+
+@router.post("/templates/{template_id}/read-model/rebuild", response_model=dict)
+async def rebuild_form_read_model(
+    template_id: int,
+    only_missing: bool = True,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Backfill record documents of a template from stored field values"""
+    template = db.query(FormTemplate).filter(FormTemplate.id == template_id).first()
+
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form template not found"
+        )
+
+    if template.current_version_id is None:
+        rebuilt = rebuild_documents(db, get_compiled_template(db, template), only_missing=only_missing)
+    else:
+        rebuilt = sum(
+            rebuild_documents(db, get_compiled_version(db, version.id), only_missing=only_missing)
+            for version in template.versions
+        )
+    db.commit()
+
+    return {
+        "message": "Read model rebuilt successfully",
+        "records": rebuilt
+    }
+
+
+def _get_template_or_404(db: Session, template_id: int) -> FormTemplate:
+    template = db.query(FormTemplate).filter(
+        FormTemplate.id == template_id,
+        FormTemplate.is_deleted == False
+    ).first()
+
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form template not found"
+        )
+    return template
+
+
+def _field_dict(field: FormField) -> dict:
+    return {
+        "id": field.id,
+        "field_name": field.field_name,
+        "field_label": field.field_label,
+        "field_type": field.field_type,
+        "order": field.order,
+        "is_required": field.is_required,
+        "is_readonly": field.is_readonly,
+        "default_value": field.default_value,
+        "placeholder": field.placeholder,
+        "help_text": field.help_text,
+        "options": field.options,
+        "validation_rules": field.validation_rules,
+        "section": field.section,
+        "formula": field.formula
+    }
+
+
+def _check_field_name(db: Session, template_id: int, field_name: str, exclude_id: Optional[int] = None):
+    query = working_fields_query(db, template_id).filter(FormField.field_name == field_name)
+    if exclude_id is not None:
+        query = query.filter(FormField.id != exclude_id)
+    if query.first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Field '{field_name}' already exists in this template"
+        )
+
+
+def _check_formulas(db: Session, template_id: int) -> None:
+    """Reject a working copy whose formulas don't parse, reference unknown fields or form cycles"""
+    db.flush()
+    try:
+        FormulaPlan(working_fields_query(db, template_id).all())
+    except FormulaError as exc:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+
+def _ensure_current_version(db: Session, template: FormTemplate, user_id: int) -> None:
+    try:
+        ensure_current_version(db, template, user_id)
+    except FormulaError as exc:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Template can't be used until its formulas are fixed: {exc}"
+        )
+
+
+@router.get("/templates/{template_id}/fields", response_model=List[dict])
+async def list_working_fields(
+    template_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Fields of a template's working copy, including unpublished edits"""
+    _get_template_or_404(db, template_id)
+    return [_field_dict(f) for f in working_fields_query(db, template_id).all()]
+
+
+@router.post("/templates/{template_id}/fields", response_model=dict)
+async def add_form_field(
+    template_id: int,
+    field_data: FormFieldCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Add a field to a template's working copy"""
+    _get_template_or_404(db, template_id)
+    _check_field_name(db, template_id, field_data.field_name)
+
+    last_order = db.query(func.max(FormField.order)).filter(
+        FormField.template_id == template_id,
+        FormField.is_active == True
+    ).scalar()
+
+    field = FormField(
+        template_id=template_id,
+        field_name=field_data.field_name,
+        field_label=field_data.field_label,
+        field_type=field_data.field_type,
+        is_required=field_data.is_required,
+        options=field_data.options,
+        validation_rules=field_data.validation_rules,
+        formula=field_data.formula,
+        order=(last_order if last_order is not None else -1) + 1,
+        created_by_id=current_user.id
+    )
+    db.add(field)
+    _check_formulas(db, template_id)
+    db.commit()
+    db.refresh(field)
+
+    return {
+        "message": "Form field added successfully",
+        "field": _field_dict(field)
+    }
+
+
+@router.put("/templates/{template_id}/fields/{field_id}", response_model=dict)
+async def update_form_field(
+    template_id: int,
+    field_id: int,
+    field_data: FormFieldUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Edit a field of a template's working copy
+
+    Fields already published in a version are copied rather than modified,
+    so the returned field id may differ from the one edited.
+    """
+    _get_template_or_404(db, template_id)
+    field = working_fields_query(db, template_id).filter(FormField.id == field_id).first()
+
+    if not field:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form field not found"
+        )
+
+    changes = field_data.model_dump(exclude_unset=True)
+    if changes.get("field_name"):
+        _check_field_name(db, template_id, changes["field_name"], exclude_id=field.id)
+
+    field = update_field(db, field, changes, current_user.id)
+    _check_formulas(db, template_id)
+    db.commit()
+    db.refresh(field)
+
+    return {
+        "message": "Form field updated successfully",
+        "field": _field_dict(field)
+    }
+
+
+@router.delete("/templates/{template_id}/fields/{field_id}", response_model=dict)
+async def delete_form_field(
+    template_id: int,
+    field_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Remove a field from a template's working copy; published versions keep it"""
+    _get_template_or_404(db, template_id)
+    field = working_fields_query(db, template_id).filter(FormField.id == field_id).first()
+
+    if not field:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form field not found"
+        )
+
+    remove_field(db, field, current_user.id)
+    _check_formulas(db, template_id)
+    db.commit()
+
+    return {"message": "Form field removed successfully"}
+
+
+@router.post("/templates/{template_id}/versions", response_model=dict)
+async def publish_form_template_version(
+    template_id: int,
+    request: FormTemplateVersionPublish,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Publish the working copy of a template as a new immutable version"""
+    template = _get_template_or_404(db, template_id)
+
+    try:
+        version = publish_version(db, template, current_user.id, notes=request.notes)
+    except (FormulaError, VersionUnchanged) as exc:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+    template.is_published = True
+    db.commit()
+
+    return {
+        "message": "Form template version published successfully",
+        "version_id": version.id,
+        "version_number": version.version_number,
+        "version": template.version
+    }
+
+
+@router.get("/templates/{template_id}/versions", response_model=List[dict])
+async def list_form_template_versions(
+    template_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List published versions of a template"""
+    template = _get_template_or_404(db, template_id)
+
+    return [
+        {
+            "id": v.id,
+            "version_number": v.version_number,
+            "notes": v.notes,
+            "is_current": v.id == template.current_version_id,
+            "created_by_id": v.created_by_id,
+            "created_at": v.created_at
+        }
+        for v in template.versions
+    ]
+
+
+@router.get("/templates/{template_id}/versions/{version_number}", response_model=dict)
+async def get_form_template_version(
+    template_id: int,
+    version_number: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the field snapshot of a template version"""
+    version = db.query(FormTemplateVersion).filter(
+        FormTemplateVersion.template_id == template_id,
+        FormTemplateVersion.version_number == version_number
+    ).first()
+
+    if not version:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Form template version not found"
+        )
+
+    return {
+        "id": version.id,
+        "template_id": version.template_id,
+        "version_number": version.version_number,
+        "notes": version.notes,
+        "created_at": version.created_at,
+        "fields": [_field_dict(f) for f in version.fields]
+    }
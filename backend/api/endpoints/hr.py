@@ -1,15 +1,22 @@
 """
 HR Management API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
 from sqlalchemy.orm import Session
 from backend.core import get_db
-from backend.models.hr import Employee, Leave, Training, LeaveTypeEnum
-from backend.api.dependencies.auth import get_current_user
+from backend.core.config import settings
+from backend.models.hr import Employee, Leave, LeaveBalance, Holiday, Attendance, Training, TrainingParticipant, LeaveTypeEnum
+from backend.api.dependencies.auth import get_current_user, get_current_superuser
+from backend.api.endpoints.workflow import run_single_transition
+from backend.services.attendance import import_punches
+from backend.services.competency import (
+    CompetencyError, competency_matrix, enroll, record_participation, retarget_training, unqualified_query
+)
+from backend.services.leave import LeaveError, request_leave as submit_leave, team_capacity
 from backend.models.user import User
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import date
+from datetime import date, timedelta
 
 router = APIRouter()
 
@@ -18,7 +25,7 @@ class LeaveRequest(BaseModel):
     leave_type: LeaveTypeEnum
     start_date: date
     end_date: date
-    num_days: float
+    half_day: bool = False
     reason: Optional[str] = None
 
 
@@ -34,13 +41,71 @@ class LeaveResponse(BaseModel):
         from_attributes = True
 
 
+class LeaveBalanceUpdate(BaseModel):
+    employee_id: int
+    leave_type: LeaveTypeEnum
+    year: int
+    entitled: float
+
+
+class HolidayCreate(BaseModel):
+    holiday_date: date
+    name: str
+
+
+class TrainingCreate(BaseModel):
+    training_code: str
+    title: str
+    description: Optional[str] = None
+    training_type: Optional[str] = None
+    trainer_name: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    duration_hours: Optional[int] = None
+    location: Optional[str] = None
+    max_participants: Optional[int] = None
+    competency: Optional[str] = None
+    validity_days: Optional[int] = None
+
+
+class TrainingUpdate(BaseModel):
+    title: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    max_participants: Optional[int] = None
+    competency: Optional[str] = None
+    validity_days: Optional[int] = None
+
+
+class TrainingEnrollment(BaseModel):
+    employee_ids: List[int]
+
+
+class ParticipationUpdate(BaseModel):
+    status: str
+    completed_on: Optional[date] = None
+    score: Optional[float] = None
+    certificate_number: Optional[str] = None
+
+
+def _balance_dict(balance: LeaveBalance) -> dict:
+    return {
+        "leave_type": balance.leave_type.value,
+        "year": balance.year,
+        "entitled": balance.entitled,
+        "used": balance.used,
+        "pending": balance.pending,
+        "available": balance.available
+    }
+
+
 @router.post("/leave", response_model=dict)
 async def request_leave(
     leave: LeaveRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Submit leave request"""
+    """Submit leave request; working days are counted against the holiday calendar"""
     # Get employee record
     employee = db.query(Employee).filter(Employee.user_id == current_user.id).first()
 
@@ -50,21 +115,24 @@ async def request_leave(
             detail="Employee record not found"
         )
 
-    new_leave = Leave(
-        employee_id=employee.id,
-        leave_type=leave.leave_type,
-        start_date=leave.start_date,
-        end_date=leave.end_date,
-        num_days=leave.num_days,
-        reason=leave.reason,
-        status='pending',
-        created_by_id=current_user.id
-    )
-
-    db.add(new_leave)
+    try:
+        new_leave = submit_leave(
+            db, employee.id, leave.leave_type, leave.start_date, leave.end_date, current_user.id,
+            half_day=leave.half_day,
+            reason=leave.reason
+        )
+    except LeaveError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
     db.commit()
 
-    return {"message": "Leave request submitted successfully"}
+    return {
+        "message": "Leave request submitted successfully",
+        "id": new_leave.id,
+        "num_days": new_leave.num_days
+    }
 
 
 @router.get("/leave", response_model=List[LeaveResponse])
@@ -75,19 +143,113 @@ async def list_leaves(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """List leave requests"""
+    """List leave requests, latest first"""
+    query = db.query(Leave).join(Employee, Employee.id == Leave.employee_id).filter(
+        Employee.user_id == current_user.id,
+        Leave.is_deleted == False
+    )
+
+    if status:
+        query = query.filter(Leave.status == status)
+
+    leaves = query.order_by(Leave.start_date.desc(), Leave.id.desc()).offset(skip).limit(limit).all()
+    return leaves
+
+
+@router.get("/leave/balances", response_model=List[dict])
+async def list_leave_balances(
+    year: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Leave balances of the current user for a year (this year by default)"""
     employee = db.query(Employee).filter(Employee.user_id == current_user.id).first()
 
     if not employee:
         return []
 
-    query = db.query(Leave).filter(Leave.employee_id == employee.id)
+    year = year or date.today().year
+    balances = {
+        balance.leave_type: balance for balance in db.query(LeaveBalance).filter(
+            LeaveBalance.employee_id == employee.id,
+            LeaveBalance.year == year
+        )
+    }
+    for leave_type in LeaveTypeEnum:
+        entitlement = settings.LEAVE_ENTITLEMENTS.get(leave_type.value)
+        if leave_type not in balances and entitlement is not None:
+            # Not used yet this year, the row is created by the first request
+            balances[leave_type] = LeaveBalance(leave_type=leave_type, year=year, entitled=float(entitlement), used=0.0, pending=0.0)
 
-    if status:
-        query = query.filter(Leave.status == status)
+    return [_balance_dict(balances[leave_type]) for leave_type in LeaveTypeEnum if leave_type in balances]
 
-    leaves = query.offset(skip).limit(limit).all()
-    return leaves
+
+@router.put("/leave/balances", response_model=dict)
+async def set_leave_entitlement(
+    balance_update: LeaveBalanceUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Set an employee's entitlement for a leave type and year"""
+    balance = db.query(LeaveBalance).filter(
+        LeaveBalance.employee_id == balance_update.employee_id,
+        LeaveBalance.leave_type == balance_update.leave_type,
+        LeaveBalance.year == balance_update.year
+    ).with_for_update().first()
+    if balance is None:
+        balance = LeaveBalance(
+            employee_id=balance_update.employee_id,
+            leave_type=balance_update.leave_type,
+            year=balance_update.year,
+            used=0,
+            pending=0,
+            created_by_id=current_user.id
+        )
+        db.add(balance)
+
+    balance.entitled = balance_update.entitled
+    balance.updated_by_id = current_user.id
+    db.commit()
+
+    return {
+        "message": "Leave entitlement updated successfully",
+        "balance": _balance_dict(balance)
+    }
+
+
+@router.get("/leave/out", response_model=dict)
+async def who_is_out(
+    department: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    include_pending: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Who is out in a department (yours by default) and the remaining headcount per working day, this week by default"""
+    department = department or current_user.department
+    if not department:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Department is required"
+        )
+    if department != current_user.department and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough privileges"
+        )
+
+    today = date.today()
+    start_date = start_date or today - timedelta(days=today.weekday())
+    end_date = end_date or start_date + timedelta(days=6)
+
+    try:
+        return team_capacity(db, department, start_date, end_date, include_pending)
+    except LeaveError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
 
 
 @router.put("/leave/{leave_id}/approve")
@@ -96,19 +258,324 @@ async def approve_leave(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Approve leave request"""
-    leave = db.query(Leave).filter(Leave.id == leave_id).first()
+    """Approve a pending leave request"""
+    run_single_transition(db, "leave", leave_id, "approve", current_user)
+
+    return {"message": "Leave approved successfully"}
+
+
+@router.get("/holidays", response_model=List[dict])
+async def list_holidays(
+    year: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Company holidays of a year (this year by default)"""
+    year = year or date.today().year
+    holidays = db.query(Holiday).filter(
+        Holiday.holiday_date >= date(year, 1, 1),
+        Holiday.holiday_date <= date(year, 12, 31),
+        Holiday.is_deleted == False
+    ).order_by(Holiday.holiday_date).all()
+
+    return [
+        {"id": holiday.id, "holiday_date": holiday.holiday_date, "name": holiday.name}
+        for holiday in holidays
+    ]
+
+
+@router.post("/holidays", response_model=dict)
+async def create_holiday(
+    holiday: HolidayCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Add a company holiday; leave already requested keeps its day count"""
+    existing = db.query(Holiday).filter(Holiday.holiday_date == holiday.holiday_date).first()
+    if existing and not existing.is_deleted:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{holiday.holiday_date} is already a holiday ({existing.name})"
+        )
+
+    if existing:
+        existing.is_deleted = False
+        existing.name = holiday.name
+        existing.updated_by_id = current_user.id
+        new_holiday = existing
+    else:
+        new_holiday = Holiday(holiday_date=holiday.holiday_date, name=holiday.name, created_by_id=current_user.id)
+        db.add(new_holiday)
+    db.commit()
+
+    return {
+        "message": "Holiday added successfully",
+        "id": new_holiday.id
+    }
+
+
+@router.delete("/holidays/{holiday_id}", response_model=dict)
+async def delete_holiday(
+    holiday_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Remove a company holiday"""
+    holiday = db.query(Holiday).filter(Holiday.id == holiday_id, Holiday.is_deleted == False).first()
+    if not holiday:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Holiday not found"
+        )
 
-    if not leave:
+    holiday.is_deleted = True
+    holiday.updated_by_id = current_user.id
+    db.commit()
+
+    return {"message": "Holiday deleted successfully"}
+
+
+def _get_training(db: Session, training_id: int) -> Training:
+    training = db.query(Training).filter(Training.id == training_id, Training.is_deleted == False).first()
+    if not training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Leave request not found"
+            detail="Training not found"
         )
+    return training
 
-    leave.status = 'approved'
-    leave.approver_id = current_user.id
-    leave.approved_at = str(date.today())
 
+@router.post("/trainings", response_model=dict)
+async def create_training(
+    training: TrainingCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Create a training, optionally qualifying its participants on a competency"""
+    if db.query(Training.id).filter(Training.training_code == training.training_code).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Training {training.training_code} already exists"
+        )
+
+    new_training = Training(**training.model_dump(), created_by_id=current_user.id)
+    db.add(new_training)
     db.commit()
 
-    return {"message": "Leave approved successfully"}
+    return {
+        "message": "Training created successfully",
+        "id": new_training.id
+    }
+
+
+@router.put("/trainings/{training_id}", response_model=dict)
+async def update_training(
+    training_id: int,
+    training_update: TrainingUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Update a training; changing its competency or validity refreshes its participants' qualifications"""
+    training = _get_training(db, training_id)
+    old_competency, old_validity = training.competency, training.validity_days
+
+    for key, value in training_update.model_dump(exclude_unset=True).items():
+        setattr(training, key, value)
+    training.updated_by_id = current_user.id
+    db.flush()
+
+    if (training.competency, training.validity_days) != (old_competency, old_validity):
+        retarget_training(db, training, old_competency)
+    db.commit()
+
+    return {"message": "Training updated successfully"}
+
+
+@router.get("/trainings/{training_id}/participants", response_model=List[dict])
+async def list_training_participants(
+    training_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Participants of a training with their outcome"""
+    _get_training(db, training_id)
+    rows = db.query(TrainingParticipant, Employee.employee_code, User.full_name).join(
+        Employee, Employee.id == TrainingParticipant.employee_id
+    ).join(
+        User, User.id == Employee.user_id
+    ).filter(
+        TrainingParticipant.training_id == training_id,
+        TrainingParticipant.is_deleted == False
+    ).order_by(User.full_name).all()
+
+    return [
+        {
+            "employee_id": participant.employee_id,
+            "employee_code": employee_code,
+            "name": full_name,
+            "status": participant.status,
+            "completed_on": participant.completed_on,
+            "score": participant.score,
+            "certificate_number": participant.certificate_number
+        }
+        for participant, employee_code, full_name in rows
+    ]
+
+
+@router.post("/trainings/{training_id}/participants", response_model=dict)
+async def enroll_training_participants(
+    training_id: int,
+    enrollment: TrainingEnrollment,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Enroll employees in a training; already enrolled employees are skipped"""
+    training = _get_training(db, training_id)
+    try:
+        enrolled = enroll(db, training, enrollment.employee_ids, current_user.id)
+    except CompetencyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    db.commit()
+
+    return {
+        "message": f"{enrolled} employees enrolled",
+        "enrolled": enrolled
+    }
+
+
+@router.put("/trainings/{training_id}/participants/{employee_id}", response_model=dict)
+async def update_training_participant(
+    training_id: int,
+    employee_id: int,
+    participation: ParticipationUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Record an employee's outcome of a training and update their competencies"""
+    training = _get_training(db, training_id)
+    try:
+        record_participation(
+            db, training, employee_id, participation.status, current_user.id,
+            completed_on=participation.completed_on,
+            score=participation.score,
+            certificate_number=participation.certificate_number
+        )
+    except CompetencyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    db.commit()
+
+    return {"message": "Participation updated successfully"}
+
+
+@router.get("/competencies/matrix", response_model=dict)
+async def get_competency_matrix(
+    competency: Optional[List[str]] = Query(None),
+    department: Optional[str] = None,
+    as_of: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Employees × competencies with qualification and expiry of every cell"""
+    return competency_matrix(db, competency, department, as_of)
+
+
+@router.get("/competencies/{competency}/unqualified", response_model=List[dict])
+async def list_unqualified(
+    competency: str,
+    department: Optional[str] = None,
+    as_of: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Active employees not (or no longer) qualified on a competency"""
+    rows = unqualified_query(db, competency, department, as_of).offset(skip).limit(limit).all()
+    return [
+        {
+            "employee_id": employee.id,
+            "employee_code": employee.employee_code,
+            "user_id": user.id,
+            "name": user.full_name,
+            "department": user.department
+        }
+        for employee, user in rows
+    ]
+
+
+@router.post("/attendance/import", response_model=dict)
+async def import_attendance(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Import a biometric/CSV punch log and update daily attendance; safe to re-run on overlapping exports"""
+    name = (file.filename or "").lower()
+    if not name.endswith((".csv", ".txt")) and file.content_type not in ("text/csv", "application/csv", "text/plain"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload must be a CSV punch log"
+        )
+
+    summary = import_punches(db, file.file, current_user.id)
+
+    return {
+        "message": "Attendance imported successfully",
+        **summary.to_dict()
+    }
+
+
+@router.get("/attendance", response_model=List[dict])
+async def list_attendance(
+    employee_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Daily attendance, latest first; other employees' records need superuser rights"""
+    if employee_id is None:
+        employee = db.query(Employee).filter(Employee.user_id == current_user.id).first()
+        if not employee:
+            return []
+        employee_id = employee.id
+    elif not current_user.is_superuser:
+        own = db.query(Employee.id).filter(Employee.user_id == current_user.id).scalar()
+        if own != employee_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough privileges"
+            )
+
+    query = db.query(Attendance).filter(
+        Attendance.employee_id == employee_id,
+        Attendance.is_deleted == False
+    )
+    if start_date:
+        query = query.filter(Attendance.date >= start_date)
+    if end_date:
+        query = query.filter(Attendance.date <= end_date)
+
+    records = query.order_by(Attendance.date.desc()).offset(skip).limit(limit).all()
+    return [
+        {
+            "id": record.id,
+            "date": record.date,
+            "check_in_time": record.check_in_time,
+            "check_out_time": record.check_out_time,
+            "hours_worked": record.hours_worked,
+            "status": record.status,
+            "location": record.location,
+            "remarks": record.remarks,
+            "punch_count": record.punch_count
+        }
+        for record in records
+    ]
@@ -0,0 +1,70 @@
+"""
+Approval Inbox API endpoints
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from backend.core import get_db
+from backend.api.dependencies.auth import get_current_user, get_current_superuser
+from backend.models.user import User
+from backend.services.work_items import inbox_query, inbox_counts, rebuild_work_items
+from typing import Optional
+
+router = APIRouter()
+
+
+@router.get("/", response_model=dict)
+async def get_inbox(
+    entity: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Items awaiting the current user across all modules, most urgent first"""
+    query = inbox_query(db, current_user.id, entity)
+    items = query.offset(skip).limit(limit).all()
+
+    return {
+        "total": query.order_by(None).count(),
+        "items": [
+            {
+                "entity_type": item.entity_type,
+                "entity_id": item.entity_id,
+                "title": item.title,
+                "status": item.status,
+                "priority": item.priority,
+                "due_date": item.due_date,
+                "link": item.link,
+                "created_at": item.created_at
+            }
+            for item in items
+        ]
+    }
+
+
+@router.get("/count", response_model=dict)
+async def get_inbox_count(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Number of items awaiting the current user, per module"""
+    counts = inbox_counts(db, current_user.id)
+    return {
+        "total": sum(counts.values()),
+        "by_entity": counts
+    }
+
+
+@router.post("/rebuild", response_model=dict)
+async def rebuild_inbox(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Rebuild all inbox items from the workflow entities"""
+    total = rebuild_work_items(db)
+    db.commit()
+
+    return {
+        "message": "Inbox rebuilt successfully",
+        "items": total
+    }
@@ -0,0 +1,249 @@
+"""
+Background Jobs API endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from backend.core import get_db
+from backend.api.dependencies.auth import get_current_superuser
+from backend.models.user import User
+from backend.models.job import Job, ScheduledJob
+from backend.services.jobs import (
+    JobError,
+    enqueue,
+    schedule,
+    retry_job,
+    queue_stats,
+    job_definitions
+)
+from pydantic import BaseModel
+from typing import List, Optional
+
+router = APIRouter()
+
+
+class JobEnqueueRequest(BaseModel):
+    name: str
+    payload: Optional[dict] = None
+    delay_seconds: Optional[int] = None
+    queue: Optional[str] = None
+    priority: int = 0
+    dedupe_key: Optional[str] = None
+
+
+class ScheduleRequest(BaseModel):
+    name: str
+    job_name: str
+    cron: str
+    payload: Optional[dict] = None
+    queue: Optional[str] = None
+
+
+def _job_dict(job: Job, detail: bool = False) -> dict:
+    data = {
+        "id": job.id,
+        "name": job.name,
+        "queue": job.queue,
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_at": job.run_at,
+        "started_at": job.started_at,
+        "heartbeat_at": job.heartbeat_at,
+        "finished_at": job.finished_at,
+        "created_at": job.created_at
+    }
+    if detail:
+        data.update(
+            payload=job.payload,
+            result=job.result,
+            last_error=job.last_error,
+            locked_by=job.locked_by,
+            dedupe_key=job.dedupe_key
+        )
+    return data
+
+
+@router.get("/stats", response_model=dict)
+async def get_job_stats(
+    window_minutes: int = 60,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Queue depth, oldest waiting job and start latency per queue"""
+    return {
+        "window_minutes": window_minutes,
+        "queues": queue_stats(db, window_minutes)
+    }
+
+
+@router.get("/definitions", response_model=List[dict])
+async def list_job_definitions(
+    current_user: User = Depends(get_current_superuser)
+):
+    """Registered job handlers"""
+    return [
+        {
+            "name": definition.name,
+            "queue": definition.queue,
+            "max_attempts": definition.max_attempts,
+            "cron": definition.cron,
+            "description": (definition.func.__doc__ or "").strip()
+        }
+        for definition in sorted(job_definitions(), key=lambda definition: definition.name)
+    ]
+
+
+@router.get("/schedules", response_model=List[dict])
+async def list_schedules(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Cron schedules"""
+    schedules = db.query(ScheduledJob).order_by(ScheduledJob.name).all()
+    return [
+        {
+            "id": scheduled.id,
+            "name": scheduled.name,
+            "job_name": scheduled.job_name,
+            "cron": scheduled.cron,
+            "payload": scheduled.payload,
+            "queue": scheduled.queue,
+            "is_active": scheduled.is_active,
+            "next_run_at": scheduled.next_run_at,
+            "last_run_at": scheduled.last_run_at,
+            "last_job_id": scheduled.last_job_id
+        }
+        for scheduled in schedules
+    ]
+
+
+@router.post("/schedules", response_model=dict)
+async def create_schedule(
+    schedule_request: ScheduleRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Create or replace a cron schedule"""
+    try:
+        scheduled = schedule(
+            db, schedule_request.name, schedule_request.job_name, schedule_request.cron,
+            payload=schedule_request.payload,
+            queue=schedule_request.queue
+        )
+    except JobError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    db.commit()
+
+    return {
+        "message": "Schedule saved successfully",
+        "name": scheduled.name,
+        "next_run_at": scheduled.next_run_at
+    }
+
+
+@router.delete("/schedules/{name}", response_model=dict)
+async def disable_schedule(
+    name: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Stop a cron schedule from enqueuing jobs"""
+    scheduled = db.query(ScheduledJob).filter(ScheduledJob.name == name).first()
+    if not scheduled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Schedule not found"
+        )
+
+    scheduled.is_active = False
+    db.commit()
+
+    return {"message": "Schedule disabled successfully"}
+
+
+@router.get("/", response_model=List[dict])
+async def list_jobs(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    queue: Optional[str] = None,
+    name: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Jobs, newest first"""
+    query = db.query(Job)
+    if status_filter:
+        query = query.filter(Job.status == status_filter)
+    if queue:
+        query = query.filter(Job.queue == queue)
+    if name:
+        query = query.filter(Job.name == name)
+
+    jobs = query.order_by(Job.id.desc()).offset(skip).limit(limit).all()
+    return [_job_dict(job) for job in jobs]
+
+
+@router.post("/", response_model=dict)
+async def enqueue_job(
+    enqueue_request: JobEnqueueRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Queue a job"""
+    try:
+        job_id = enqueue(
+            db, enqueue_request.name, enqueue_request.payload,
+            delay=enqueue_request.delay_seconds,
+            queue=enqueue_request.queue,
+            priority=enqueue_request.priority,
+            dedupe_key=enqueue_request.dedupe_key
+        )
+    except JobError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    db.commit()
+
+    return {
+        "message": "Job queued successfully",
+        "id": job_id
+    }
+
+
+@router.get("/{job_id}", response_model=dict)
+async def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Job details, including its result or last error"""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return _job_dict(job, detail=True)
+
+
+@router.post("/{job_id}/retry", response_model=dict)
+async def retry_failed_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Queue a failed job again"""
+    if not retry_job(db, job_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only failed jobs can be retried"
+        )
+    db.commit()
+
+    return {"message": "Job queued for retry"}
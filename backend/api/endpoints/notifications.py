@@ -0,0 +1,196 @@
+"""
+Notification API endpoints
+"""
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, status, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from backend.core import get_db, settings
+from backend.core.database import SessionLocal
+from backend.api.dependencies.auth import get_current_user, get_current_superuser, authenticate_token
+from backend.models.user import User
+from backend.models.notification import Notification
+from backend.services.notifications import hub, mark_read
+from backend.services.email_outbox import outbox_counts
+from pydantic import BaseModel
+from typing import List, Optional, Tuple
+
+router = APIRouter()
+
+
+class NotificationReadRequest(BaseModel):
+    ids: Optional[List[int]] = None  # All unread notifications when omitted
+
+
+def _authenticate_stream(token: Optional[str]) -> Optional[Tuple[int, int]]:
+    """User id and unread count for a streaming connection, without holding a session open"""
+    db = SessionLocal()
+    try:
+        user = authenticate_token(token, db)
+        if user is None:
+            return None
+        return user.id, hub.unread_count(db, user.id)
+    finally:
+        db.close()
+
+
+def _bearer_token(request: Request, token: Optional[str]) -> Optional[str]:
+    if token:
+        return token
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    return credentials if scheme.lower() == "bearer" else None
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/", response_model=List[dict])
+async def list_notifications(
+    unread_only: bool = False,
+    category: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Notifications of the current user, newest first"""
+    query = db.query(Notification).filter(
+        Notification.user_id == current_user.id,
+        Notification.is_deleted == False
+    )
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+    if category:
+        query = query.filter(Notification.category == category)
+
+    notifications = query.order_by(Notification.id.desc()).offset(skip).limit(limit).all()
+    return [
+        {
+            "id": notification.id,
+            "title": notification.title,
+            "message": notification.message,
+            "notification_type": notification.notification_type,
+            "category": notification.category,
+            "priority": notification.priority,
+            "link": notification.link,
+            "event_count": notification.event_count,
+            "is_read": notification.is_read,
+            "read_at": notification.read_at,
+            "created_at": notification.created_at
+        }
+        for notification in notifications
+    ]
+
+
+@router.get("/unread-count", response_model=dict)
+async def get_unread_count(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Number of unread notifications of the current user"""
+    return {"unread": hub.unread_count(db, current_user.id)}
+
+
+@router.post("/read", response_model=dict)
+async def mark_notifications_read(
+    read_request: NotificationReadRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Mark notifications read, all of them when no ids are given"""
+    read_ids = mark_read(db, current_user.id, read_request.ids)
+    db.commit()
+
+    return {
+        "message": f"{len(read_ids)} notifications marked read",
+        "ids": read_ids,
+        "unread": hub.unread_count(db, current_user.id)
+    }
+
+
+@router.get("/email-outbox", response_model=dict)
+async def get_email_outbox_status(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Outgoing email counts per delivery status"""
+    counts = outbox_counts(db)
+    return {
+        "enabled": settings.EMAIL_ENABLED,
+        "total": sum(counts.values()),
+        "by_status": counts
+    }
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = None
+):
+    """
+    Server-Sent Events stream of the current user's notifications
+
+    EventSource can't set headers, so the access token may be passed as the
+    `token` query parameter instead of an Authorization header.
+    """
+    authenticated = _authenticate_stream(_bearer_token(request, token))
+    if authenticated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
+        )
+    user_id, unread = authenticated
+    queue = hub.subscribe(user_id)
+
+    async def events():
+        try:
+            yield _sse("unread", {"unread": unread})
+            while not await request.is_disconnected():
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(item["event"], item)
+        finally:
+            hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def notifications_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = None
+):
+    """WebSocket push of the current user's notifications; the token comes in the query string"""
+    authenticated = _authenticate_stream(token)
+    if authenticated is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id, unread = authenticated
+
+    await websocket.accept()
+    queue = hub.subscribe(user_id)
+
+    async def forward():
+        await websocket.send_json({"event": "unread", "unread": unread})
+        while True:
+            await websocket.send_json(await queue.get())
+
+    sender = asyncio.create_task(forward())
+    try:
+        # Client messages are ignored; receiving is how a disconnect is noticed
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(user_id, queue)
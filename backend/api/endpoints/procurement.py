@@ -1,12 +1,28 @@
 """
 Procurement and Equipment API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from backend.core import get_db
-from backend.models.procurement import Equipment, Calibration, EquipmentStatusEnum
+from backend.models.procurement import Equipment, Calibration, EquipmentBooking, EquipmentDrift, EquipmentStatusEnum
 from backend.api.dependencies.auth import get_current_user
 from backend.models.user import User
+from backend.services.calibration import (
+    CalibrationError,
+    record_calibration,
+    schedule_reminders,
+    next_due_date,
+    due_calibrations_query
+)
+from backend.services.calibration_analytics import numpy_available, drift_report
+from backend.services.equipment_booking import (
+    BookingError,
+    BookingConflict,
+    CONFIRMED,
+    create_booking,
+    cancel_booking,
+    availability
+)
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import date, datetime, timedelta
@@ -22,6 +38,7 @@ class EquipmentCreate(BaseModel):
     serial_number: Optional[str] = None
     calibration_required: bool = False
     calibration_frequency_days: Optional[int] = None
+    last_calibration_date: Optional[date] = None
 
 
 class EquipmentResponse(BaseModel):
@@ -36,6 +53,56 @@ class EquipmentResponse(BaseModel):
         from_attributes = True
 
 
+class CalibrationCreate(BaseModel):
+    calibration_date: date
+    next_due_date: Optional[date] = None  # From the certificate; calibration_frequency_days when omitted
+    calibrated_by: Optional[str] = None
+    certificate_number: Optional[str] = None
+    result: Optional[str] = None  # Pass, Fail, Conditional
+    calibration_data: Optional[dict] = None
+    remarks: Optional[str] = None
+    cost: Optional[float] = None
+
+
+class BookingCreate(BaseModel):
+    start_at: datetime
+    end_at: datetime
+    project_id: Optional[int] = None
+    order_id: Optional[int] = None
+    purpose: Optional[str] = None
+    notes: Optional[str] = None
+
+
+def _booking_dict(booking: EquipmentBooking) -> dict:
+    return {
+        "id": booking.id,
+        "equipment_id": booking.equipment_id,
+        "start_at": booking.start_at,
+        "end_at": booking.end_at,
+        "status": booking.status,
+        "project_id": booking.project_id,
+        "order_id": booking.order_id,
+        "booked_by_id": booking.booked_by_id,
+        "purpose": booking.purpose,
+        "notes": booking.notes
+    }
+
+
+def _calibration_dict(calibration: Calibration) -> dict:
+    return {
+        "id": calibration.id,
+        "calibration_number": calibration.calibration_number,
+        "calibration_date": calibration.calibration_date,
+        "due_date": calibration.due_date,
+        "next_due_date": calibration.next_due_date,
+        "calibrated_by": calibration.calibrated_by,
+        "certificate_number": calibration.certificate_number,
+        "result": calibration.result,
+        "remarks": calibration.remarks,
+        "cost": calibration.cost
+    }
+
+
 @router.post("/equipment", response_model=EquipmentResponse)
 async def create_equipment(
     equipment: EquipmentCreate,
@@ -56,12 +123,17 @@ async def create_equipment(
         serial_number=equipment.serial_number,
         calibration_required=equipment.calibration_required,
         calibration_frequency_days=equipment.calibration_frequency_days,
+        last_calibration_date=equipment.last_calibration_date,
         status=EquipmentStatusEnum.ACTIVE,
         custodian_id=current_user.id,
         created_by_id=current_user.id
     )
+    if equipment.calibration_required and equipment.last_calibration_date:
+        new_equipment.next_calibration_date = next_due_date(new_equipment, equipment.last_calibration_date)
 
     db.add(new_equipment)
+    db.flush()
+    schedule_reminders(db, new_equipment)
     db.commit()
     db.refresh(new_equipment)
 
@@ -94,28 +166,275 @@ async def list_equipment(
     return equipment
 
 
+@router.get("/equipment/availability", response_model=List[dict])
+async def get_equipment_availability(
+    start_at: datetime,
+    end_at: datetime,
+    category: Optional[str] = None,
+    equipment_ids: Optional[List[int]] = Query(None),
+    min_hours: Optional[float] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Free slots of active equipment between start_at and end_at, e.g. all chambers next week"""
+    try:
+        return availability(
+            db, start_at, end_at,
+            category=category,
+            equipment_ids=equipment_ids,
+            min_duration=timedelta(hours=min_hours) if min_hours else None
+        )
+    except BookingError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+
+@router.post("/equipment/{equipment_id}/bookings", response_model=dict)
+async def create_equipment_booking(
+    equipment_id: int,
+    booking: BookingCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Book equipment for a time range against a project or customer order"""
+    try:
+        new_booking = create_booking(
+            db, equipment_id, booking.start_at, booking.end_at, current_user.id,
+            project_id=booking.project_id,
+            order_id=booking.order_id,
+            purpose=booking.purpose,
+            notes=booking.notes
+        )
+    except BookingConflict as exc:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": str(exc),
+                "conflicts": [
+                    {"id": conflict.id, "start_at": conflict.start_at.isoformat(), "end_at": conflict.end_at.isoformat()}
+                    for conflict in exc.conflicts
+                ]
+            }
+        )
+    except BookingError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    db.commit()
+
+    return {
+        "message": "Equipment booked successfully",
+        "booking": _booking_dict(new_booking)
+    }
+
+
+@router.get("/equipment/{equipment_id}/bookings", response_model=List[dict])
+async def list_equipment_bookings(
+    equipment_id: int,
+    start_at: Optional[datetime] = None,
+    end_at: Optional[datetime] = None,
+    include_cancelled: bool = False,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Bookings of one equipment overlapping the given range, in start order"""
+    query = db.query(EquipmentBooking).filter(
+        EquipmentBooking.equipment_id == equipment_id,
+        EquipmentBooking.is_deleted == False
+    )
+    if not include_cancelled:
+        query = query.filter(EquipmentBooking.status == CONFIRMED)
+    if start_at:
+        query = query.filter(EquipmentBooking.end_at > start_at)
+    if end_at:
+        query = query.filter(EquipmentBooking.start_at < end_at)
+
+    bookings = query.order_by(EquipmentBooking.start_at).offset(skip).limit(limit).all()
+    return [_booking_dict(booking) for booking in bookings]
+
+
+@router.post("/bookings/{booking_id}/cancel", response_model=dict)
+async def cancel_equipment_booking(
+    booking_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Cancel a booking; allowed for whoever booked it, the custodian and superusers"""
+    booking = db.query(EquipmentBooking).filter(
+        EquipmentBooking.id == booking_id,
+        EquipmentBooking.is_deleted == False
+    ).first()
+    if not booking:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Booking not found"
+        )
+    if current_user.id not in (booking.booked_by_id, booking.equipment.custodian_id) and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough privileges"
+        )
+
+    try:
+        cancel_booking(db, booking, current_user.id)
+    except BookingError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    db.commit()
+
+    return {"message": "Booking cancelled successfully"}
+
+
+@router.post("/equipment/{equipment_id}/calibrations", response_model=dict)
+async def create_calibration(
+    equipment_id: int,
+    calibration: CalibrationCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Record a calibration and move the equipment's next calibration date"""
+    try:
+        record = record_calibration(
+            db, equipment_id, calibration.calibration_date, current_user.id,
+            certificate_due=calibration.next_due_date,
+            calibrated_by=calibration.calibrated_by,
+            certificate_number=calibration.certificate_number,
+            result=calibration.result,
+            calibration_data=calibration.calibration_data,
+            remarks=calibration.remarks,
+            cost=calibration.cost
+        )
+    except CalibrationError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(exc)
+        )
+    db.commit()
+
+    equipment = record.equipment
+    return {
+        "message": "Calibration recorded successfully",
+        "calibration": _calibration_dict(record),
+        "last_calibration_date": equipment.last_calibration_date,
+        "next_calibration_date": equipment.next_calibration_date
+    }
+
+
+@router.get("/equipment/{equipment_id}/calibrations", response_model=List[dict])
+async def list_equipment_calibrations(
+    equipment_id: int,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Calibration history of one equipment, latest first"""
+    calibrations = db.query(Calibration).filter(
+        Calibration.equipment_id == equipment_id,
+        Calibration.is_deleted == False
+    ).order_by(Calibration.calibration_date.desc(), Calibration.id.desc()).offset(skip).limit(limit).all()
+
+    return [_calibration_dict(calibration) for calibration in calibrations]
+
+
+@router.get("/equipment/{equipment_id}/drift", response_model=dict)
+async def get_equipment_drift(
+    equipment_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Measurement drift per parameter with the predicted out-of-tolerance date"""
+    equipment = db.query(Equipment).filter(
+        Equipment.id == equipment_id,
+        Equipment.is_deleted == False
+    ).first()
+    if not equipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Equipment not found"
+        )
+    if not numpy_available():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Drift analysis requires numpy to be installed"
+        )
+
+    report = drift_report(db, equipment.id)
+    report["next_calibration_date"] = equipment.next_calibration_date
+    return report
+
+
+@router.get("/calibration/risk", response_model=List[dict])
+async def list_calibration_risk(
+    category: Optional[str] = None,
+    min_score: float = 0.0,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Equipment ranked by drift risk, from the latest nightly drift analysis"""
+    query = db.query(EquipmentDrift, Equipment).join(
+        Equipment, Equipment.id == EquipmentDrift.equipment_id
+    ).filter(
+        Equipment.is_deleted == False,
+        EquipmentDrift.risk_score >= min_score
+    )
+    if category:
+        query = query.filter(Equipment.category == category)
+
+    ranked = query.order_by(
+        EquipmentDrift.risk_score.desc(),
+        EquipmentDrift.predicted_out_of_tolerance.nullslast(),
+        Equipment.id
+    ).offset(skip).limit(limit).all()
+
+    return [
+        {
+            "id": equipment.id,
+            "equipment_id": equipment.equipment_id,
+            "name": equipment.name,
+            "category": equipment.category,
+            "risk_score": drift.risk_score,
+            "worst_parameter": drift.worst_parameter,
+            "tolerance_used": drift.tolerance_used,
+            "drift_per_year": drift.drift_per_year,
+            "predicted_out_of_tolerance": drift.predicted_out_of_tolerance,
+            "next_calibration_date": equipment.next_calibration_date,
+            "out_of_tolerance_before_due": drift.out_of_tolerance_before_due,
+            "computed_at": drift.computed_at
+        }
+        for drift, equipment in ranked
+    ]
+
+
 @router.get("/calibration/due", response_model=List[dict])
 async def list_due_calibrations(
     days_ahead: int = 30,
+    skip: int = 0,
+    limit: int = 100,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """List equipment with calibration due in next N days"""
+    """List equipment with calibration due in next N days (overdue included), soonest first"""
     today = date.today()
-    future_date = today + timedelta(days=days_ahead)
-
-    equipment = db.query(Equipment).filter(
-        Equipment.calibration_required == True,
-        Equipment.next_calibration_date <= future_date,
-        Equipment.is_deleted == False
-    ).all()
+    equipment = due_calibrations_query(db, days_ahead, today).offset(skip).limit(limit).all()
 
     return [
         {
+            "id": e.id,
             "equipment_id": e.equipment_id,
             "name": e.name,
             "next_calibration_date": str(e.next_calibration_date),
-            "days_remaining": (e.next_calibration_date - today).days if e.next_calibration_date else None
+            "days_remaining": (e.next_calibration_date - today).days,
+            "overdue": e.next_calibration_date < today
         }
         for e in equipment
     ]
@@ -1,12 +1,15 @@
 """
 Project Management API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from backend.core import get_db
-from backend.models.workflow import Project, ProjectStatusEnum
+from backend.models.workflow import Project, ProjectStatusEnum, TaskDependency
 from backend.api.dependencies.auth import get_current_user
 from backend.models.user import User
+from backend.services.scheduling import ScheduleError, add_dependency, get_schedule_json, remove_dependency
+from backend.services.project_costs import cost_summary
+from backend.services.task_tree import project_rollup
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import date, datetime
@@ -23,6 +26,12 @@ class ProjectCreate(BaseModel):
     budget: Optional[int] = None
 
 
+class DependencyCreate(BaseModel):
+    predecessor_id: int
+    successor_id: int
+    lag_days: int = 0
+
+
 class ProjectResponse(BaseModel):
     id: int
     project_number: str
@@ -103,3 +112,108 @@ async def get_project(
         )
 
     return project
+
+
+def _get_project(db: Session, project_id: int) -> Project:
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.is_deleted == False
+    ).first()
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    return project
+
+
+@router.get("/{project_id}/schedule")
+async def get_project_schedule(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Critical path schedule: early/late dates and slack of every task, recomputed only after changes"""
+    project = _get_project(db, project_id)
+    try:
+        body = get_schedule_json(db, project)
+    except ScheduleError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/{project_id}/rollup", response_model=dict)
+async def get_project_rollup(
+    project_id: int,
+    max_depth: int = 1,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Hours and progress of the project, and of each task subtree down to max_depth"""
+    _get_project(db, project_id)
+    return project_rollup(db, project_id, max_depth)
+
+
+@router.get("/{project_id}/costs", response_model=dict)
+async def get_project_costs(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Budget burn, margin and forecast at completion from the project's cost ledger"""
+    project = _get_project(db, project_id)
+    return cost_summary(db, project)
+
+
+@router.post("/{project_id}/dependencies", response_model=dict)
+async def create_dependency(
+    project_id: int,
+    dependency: DependencyCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Make a task wait for another to finish (finish-to-start, with optional lag in working days)"""
+    project = _get_project(db, project_id)
+    try:
+        new_dependency = add_dependency(
+            db, project, dependency.predecessor_id, dependency.successor_id,
+            current_user.id, lag_days=dependency.lag_days
+        )
+    except ScheduleError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    db.commit()
+
+    return {
+        "message": "Dependency added successfully",
+        "id": new_dependency.id
+    }
+
+
+@router.delete("/{project_id}/dependencies/{dependency_id}", response_model=dict)
+async def delete_dependency(
+    project_id: int,
+    dependency_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Remove a task dependency"""
+    dependency = db.query(TaskDependency).filter(
+        TaskDependency.id == dependency_id,
+        TaskDependency.project_id == project_id
+    ).first()
+    if not dependency:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dependency not found"
+        )
+
+    remove_dependency(db, dependency)
+    db.commit()
+
+    return {"message": "Dependency removed successfully"}
@@ -1,26 +1,46 @@
 """
 Task Management API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from backend.core import get_db
 from backend.models.workflow import Task, TaskStatusEnum, TaskPriorityEnum
 from backend.api.dependencies.auth import get_current_user
 from backend.models.user import User
+from backend.models.traceability import EntityTypeEnum, ActionTypeEnum
+from backend.services.audit import log_actions
+from backend.services.competency import is_qualified
+from backend.services.scheduling import bump_schedule_version
+from backend.services.task_tree import TaskTreeError, move_task, subtree
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import date, datetime
 
 router = APIRouter()
 
+# Largest batch accepted by bulk endpoints
+BULK_MAX_IDS = 1000
+
 
 class TaskCreate(BaseModel):
     title: str
     description: Optional[str] = None
     project_id: Optional[int] = None
+    parent_task_id: Optional[int] = None
     assigned_to_id: Optional[int] = None
     priority: TaskPriorityEnum = TaskPriorityEnum.MEDIUM
     due_date: Optional[date] = None
+    estimated_hours: Optional[int] = None
+    required_competency: Optional[str] = None
+
+
+class TaskAssign(BaseModel):
+    assigned_to_id: int
+
+
+class TaskMove(BaseModel):
+    parent_task_id: Optional[int] = None
 
 
 class TaskResponse(BaseModel):
@@ -35,6 +55,21 @@ class TaskResponse(BaseModel):
         from_attributes = True
 
 
+class TaskBulkStatusUpdate(BaseModel):
+    ids: List[int]
+    status: TaskStatusEnum
+
+
+def _check_qualified(db: Session, user_id: int, competency: Optional[str], on: Optional[date]) -> None:
+    """Refuse an assignee without a qualification on the task's competency that is valid through the due date"""
+    on = max(on, date.today()) if on else None
+    if competency and not is_qualified(db, user_id, competency, on):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Assignee is not qualified on {competency}" + (f" through {on}" if on else "")
+        )
+
+
 @router.post("/", response_model=TaskResponse)
 async def create_task(
     task: TaskCreate,
@@ -46,15 +81,29 @@ async def create_task(
     count = db.query(Task).count() + 1
     task_number = f"TASK-{year}-{count:04d}"
 
+    assigned_to_id = task.assigned_to_id or current_user.id
+    _check_qualified(db, assigned_to_id, task.required_competency, task.due_date)
+
+    if task.parent_task_id:
+        parent = db.query(Task).filter(Task.id == task.parent_task_id, Task.is_deleted == False).first()
+        if not parent or parent.project_id != task.project_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Parent task not found in this project"
+            )
+
     new_task = Task(
         task_number=task_number,
         title=task.title,
         description=task.description,
         project_id=task.project_id,
-        assigned_to_id=task.assigned_to_id or current_user.id,
+        parent_task_id=task.parent_task_id,
+        assigned_to_id=assigned_to_id,
         priority=task.priority,
         status=TaskStatusEnum.TODO,
         due_date=task.due_date,
+        estimated_hours=task.estimated_hours,
+        required_competency=task.required_competency,
         created_by_id=current_user.id
     )
 
@@ -89,6 +138,158 @@ async def list_tasks(
     return tasks
 
 
+@router.put("/bulk/status", response_model=dict)
+async def bulk_update_task_status(
+    update_request: TaskBulkStatusUpdate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Set the status of many tasks with one UPDATE, reporting the outcome per task"""
+    ids = list(dict.fromkeys(update_request.ids))
+    if not ids or len(ids) > BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Give between 1 and {BULK_MAX_IDS} task ids"
+        )
+
+    new_status = update_request.status
+    previous = dict(
+        db.query(Task.id, Task.status).filter(Task.id.in_(ids), Task.is_deleted == False).all()
+    )
+
+    values = {"status": new_status, "updated_by_id": current_user.id}
+    if new_status == TaskStatusEnum.COMPLETED:
+        values["progress"] = 100
+
+    updated = set(db.execute(
+        update(Task.__table__)
+        .where(
+            Task.id.in_([task_id for task_id, old in previous.items() if old != new_status]),
+            Task.status != new_status
+        )
+        .values(**values)
+        .returning(Task.id, Task.project_id)
+    ).all())
+    bump_schedule_version(db, {project_id for _, project_id in updated})
+    updated = {task_id for task_id, _ in updated}
+
+    log_actions(
+        db,
+        current_user.id,
+        EntityTypeEnum.TASK,
+        ActionTypeEnum.UPDATE,
+        [
+            {
+                "entity_id": task_id,
+                "description": f"Task status changed to {new_status.value}",
+                "old_values": {"status": previous[task_id].value},
+                "new_values": {"status": new_status.value}
+            }
+            for task_id in ids if task_id in updated
+        ],
+        request=request
+    )
+    db.commit()
+
+    results = []
+    for task_id in ids:
+        if task_id not in previous:
+            results.append({"id": task_id, "outcome": "not_found", "message": "Task not found"})
+        elif task_id in updated:
+            results.append({"id": task_id, "outcome": "ok", "message": None})
+        else:
+            results.append({"id": task_id, "outcome": "unchanged", "message": f"Already {new_status.value}"})
+
+    return {
+        "message": f"{len(updated)} of {len(ids)} tasks updated",
+        "status": new_status.value,
+        "succeeded": len(updated),
+        "failed": len(ids) - len(updated),
+        "results": results
+    }
+
+
+@router.put("/{task_id}/assign", response_model=dict)
+async def assign_task(
+    task_id: int,
+    assignment: TaskAssign,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Reassign a task; the assignee must be qualified on its required competency"""
+    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+
+    _check_qualified(db, assignment.assigned_to_id, task.required_competency, task.due_date)
+
+    task.assigned_to_id = assignment.assigned_to_id
+    task.updated_by_id = current_user.id
+    db.commit()
+
+    return {"message": "Task assigned successfully"}
+
+
+@router.get("/{task_id}/subtree", response_model=dict)
+async def get_task_subtree(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """A task with all its subtasks, depth first, and their rolled-up hours and progress"""
+    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+
+    try:
+        return subtree(db, task)
+    except TaskTreeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.put("/{task_id}/parent", response_model=dict)
+async def move_task_to_parent(
+    task_id: int,
+    move: TaskMove,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Move a task with its subtasks under another task of the project, or to the top level"""
+    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+
+    try:
+        moved = move_task(db, task, move.parent_task_id, current_user.id)
+    except TaskTreeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    db.commit()
+
+    return {
+        "message": "Task moved successfully",
+        "path": moved.path
+    }
+
+
 @router.put("/{task_id}/status")
 async def update_task_status(
     task_id: int,
@@ -0,0 +1,235 @@
+"""
+Workflow API endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from sqlalchemy.orm import Session
+from backend.core import get_db
+from backend.api.dependencies.auth import get_current_user
+from backend.models.user import User
+from backend.services.workflow_engine import (
+    WorkflowError,
+    TransitionResult,
+    apply_transition,
+    get_workflow,
+    workflows,
+    OK,
+    NOT_FOUND,
+    FORBIDDEN,
+    CONFLICT
+)
+from pydantic import BaseModel
+from typing import List, Optional
+
+router = APIRouter()
+
+OUTCOME_STATUS_CODES = {
+    NOT_FOUND: status.HTTP_404_NOT_FOUND,
+    FORBIDDEN: status.HTTP_403_FORBIDDEN,
+    CONFLICT: status.HTTP_409_CONFLICT,
+}
+
+
+# Largest batch accepted by the bulk endpoint
+BULK_MAX_IDS = 1000
+
+
+class WorkflowActionRequest(BaseModel):
+    comments: Optional[str] = None
+    row_version: Optional[int] = None  # Version the client last saw, rejected with 409 if stale
+
+
+class WorkflowBulkRequest(BaseModel):
+    action: str
+    ids: List[int]
+    comments: Optional[str] = None
+
+
+def _get_definition(entity: str):
+    try:
+        return get_workflow(entity)
+    except WorkflowError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(exc)
+        )
+
+
+def run_single_transition(
+    db: Session,
+    entity: str,
+    entity_id: int,
+    action: str,
+    user: User,
+    comments: Optional[str] = None,
+    row_version: Optional[int] = None,
+    request: Optional[Request] = None
+) -> TransitionResult:
+    """Apply one action to one entity and commit, raising HTTP errors for failures"""
+    try:
+        result = apply_transition(
+            db, entity, [entity_id], action, user,
+            comments=comments,
+            expected_versions={entity_id: row_version} if row_version is not None else None,
+            request=request
+        )
+    except WorkflowError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+    code, message = result.outcomes[entity_id]
+    if code != OK:
+        db.rollback()
+        raise HTTPException(
+            status_code=OUTCOME_STATUS_CODES.get(code, status.HTTP_400_BAD_REQUEST),
+            detail=message
+        )
+
+    db.commit()
+    return result
+
+
+@router.get("/definitions", response_model=List[dict])
+async def list_workflow_definitions(
+    current_user: User = Depends(get_current_user)
+):
+    """States and transitions of every workflow"""
+    return [definition.describe() for definition in workflows()]
+
+
+@router.get("/{entity}/queue", response_model=List[dict])
+async def get_approval_queue(
+    entity: str,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Items of one entity type waiting for the current user"""
+    definition = _get_definition(entity)
+    model = definition.model
+
+    columns = [model.id, definition.status.label("status"), model.row_version, model.created_at]
+    if definition.number_column:
+        columns.append(getattr(model, definition.number_column).label("number"))
+
+    rows = db.query(*columns).filter(
+        definition.queue_clause(current_user),
+        model.is_deleted == False
+    ).order_by(model.created_at).offset(skip).limit(limit).all()
+
+    return [
+        {
+            "id": row.id,
+            "number": getattr(row, "number", None),
+            "status": getattr(row.status, "value", row.status),
+            "row_version": row.row_version,
+            "created_at": row.created_at,
+            "actions": definition.available_actions(row.status, current_user)
+        }
+        for row in rows
+    ]
+
+
+@router.post("/{entity}/bulk", response_model=dict)
+async def perform_bulk_workflow_action(
+    entity: str,
+    bulk: WorkflowBulkRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Apply one action to many entities in a single transaction
+
+    Items that can't make the transition (wrong state, not permitted,
+    changed concurrently) are reported per id; the rest are committed.
+    """
+    definition = _get_definition(entity)
+    if not bulk.ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No ids given"
+        )
+    if len(bulk.ids) > BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BULK_MAX_IDS} ids per request"
+        )
+
+    try:
+        result = apply_transition(
+            db, entity, bulk.ids, bulk.action, current_user,
+            comments=bulk.comments,
+            request=request
+        )
+    except WorkflowError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    db.commit()
+
+    return {
+        "message": f"{definition.title}: {len(result.succeeded)} of {len(result.outcomes)} items updated",
+        **result.to_dict()
+    }
+
+
+@router.get("/{entity}/{entity_id}", response_model=dict)
+async def get_workflow_state(
+    entity: str,
+    entity_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Current state, row version and actions available to the current user"""
+    definition = _get_definition(entity)
+    model = definition.model
+
+    row = db.query(model.id, definition.status.label("status"), model.row_version).filter(
+        model.id == entity_id,
+        model.is_deleted == False
+    ).first()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{definition.title} not found"
+        )
+
+    return {
+        "entity": definition.name,
+        "id": row.id,
+        "status": getattr(row.status, "value", row.status),
+        "row_version": row.row_version,
+        "actions": definition.available_actions(row.status, current_user)
+    }
+
+
+@router.post("/{entity}/{entity_id}/{action}", response_model=dict)
+async def perform_workflow_action(
+    entity: str,
+    entity_id: int,
+    action: str,
+    action_request: WorkflowActionRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Move an entity through its workflow"""
+    definition = _get_definition(entity)
+    result = run_single_transition(
+        db, entity, entity_id, action, current_user,
+        comments=action_request.comments,
+        row_version=action_request.row_version,
+        request=request
+    )
+
+    target = result.to_dict()["status"]
+    return {
+        "message": f"{definition.title} moved to {target}",
+        "id": entity_id,
+        "status": target
+    }
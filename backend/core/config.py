@@ -44,6 +44,10 @@ class Settings(BaseSettings):
         'txt', 'png', 'jpg', 'jpeg', 'gif'
     }
 
+    # Form template import
+    TEMPLATE_IMPORT_DIR: str = os.getenv("TEMPLATE_IMPORT_DIR", "templates_uploaded")
+    TEMPLATE_IMPORT_WORKERS: int = int(os.getenv("TEMPLATE_IMPORT_WORKERS", "4"))
+
     # AI Configuration
     ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
     CLAUDE_MODEL: str = "claude-3-5-sonnet-20241022"
@@ -54,10 +58,66 @@ class Settings(BaseSettings):
     SMTP_USER: str = os.getenv("SMTP_USER", "")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
     EMAIL_FROM: str = os.getenv("EMAIL_FROM", "noreply@lims-qms.com")
+    SMTP_USE_TLS: bool = os.getenv("SMTP_USE_TLS", "true").lower() == "true"  # STARTTLS; off for a local test server
+    SMTP_TIMEOUT: int = 30
+
+    # Email outbox
+    EMAIL_ENABLED: bool = os.getenv("EMAIL_ENABLED", "false").lower() == "true"  # Queue notification emails and run the dispatcher
+    EMAIL_POOL_SIZE: int = int(os.getenv("EMAIL_POOL_SIZE", "4"))  # Persistent SMTP connections
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_RATE_PER_SECOND: float = float(os.getenv("EMAIL_RATE_PER_SECOND", "10"))
+    EMAIL_MAX_ATTEMPTS: int = 6
+    EMAIL_RETRY_BASE_SECONDS: int = 60  # Doubles with every failed attempt
+    EMAIL_POLL_SECONDS: int = 5
 
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+    # Notifications
+    NOTIFICATION_BROKER: str = os.getenv("NOTIFICATION_BROKER", "memory")  # memory, or redis to share across workers
+    NOTIFICATION_KEEPALIVE_SECONDS: int = 15
+    NOTIFICATION_COALESCE_SECONDS: int = int(os.getenv("NOTIFICATION_COALESCE_SECONDS", "900"))
+    NOTIFICATION_DIGEST_SECONDS: int = int(os.getenv("NOTIFICATION_DIGEST_SECONDS", "3600"))
+    NOTIFICATION_DIGEST_CATEGORIES: list = ["calibration"]  # JSON list in the environment
+
+    # Background jobs
+    JOB_BACKEND: str = os.getenv("JOB_BACKEND", "database")  # database (SKIP LOCKED polling), or redis for wakeups via REDIS_URL
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))  # Worker processes per supervisor
+    JOB_POLL_SECONDS: int = 2
+    JOB_RETRY_BASE_SECONDS: int = 30  # Doubles with every failed attempt
+    JOB_HEARTBEAT_SECONDS: int = 60  # How often a worker marks its running job alive
+    JOB_LOCK_TIMEOUT_SECONDS: int = 600  # Running jobs without a heartbeat for this long are assumed lost
+    JOB_RETENTION_DAYS: int = 14
+
+    # Calibration
+    CALIBRATION_REMINDER_LEAD_DAYS: list = [30, 7, 1, 0]  # Days before the due date to remind; JSON list in the environment
+
+    # Leave
+    LEAVE_WORKING_WEEKDAYS: list = [0, 1, 2, 3, 4]  # Monday = 0; JSON list in the environment
+    LEAVE_ENTITLEMENTS: dict = {  # Days per year, per leave type; types not listed aren't balance-checked
+        "Casual Leave": 12,
+        "Sick Leave": 12,
+        "Earned Leave": 15,
+        "Maternity Leave": 182,
+        "Paternity Leave": 15
+    }
+
+    # Attendance
+    ATTENDANCE_IMPORT_BATCH_SIZE: int = 5000  # Punches parsed and written per round
+    ATTENDANCE_HALF_DAY_HOURS: float = 4.0  # Days with fewer hours worked count as half days
+
+    # Invoicing
+    COMPANY_GSTIN: str = os.getenv("COMPANY_GSTIN", "")  # Its first two digits are the state of supply
+    INVOICE_DEFAULT_GST_RATE: float = 18.0  # Percent, for lines that don't give one
+    INVOICE_PDF_DIR: str = os.getenv("INVOICE_PDF_DIR", "uploads/invoices")
+
+    # Receivables
+    RECONCILE_AMOUNT_TOLERANCE: float = 1.0  # Rupees a receipt may differ from the amount due and still match; invoices short by no more count as paid
+    RECONCILE_DATE_TOLERANCE_DAYS: int = 30  # Days after the due date a receipt is still matched by amount alone
+
+    # Project scheduling
+    SCHEDULE_HOURS_PER_DAY: int = 8  # Task estimates are converted to working days at this rate
+
     # Pagination
     DEFAULT_PAGE_SIZE: int = 50
     MAX_PAGE_SIZE: int = 100
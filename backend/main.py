@@ -6,6 +6,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from backend.core.config import settings
 from backend.core.database import init_db
+from backend.services import notifications as notification_service
+from backend.services.email_outbox import dispatcher as email_dispatcher
 from backend.api.endpoints import (
     auth,
     users,
@@ -18,7 +20,12 @@ from backend.api.endpoints import (
     financial,
     crm,
     quality,
-    analytics
+    analytics,
+    exports,
+    workflow,
+    inbox,
+    notifications,
+    jobs
 )
 import os
 
@@ -61,16 +68,30 @@ app.include_router(financial.router, prefix=f"{settings.API_V1_STR}/financial",
 app.include_router(crm.router, prefix=f"{settings.API_V1_STR}/crm", tags=["CRM"])
 app.include_router(quality.router, prefix=f"{settings.API_V1_STR}/quality", tags=["Quality"])
 app.include_router(analytics.router, prefix=f"{settings.API_V1_STR}/analytics", tags=["Analytics"])
+app.include_router(exports.router, prefix=f"{settings.API_V1_STR}/exports", tags=["Exports"])
+app.include_router(workflow.router, prefix=f"{settings.API_V1_STR}/workflow", tags=["Workflow"])
+app.include_router(inbox.router, prefix=f"{settings.API_V1_STR}/inbox", tags=["Inbox"])
+app.include_router(notifications.router, prefix=f"{settings.API_V1_STR}/notifications", tags=["Notifications"])
+app.include_router(jobs.router, prefix=f"{settings.API_V1_STR}/jobs", tags=["Jobs"])
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
     init_db()
+    await notification_service.start()
+    await email_dispatcher.start()
     print(f"🚀 {settings.APP_NAME} started successfully!")
     print(f"📚 API Documentation: http://localhost:8000/api/docs")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks"""
+    await notification_service.stop()
+    await email_dispatcher.stop()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
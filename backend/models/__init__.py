@@ -4,27 +4,31 @@ Database Models for LIMS-QMS Platform
 from backend.core.database import Base
 from .user import User, Role, Permission
 from .document import Document, DocumentVersion, DocumentLevel
-from .form import FormTemplate, FormField, FormRecord, FormValue
+from .form import FormTemplate, FormTemplateVersion, FormField, FormRecord, FormValue, TemplateImportBatch
 from .traceability import TraceabilityLink, AuditLog
-from .workflow import Project, Task, Meeting, ActionItem
-from .hr import Employee, JobPosting, Candidate, Training, Leave, Attendance, Performance
-from .procurement import Vendor, RFQ, PurchaseOrder, Equipment, Calibration, Maintenance
-from .financial import Expense, Invoice, Payment, Revenue
+from .workflow import Project, Task, TaskDependency, Meeting, ActionItem
+from .hr import Employee, JobPosting, Candidate, Training, TrainingParticipant, EmployeeCompetency, Leave, LeaveBalance, Holiday, Attendance, AttendancePunch, Performance
+from .procurement import Vendor, RFQ, PurchaseOrder, Equipment, Calibration, CalibrationMeasurement, EquipmentDrift, EquipmentBooking, Maintenance
+from .financial import Expense, Invoice, Payment, Revenue, ProjectCostLedger, BankStatementLine, ReceivableAging
 from .crm import Lead, Customer, Order, SupportTicket
 from .quality import NonConformance, Audit, CAPA, RiskAssessment
-from .notification import Notification
+from .notification import Notification, NotificationDigestEntry, EmailOutbox
+from .work_item import WorkItem
+from .job import Job, ScheduledJob
 
 __all__ = [
     "Base",
     "User", "Role", "Permission",
     "Document", "DocumentVersion", "DocumentLevel",
-    "FormTemplate", "FormField", "FormRecord", "FormValue",
+    "FormTemplate", "FormTemplateVersion", "FormField", "FormRecord", "FormValue", "TemplateImportBatch",
     "TraceabilityLink", "AuditLog",
-    "Project", "Task", "Meeting", "ActionItem",
-    "Employee", "JobPosting", "Candidate", "Training", "Leave", "Attendance", "Performance",
-    "Vendor", "RFQ", "PurchaseOrder", "Equipment", "Calibration", "Maintenance",
-    "Expense", "Invoice", "Payment", "Revenue",
+    "Project", "Task", "TaskDependency", "Meeting", "ActionItem",
+    "Employee", "JobPosting", "Candidate", "Training", "TrainingParticipant", "EmployeeCompetency", "Leave", "LeaveBalance", "Holiday", "Attendance", "AttendancePunch", "Performance",
+    "Vendor", "RFQ", "PurchaseOrder", "Equipment", "Calibration", "CalibrationMeasurement", "EquipmentDrift", "EquipmentBooking", "Maintenance",
+    "Expense", "Invoice", "Payment", "Revenue", "ProjectCostLedger", "BankStatementLine", "ReceivableAging",
     "Lead", "Customer", "Order", "SupportTicket",
     "NonConformance", "Audit", "CAPA", "RiskAssessment",
-    "Notification"
+    "Notification", "NotificationDigestEntry", "EmailOutbox",
+    "WorkItem",
+    "Job", "ScheduledJob"
 ]
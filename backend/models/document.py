@@ -1,7 +1,7 @@
 """
 Document Management System models
 """
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 import enum
@@ -59,11 +59,17 @@ class Document(BaseModel):
     approver_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     reviewed_at = Column(String(255), nullable=True)
     approved_at = Column(String(255), nullable=True)
+    row_version = Column(Integer, nullable=False, default=1, server_default='1')  # Optimistic concurrency
 
     # Relationships
     versions = relationship('DocumentVersion', back_populates='document', foreign_keys='DocumentVersion.document_id')
     parent_document = relationship('Document', remote_side='Document.id', foreign_keys=[parent_document_id])
 
+    __table_args__ = (
+        Index('ix_documents_approver_status', 'approver_id', 'status'),
+    )
+    __mapper_args__ = {'version_id_col': row_version}
+
 
 class DocumentVersion(BaseModel):
     """Document version history"""
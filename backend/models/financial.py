@@ -1,7 +1,7 @@
 """
 Financial and Accounting models
 """
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, Enum, JSON, Float
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, Enum, JSON, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 import enum
@@ -52,6 +52,13 @@ class Expense(BaseModel):
     approver_comments = Column(Text, nullable=True)
     reimbursement_date = Column(Date, nullable=True)
     payment_reference = Column(String(200), nullable=True)
+    row_version = Column(Integer, nullable=False, default=1, server_default='1')  # Optimistic concurrency
+
+    __table_args__ = (
+        Index('ix_expenses_approver_status', 'approver_id', 'status'),
+        Index('ix_expenses_project_status', 'project_id', 'status'),
+    )
+    __mapper_args__ = {'version_id_col': row_version}
 
 
 class Invoice(BaseModel):
@@ -80,9 +87,17 @@ class Invoice(BaseModel):
     total_amount = Column(Float, nullable=False)
     currency = Column(String(10), default='INR')
 
+    # GST breakdown (intra-state supply splits into CGST and SGST, inter-state is IGST)
+    place_of_supply = Column(String(2), nullable=True)  # State code
+    cgst_amount = Column(Float, nullable=True)
+    sgst_amount = Column(Float, nullable=True)
+    igst_amount = Column(Float, nullable=True)
+    round_off = Column(Float, nullable=True)  # Added to reach the rounded total
+
     # Payment
     payment_terms = Column(String(200), nullable=True)
     payment_status = Column(Enum(PaymentStatusEnum), default=PaymentStatusEnum.PENDING)
+    amount_paid = Column(Float, nullable=False, default=0.0, server_default='0')  # Sum of the payments recorded against it
 
     # Other
     notes = Column(Text, nullable=True)
@@ -92,6 +107,11 @@ class Invoice(BaseModel):
     # Relationships
     payments = relationship('Payment', back_populates='invoice')
 
+    __table_args__ = (
+        Index('ix_invoices_project', 'project_id'),
+        Index('ix_invoices_customer_status', 'customer_id', 'payment_status'),
+    )
+
 
 class Payment(BaseModel):
     """Payment model"""
@@ -107,11 +127,74 @@ class Payment(BaseModel):
     bank_name = Column(String(200), nullable=True)
     transaction_id = Column(String(200), nullable=True)
     received_by_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    statement_line_id = Column(Integer, ForeignKey('bank_statement_lines.id'), nullable=True)  # When matched from a bank statement
     notes = Column(Text, nullable=True)
 
     # Relationships
     invoice = relationship('Invoice', back_populates='payments')
 
+    __table_args__ = (
+        Index('ix_payments_invoice', 'invoice_id'),
+        Index('ix_payments_statement_line', 'statement_line_id'),
+    )
+
+
+class StatementLineStatusEnum(str, enum.Enum):
+    """Reconciliation state of a bank statement line"""
+    UNMATCHED = "Unmatched"
+    MATCHED = "Matched"
+    AMBIGUOUS = "Ambiguous"  # Several invoices fit; needs a manual match
+    IGNORED = "Ignored"  # Debits and lines that aren't customer receipts
+
+
+class BankStatementLine(BaseModel):
+    """
+    One line of an imported bank statement
+
+    Credits are matched to open invoices by services.receivables; a match
+    records a Payment against each invoice it settles.
+    """
+    __tablename__ = 'bank_statement_lines'
+
+    line_hash = Column(String(64), nullable=False)  # Of account, date, amount and narration; makes re-imports harmless
+    bank_account = Column(String(100), nullable=True)
+    value_date = Column(Date, nullable=False)
+    amount = Column(Float, nullable=False)  # Credits positive, debits negative
+    reference = Column(String(200), nullable=True)  # Bank reference (UTR, cheque number)
+    description = Column(Text, nullable=True)  # Narration
+    status = Column(Enum(StatementLineStatusEnum), nullable=False, default=StatementLineStatusEnum.UNMATCHED)
+    match_rule = Column(String(50), nullable=True)  # reference, amount or manual
+    candidate_invoice_ids = Column(JSON, nullable=True)  # Invoices that fit an ambiguous line
+
+    __table_args__ = (
+        UniqueConstraint('line_hash', name='uq_bank_statement_lines_hash'),
+        Index('ix_bank_statement_lines_status', 'status', 'value_date'),
+    )
+
+
+class ReceivableAging(BaseModel):
+    """
+    Outstanding receivables of a customer by age
+
+    Age is counted from the invoice due date (the invoice date when there's
+    none); invoices not yet due are in the first bucket. Kept up to date by
+    services.receivables as invoices are issued and paid, and re-aged daily.
+    """
+    __tablename__ = 'receivable_aging'
+
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)
+    as_of = Column(Date, nullable=False)
+    open_invoices = Column(Integer, nullable=False, default=0)
+    days_0_30 = Column(Float, nullable=False, default=0.0)
+    days_31_60 = Column(Float, nullable=False, default=0.0)
+    days_61_90 = Column(Float, nullable=False, default=0.0)
+    days_over_90 = Column(Float, nullable=False, default=0.0)
+    total = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint('customer_id', name='uq_receivable_aging_customer'),
+    )
+
 
 class Revenue(BaseModel):
     """Revenue tracking"""
@@ -128,3 +211,22 @@ class Revenue(BaseModel):
     cost = Column(Float, nullable=True)  # Cost of goods/services
     profit = Column(Float, nullable=True)
     notes = Column(Text, nullable=True)
+
+
+class ProjectCostLedger(BaseModel):
+    """
+    Running cost and billing totals of a project
+
+    Maintained incrementally as expenses are approved, invoices issued and
+    payments received; see services.project_costs.
+    """
+    __tablename__ = 'project_cost_ledgers'
+
+    project_id = Column(Integer, ForeignKey('projects.id'), nullable=False)
+    expense_cost = Column(Float, nullable=False, default=0.0)  # Approved and paid expenses
+    invoiced = Column(Float, nullable=False, default=0.0)  # Tax invoices and debit notes, less credit notes; before tax
+    collected = Column(Float, nullable=False, default=0.0)  # Payments received against the project's invoices, tax included
+
+    __table_args__ = (
+        UniqueConstraint('project_id', name='uq_project_cost_ledgers_project'),
+    )
@@ -1,7 +1,10 @@
 """
 Dynamic Form Engine models
 """
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, JSON, Enum
+from sqlalchemy import (
+    Column, Integer, String, Text, ForeignKey, Boolean, JSON, Enum, Index, DateTime, Table, UniqueConstraint
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 import enum
@@ -24,6 +27,15 @@ class FieldTypeEnum(str, enum.Enum):
     CALCULATED = "calculated"
 
 
+# Fields making up each template version; unchanged fields are shared between versions
+template_version_fields = Table(
+    'form_template_version_fields',
+    BaseModel.metadata,
+    Column('version_id', Integer, ForeignKey('form_template_versions.id', ondelete='CASCADE'), primary_key=True),
+    Column('field_id', Integer, ForeignKey('form_fields.id'), primary_key=True, index=True)
+)
+
+
 class FormTemplate(BaseModel):
     """Form template generated from Excel/Word files"""
     __tablename__ = 'form_templates'
@@ -36,15 +48,49 @@ class FormTemplate(BaseModel):
     document_id = Column(Integer, ForeignKey('documents.id'), nullable=True)  # Link to Level 4 document
     is_published = Column(Boolean, default=False)
     version = Column(String(20), default="1.0")
+    current_version_id = Column(
+        Integer,
+        ForeignKey('form_template_versions.id', use_alter=True, name='fk_form_templates_current_version'),
+        nullable=True
+    )
     layout_config = Column(JSON, nullable=True)  # UI layout configuration
 
     # Relationships
     fields = relationship('FormField', back_populates='template', cascade='all, delete-orphan')
     records = relationship('FormRecord', back_populates='template')
+    versions = relationship(
+        'FormTemplateVersion',
+        back_populates='template',
+        foreign_keys='FormTemplateVersion.template_id',
+        order_by='FormTemplateVersion.version_number'
+    )
+    current_version = relationship('FormTemplateVersion', foreign_keys=[current_version_id], post_update=True)
+
+
+class FormTemplateVersion(BaseModel):
+    """Immutable snapshot of a template's fields"""
+    __tablename__ = 'form_template_versions'
+
+    template_id = Column(Integer, ForeignKey('form_templates.id', ondelete='CASCADE'), nullable=False)
+    version_number = Column(Integer, nullable=False)
+    notes = Column(Text, nullable=True)
+
+    # Relationships
+    template = relationship('FormTemplate', back_populates='versions', foreign_keys=[template_id])
+    fields = relationship('FormField', secondary=template_version_fields, order_by='FormField.order, FormField.id')
+
+    __table_args__ = (
+        UniqueConstraint('template_id', 'version_number', name='uq_form_template_versions_number'),
+    )
 
 
 class FormField(BaseModel):
-    """Form field definition"""
+    """
+    Form field definition
+
+    Fields that belong to a published version are never edited in place;
+    edits create a new row and deactivate the old one (is_active=False).
+    """
     __tablename__ = 'form_fields'
 
     template_id = Column(Integer, ForeignKey('form_templates.id', ondelete='CASCADE'), nullable=False)
@@ -73,6 +119,7 @@ class FormRecord(BaseModel):
     __tablename__ = 'form_records'
 
     template_id = Column(Integer, ForeignKey('form_templates.id'), nullable=False)
+    template_version_id = Column(Integer, ForeignKey('form_template_versions.id'), nullable=True, index=True)
     record_number = Column(String(100), unique=True, nullable=False, index=True)
     title = Column(String(500), nullable=True)
     status = Column(String(50), default='draft')  # draft, submitted, reviewed, approved, rejected
@@ -86,15 +133,28 @@ class FormRecord(BaseModel):
     approved_at = Column(String(255), nullable=True)
     checker_comments = Column(Text, nullable=True)
     approver_comments = Column(Text, nullable=True)
+    row_version = Column(Integer, nullable=False, default=1, server_default='1')  # Optimistic concurrency
 
     # Metadata
     metadata = Column(JSON, nullable=True)
     attachments = Column(JSON, nullable=True)  # List of file paths
 
+    # Pivoted read model {field_name: value}, kept in sync with form_values on write
+    data = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql'), nullable=True)
+
     # Relationships
     template = relationship('FormTemplate', back_populates='records')
+    template_version = relationship('FormTemplateVersion')
     values = relationship('FormValue', back_populates='record', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        Index('ix_form_records_template_created', 'template_id', 'created_at'),
+        Index('ix_form_records_data', 'data', postgresql_using='gin'),
+        Index('ix_form_records_checker_status', 'checker_id', 'status'),
+        Index('ix_form_records_approver_status', 'approver_id', 'status'),
+    )
+    __mapper_args__ = {'version_id_col': row_version}
+
 
 class FormValue(BaseModel):
     """Form field values"""
@@ -109,3 +169,18 @@ class FormValue(BaseModel):
 
     # Relationships
     record = relationship('FormRecord', back_populates='values')
+
+
+class TemplateImportBatch(BaseModel):
+    """Batch import of form templates from Excel/Word files"""
+    __tablename__ = 'form_template_imports'
+
+    source = Column(String(500), nullable=True)  # Directory or "upload"
+    status = Column(String(50), default='pending')  # pending, running, completed, failed
+    total_files = Column(Integer, default=0)
+    processed_files = Column(Integer, default=0)
+    succeeded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    results = Column(JSON, nullable=True)  # [{"file", "status", "template_code", "fields", "warnings", "error"}]
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
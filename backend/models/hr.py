@@ -1,7 +1,7 @@
 """
 HR and People Management models
 """
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, Enum, JSON, Boolean, Float
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, DateTime, Enum, JSON, Boolean, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 import enum
@@ -119,9 +119,55 @@ class Training(BaseModel):
     location = Column(String(200), nullable=True)
     max_participants = Column(Integer, nullable=True)
     cost = Column(Integer, nullable=True)
-    participants = Column(JSON, nullable=True)  # List of employee IDs
-    completion_status = Column(JSON, nullable=True)  # {employee_id: "completed"/"pending"}
+    participants = Column(JSON, nullable=True)  # List of employee IDs; superseded by training_participants
+    completion_status = Column(JSON, nullable=True)  # {employee_id: "completed"/"pending"}; superseded by training_participants
     certificates_issued = Column(JSON, nullable=True)
+    competency = Column(String(200), nullable=True, index=True)  # Procedure or skill it qualifies for, e.g. "L3-2025-0012"
+    validity_days = Column(Integer, nullable=True)  # Qualification lapses after this many days; never when empty
+
+    # Relationships
+    participant_records = relationship('TrainingParticipant', back_populates='training')
+
+
+class TrainingParticipant(BaseModel):
+    """Participation of one employee in a training"""
+    __tablename__ = 'training_participants'
+
+    training_id = Column(Integer, ForeignKey('trainings.id'), nullable=False)
+    employee_id = Column(Integer, ForeignKey('employees.id'), nullable=False)
+    status = Column(String(20), nullable=False, default='enrolled')  # enrolled, completed, failed, absent
+    completed_on = Column(Date, nullable=True)
+    score = Column(Float, nullable=True)
+    certificate_number = Column(String(100), nullable=True)
+
+    # Relationships
+    training = relationship('Training', back_populates='participant_records')
+
+    __table_args__ = (
+        UniqueConstraint('training_id', 'employee_id', name='uq_training_participants_training_employee'),
+        Index('ix_training_participants_employee_status', 'employee_id', 'status'),
+    )
+
+
+class EmployeeCompetency(BaseModel):
+    """
+    Competency matrix cell: an employee qualified on a procedure or skill
+
+    Derived from completed training participations and refreshed for the
+    affected (employee, competency) pairs whenever a participation changes.
+    """
+    __tablename__ = 'employee_competencies'
+
+    employee_id = Column(Integer, ForeignKey('employees.id'), nullable=False)
+    competency = Column(String(200), nullable=False)
+    qualified_on = Column(Date, nullable=False)
+    expires_on = Column(Date, nullable=True)  # Never when empty
+    training_id = Column(Integer, ForeignKey('trainings.id'), nullable=True)  # Latest qualifying training
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'competency', name='uq_employee_competencies_employee_competency'),
+        Index('ix_employee_competencies_competency_expiry', 'competency', 'expires_on'),
+    )
 
 
 class Leave(BaseModel):
@@ -138,6 +184,48 @@ class Leave(BaseModel):
     approver_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     approver_comments = Column(Text, nullable=True)
     approved_at = Column(String(255), nullable=True)
+    row_version = Column(Integer, nullable=False, default=1, server_default='1')  # Optimistic concurrency
+
+    __table_args__ = (
+        Index('ix_leaves_approver_status', 'approver_id', 'status'),
+        Index('ix_leaves_employee_dates', 'employee_id', 'start_date', 'end_date'),
+        Index('ix_leaves_dates_status', 'start_date', 'end_date', 'status'),
+    )
+    __mapper_args__ = {'version_id_col': row_version}
+
+
+class LeaveBalance(BaseModel):
+    """
+    Leave entitlement and usage of one employee, leave type and year
+
+    used and pending are kept current by the leave workflow: a request adds
+    to pending, approval moves it to used, rejection or cancellation gives
+    it back.
+    """
+    __tablename__ = 'leave_balances'
+
+    employee_id = Column(Integer, ForeignKey('employees.id'), nullable=False)
+    leave_type = Column(Enum(LeaveTypeEnum), nullable=False)
+    year = Column(Integer, nullable=False)
+    entitled = Column(Float, nullable=False, default=0)
+    used = Column(Float, nullable=False, default=0)
+    pending = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'leave_type', 'year', name='uq_leave_balances_employee_type_year'),
+    )
+
+    @property
+    def available(self) -> float:
+        return self.entitled - self.used - self.pending
+
+
+class Holiday(BaseModel):
+    """Company holiday, not counted as a working day of leave"""
+    __tablename__ = 'holidays'
+
+    holiday_date = Column(Date, unique=True, nullable=False)
+    name = Column(String(200), nullable=False)
 
 
 class Attendance(BaseModel):
@@ -152,6 +240,26 @@ class Attendance(BaseModel):
     hours_worked = Column(Float, nullable=True)
     location = Column(String(200), nullable=True)
     remarks = Column(Text, nullable=True)
+    punch_count = Column(Integer, nullable=True)  # Punches the day was computed from
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'date', name='uq_attendance_employee_date'),
+        Index('ix_attendance_date', 'date'),
+    )
+
+
+class AttendancePunch(BaseModel):
+    """Raw punch from a biometric device or CSV export, kept so a day can be re-paired"""
+    __tablename__ = 'attendance_punches'
+
+    employee_id = Column(Integer, ForeignKey('employees.id'), nullable=False)
+    punched_at = Column(DateTime, nullable=False)  # Site local time
+    direction = Column(String(10), nullable=True)  # in, out; None when the device doesn't say
+    device = Column(String(100), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'punched_at', name='uq_attendance_punches_employee_time'),
+    )
 
 
 class Performance(BaseModel):
@@ -0,0 +1,54 @@
+"""
+Background job models
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index, text
+from .base import BaseModel
+
+
+class Job(BaseModel):
+    """
+    A unit of deferred work, claimed by worker processes with SKIP LOCKED
+
+    Rows stay after they finish so queue depth, latency and failures can be
+    reported; finished jobs are purged by a housekeeping job.
+    """
+    __tablename__ = 'jobs'
+
+    name = Column(String(100), nullable=False)  # Registered handler name
+    queue = Column(String(50), nullable=False, default='default')
+    payload = Column(JSON, nullable=True)  # Keyword arguments of the handler
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    priority = Column(Integer, nullable=False, default=0)  # Higher first
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    dedupe_key = Column(String(255), nullable=True)  # At most one queued or running job per key
+    locked_by = Column(String(100), nullable=True)  # Worker that claimed it
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # Refreshed by the worker while it runs
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+
+    __table_args__ = (
+        Index('ix_jobs_claim', 'status', 'queue', 'run_at'),
+        Index(
+            'uq_jobs_dedupe_key_active', 'dedupe_key', unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')")
+        ),
+    )
+
+
+class ScheduledJob(BaseModel):
+    """Cron schedule that enqueues a job every time it comes due"""
+    __tablename__ = 'scheduled_jobs'
+
+    name = Column(String(100), unique=True, nullable=False)
+    job_name = Column(String(100), nullable=False)
+    cron = Column(String(100), nullable=False)  # minute hour day-of-month month day-of-week, UTC
+    payload = Column(JSON, nullable=True)
+    queue = Column(String(50), nullable=True)  # Handler's queue when empty
+    next_run_at = Column(DateTime(timezone=True), nullable=False)
+    last_run_at = Column(DateTime(timezone=True), nullable=True)
+    last_job_id = Column(Integer, nullable=True)
@@ -1,13 +1,17 @@
 """
 Notification model
 """
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, JSON, Index, DateTime
 from .base import BaseModel
 
 
 class Notification(BaseModel):
     """Notification model for user alerts"""
     __tablename__ = 'notifications'
+    __table_args__ = (
+        Index('ix_notifications_user_unread', 'user_id', 'is_read'),
+        Index('ix_notifications_user_group', 'user_id', 'group_key'),
+    )
 
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     title = Column(String(500), nullable=False)
@@ -19,3 +23,50 @@ class Notification(BaseModel):
     link = Column(String(500), nullable=True)  # Link to related entity
     metadata = Column(JSON, nullable=True)
     priority = Column(String(50), default='normal')  # low, normal, high
+    group_key = Column(String(255), nullable=True)  # category:entity, repeats within a window collapse into one row
+    event_count = Column(Integer, nullable=False, default=1, server_default='1')
+
+
+class NotificationDigestEntry(BaseModel):
+    """
+    Event of a digest category waiting for the next digest run
+
+    Written in the same transaction as the change it reports, so a restart
+    between the event and the digest doesn't lose it.
+    """
+    __tablename__ = 'notification_digest_entries'
+    __table_args__ = (
+        Index('ix_notification_digest_entries_user_category', 'user_id', 'category'),
+    )
+
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    category = Column(String(100), nullable=False)
+    title = Column(String(500), nullable=False)
+    priority = Column(String(50), default='normal')
+
+
+class EmailOutbox(BaseModel):
+    """
+    Outgoing email, written in the same transaction as the change it reports
+
+    Drained by the email dispatcher; a rolled back change never sends mail
+    and a committed one is retried until delivered or out of attempts.
+    """
+    __tablename__ = 'email_outbox'
+
+    to_address = Column(String(255), nullable=False)
+    subject = Column(String(500), nullable=False)
+    body = Column(Text, nullable=False)
+    html_body = Column(Text, nullable=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    notification_id = Column(Integer, ForeignKey('notifications.id'), nullable=True)
+    status = Column(String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)  # Null means as soon as possible
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index('ix_email_outbox_due', 'status', 'next_attempt_at'),
+    )
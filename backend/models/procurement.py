@@ -1,7 +1,11 @@
 """
 Procurement and Equipment Management models
 """
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, Enum, JSON, Boolean, Float
+from sqlalchemy import (
+    Column, Integer, String, Text, ForeignKey, Date, DateTime, Enum, JSON, Boolean, Float, Index,
+    CheckConstraint, DDL, event, func
+)
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 import enum
@@ -134,6 +138,11 @@ class Equipment(BaseModel):
     # Relationships
     calibrations = relationship('Calibration', back_populates='equipment')
     maintenance_records = relationship('Maintenance', back_populates='equipment')
+    bookings = relationship('EquipmentBooking', back_populates='equipment')
+
+    __table_args__ = (
+        Index('ix_equipment_calibration_due', 'calibration_required', 'next_calibration_date'),
+    )
 
 
 class Calibration(BaseModel):
@@ -155,6 +164,98 @@ class Calibration(BaseModel):
 
     # Relationships
     equipment = relationship('Equipment', back_populates='calibrations')
+    measurements = relationship('CalibrationMeasurement', back_populates='calibration')
+
+    __table_args__ = (
+        Index('ix_calibrations_equipment_date', 'equipment_id', 'calibration_date'),
+    )
+
+
+class CalibrationMeasurement(BaseModel):
+    """
+    One measurement point extracted from Calibration.calibration_data
+
+    Stored per equipment and parameter in calibration date order so drift
+    analysis can read a whole fleet's history with a single ordered scan.
+    """
+    __tablename__ = 'calibration_measurements'
+
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), nullable=False)
+    calibration_id = Column(Integer, ForeignKey('calibrations.id'), nullable=False, index=True)
+    parameter = Column(String(200), nullable=False)  # Measurement point, e.g. "Temperature 25C"
+    unit = Column(String(50), nullable=True)
+    measured_on = Column(Date, nullable=False)  # Calibration date
+    nominal = Column(Float, nullable=True)
+    measured = Column(Float, nullable=False)
+    error = Column(Float, nullable=True)  # measured - nominal
+    uncertainty = Column(Float, nullable=True)  # Expanded uncertainty
+    tolerance = Column(Float, nullable=True)  # Permissible error, +/-
+
+    # Relationships
+    calibration = relationship('Calibration', back_populates='measurements')
+
+    __table_args__ = (
+        Index('ix_calibration_measurements_series', 'equipment_id', 'parameter', 'measured_on'),
+    )
+
+
+class EquipmentDrift(BaseModel):
+    """Latest drift analysis of one equipment, refreshed by the nightly drift job"""
+    __tablename__ = 'equipment_drift'
+
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), unique=True, nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+    series_count = Column(Integer, nullable=False, default=0)
+    worst_parameter = Column(String(200), nullable=True)
+    tolerance_used = Column(Float, nullable=True)  # Fraction of tolerance consumed today, guard band included
+    drift_per_year = Column(Float, nullable=True)  # Of the worst parameter
+    predicted_out_of_tolerance = Column(Date, nullable=True)
+    out_of_tolerance_before_due = Column(Boolean, nullable=False, default=False)
+    risk_score = Column(Float, nullable=False, default=0, index=True)
+
+
+class EquipmentBooking(BaseModel):
+    """
+    Reservation of equipment for a time range, against a project or customer order
+
+    On PostgreSQL an exclusion constraint over tstzrange(start_at, end_at)
+    rejects overlapping confirmed bookings of the same equipment; elsewhere
+    the booking service checks overlaps under a lock on the equipment row.
+    """
+    __tablename__ = 'equipment_bookings'
+
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), nullable=False)
+    start_at = Column(DateTime(timezone=True), nullable=False)
+    end_at = Column(DateTime(timezone=True), nullable=False)  # Exclusive
+    project_id = Column(Integer, ForeignKey('projects.id'), nullable=True)
+    order_id = Column(Integer, ForeignKey('customer_orders.id'), nullable=True)
+    booked_by_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    purpose = Column(String(500), nullable=True)
+    status = Column(String(20), nullable=False, default='confirmed')  # confirmed, cancelled
+    notes = Column(Text, nullable=True)
+
+    # Relationships
+    equipment = relationship('Equipment', back_populates='bookings')
+
+    __table_args__ = (
+        CheckConstraint('end_at > start_at', name='ck_equipment_bookings_range'),
+        Index('ix_equipment_bookings_window', 'equipment_id', 'start_at', 'end_at'),
+        ExcludeConstraint(
+            (equipment_id, '='),
+            (func.tstzrange(start_at, end_at, '[)'), '&&'),
+            name='ex_equipment_bookings_overlap',
+            using='gist',
+            where=(status == 'confirmed')
+        ).ddl_if(dialect='postgresql'),
+    )
+
+
+# The exclusion constraint compares equipment_id with = inside a GiST index
+event.listen(
+    EquipmentBooking.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql')
+)
 
 
 class Maintenance(BaseModel):
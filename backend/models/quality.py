@@ -1,7 +1,7 @@
 """
 Quality and Audit Management models
 """
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, Enum, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, Enum, JSON, Boolean, Index
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 import enum
@@ -175,10 +175,17 @@ class CAPA(BaseModel):
     closure_notes = Column(Text, nullable=True)
     closed_by_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     closed_at = Column(String(255), nullable=True)
+    row_version = Column(Integer, nullable=False, default=1, server_default='1')  # Optimistic concurrency
 
     # Relationships
     non_conformance = relationship('NonConformance', back_populates='capas')
 
+    __table_args__ = (
+        Index('ix_capas_responsible_status', 'responsible_person_id', 'status'),
+        Index('ix_capas_verifier_status', 'verified_by_id', 'status'),
+    )
+    __mapper_args__ = {'version_id_col': row_version}
+
 
 class RiskAssessment(BaseModel):
     """Risk Assessment model"""
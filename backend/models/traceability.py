@@ -20,6 +20,9 @@ class EntityTypeEnum(str, enum.Enum):
     NON_CONFORMANCE = "non_conformance"
     CAPA = "capa"
     AUDIT = "audit"
+    INVOICE = "invoice"
+    LEAVE = "leave"
+    EXPENSE = "expense"
 
 
 class ActionTypeEnum(str, enum.Enum):
@@ -0,0 +1,29 @@
+"""
+Work item model
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, Index, UniqueConstraint
+from .base import BaseModel
+
+
+class WorkItem(BaseModel):
+    """
+    Denormalized inbox entry: one row per open workflow item per assignee
+
+    Maintained by the workflow engine on every state change, so "what is
+    waiting for me" is a single indexed query across all modules.
+    """
+    __tablename__ = 'work_items'
+
+    assignee_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    entity_type = Column(String(50), nullable=False)  # Workflow name: document, leave, capa, ...
+    entity_id = Column(Integer, nullable=False)
+    title = Column(String(500), nullable=False)
+    status = Column(String(50), nullable=False)
+    priority = Column(Integer, default=0, nullable=False)  # Higher first
+    due_date = Column(Date, nullable=True)
+    link = Column(String(500), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('entity_type', 'entity_id', 'assignee_id', name='uq_work_items_entity_assignee'),
+        Index('ix_work_items_inbox', 'assignee_id', 'priority', 'due_date', 'id'),
+    )
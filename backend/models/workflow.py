@@ -1,7 +1,7 @@
 """
 Workflow and Task Management models
 """
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, Enum, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, Enum, JSON, Boolean, Index, UniqueConstraint, CheckConstraint
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 import enum
@@ -49,6 +49,7 @@ class Project(BaseModel):
     budget = Column(Integer, nullable=True)
     actual_cost = Column(Integer, nullable=True)
     metadata = Column(JSON, nullable=True)
+    schedule_version = Column(Integer, nullable=False, default=0, server_default='0')  # Bumped on every task or dependency change
 
     # Relationships
     tasks = relationship('Task', back_populates='project', cascade='all, delete-orphan')
@@ -73,11 +74,37 @@ class Task(BaseModel):
     progress = Column(Integer, default=0)  # 0-100
     tags = Column(JSON, nullable=True)
     metadata = Column(JSON, nullable=True)
+    required_competency = Column(String(200), nullable=True)  # Assignee must be qualified on it
+    path = Column(String(1000), nullable=True)  # Ids from the root down to this task, e.g. "/12/45/78/"; maintained by services.task_tree
+    depth = Column(Integer, nullable=True)  # 1 for top-level tasks
 
     # Relationships
     project = relationship('Project', back_populates='tasks')
     parent_task = relationship('Task', remote_side='Task.id', foreign_keys=[parent_task_id])
 
+    __table_args__ = (
+        Index('ix_tasks_project', 'project_id'),
+        # text_pattern_ops lets PostgreSQL use the index for LIKE 'prefix%'
+        Index('ix_tasks_path', 'path', postgresql_ops={'path': 'text_pattern_ops'}),
+    )
+
+
+class TaskDependency(BaseModel):
+    """Finish-to-start link: the successor can start once the predecessor is finished (plus lag)"""
+    __tablename__ = 'task_dependencies'
+
+    project_id = Column(Integer, ForeignKey('projects.id'), nullable=False)  # Both tasks belong to it
+    predecessor_id = Column(Integer, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
+    successor_id = Column(Integer, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
+    lag_days = Column(Integer, nullable=False, default=0)  # Working days
+
+    __table_args__ = (
+        UniqueConstraint('predecessor_id', 'successor_id', name='uq_task_dependencies_pair'),
+        CheckConstraint('predecessor_id <> successor_id', name='ck_task_dependencies_not_self'),
+        Index('ix_task_dependencies_project', 'project_id'),
+        Index('ix_task_dependencies_successor', 'successor_id'),
+    )
+
 
 class Meeting(BaseModel):
     """Meeting model"""
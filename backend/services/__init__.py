@@ -0,0 +1,19 @@
+"""
+Business logic services
+"""
+import importlib
+
+# Modules that register workflows or transition hooks when imported. A
+# feature adding a hook lists its module here; the engine itself imports none.
+WORKFLOW_MODULES = (
+    "workflows",
+    "work_items",
+    "leave",
+    "project_costs",
+)
+
+
+def load_workflow_modules() -> None:
+    """Import every module in WORKFLOW_MODULES, registering their workflows and hooks"""
+    for module in WORKFLOW_MODULES:
+        importlib.import_module(f"{__name__}.{module}")
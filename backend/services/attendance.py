@@ -0,0 +1,336 @@
+"""
+Attendance import from biometric punch logs
+
+Punch exports are read as a stream of CSV rows and handled in batches of
+ATTENDANCE_IMPORT_BATCH_SIZE, so memory depends on the batch size, not the
+file. Each batch:
+
+1. inserts the raw punches into attendance_punches, skipping punches
+   already imported (ON CONFLICT (employee_id, punched_at) DO NOTHING), so
+   re-importing an overlapping export is harmless;
+2. reloads all punches of the employee-days the batch touched, which also
+   picks up punches of the same day from earlier batches or files;
+3. pairs them with NumPy: check-in is the first "in" punch, check-out the
+   last "out", and hours are the sum of in -> out intervals (first to last
+   punch when the device doesn't record a direction);
+4. upserts one attendance row per employee-day with
+   INSERT ... ON CONFLICT (employee_id, date) DO UPDATE.
+
+Every batch is committed on its own; a failed import can simply be re-run.
+"""
+import codecs
+import csv
+import re
+from datetime import date, datetime, time, timedelta
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.models.hr import Employee, Attendance, AttendancePunch
+
+# Errors listed in an import summary; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Accepted header names, lower case with spaces, dashes and underscores removed
+_EMPLOYEE_COLUMNS = ("employeecode", "empcode", "employee", "employeeid", "empid", "userid", "enrollid", "enrollno")
+_TIMESTAMP_COLUMNS = ("timestamp", "datetime", "punchtime", "punchedat", "logtime")
+_DATE_COLUMNS = ("date", "punchdate")
+_TIME_COLUMNS = ("time",)
+_DIRECTION_COLUMNS = ("direction", "type", "status", "inout", "punchstate")
+_DEVICE_COLUMNS = ("device", "deviceid", "terminal", "location")
+
+_DIRECTIONS = {
+    "in": "in", "i": "in", "check-in": "in", "checkin": "in", "check in": "in", "0": "in",
+    "out": "out", "o": "out", "check-out": "out", "checkout": "out", "check out": "out", "1": "out",
+}
+_DATETIME_FORMATS = (
+    "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M",
+    "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M",
+)
+
+
+class ImportSummary:
+    """Counts and first errors of one punch import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.punches = 0
+        self.duplicates = 0
+        self.days = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def error(self, row_number: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "message": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "punches": self.punches,
+            "duplicates": self.duplicates,
+            "days": self.days,
+            "failed": self.failed,
+            "errors": self.errors
+        }
+
+
+def _column(header: Dict[str, int], names: Tuple[str, ...]) -> Optional[int]:
+    for name in names:
+        if name in header:
+            return header[name]
+    return None
+
+
+def _parse_timestamp(value: str) -> datetime:
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised timestamp '{value}'")
+
+
+def read_punches(stream: BinaryIO) -> Iterator[Tuple[int, Optional[tuple], Optional[str]]]:
+    """
+    Parse a punch log CSV incrementally
+
+    The header names the employee code column, and either a timestamp
+    column or separate date and time columns; direction (in/out, 0/1) and
+    device are optional.
+
+    Yields:
+        (row number, (employee code, punched_at, direction, device) or None, error or None)
+    """
+    reader = csv.reader(codecs.iterdecode(stream, "utf-8-sig"))
+    try:
+        header_row = next(reader)
+    except StopIteration:
+        return
+    header = {re.sub(r"[\s_-]", "", name.lower()): index for index, name in enumerate(header_row)}
+
+    employee_column = _column(header, _EMPLOYEE_COLUMNS)
+    timestamp_column = _column(header, _TIMESTAMP_COLUMNS)
+    date_column = _column(header, _DATE_COLUMNS)
+    time_column = _column(header, _TIME_COLUMNS)
+    direction_column = _column(header, _DIRECTION_COLUMNS)
+    device_column = _column(header, _DEVICE_COLUMNS)
+    if employee_column is None or (timestamp_column is None and (date_column is None or time_column is None)):
+        yield 0, None, "Header needs an employee code column and a timestamp (or date and time) column"
+        return
+
+    for row_number, row in enumerate(reader, start=1):
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            code = row[employee_column].strip()
+            if timestamp_column is not None:
+                punched_at = _parse_timestamp(row[timestamp_column])
+            else:
+                punched_at = _parse_timestamp(f"{row[date_column].strip()} {row[time_column].strip()}")
+            direction = None
+            if direction_column is not None and direction_column < len(row) and row[direction_column].strip():
+                direction = _DIRECTIONS.get(row[direction_column].strip().lower())
+                if direction is None:
+                    raise ValueError(f"Unrecognised direction '{row[direction_column].strip()}'")
+            device = row[device_column].strip()[:100] if device_column is not None and device_column < len(row) else None
+        except IndexError:
+            yield row_number, None, "Missing columns"
+            continue
+        except ValueError as exc:
+            yield row_number, None, str(exc)
+            continue
+        if not code:
+            yield row_number, None, "Missing employee code"
+            continue
+        yield row_number, (code, punched_at.replace(tzinfo=None, microsecond=0), direction, device or None), None
+
+
+def _insert(db: Session, model):
+    """INSERT with ON CONFLICT support for the session's database"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def _clock(seconds: Optional[float]) -> Optional[str]:
+    if seconds is None:
+        return None
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def pair_punches(rows: List[tuple]) -> List[dict]:
+    """
+    Attendance values of each employee-day from its punches
+
+    Args:
+        rows: (employee_id, punched_at, direction, device) of complete days
+
+    Returns:
+        One dict per employee-day with the attendance columns
+    """
+    import numpy as np
+
+    if not rows:
+        return []
+
+    keys: Dict[Tuple[int, date], int] = {}
+    key_index = np.empty(len(rows), dtype=np.int64)
+    seconds = np.empty(len(rows), dtype=np.int64)
+    direction = np.zeros(len(rows), dtype=np.int8)  # 1 in, -1 out, 0 unknown
+    devices: Dict[int, str] = {}
+    for i, (employee_id, punched_at, punch_direction, device) in enumerate(rows):
+        index = keys.setdefault((employee_id, punched_at.date()), len(keys))
+        key_index[i] = index
+        seconds[i] = punched_at.hour * 3600 + punched_at.minute * 60 + punched_at.second
+        direction[i] = 1 if punch_direction == "in" else -1 if punch_direction == "out" else 0
+        if device:
+            devices.setdefault(index, device)
+
+    order = np.lexsort((seconds, key_index))
+    key_index, seconds, direction = key_index[order], seconds[order], direction[order]
+
+    size = len(keys)
+    boundary = np.ones(len(key_index), dtype=bool)
+    boundary[1:] = key_index[1:] != key_index[:-1]
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(key_index)) - 1
+    counts = ends - starts + 1
+
+    first_in = np.minimum.reduceat(np.where(direction == 1, seconds, np.iinfo(np.int64).max), starts)
+    last_out = np.maximum.reduceat(np.where(direction == -1, seconds, -1), starts)
+    directional = np.maximum.reduceat(direction != 0, starts)
+
+    # Directional days: sum every out punch that directly follows an in punch
+    closes = np.zeros(len(key_index), dtype=bool)
+    closes[1:] = (direction[1:] == -1) & (direction[:-1] == 1) & ~boundary[1:]
+    elapsed = np.zeros(len(key_index), dtype=float)
+    elapsed[1:] = seconds[1:] - seconds[:-1]
+    paired = np.bincount(key_index[closes], weights=elapsed[closes], minlength=size)
+
+    # A directional day is left open when it lacks an in or out punch or ends on an in punch
+    positions = np.where(direction != 0, np.arange(len(key_index)), -1)
+    last_directional = np.maximum.reduceat(positions, starts)
+    ends_in = (last_directional >= 0) & (direction[np.maximum(last_directional, 0)] == 1)
+    no_in = directional & (first_in == np.iinfo(np.int64).max)
+    open_day = directional & (ends_in | (last_out < 0) | no_in)
+
+    span = (seconds[ends] - seconds[starts]).astype(float)
+    hours = np.where(open_day, np.nan, np.where(directional, paired, np.where(counts > 1, span, np.nan))) / 3600.0
+
+    check_in = np.where(first_in != np.iinfo(np.int64).max, first_in, seconds[starts])
+    check_out = np.where(last_out >= 0, last_out, np.where(counts > 1, seconds[ends], -1))
+
+    result = []
+    for (employee_id, day), index in keys.items():
+        worked = None if np.isnan(hours[index]) else round(float(hours[index]), 2)
+        out = int(check_out[index])
+        result.append({
+            "employee_id": employee_id,
+            "date": day,
+            "check_in_time": _clock(check_in[index]),
+            "check_out_time": _clock(out) if out >= 0 else None,
+            "hours_worked": worked,
+            "status": "half_day" if worked is not None and worked < settings.ATTENDANCE_HALF_DAY_HOURS else "present",
+            "location": devices.get(index),
+            "remarks": None if worked is not None else "Missing check-in" if no_in[index] else "Missing check-out",
+            "punch_count": int(counts[index])
+        })
+    return result
+
+
+def _write_batch(db: Session, punches: List[dict], user_id: int, summary: ImportSummary) -> None:
+    statement = _insert(db, AttendancePunch).on_conflict_do_nothing(index_elements=["employee_id", "punched_at"])
+    inserted = db.connection().execute(statement, punches).rowcount
+    if inserted is not None and inserted >= 0:
+        summary.duplicates += len(punches) - inserted
+
+    touched: Set[Tuple[int, date]] = {(punch["employee_id"], punch["punched_at"].date()) for punch in punches}
+    first_day = min(day for _, day in touched)
+    last_day = max(day for _, day in touched)
+    rows = [
+        row for row in db.execute(
+            select(
+                AttendancePunch.employee_id,
+                AttendancePunch.punched_at,
+                AttendancePunch.direction,
+                AttendancePunch.device
+            ).where(
+                AttendancePunch.employee_id.in_({employee_id for employee_id, _ in touched}),
+                AttendancePunch.punched_at >= datetime.combine(first_day, time()),
+                AttendancePunch.punched_at < datetime.combine(last_day + timedelta(days=1), time()),
+                AttendancePunch.is_deleted == False
+            )
+        )
+        if (row.employee_id, row.punched_at.date()) in touched
+    ]
+
+    days = pair_punches(rows)
+    for day in days:
+        day["created_by_id"] = user_id
+    statement = _insert(db, Attendance)
+    db.connection().execute(
+        statement.on_conflict_do_update(
+            index_elements=["employee_id", "date"],
+            set_={
+                "check_in_time": statement.excluded.check_in_time,
+                "check_out_time": statement.excluded.check_out_time,
+                "hours_worked": statement.excluded.hours_worked,
+                "status": statement.excluded.status,
+                "location": statement.excluded.location,
+                "remarks": statement.excluded.remarks,
+                "punch_count": statement.excluded.punch_count,
+                "updated_by_id": user_id,
+                "updated_at": func.now()
+            }
+        ),
+        days
+    )
+    summary.days += len(days)
+    db.commit()
+
+
+def import_punches(db: Session, stream: BinaryIO, user_id: int, batch_size: Optional[int] = None) -> ImportSummary:
+    """Import a punch log CSV, committing each batch"""
+    batch_size = batch_size or settings.ATTENDANCE_IMPORT_BATCH_SIZE
+    employees = dict(db.query(Employee.employee_code, Employee.id).filter(Employee.is_deleted == False).all())
+    summary = ImportSummary()
+
+    batch: List[dict] = []
+    for row_number, punch, error in read_punches(stream):
+        summary.rows += 1 if row_number else 0
+        if error:
+            summary.error(row_number, error)
+            continue
+        code, punched_at, direction, device = punch
+        employee_id = employees.get(code)
+        if employee_id is None:
+            summary.error(row_number, f"Unknown employee code '{code}'")
+            continue
+        batch.append({
+            "employee_id": employee_id,
+            "punched_at": punched_at,
+            "direction": direction,
+            "device": device,
+            "created_by_id": user_id
+        })
+        if len(batch) >= batch_size:
+            summary.punches += len(batch)
+            _write_batch(db, batch, user_id, summary)
+            batch = []
+
+    if batch:
+        summary.punches += len(batch)
+        _write_batch(db, batch, user_id, summary)
+    return summary
@@ -0,0 +1,86 @@
+"""
+Audit trail helpers
+"""
+from typing import Iterable, Optional
+
+from fastapi import Request
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend.models.traceability import AuditLog, EntityTypeEnum, ActionTypeEnum
+
+
+def log_action(
+    db: Session,
+    user_id: Optional[int],
+    entity_type: EntityTypeEnum,
+    entity_id: int,
+    action: ActionTypeEnum,
+    description: Optional[str] = None,
+    old_values: Optional[dict] = None,
+    new_values: Optional[dict] = None,
+    request: Optional[Request] = None
+) -> AuditLog:
+    """
+    Add an audit log entry to the session
+
+    The entry is committed with the caller's transaction.
+    """
+    entry = AuditLog(
+        user_id=user_id,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        action=action,
+        description=description,
+        old_values=old_values,
+        new_values=new_values,
+        created_by_id=user_id
+    )
+    if request is not None:
+        entry.ip_address = request.client.host if request.client else None
+        entry.user_agent = (request.headers.get("user-agent") or "")[:500]
+
+    db.add(entry)
+    return entry
+
+
+def log_actions(
+    db: Session,
+    user_id: Optional[int],
+    entity_type: EntityTypeEnum,
+    action: ActionTypeEnum,
+    entries: Iterable[dict],
+    request: Optional[Request] = None
+) -> int:
+    """
+    Write audit log entries for a batch of entities with one INSERT
+
+    Each entry holds entity_id and optionally description, old_values and
+    new_values. The entries are committed with the caller's transaction.
+
+    Returns:
+        Number of entries written
+    """
+    ip_address = user_agent = None
+    if request is not None:
+        ip_address = request.client.host if request.client else None
+        user_agent = (request.headers.get("user-agent") or "")[:500]
+
+    rows = [
+        {
+            "user_id": user_id,
+            "entity_type": entity_type,
+            "entity_id": entry["entity_id"],
+            "action": action,
+            "description": entry.get("description"),
+            "old_values": entry.get("old_values"),
+            "new_values": entry.get("new_values"),
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "created_by_id": user_id
+        }
+        for entry in entries
+    ]
+    if rows:
+        db.execute(insert(AuditLog), rows)
+    return len(rows)
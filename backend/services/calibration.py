@@ -0,0 +1,141 @@
+"""
+Calibration scheduling
+
+Recording a calibration locks the equipment row and moves its
+last/next_calibration_date in the same transaction, so two certificates
+entered at once can't leave the dates out of step. The next due date comes
+from the certificate when given, otherwise from calibration_frequency_days.
+
+Reminders are pre-generated as background jobs, one per lead time in
+CALIBRATION_REMINDER_LEAD_DAYS before the due date. Rescheduling deletes the
+queued reminders of the old date; a reminder that still fires for a date the
+equipment no longer has does nothing.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.models.job import Job
+from backend.models.procurement import Equipment, Calibration
+from .calibration_analytics import store_measurements
+from .jobs import enqueue, QUEUED
+
+# Hour of day (UTC) reminders go out
+REMINDER_HOUR = 8
+
+REMINDER_JOB = "calibration.reminder"
+
+
+class CalibrationError(ValueError):
+    """Calibration can't be recorded for this equipment"""
+
+
+def _reminder_prefix(equipment_id: int) -> str:
+    return f"calibration-reminder:{equipment_id}:"
+
+
+def next_due_date(equipment: Equipment, calibration_date: date, certificate_due: Optional[date] = None) -> Optional[date]:
+    """Due date following a calibration: the certificate's, else the equipment frequency"""
+    if certificate_due:
+        return certificate_due
+    if equipment.calibration_frequency_days:
+        return calibration_date + timedelta(days=equipment.calibration_frequency_days)
+    return None
+
+
+def schedule_reminders(db: Session, equipment: Equipment) -> List[int]:
+    """
+    Replace the queued reminder jobs of one equipment; the caller commits
+
+    Returns:
+        Ids of the reminder jobs now queued
+    """
+    db.execute(
+        delete(Job).where(
+            Job.name == REMINDER_JOB,
+            Job.status == QUEUED,
+            Job.dedupe_key.like(f"{_reminder_prefix(equipment.id)}%")
+        )
+    )
+    due = equipment.next_calibration_date
+    if not equipment.calibration_required or due is None or equipment.is_deleted:
+        return []
+
+    now = datetime.now(timezone.utc)
+    job_ids = []
+    for lead_days in sorted(set(settings.CALIBRATION_REMINDER_LEAD_DAYS), reverse=True):
+        run_at = datetime.combine(due - timedelta(days=lead_days), time(REMINDER_HOUR), tzinfo=timezone.utc)
+        if run_at < now:
+            continue
+        job_ids.append(enqueue(
+            db, REMINDER_JOB,
+            {"equipment_id": equipment.id, "due_date": due.isoformat(), "lead_days": lead_days},
+            run_at=run_at,
+            dedupe_key=f"{_reminder_prefix(equipment.id)}{due.isoformat()}:{lead_days}"
+        ))
+    return job_ids
+
+
+def record_calibration(
+    db: Session,
+    equipment_id: int,
+    calibration_date: date,
+    user_id: int,
+    certificate_due: Optional[date] = None,
+    **fields
+) -> Calibration:
+    """
+    Add a calibration record and move the equipment's calibration dates
+
+    The equipment row is locked (SELECT ... FOR UPDATE) until the caller
+    commits. Measurement points in calibration_data are extracted for drift
+    analysis. A back-dated record older than the last calibration is stored
+    but doesn't move the dates.
+
+    Raises:
+        CalibrationError: If the equipment doesn't exist
+    """
+    equipment = db.query(Equipment).filter(
+        Equipment.id == equipment_id,
+        Equipment.is_deleted == False
+    ).with_for_update().first()
+    if equipment is None:
+        raise CalibrationError("Equipment not found")
+
+    year = datetime.now().year
+    count = db.query(Calibration).count() + 1
+    following = next_due_date(equipment, calibration_date, certificate_due)
+
+    calibration = Calibration(
+        calibration_number=f"CAL-{year}-{count:04d}",
+        equipment_id=equipment.id,
+        calibration_date=calibration_date,
+        due_date=equipment.next_calibration_date or calibration_date,
+        next_due_date=following,
+        created_by_id=user_id,
+        **fields
+    )
+    db.add(calibration)
+    db.flush()
+    store_measurements(db, calibration)
+
+    if equipment.last_calibration_date is None or calibration_date >= equipment.last_calibration_date:
+        equipment.last_calibration_date = calibration_date
+        equipment.next_calibration_date = following
+        equipment.updated_by_id = user_id
+        db.flush()
+        schedule_reminders(db, equipment)
+    return calibration
+
+
+def due_calibrations_query(db: Session, days_ahead: int = 30, as_of: Optional[date] = None):
+    """Equipment due within days_ahead (overdue included), soonest first, using ix_equipment_calibration_due"""
+    until = (as_of or date.today()) + timedelta(days=days_ahead)
+    return db.query(Equipment).filter(
+        Equipment.calibration_required == True,
+        Equipment.next_calibration_date <= until,
+        Equipment.is_deleted == False
+    ).order_by(Equipment.next_calibration_date, Equipment.id)
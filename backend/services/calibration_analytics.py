@@ -0,0 +1,386 @@
+"""
+Calibration drift analytics
+
+Measurement points are pulled out of Calibration.calibration_data into
+calibration_measurements when a calibration is recorded (and by a backfill
+for older records). Analysis reads them in one ordered scan, so each
+(equipment, parameter) series is a contiguous run of the arrays, and fits
+all series at once with NumPy reductions over the run boundaries:
+
+    error(t) = intercept + slope * (t - last calibration)
+
+The predicted out-of-tolerance date is where the fitted error plus the
+latest expanded uncertainty (guard band) reaches the tolerance. Each
+equipment is scored by its worst series: the larger of the tolerance used
+today and how close the predicted date is within RISK_HORIZON_DAYS.
+Points recorded without a nominal have no error; a series with none left
+gets no tolerance use, prediction or risk rather than having raw readings
+compared against the tolerance.
+
+NumPy is imported when an analysis runs; extraction works without it.
+"""
+import math
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, List, Optional
+
+from sqlalchemy import delete, exists, func, insert, select
+from sqlalchemy.orm import Session
+
+from backend.models.procurement import Equipment, Calibration, CalibrationMeasurement, EquipmentDrift
+
+# Predicted out-of-tolerance dates further out than this add no risk
+RISK_HORIZON_DAYS = 365
+
+_POINT_LIST_KEYS = ("points", "measurements", "readings")
+_PARAMETER_KEYS = ("parameter", "name", "point")
+_MEASURED_KEYS = ("measured", "reading", "actual", "value")
+_EPOCH = date(1970, 1, 1)
+
+
+def numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value.strip())
+        except ValueError:
+            return None
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return float(value)
+    return None
+
+
+def _first(entry: dict, keys) -> Any:
+    for key in keys:
+        if entry.get(key) is not None:
+            return entry[key]
+    return None
+
+
+def extract_points(calibration_data: Any) -> List[dict]:
+    """
+    Numeric measurement points of a calibration_data blob
+
+    Accepted shapes:
+        {"points": [{"parameter": "25C", "nominal": 25, "measured": 25.03,
+                     "uncertainty": 0.02, "tolerance": 0.1, "unit": "C"}, ...]}
+        {"25C": {"nominal": 25, "measured": 25.03, ...}, ...}
+        {"25C": 25.03, ...}
+
+    "measurements" or "readings" may hold the list, "name" or "point" the
+    parameter, and "reading", "actual" or "value" the measured value; an
+    "error" with a nominal stands in for a missing reading. Entries without
+    a numeric reading are skipped.
+    """
+    if not isinstance(calibration_data, dict):
+        return []
+
+    for key in _POINT_LIST_KEYS:
+        if isinstance(calibration_data.get(key), list):
+            entries = [(None, entry) for entry in calibration_data[key]]
+            break
+    else:
+        entries = list(calibration_data.items())
+
+    points = []
+    for name, entry in entries:
+        if isinstance(entry, dict):
+            parameter = _first(entry, _PARAMETER_KEYS) or name
+            measured = _number(_first(entry, _MEASURED_KEYS))
+            nominal = _number(entry.get("nominal"))
+            error = _number(entry.get("error"))
+            uncertainty = _number(entry.get("uncertainty"))
+            tolerance = _number(entry.get("tolerance"))
+            unit = entry.get("unit")
+            if measured is None and nominal is not None and error is not None:
+                measured = nominal + error
+        else:
+            parameter, measured = name, _number(entry)
+            nominal = error = uncertainty = tolerance = unit = None
+
+        if parameter is None or measured is None:
+            continue
+        if error is None and nominal is not None:
+            error = measured - nominal
+        points.append({
+            "parameter": str(parameter)[:200],
+            "unit": str(unit)[:50] if unit is not None else None,
+            "nominal": nominal,
+            "measured": measured,
+            "error": error,
+            "uncertainty": abs(uncertainty) if uncertainty is not None else None,
+            "tolerance": abs(tolerance) if tolerance is not None else None
+        })
+    return points
+
+
+def _measurement_rows(calibration_id: int, equipment_id: int, calibration_date: date, data: Any, user_id: Optional[int]) -> List[dict]:
+    return [
+        dict(
+            equipment_id=equipment_id,
+            calibration_id=calibration_id,
+            measured_on=calibration_date,
+            created_by_id=user_id,
+            **point
+        )
+        for point in extract_points(data)
+    ]
+
+
+def store_measurements(db: Session, calibration: Calibration) -> int:
+    """Replace the extracted measurement points of one calibration; the caller commits"""
+    db.execute(delete(CalibrationMeasurement).where(CalibrationMeasurement.calibration_id == calibration.id))
+    rows = _measurement_rows(
+        calibration.id, calibration.equipment_id, calibration.calibration_date,
+        calibration.calibration_data, calibration.created_by_id
+    )
+    if rows:
+        db.execute(insert(CalibrationMeasurement), rows)
+    return len(rows)
+
+
+def backfill_measurements(db: Session, batch_size: int = 2000) -> int:
+    """Extract points of calibrations recorded before extraction existed; the caller commits"""
+    missing = ~exists().where(CalibrationMeasurement.calibration_id == Calibration.id)
+    stored = 0
+    last_id = 0
+    while True:
+        calibrations = db.execute(
+            select(
+                Calibration.id,
+                Calibration.equipment_id,
+                Calibration.calibration_date,
+                Calibration.calibration_data,
+                Calibration.created_by_id
+            ).where(
+                Calibration.id > last_id,
+                Calibration.calibration_data.isnot(None),
+                Calibration.is_deleted == False,
+                missing
+            ).order_by(Calibration.id).limit(batch_size)
+        ).all()
+        if not calibrations:
+            return stored
+
+        rows = [row for calibration in calibrations for row in _measurement_rows(*calibration)]
+        if rows:
+            db.execute(insert(CalibrationMeasurement), rows)
+        stored += len(rows)
+        last_id = calibrations[-1].id
+
+
+def _load(db: Session, equipment_id: Optional[int] = None):
+    """Measurement arrays ordered by equipment, parameter and date, or None when there are none"""
+    import numpy as np
+
+    query = select(
+        CalibrationMeasurement.equipment_id,
+        CalibrationMeasurement.parameter,
+        CalibrationMeasurement.measured_on,
+        CalibrationMeasurement.error,
+        CalibrationMeasurement.uncertainty,
+        CalibrationMeasurement.tolerance
+    ).where(CalibrationMeasurement.is_deleted == False)
+    if equipment_id is not None:
+        query = query.where(CalibrationMeasurement.equipment_id == equipment_id)
+    rows = db.execute(query.order_by(
+        CalibrationMeasurement.equipment_id,
+        CalibrationMeasurement.parameter,
+        CalibrationMeasurement.measured_on
+    )).all()
+    if not rows:
+        return None
+
+    equipment_ids, parameters, measured_on, values, uncertainties, tolerances = zip(*rows)
+    return {
+        "equipment_id": np.array(equipment_ids, dtype=np.int64),
+        "parameter": np.array(parameters, dtype=object),
+        "day": np.array(measured_on, dtype="datetime64[D]").astype(np.int64),
+        "value": np.array(values, dtype=float),
+        "uncertainty": np.array(uncertainties, dtype=float),
+        "tolerance": np.array(tolerances, dtype=float)
+    }
+
+
+def _fit(np, x, y, starts):
+    """Least-squares line of every run starting at starts; NaN values are left out"""
+    present = ~np.isnan(y)
+    xs = np.where(present, x, 0.0)
+    ys = np.where(present, y, 0.0)
+    n = np.add.reduceat(present.astype(float), starts)
+    sx = np.add.reduceat(xs, starts)
+    sy = np.add.reduceat(ys, starts)
+    sxx = np.add.reduceat(xs * xs, starts)
+    sxy = np.add.reduceat(xs * ys, starts)
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, np.nan)
+        intercept = np.where(np.isnan(slope), sy / n, (sy - slope * sx) / n)
+    return slope, intercept
+
+
+def _analyze(np, data: dict, as_of: date) -> dict:
+    """Per-series drift fit, tolerance use and predicted out-of-tolerance day"""
+    equipment_ids, parameters = data["equipment_id"], data["parameter"]
+    size = len(equipment_ids)
+
+    boundary = np.ones(size, dtype=bool)
+    boundary[1:] = (equipment_ids[1:] != equipment_ids[:-1]) | (parameters[1:] != parameters[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], size) - 1
+    series = np.cumsum(boundary) - 1
+
+    last_day = data["day"][ends]
+    x = (data["day"] - last_day[series]).astype(float)
+    slope, intercept = _fit(np, x, data["value"], starts)
+    uncertainty_slope, _ = _fit(np, x, data["uncertainty"], starts)
+
+    guard = np.nan_to_num(data["uncertainty"][ends])
+    # Series without a single error (no nominal recorded) can't be judged against a tolerance
+    has_error = np.add.reduceat((~np.isnan(data["value"])).astype(int), starts) > 0
+    tolerance = np.where(has_error, np.fmax.reduceat(data["tolerance"], starts), np.nan)
+    today = (as_of - _EPOCH).days
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        error_today = np.where(np.isnan(slope), intercept, intercept + slope * (today - last_day))
+        tolerance_used = (np.abs(error_today) + guard) / tolerance
+
+        limit = np.where(slope > 0, 1.0, -1.0) * (tolerance - guard)
+        days_to_limit = np.maximum((limit - intercept) / slope, 0.0)
+        exceeded = np.abs(intercept) + guard >= tolerance
+        predictable = np.isfinite(days_to_limit) & (slope != 0)
+        predicted = np.where(
+            exceeded, last_day,
+            np.where(predictable, last_day + np.ceil(np.where(predictable, days_to_limit, 0.0)), np.nan)
+        )
+
+        proximity = np.clip(1.0 - (predicted - today) / RISK_HORIZON_DAYS, 0.0, 1.0)
+    risk = np.fmax(np.nan_to_num(tolerance_used), np.nan_to_num(proximity))
+
+    return {
+        "starts": starts,
+        "ends": ends,
+        "equipment_id": equipment_ids[starts],
+        "parameter": parameters[starts],
+        "points": ends - starts + 1,
+        "last_day": last_day,
+        "drift_per_year": slope * 365.25,
+        "error_today": error_today,
+        "uncertainty_trend_per_year": uncertainty_slope * 365.25,
+        "tolerance": tolerance,
+        "tolerance_used": tolerance_used,
+        "predicted_day": predicted,
+        "risk": risk
+    }
+
+
+def _day(value) -> Optional[date]:
+    if value is None or math.isnan(value):
+        return None
+    return _EPOCH + timedelta(days=int(value))
+
+
+def _float(value, digits: int = 6) -> Optional[float]:
+    value = float(value)
+    return round(value, digits) + 0.0 if math.isfinite(value) else None
+
+
+def drift_report(db: Session, equipment_id: int, as_of: Optional[date] = None) -> dict:
+    """Fitted drift and measurement history of every parameter of one equipment"""
+    import numpy as np
+
+    as_of = as_of or date.today()
+    data = _load(db, equipment_id)
+    if data is None:
+        return {"equipment_id": equipment_id, "as_of": as_of, "risk_score": 0.0, "parameters": []}
+
+    result = _analyze(np, data, as_of)
+    parameters = []
+    for i in np.argsort(-result["risk"], kind="stable"):
+        run = slice(result["starts"][i], result["ends"][i] + 1)
+        parameters.append({
+            "parameter": result["parameter"][i],
+            "points": [
+                {"measured_on": _day(day), "error": _float(value), "uncertainty": _float(uncertainty)}
+                for day, value, uncertainty in zip(data["day"][run], data["value"][run], data["uncertainty"][run])
+            ],
+            "drift_per_year": _float(result["drift_per_year"][i]),
+            "error_today": _float(result["error_today"][i]),
+            "uncertainty_trend_per_year": _float(result["uncertainty_trend_per_year"][i]),
+            "tolerance": _float(result["tolerance"][i]),
+            "tolerance_used": _float(result["tolerance_used"][i], 4),
+            "predicted_out_of_tolerance": _day(result["predicted_day"][i]),
+            "risk_score": _float(result["risk"][i], 4)
+        })
+
+    predicted = [item["predicted_out_of_tolerance"] for item in parameters if item["predicted_out_of_tolerance"]]
+    return {
+        "equipment_id": equipment_id,
+        "as_of": as_of,
+        "risk_score": parameters[0]["risk_score"],
+        "predicted_out_of_tolerance": min(predicted) if predicted else None,
+        "parameters": parameters
+    }
+
+
+def refresh_fleet_drift(db: Session, as_of: Optional[date] = None) -> dict:
+    """Recompute equipment_drift for every equipment with measurements; the caller commits"""
+    import numpy as np
+
+    started = time.perf_counter()
+    as_of = as_of or date.today()
+    data = _load(db)
+    db.execute(delete(EquipmentDrift))
+    if data is None:
+        return {"equipment": 0, "series": 0, "measurements": 0, "seconds": round(time.perf_counter() - started, 3)}
+
+    result = _analyze(np, data, as_of)
+    equipment_ids = result["equipment_id"]
+    boundary = np.ones(len(equipment_ids), dtype=bool)
+    boundary[1:] = equipment_ids[1:] != equipment_ids[:-1]
+    starts = np.flatnonzero(boundary)
+    series_counts = np.diff(np.append(starts, len(equipment_ids)))
+
+    # Series are grouped by equipment; within each group put the riskiest first
+    worst = np.lexsort((-result["risk"], equipment_ids))[starts]
+    earliest = np.fmin.reduceat(result["predicted_day"], starts)
+
+    next_due = dict(db.query(Equipment.id, Equipment.next_calibration_date).filter(
+        Equipment.calibration_required == True,
+        Equipment.next_calibration_date.isnot(None)
+    ).all())
+    computed_at = datetime.now(timezone.utc)
+
+    rows = []
+    for position, series in enumerate(worst):
+        equipment_id = int(equipment_ids[series])
+        predicted = _day(earliest[position])
+        due = next_due.get(equipment_id)
+        rows.append({
+            "equipment_id": equipment_id,
+            "computed_at": computed_at,
+            "series_count": int(series_counts[position]),
+            "worst_parameter": result["parameter"][series],
+            "tolerance_used": _float(result["tolerance_used"][series], 4),
+            "drift_per_year": _float(result["drift_per_year"][series]),
+            "predicted_out_of_tolerance": predicted,
+            "out_of_tolerance_before_due": bool(predicted and due and predicted < due),
+            "risk_score": _float(result["risk"][series], 4) or 0.0
+        })
+    db.execute(insert(EquipmentDrift), rows)
+
+    return {
+        "equipment": len(rows),
+        "series": len(result["starts"]),
+        "measurements": len(data["day"]),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
@@ -0,0 +1,289 @@
+"""
+Training participation and competency matrix
+
+training_participants holds one row per employee and training (the
+Training.participants / completion_status JSON is only read by the one-off
+migration). employee_competencies is the materialized matrix derived from
+it: one row per employee and competency with the latest qualification and
+its expiry. Whenever participations change, only the affected
+(employee, competency) pairs are recomputed, so the matrix never needs a
+full rebuild.
+
+Qualification checks are a single lookup on
+uq_employee_competencies_employee_competency; "who is not qualified on X"
+is an anti-join on the same index.
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, insert, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from backend.models.hr import Employee, Training, TrainingParticipant, EmployeeCompetency, EmploymentStatusEnum
+from backend.models.user import User
+
+ENROLLED = "enrolled"
+COMPLETED = "completed"
+PARTICIPANT_STATES = (ENROLLED, COMPLETED, "failed", "absent")
+
+
+class CompetencyError(ValueError):
+    """Participation can't be recorded"""
+
+
+def refresh_competencies(db: Session, pairs: Iterable[Tuple[int, str]]) -> int:
+    """
+    Recompute the matrix cells of some (employee_id, competency) pairs; the caller commits
+
+    Returns:
+        Number of cells now holding a qualification
+    """
+    pairs = {(employee_id, competency) for employee_id, competency in pairs if competency}
+    if not pairs:
+        return 0
+
+    db.execute(
+        delete(EmployeeCompetency)
+        .where(tuple_(EmployeeCompetency.employee_id, EmployeeCompetency.competency).in_(pairs))
+        .execution_options(synchronize_session=False)
+    )
+
+    rows = db.execute(
+        select(
+            TrainingParticipant.employee_id,
+            Training.competency,
+            Training.id,
+            Training.validity_days,
+            TrainingParticipant.completed_on,
+            Training.end_date
+        ).join(Training, Training.id == TrainingParticipant.training_id).where(
+            tuple_(TrainingParticipant.employee_id, Training.competency).in_(pairs),
+            TrainingParticipant.status == COMPLETED,
+            TrainingParticipant.is_deleted == False,
+            Training.is_deleted == False
+        )
+    ).all()
+
+    cells: Dict[Tuple[int, str], dict] = {}
+    for employee_id, competency, training_id, validity_days, completed_on, end_date in rows:
+        qualified_on = completed_on or end_date
+        if qualified_on is None:
+            continue
+        expires_on = qualified_on + timedelta(days=validity_days) if validity_days else None
+        cell = cells.get((employee_id, competency))
+        if cell is None:
+            cells[(employee_id, competency)] = {
+                "employee_id": employee_id,
+                "competency": competency,
+                "qualified_on": qualified_on,
+                "expires_on": expires_on,
+                "training_id": training_id
+            }
+            continue
+        # The latest training is shown, the qualification lasts as long as the longest-lived one
+        if qualified_on > cell["qualified_on"]:
+            cell["qualified_on"], cell["training_id"] = qualified_on, training_id
+        if cell["expires_on"] is not None and (expires_on is None or expires_on > cell["expires_on"]):
+            cell["expires_on"] = expires_on
+
+    if cells:
+        db.execute(insert(EmployeeCompetency), list(cells.values()))
+    return len(cells)
+
+
+def record_participation(
+    db: Session,
+    training: Training,
+    employee_id: int,
+    status: str,
+    user_id: int,
+    completed_on: Optional[date] = None,
+    **fields
+) -> TrainingParticipant:
+    """Create or update one participation and refresh the employee's matrix cell; the caller commits"""
+    if status not in PARTICIPANT_STATES:
+        raise CompetencyError(f"Status must be one of: {', '.join(PARTICIPANT_STATES)}")
+
+    participant = db.query(TrainingParticipant).filter(
+        TrainingParticipant.training_id == training.id,
+        TrainingParticipant.employee_id == employee_id
+    ).first()
+    if participant is None:
+        if not db.query(Employee.id).filter(Employee.id == employee_id, Employee.is_deleted == False).first():
+            raise CompetencyError(f"Employee {employee_id} not found")
+        participant = TrainingParticipant(training_id=training.id, employee_id=employee_id, created_by_id=user_id)
+        db.add(participant)
+
+    participant.status = status
+    participant.is_deleted = False
+    participant.completed_on = (completed_on or training.end_date or date.today()) if status == COMPLETED else None
+    participant.updated_by_id = user_id
+    for key, value in fields.items():
+        if value is not None:
+            setattr(participant, key, value)
+    db.flush()
+
+    refresh_competencies(db, [(employee_id, training.competency)])
+    return participant
+
+
+def enroll(db: Session, training: Training, employee_ids: Iterable[int], user_id: int) -> int:
+    """Enroll employees not yet on a training, reviving removed participations; the caller commits"""
+    employee_ids = set(employee_ids)
+    existing, removed = set(), set()
+    for employee_id, is_deleted in db.query(TrainingParticipant.employee_id, TrainingParticipant.is_deleted).filter(
+        TrainingParticipant.training_id == training.id,
+        TrainingParticipant.employee_id.in_(employee_ids)
+    ):
+        (removed if is_deleted else existing).add(employee_id)
+    valid = {
+        employee_id for (employee_id,) in db.query(Employee.id).filter(
+            Employee.id.in_(employee_ids - existing),
+            Employee.is_deleted == False
+        )
+    }
+    if training.max_participants:
+        current = db.query(TrainingParticipant).filter(
+            TrainingParticipant.training_id == training.id,
+            TrainingParticipant.is_deleted == False
+        ).count()
+        if current + len(valid) > training.max_participants:
+            raise CompetencyError(f"Training is limited to {training.max_participants} participants")
+
+    revived = valid & removed
+    if revived:
+        db.execute(
+            update(TrainingParticipant.__table__).where(
+                TrainingParticipant.training_id == training.id,
+                TrainingParticipant.employee_id.in_(revived)
+            ).values(
+                status=ENROLLED, is_deleted=False, completed_on=None, score=None,
+                certificate_number=None, updated_by_id=user_id
+            )
+        )
+    if valid - revived:
+        db.execute(insert(TrainingParticipant), [
+            {"training_id": training.id, "employee_id": employee_id, "status": ENROLLED, "created_by_id": user_id}
+            for employee_id in sorted(valid - revived)
+        ])
+    return len(valid)
+
+
+def retarget_training(db: Session, training: Training, old_competency: Optional[str]) -> None:
+    """Refresh the cells of all participants after a training's competency or validity changed"""
+    employee_ids = [
+        employee_id for (employee_id,) in db.query(TrainingParticipant.employee_id).filter(
+            TrainingParticipant.training_id == training.id,
+            TrainingParticipant.status == COMPLETED
+        )
+    ]
+    competencies = {competency for competency in (old_competency, training.competency) if competency}
+    refresh_competencies(db, [(employee_id, competency) for employee_id in employee_ids for competency in competencies])
+
+
+def _valid_on(on: date):
+    return or_(EmployeeCompetency.expires_on.is_(None), EmployeeCompetency.expires_on >= on)
+
+
+def is_qualified(db: Session, user_id: int, competency: str, on: Optional[date] = None) -> bool:
+    """Whether the employee record of a user holds a valid qualification on a competency"""
+    return db.query(EmployeeCompetency.id).join(
+        Employee, Employee.id == EmployeeCompetency.employee_id
+    ).filter(
+        Employee.user_id == user_id,
+        EmployeeCompetency.competency == competency,
+        _valid_on(on or date.today())
+    ).first() is not None
+
+
+def unqualified_query(db: Session, competency: str, department: Optional[str] = None, on: Optional[date] = None):
+    """Active employees without a valid qualification on a competency, with their user"""
+    qualification = and_(
+        EmployeeCompetency.employee_id == Employee.id,
+        EmployeeCompetency.competency == competency,
+        _valid_on(on or date.today())
+    )
+    query = db.query(Employee, User).join(User, User.id == Employee.user_id).outerjoin(
+        EmployeeCompetency, qualification
+    ).filter(
+        EmployeeCompetency.id.is_(None),
+        Employee.employment_status == EmploymentStatusEnum.ACTIVE,
+        Employee.is_deleted == False
+    )
+    if department:
+        query = query.filter(User.department == department)
+    return query.order_by(User.full_name)
+
+
+def competency_matrix(
+    db: Session,
+    competencies: Optional[List[str]] = None,
+    department: Optional[str] = None,
+    on: Optional[date] = None
+) -> dict:
+    """Employees × competencies with the qualification state of every cell"""
+    on = on or date.today()
+    query = db.query(EmployeeCompetency, Employee.employee_code, User.full_name, User.department).join(
+        Employee, Employee.id == EmployeeCompetency.employee_id
+    ).join(
+        User, User.id == Employee.user_id
+    ).filter(Employee.is_deleted == False)
+    if competencies:
+        query = query.filter(EmployeeCompetency.competency.in_(competencies))
+    if department:
+        query = query.filter(User.department == department)
+
+    employees: Dict[int, dict] = {}
+    columns = set(competencies or ())
+    for cell, employee_code, full_name, employee_department in query.order_by(User.full_name):
+        columns.add(cell.competency)
+        row = employees.setdefault(cell.employee_id, {
+            "employee_id": cell.employee_id,
+            "employee_code": employee_code,
+            "name": full_name,
+            "department": employee_department,
+            "competencies": {}
+        })
+        row["competencies"][cell.competency] = {
+            "qualified_on": cell.qualified_on,
+            "expires_on": cell.expires_on,
+            "valid": cell.expires_on is None or cell.expires_on >= on,
+            "training_id": cell.training_id
+        }
+
+    return {"as_of": on, "competencies": sorted(columns), "employees": list(employees.values())}
+
+
+def migrate_json_participation(db: Session) -> dict:
+    """Copy Training.participants/completion_status into training_participants; the caller commits"""
+    trainings = db.query(Training).filter(
+        Training.participants.isnot(None),
+        ~Training.participant_records.any()
+    ).all()
+
+    known: Set[int] = {employee_id for (employee_id,) in db.query(Employee.id)}
+    rows: List[dict] = []
+    pairs = set()
+    for training in trainings:
+        completion = {str(key): value for key, value in (training.completion_status or {}).items()}
+        for raw_id in training.participants or []:
+            try:
+                employee_id = int(raw_id)
+            except (TypeError, ValueError):
+                continue
+            if employee_id not in known:
+                continue
+            status = completion.get(str(employee_id)) or ENROLLED
+            status = status if status in PARTICIPANT_STATES else ENROLLED
+            rows.append({
+                "training_id": training.id,
+                "employee_id": employee_id,
+                "status": status,
+                "completed_on": training.end_date if status == COMPLETED else None
+            })
+            if status == COMPLETED:
+                pairs.add((employee_id, training.competency))
+
+    if rows:
+        db.execute(insert(TrainingParticipant), rows)
+    return {"trainings": len(trainings), "participants": len(rows), "competencies": refresh_competencies(db, pairs)}
@@ -0,0 +1,309 @@
+"""
+Transactional email outbox
+
+Mail is never sent from a request handler. queue_emails() inserts outbox rows
+in the caller's transaction, so an email exists only if the change it reports
+commits. The dispatcher drains the table in the background:
+
+- claims a batch of due rows with SELECT ... FOR UPDATE SKIP LOCKED and marks
+  them "sending", so several workers never pick the same row
+- sends through a pool of persistent SMTP connections (one handshake and
+  login per connection, not per message), throttled by a token bucket
+- records the outcome of the whole batch with one bulk UPDATE; failures are
+  retried with exponential backoff up to EMAIL_MAX_ATTEMPTS, while mailbox
+  errors (550-554) and refused recipients fail at once
+
+Rows left "sending" by a crashed worker are released after SENDING_TIMEOUT.
+To try it locally, point SMTP_HOST/SMTP_PORT at a stand-in such as
+`python -m aiosmtpd -n -l localhost:1025` with SMTP_USE_TLS=false, or run the
+dispatcher on its own with `python -m backend.services.email_outbox`.
+"""
+import asyncio
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, or_, update
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.core.database import SessionLocal
+from backend.models.notification import EmailOutbox
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Claimed rows not finished within this time are handed out again
+SENDING_TIMEOUT = timedelta(minutes=10)
+
+# Longest wait between two attempts
+MAX_RETRY_DELAY = 6 * 3600
+
+# Seconds an idle connection is reused without checking it with NOOP
+CONNECTION_IDLE_CHECK = 60
+
+
+def queue_emails(db: Session, rows: List[dict]) -> int:
+    """
+    Add emails to the outbox with one INSERT; the caller commits
+
+    Args:
+        db: Database session
+        rows: Dicts with to_address, subject and body, plus optional
+            html_body, user_id and notification_id
+
+    Returns:
+        Number of emails queued (rows without an address are skipped)
+    """
+    rows = [
+        {"html_body": None, "user_id": None, "notification_id": None, **row, "status": PENDING, "attempts": 0}
+        for row in rows if row.get("to_address")
+    ]
+    if rows:
+        db.execute(insert(EmailOutbox), rows)
+    return len(rows)
+
+
+def queue_email(db: Session, to_address: str, subject: str, body: str, **fields) -> int:
+    """Add one email to the outbox"""
+    return queue_emails(db, [{"to_address": to_address, "subject": subject, "body": body, **fields}])
+
+
+def outbox_counts(db: Session) -> Dict[str, int]:
+    """Number of outbox rows per status"""
+    return dict(db.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all())
+
+
+class SMTPConnectionPool:
+    """Bounded pool of logged-in SMTP connections shared by the sender threads"""
+
+    def __init__(self, size: int):
+        self._idle: "queue.LifoQueue[Tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT)
+        try:
+            if settings.SMTP_USE_TLS:
+                smtp.starttls(context=ssl.create_default_context())
+            if settings.SMTP_USER:
+                smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        except Exception:
+            self._discard(smtp)
+            raise
+        return smtp
+
+    @staticmethod
+    def _discard(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    @staticmethod
+    def _alive(smtp: smtplib.SMTP) -> bool:
+        try:
+            return smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it goes back to the pool unless it broke"""
+        with self._slots:
+            smtp = None
+            try:
+                smtp, last_used = self._idle.get_nowait()
+                if time.monotonic() - last_used > CONNECTION_IDLE_CHECK and not self._alive(smtp):
+                    self._discard(smtp)
+                    smtp = None
+            except queue.Empty:
+                pass
+            if smtp is None:
+                smtp = self._connect()
+
+            try:
+                yield smtp
+            except Exception as exc:
+                if isinstance(exc, smtplib.SMTPServerDisconnected) or not isinstance(exc, smtplib.SMTPException):
+                    self._discard(smtp)
+                    smtp = None
+                raise
+            finally:
+                if smtp is not None:
+                    self._idle.put((smtp, time.monotonic()))
+
+    def close(self) -> None:
+        while True:
+            try:
+                smtp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(smtp)
+
+
+class RateLimiter:
+    """Token bucket shared by the sender threads"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _build_message(row) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.EMAIL_FROM
+    message["To"] = row.to_address
+    message["Subject"] = row.subject
+    message.set_content(row.body)
+    if row.html_body:
+        message.add_alternative(row.html_body, subtype="html")
+    return message
+
+
+def _is_permanent(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and 550 <= exc.smtp_code <= 554
+
+
+class EmailDispatcher:
+    """Drains the outbox in batches over the connection pool"""
+
+    def __init__(self):
+        self.pool = SMTPConnectionPool(settings.EMAIL_POOL_SIZE)
+        self.limiter = RateLimiter(settings.EMAIL_RATE_PER_SECOND)
+        self._executor = ThreadPoolExecutor(max_workers=settings.EMAIL_POOL_SIZE, thread_name_prefix="smtp")
+        self._task: Optional[asyncio.Task] = None
+
+    def claim_batch(self, db: Session) -> list:
+        """Lock due rows, mark them sending and commit"""
+        now = datetime.now(timezone.utc)
+        db.execute(
+            update(EmailOutbox.__table__)
+            .where(EmailOutbox.status == SENDING, EmailOutbox.locked_at < now - SENDING_TIMEOUT)
+            .values(status=PENDING, locked_at=None)
+        )
+        rows = db.query(
+            EmailOutbox.id, EmailOutbox.to_address, EmailOutbox.subject,
+            EmailOutbox.body, EmailOutbox.html_body, EmailOutbox.attempts
+        ).filter(
+            EmailOutbox.status == PENDING,
+            or_(EmailOutbox.next_attempt_at.is_(None), EmailOutbox.next_attempt_at <= now)
+        ).order_by(EmailOutbox.id).limit(settings.EMAIL_BATCH_SIZE).with_for_update(skip_locked=True).all()
+
+        if rows:
+            db.execute(
+                update(EmailOutbox.__table__)
+                .where(EmailOutbox.id.in_([row.id for row in rows]))
+                .values(status=SENDING, locked_at=now)
+            )
+        db.commit()
+        return rows
+
+    def _deliver(self, row) -> Optional[Tuple[bool, str]]:
+        """Send one email; returns (permanent, error) on failure"""
+        try:
+            message = _build_message(row)
+        except Exception as exc:
+            # Header injection, bad address and the like: this row can never be sent
+            return True, str(exc) or exc.__class__.__name__
+        self.limiter.acquire()
+        for attempt in range(2):
+            try:
+                with self.pool.connection() as smtp:
+                    smtp.send_message(message)
+                return None
+            except smtplib.SMTPServerDisconnected as exc:
+                # A pooled connection the server had already dropped; retry once on a new one
+                if attempt:
+                    return False, str(exc) or "Server disconnected"
+            except (smtplib.SMTPException, OSError) as exc:
+                return _is_permanent(exc), str(exc)
+            except Exception as exc:
+                # Not a delivery problem (e.g. the message can't be serialized); fail this row only
+                return True, str(exc) or exc.__class__.__name__
+
+    def process_batch(self) -> int:
+        """Claim, send and record one batch; returns the number of rows handled"""
+        db = SessionLocal()
+        try:
+            rows = self.claim_batch(db)
+            if not rows:
+                return 0
+            results = list(self._executor.map(self._deliver, rows))
+
+            now = datetime.now(timezone.utc)
+            updates = []
+            for row, error in zip(rows, results):
+                attempts = row.attempts + 1
+                values = {"id": row.id, "attempts": attempts, "locked_at": None}
+                if error is None:
+                    values.update(status=SENT, sent_at=now, last_error=None)
+                else:
+                    permanent, message = error
+                    if permanent or attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                        values.update(status=FAILED, last_error=message)
+                    else:
+                        delay = min(settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+                        values.update(status=PENDING, next_attempt_at=now + timedelta(seconds=delay), last_error=message)
+                updates.append(values)
+
+            db.execute(update(EmailOutbox), updates)
+            db.commit()
+            return len(rows)
+        finally:
+            db.close()
+
+    async def run(self) -> None:
+        """Drain the outbox until cancelled, polling when it is empty"""
+        while True:
+            try:
+                handled = await asyncio.to_thread(self.process_batch)
+            except Exception:
+                # Database or server unavailable: try again after the poll interval
+                handled = 0
+            if not handled:
+                await asyncio.sleep(settings.EMAIL_POLL_SECONDS)
+
+    async def start(self) -> None:
+        if settings.EMAIL_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await asyncio.to_thread(self.pool.close)
+
+
+dispatcher = EmailDispatcher()
+
+
+if __name__ == "__main__":
+    asyncio.run(dispatcher.run())
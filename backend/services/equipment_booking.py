@@ -0,0 +1,285 @@
+"""
+Equipment booking calendar
+
+Bookings are half-open [start_at, end_at) ranges. Creating one locks the
+equipment row, so two requests for the same chamber are checked one after
+the other; on PostgreSQL the ex_equipment_bookings_overlap exclusion
+constraint backs this up at the database level. Bookings can't run into
+the day calibration falls due.
+
+Availability is computed from a single range query over
+ix_equipment_bookings_window for the requested window, grouped into an
+IntervalIndex per equipment: intervals sorted by start with a running
+maximum of their ends, so the bookings touching a range are found by
+bisection instead of a scan.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.models.crm import Order
+from backend.models.procurement import Equipment, EquipmentBooking, EquipmentStatusEnum
+from backend.models.workflow import Project
+
+CONFIRMED = "confirmed"
+CANCELLED = "cancelled"
+
+# SQLSTATE of an exclusion constraint violation on PostgreSQL
+EXCLUSION_VIOLATION = "23P01"
+
+# Longest window an availability query may cover
+AVAILABILITY_MAX_DAYS = 92
+
+
+class BookingError(ValueError):
+    """Booking request can't be accepted"""
+
+
+class BookingConflict(BookingError):
+    """Requested range overlaps confirmed bookings"""
+
+    def __init__(self, message: str, conflicts: Sequence[EquipmentBooking]):
+        super().__init__(message)
+        self.conflicts = list(conflicts)
+
+
+def as_utc(value: datetime) -> datetime:
+    """Aware UTC datetime; naive values (e.g. read back from SQLite) are taken as UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class IntervalIndex:
+    """
+    Static index of [start, end) intervals for window lookups
+
+    Intervals are kept sorted by start together with the running maximum of
+    their ends. Both sequences are non-decreasing, so the candidates for a
+    range are the slice between two bisections; overlapping input (legacy
+    rows written before the checks existed) is still answered correctly.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[datetime, datetime]] = ()):
+        ordered = sorted(intervals)
+        self._starts = [interval[0] for interval in ordered]
+        self._ends = [interval[1] for interval in ordered]
+        self._max_ends = []
+        running = None
+        for end in self._ends:
+            running = end if running is None or end > running else running
+            self._max_ends.append(running)
+
+    def busy(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Merged busy blocks within [start, end)"""
+        first = bisect_right(self._max_ends, start)
+        last = bisect_left(self._starts, end)
+        blocks = []
+        for i in range(first, last):
+            block_start, block_end = max(self._starts[i], start), min(self._ends[i], end)
+            if block_end <= block_start:
+                continue
+            if blocks and block_start <= blocks[-1][1]:
+                if block_end > blocks[-1][1]:
+                    blocks[-1] = (blocks[-1][0], block_end)
+            else:
+                blocks.append((block_start, block_end))
+        return blocks
+
+    def free(
+        self,
+        start: datetime,
+        end: datetime,
+        min_duration: Optional[timedelta] = None
+    ) -> List[Tuple[datetime, datetime]]:
+        """Gaps between bookings within [start, end), at least min_duration long"""
+        slots = []
+        cursor = start
+        for block_start, block_end in self.busy(start, end) + [(end, end)]:
+            if block_start > cursor and (min_duration is None or block_start - cursor >= min_duration):
+                slots.append((cursor, block_start))
+            cursor = max(cursor, block_end)
+        return slots
+
+
+def _calibration_due(equipment: Equipment) -> Optional[datetime]:
+    """Start of the day calibration falls due, for equipment that needs calibrating"""
+    if equipment.calibration_required and equipment.next_calibration_date:
+        return datetime.combine(equipment.next_calibration_date, time(), tzinfo=timezone.utc)
+    return None
+
+
+def _is_exclusion_violation(exc: IntegrityError) -> bool:
+    # psycopg2 exposes pgcode, psycopg 3 sqlstate
+    code = getattr(exc.orig, "pgcode", None) or getattr(exc.orig, "sqlstate", None)
+    return code == EXCLUSION_VIOLATION
+
+
+def _validate_range(start_at: datetime, end_at: datetime) -> Tuple[datetime, datetime]:
+    start_at, end_at = as_utc(start_at), as_utc(end_at)
+    if end_at <= start_at:
+        raise BookingError("Booking must end after it starts")
+    return start_at, end_at
+
+
+def overlapping_bookings_query(db: Session, equipment_id: int, start_at: datetime, end_at: datetime):
+    """Confirmed bookings of one equipment overlapping [start_at, end_at)"""
+    return db.query(EquipmentBooking).filter(
+        EquipmentBooking.equipment_id == equipment_id,
+        EquipmentBooking.status == CONFIRMED,
+        EquipmentBooking.start_at < end_at,
+        EquipmentBooking.end_at > start_at,
+        EquipmentBooking.is_deleted == False
+    ).order_by(EquipmentBooking.start_at)
+
+
+def create_booking(
+    db: Session,
+    equipment_id: int,
+    start_at: datetime,
+    end_at: datetime,
+    user_id: int,
+    **fields
+) -> EquipmentBooking:
+    """
+    Book equipment for [start_at, end_at); the caller commits
+
+    Raises:
+        BookingError: If the range is empty, the equipment can't be booked
+            for it, or the project or order doesn't exist
+        BookingConflict: If the range overlaps a confirmed booking
+    """
+    start_at, end_at = _validate_range(start_at, end_at)
+    if fields.get("project_id") is not None and not db.query(Project.id).filter(
+        Project.id == fields["project_id"],
+        Project.is_deleted == False
+    ).first():
+        raise BookingError("Project not found")
+    if fields.get("order_id") is not None and not db.query(Order.id).filter(
+        Order.id == fields["order_id"],
+        Order.is_deleted == False
+    ).first():
+        raise BookingError("Order not found")
+
+    equipment = db.query(Equipment).filter(
+        Equipment.id == equipment_id,
+        Equipment.is_deleted == False
+    ).with_for_update().first()
+    if equipment is None:
+        raise BookingError("Equipment not found")
+    if equipment.status in (EquipmentStatusEnum.INACTIVE, EquipmentStatusEnum.RETIRED):
+        raise BookingError(f"Equipment is {equipment.status.value.lower()} and can't be booked")
+    calibration_due = _calibration_due(equipment)
+    if calibration_due is not None and end_at > calibration_due:
+        raise BookingError(
+            f"Equipment calibration falls due on {equipment.next_calibration_date.isoformat()}; "
+            "it can't be booked past that until it is recalibrated"
+        )
+
+    conflicts = overlapping_bookings_query(db, equipment.id, start_at, end_at).all()
+    if conflicts:
+        raise BookingConflict("Equipment is already booked in this period", conflicts)
+
+    booking = EquipmentBooking(
+        equipment_id=equipment.id,
+        start_at=start_at,
+        end_at=end_at,
+        status=CONFIRMED,
+        booked_by_id=user_id,
+        created_by_id=user_id,
+        **fields
+    )
+    try:
+        with db.begin_nested():
+            db.add(booking)
+    except IntegrityError as exc:
+        if not _is_exclusion_violation(exc):
+            raise
+        raise BookingConflict(
+            "Equipment is already booked in this period",
+            overlapping_bookings_query(db, equipment.id, start_at, end_at).all()
+        )
+    return booking
+
+
+def cancel_booking(db: Session, booking: EquipmentBooking, user_id: int) -> EquipmentBooking:
+    """Release a booking's range; the caller commits"""
+    if booking.status == CANCELLED:
+        raise BookingError("Booking is already cancelled")
+    booking.status = CANCELLED
+    booking.updated_by_id = user_id
+    db.flush()
+    return booking
+
+
+def availability(
+    db: Session,
+    start_at: datetime,
+    end_at: datetime,
+    category: Optional[str] = None,
+    equipment_ids: Optional[Sequence[int]] = None,
+    min_duration: Optional[timedelta] = None
+) -> List[dict]:
+    """
+    Free slots of every active equipment in a window
+
+    Slots stop at the start of the day calibration falls due, since the
+    equipment can't be used past that point until it is recalibrated.
+
+    Raises:
+        BookingError: If the window is empty or longer than AVAILABILITY_MAX_DAYS
+    """
+    start_at, end_at = _validate_range(start_at, end_at)
+    if end_at - start_at > timedelta(days=AVAILABILITY_MAX_DAYS):
+        raise BookingError(f"Availability window can't exceed {AVAILABILITY_MAX_DAYS} days")
+
+    equipment_query = db.query(Equipment).filter(
+        Equipment.is_deleted == False,
+        Equipment.status == EquipmentStatusEnum.ACTIVE
+    )
+    if category:
+        equipment_query = equipment_query.filter(Equipment.category == category)
+    if equipment_ids:
+        equipment_query = equipment_query.filter(Equipment.id.in_(equipment_ids))
+    equipment = equipment_query.order_by(Equipment.id).all()
+    if not equipment:
+        return []
+
+    rows = db.query(
+        EquipmentBooking.equipment_id,
+        EquipmentBooking.start_at,
+        EquipmentBooking.end_at
+    ).filter(
+        EquipmentBooking.equipment_id.in_([item.id for item in equipment]),
+        EquipmentBooking.status == CONFIRMED,
+        EquipmentBooking.start_at < end_at,
+        EquipmentBooking.end_at > start_at,
+        EquipmentBooking.is_deleted == False
+    ).all()
+
+    intervals = {}
+    for row in rows:
+        intervals.setdefault(row.equipment_id, []).append((as_utc(row.start_at), as_utc(row.end_at)))
+
+    result = []
+    for item in equipment:
+        calibration_due = _calibration_due(item)
+        usable_until = end_at if calibration_due is None else min(end_at, calibration_due)
+
+        index = IntervalIndex(intervals.get(item.id, ()))
+        slots = index.free(start_at, usable_until, min_duration) if usable_until > start_at else []
+        busy = index.busy(start_at, end_at)
+        result.append({
+            "id": item.id,
+            "equipment_id": item.equipment_id,
+            "name": item.name,
+            "category": item.category,
+            "location": item.location,
+            "calibration_due": calibration_due is not None and calibration_due < end_at,
+            "booked_hours": round(sum((block_end - block_start).total_seconds() for block_start, block_end in busy) / 3600, 2),
+            "free_slots": [{"start_at": slot_start, "end_at": slot_end} for slot_start, slot_end in slots]
+        })
+    return result
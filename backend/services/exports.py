@@ -0,0 +1,302 @@
+"""
+Streaming CSV/XLSX exports
+
+Exports select plain column tuples (no ORM objects) and read them with
+``yield_per`` so PostgreSQL serves them from a server-side cursor. Rows are
+encoded in fixed-size chunks and handed to a StreamingResponse, which keeps
+memory flat whether an export has a hundred rows or millions. XLSX output
+uses openpyxl's write-only mode, which spools rows to a temporary file.
+"""
+import csv
+import enum
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.core.database import SessionLocal
+from backend.models.form import FormRecord
+from backend.models.quality import NonConformance, CAPA
+from backend.models.procurement import Equipment, Calibration
+from backend.models.financial import Invoice
+from backend.models.traceability import EntityTypeEnum
+
+# Rows fetched per round trip from the server-side cursor
+FETCH_SIZE = 1000
+
+# Rows encoded per chunk of the HTTP response
+CHUNK_ROWS = 500
+
+CSV_MEDIA_TYPE = "text/csv"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class ExportSpec:
+    """Columns and filters for one exportable entity"""
+
+    def __init__(
+        self,
+        name: str,
+        model,
+        entity_type: EntityTypeEnum,
+        columns: List[Tuple[str, Any]],
+        status_column=None,
+        joins: Tuple = ()
+    ):
+        self.name = name
+        self.model = model
+        self.entity_type = entity_type
+        self.headers = [header for header, _ in columns]
+        self.columns = [column for _, column in columns]
+        self.status_column = status_column
+        self.joins = joins
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    spec.name: spec for spec in [
+        ExportSpec(
+            "ncs", NonConformance, EntityTypeEnum.NON_CONFORMANCE,
+            [
+                ("NC Number", NonConformance.nc_number),
+                ("Title", NonConformance.title),
+                ("Category", NonConformance.category),
+                ("Severity", NonConformance.severity),
+                ("Status", NonConformance.status),
+                ("Detected Date", NonConformance.detected_date),
+                ("Area/Department", NonConformance.area_department),
+                ("Root Cause", NonConformance.root_cause),
+                ("Target Closure Date", NonConformance.target_closure_date),
+                ("Actual Closure Date", NonConformance.actual_closure_date),
+                ("Created At", NonConformance.created_at),
+            ],
+            status_column=NonConformance.status
+        ),
+        ExportSpec(
+            "capas", CAPA, EntityTypeEnum.CAPA,
+            [
+                ("CAPA Number", CAPA.capa_number),
+                ("Title", CAPA.title),
+                ("Type", CAPA.capa_type),
+                ("Status", CAPA.status),
+                ("Source", CAPA.source_type),
+                ("NC ID", CAPA.non_conformance_id),
+                ("Target Completion Date", CAPA.target_completion_date),
+                ("Actual Completion Date", CAPA.actual_completion_date),
+                ("Effective", CAPA.is_effective),
+                ("Created At", CAPA.created_at),
+            ],
+            status_column=CAPA.status
+        ),
+        ExportSpec(
+            "equipment", Equipment, EntityTypeEnum.EQUIPMENT,
+            [
+                ("Equipment ID", Equipment.equipment_id),
+                ("Name", Equipment.name),
+                ("Category", Equipment.category),
+                ("Manufacturer", Equipment.manufacturer),
+                ("Model", Equipment.model),
+                ("Serial Number", Equipment.serial_number),
+                ("Location", Equipment.location),
+                ("Status", Equipment.status),
+                ("Calibration Required", Equipment.calibration_required),
+                ("Calibration Frequency (days)", Equipment.calibration_frequency_days),
+                ("Last Calibration", Equipment.last_calibration_date),
+                ("Next Calibration", Equipment.next_calibration_date),
+            ],
+            status_column=Equipment.status
+        ),
+        ExportSpec(
+            "calibrations", Calibration, EntityTypeEnum.CALIBRATION,
+            [
+                ("Calibration Number", Calibration.calibration_number),
+                ("Equipment ID", Equipment.equipment_id),
+                ("Equipment", Equipment.name),
+                ("Calibration Date", Calibration.calibration_date),
+                ("Due Date", Calibration.due_date),
+                ("Calibrated By", Calibration.calibrated_by),
+                ("Certificate Number", Calibration.certificate_number),
+                ("Result", Calibration.result),
+                ("Cost", Calibration.cost),
+                ("Next Due Date", Calibration.next_due_date),
+            ],
+            status_column=Calibration.result,
+            joins=((Equipment, Calibration.equipment_id == Equipment.id),)
+        ),
+        ExportSpec(
+            "invoices", Invoice, EntityTypeEnum.INVOICE,
+            [
+                ("Invoice Number", Invoice.invoice_number),
+                ("Type", Invoice.invoice_type),
+                ("Invoice Date", Invoice.invoice_date),
+                ("Due Date", Invoice.due_date),
+                ("Bill To", Invoice.bill_to_name),
+                ("GST Number", Invoice.bill_to_gst),
+                ("Subtotal", Invoice.subtotal),
+                ("Tax Amount", Invoice.tax_amount),
+                ("Total Amount", Invoice.total_amount),
+                ("Currency", Invoice.currency),
+                ("Amount Paid", Invoice.amount_paid),
+                ("Payment Status", Invoice.payment_status),
+            ],
+            status_column=Invoice.payment_status
+        ),
+    ]
+}
+
+
+def _cell(value: Any) -> Any:
+    """Convert a database value into something CSV and XLSX writers accept"""
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None).isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def _date_filters(model, start_date: Optional[date], end_date: Optional[date]) -> list:
+    filters = []
+    if start_date:
+        filters.append(model.created_at >= datetime.combine(start_date, time.min))
+    if end_date:
+        filters.append(model.created_at < datetime.combine(end_date + timedelta(days=1), time.min))
+    return filters
+
+
+def entity_rows(
+    spec: ExportSpec,
+    status: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Tuple[List[str], Callable[[], Iterator[list]]]:
+    """Headers and a row factory for a standard entity export"""
+    stmt = select(*spec.columns).select_from(spec.model)
+    for target, onclause in spec.joins:
+        stmt = stmt.join(target, onclause)
+    stmt = stmt.where(spec.model.is_deleted == False, *_date_filters(spec.model, start_date, end_date))
+    if status and spec.status_column is not None:
+        stmt = stmt.where(spec.status_column == status)
+    stmt = stmt.order_by(spec.model.id)
+
+    def rows() -> Iterator[list]:
+        yield from _stream(stmt, lambda row: [_cell(value) for value in row])
+
+    return spec.headers, rows
+
+
+def form_record_rows(
+    template_id: int,
+    field_names: List[str],
+    field_labels: Dict[str, str],
+    status: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Tuple[List[str], Callable[[], Iterator[list]]]:
+    """Headers and a row factory for records of one template, one column per field"""
+    stmt = select(
+        FormRecord.record_number,
+        FormRecord.status,
+        FormRecord.created_at,
+        FormRecord.data
+    ).where(
+        FormRecord.template_id == template_id,
+        FormRecord.is_deleted == False,
+        *_date_filters(FormRecord, start_date, end_date)
+    )
+    if status:
+        stmt = stmt.where(FormRecord.status == status)
+    stmt = stmt.order_by(FormRecord.id)
+
+    headers = ["Record Number", "Status", "Created At"] + [
+        field_labels.get(name) or name for name in field_names
+    ]
+
+    def to_row(row) -> list:
+        data = row.data or {}
+        return [_cell(row.record_number), _cell(row.status), _cell(row.created_at)] + [
+            _cell(data.get(name)) for name in field_names
+        ]
+
+    def rows() -> Iterator[list]:
+        yield from _stream(stmt, to_row)
+
+    return headers, rows
+
+
+def _stream(stmt, to_row: Callable) -> Iterator[list]:
+    """Read a statement through a server-side cursor in its own session"""
+    # The request's session may be closed before the response body is sent
+    db: Session = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=FETCH_SIZE))
+        for row in result:
+            yield to_row(row)
+    finally:
+        db.close()
+
+
+def stream_csv(headers: List[str], rows: Callable[[], Iterator[list]]) -> Iterator[bytes]:
+    """Encode rows as CSV in chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")  # BOM so Excel detects UTF-8
+    writer.writerow(headers)
+
+    pending = 0
+    for row in rows():
+        writer.writerow(row)
+        pending += 1
+        if pending >= CHUNK_ROWS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+
+    yield buffer.getvalue().encode("utf-8")
+
+
+def xlsx_available() -> bool:
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_xlsx(
+    headers: List[str],
+    rows: Callable[[], Iterator[list]],
+    sheet_title: str = "Export",
+    chunk_size: int = 64 * 1024
+) -> Iterator[bytes]:
+    """Write rows to a write-only workbook on disk, then stream the file"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title[:31])
+    sheet.append(headers)
+    for row in rows():
+        sheet.append(row)
+
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(handle)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
@@ -0,0 +1,148 @@
+"""
+Compiled form templates
+
+A template version's FormField rows are compiled once into a CompiledTemplate
+(field validators plus the formula plan for calculated fields) and cached per
+process, so record submission, imports and record reads don't rebuild them
+on every request. Published versions are immutable, so their cache entries
+are keyed by version id alone and never need revalidating. The working copy
+of a template that has not been published yet is revalidated against a cheap
+aggregate over its fields, which keeps it correct across multiple workers.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.models.form import FormTemplate, FormTemplateVersion, FormField, FormRecord
+from .form_formulas import FormulaPlan
+from .form_validation import TemplateValidator
+
+# Compiled versions kept per process
+VERSION_CACHE_SIZE = 512
+
+
+class CompiledTemplate:
+    """Per-version compiled artefacts (holds no ORM state)"""
+
+    def __init__(
+        self,
+        template: FormTemplate,
+        fields: List[FormField],
+        version: Optional[FormTemplateVersion] = None
+    ):
+        self.template_id = template.id
+        self.code = template.code
+        self.version_id = version.id if version is not None else None
+        self.version_number = version.version_number if version is not None else None
+        self.field_names = [f.field_name for f in fields]
+        self.field_ids = {f.field_name: f.id for f in fields}
+        self.field_labels = {f.field_name: f.field_label for f in fields}
+        self.validator = TemplateValidator(fields)
+        self.formulas = FormulaPlan(fields)
+
+    def compute(self, values: dict, changed: Optional[Iterable[str]] = None) -> dict:
+        """Return values with calculated fields filled in"""
+        if not self.formulas:
+            return values
+        computed = dict(values)
+        for name, result in self.formulas.evaluate(values, changed).items():
+            if result is None:
+                computed.pop(name, None)
+            else:
+                computed[name] = result
+        return computed
+
+
+_version_cache: "OrderedDict[int, CompiledTemplate]" = OrderedDict()
+_draft_cache: Dict[int, Tuple[tuple, CompiledTemplate]] = {}
+_cache_lock = threading.Lock()
+
+
+def working_fields_query(db: Session, template_id: int):
+    """Fields of a template's working copy, in form order"""
+    return db.query(FormField).filter(
+        FormField.template_id == template_id,
+        FormField.is_active == True,
+        FormField.is_deleted == False
+    ).order_by(FormField.order, FormField.id)
+
+
+def _fields_fingerprint(db: Session, template_id: int) -> tuple:
+    """Changes whenever a field of the template is added, edited or removed"""
+    last_change, field_count = db.query(
+        func.max(FormField.updated_at),
+        func.count(FormField.id)
+    ).filter(FormField.template_id == template_id).one()
+    return (last_change, field_count)
+
+
+def get_compiled_version(db: Session, version_id: int) -> CompiledTemplate:
+    """
+    Get the compiled form of a published template version
+
+    Args:
+        db: Database session
+        version_id: FormTemplateVersion id
+
+    Returns:
+        CompiledTemplate for the fields snapshotted in that version
+    """
+    with _cache_lock:
+        compiled = _version_cache.get(version_id)
+        if compiled is not None:
+            _version_cache.move_to_end(version_id)
+            return compiled
+
+    version = db.query(FormTemplateVersion).filter(FormTemplateVersion.id == version_id).one()
+    compiled = CompiledTemplate(version.template, version.fields, version)
+
+    with _cache_lock:
+        _version_cache[version_id] = compiled
+        while len(_version_cache) > VERSION_CACHE_SIZE:
+            _version_cache.popitem(last=False)
+    return compiled
+
+
+def get_compiled_template(db: Session, template: FormTemplate, draft: bool = False) -> CompiledTemplate:
+    """
+    Get the compiled form of a template, compiling it on first use
+
+    Args:
+        db: Database session
+        template: Form template
+        draft: Compile the working copy even if a version has been published
+
+    Returns:
+        CompiledTemplate for the current version, or for the working copy
+        when the template has never been published
+    """
+    if template.current_version_id and not draft:
+        return get_compiled_version(db, template.current_version_id)
+
+    fingerprint = _fields_fingerprint(db, template.id)
+
+    with _cache_lock:
+        cached = _draft_cache.get(template.id)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    compiled = CompiledTemplate(template, working_fields_query(db, template.id).all())
+    with _cache_lock:
+        _draft_cache[template.id] = (fingerprint, compiled)
+    return compiled
+
+
+def get_compiled_record(db: Session, record: FormRecord) -> CompiledTemplate:
+    """Compiled schema a record was submitted against"""
+    if record.template_version_id:
+        return get_compiled_version(db, record.template_version_id)
+    return get_compiled_template(db, record.template)
+
+
+def invalidate_template(template_id: int) -> None:
+    """Drop a template's working copy from the compiled cache"""
+    with _cache_lock:
+        _draft_cache.pop(template_id, None)
@@ -0,0 +1,306 @@
+"""
+Formula engine for CALCULATED form fields
+
+Formulas are parsed once with Python's ``ast`` module and accepted only if they
+use arithmetic, whitelisted functions, references to other fields and
+``table.column`` aggregates. Each accepted formula is compiled into a plain
+closure, and the calculated fields of a template are ordered topologically so
+a change to one input recomputes only the fields that depend on it.
+
+Examples::
+
+    reading_1 + reading_2
+    =avg(readings.value) - nominal
+    round(sqrt(u_a ** 2 + u_b ** 2) * 2, 3)
+"""
+import ast
+import math
+import operator
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from backend.models.form import FormField, FieldTypeEnum
+
+Evaluator = Callable[[dict], Any]
+
+
+class FormulaError(ValueError):
+    """Raised when a formula is invalid or calculated fields form a cycle"""
+
+
+def _numbers(values: Iterable[Any]) -> List[float]:
+    return [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+
+def _flatten(args: tuple) -> List[float]:
+    items: List[Any] = []
+    for arg in args:
+        if isinstance(arg, list):
+            items.extend(arg)
+        else:
+            items.append(arg)
+    return _numbers(items)
+
+
+def _avg(*args):
+    items = _flatten(args)
+    return sum(items) / len(items) if items else None
+
+
+def _stdev(*args):
+    items = _flatten(args)
+    if len(items) < 2:
+        return None
+    mean = sum(items) / len(items)
+    return math.sqrt(sum((x - mean) ** 2 for x in items) / (len(items) - 1))
+
+
+def _aggregate(func: Callable[[List[float]], Any]) -> Callable:
+    def wrapper(*args):
+        items = _flatten(args)
+        return func(items) if items else None
+    return wrapper
+
+
+FUNCTIONS: Dict[str, Callable] = {
+    "abs": abs,
+    "round": lambda x, digits=0: round(x, int(digits)),
+    "sqrt": math.sqrt,
+    "min": _aggregate(min),
+    "max": _aggregate(max),
+    "sum": _aggregate(sum),
+    "avg": _avg,
+    "count": lambda *args: len(_flatten(args)),
+    "stdev": _stdev,
+}
+
+# Functions that may take a whole table column as an argument
+AGGREGATES = {"min", "max", "sum", "avg", "count", "stdev"}
+
+# Largest exponent accepted by "**"; integer powers beyond it would stall the evaluator
+MAX_EXPONENT = 1000
+
+
+def _pow(base, exponent):
+    """Power evaluated in floats with a bounded exponent; integer results stay integers while exact"""
+    result_base, result_exponent = float(base), float(exponent)
+    if abs(result_exponent) > MAX_EXPONENT:
+        raise FormulaError(f"Exponent {result_exponent:g} is out of range")
+    if result_base < 0 and not result_exponent.is_integer():
+        raise FormulaError("Fractional power of a negative number")
+    result = result_base ** result_exponent
+    if isinstance(base, int) and isinstance(exponent, int) and exponent >= 0 and abs(result) < 2 ** 53:
+        return base ** exponent
+    return result
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _pow,
+}
+
+_UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+class CompiledFormula:
+    """A single formula compiled into a closure over the record's values"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.references: Set[str] = set()
+        text = source.strip()
+        if text.startswith("="):
+            text = text[1:]
+        try:
+            tree = ast.parse(text, mode="eval")
+        except SyntaxError as exc:
+            raise FormulaError(f"Invalid formula '{source}': {exc.msg}")
+        self._evaluate = self._compile(tree.body, in_aggregate=False)
+
+    def __call__(self, values: dict) -> Any:
+        try:
+            return self._evaluate(values)
+        except (ArithmeticError, TypeError, ValueError):
+            return None
+
+    def _compile(self, node: ast.AST, in_aggregate: bool) -> Evaluator:
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise FormulaError(f"Only numeric constants are allowed in '{self.source}'")
+            constant = node.value
+            return lambda values: constant
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            self.references.add(name)
+            return lambda values: values.get(name)
+
+        if isinstance(node, ast.Attribute):
+            if not in_aggregate or not isinstance(node.value, ast.Name):
+                raise FormulaError(
+                    f"Table columns can only be used inside {', '.join(sorted(AGGREGATES))}"
+                )
+            table, column = node.value.id, node.attr
+            self.references.add(table)
+            return lambda values: [
+                row.get(column) for row in (values.get(table) or []) if isinstance(row, dict)
+            ]
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            op = _BINARY_OPERATORS[type(node.op)]
+            left = self._compile(node.left, in_aggregate=False)
+            right = self._compile(node.right, in_aggregate=False)
+
+            def binary(values, op=op, left=left, right=right):
+                a, b = left(values), right(values)
+                if a is None or b is None:
+                    return None
+                return op(a, b)
+            return binary
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+            op = _UNARY_OPERATORS[type(node.op)]
+            operand = self._compile(node.operand, in_aggregate=False)
+
+            def unary(values, op=op, operand=operand):
+                a = operand(values)
+                return None if a is None else op(a)
+            return unary
+
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise FormulaError(f"Unknown function in '{self.source}'")
+            if node.keywords:
+                raise FormulaError(f"Keyword arguments are not allowed in '{self.source}'")
+            name = node.func.id
+            func = FUNCTIONS[name]
+            args = [self._compile(arg, in_aggregate=name in AGGREGATES) for arg in node.args]
+            aggregate = name in AGGREGATES
+
+            def call(values, func=func, args=args, aggregate=aggregate):
+                evaluated = [arg(values) for arg in args]
+                if not aggregate and any(a is None for a in evaluated):
+                    return None
+                return func(*evaluated)
+            return call
+
+        raise FormulaError(f"Unsupported expression in '{self.source}'")
+
+
+class FormulaPlan:
+    """
+    Evaluation plan for all calculated fields of a template
+
+    Fields are kept in dependency order, and for every referenced field the
+    plan knows which calculated fields must be refreshed when it changes.
+    """
+
+    def __init__(self, fields: Iterable[FormField]):
+        fields = list(fields)
+        known = {f.field_name for f in fields}
+        formulas: Dict[str, CompiledFormula] = {}
+        decimals: Dict[str, Optional[int]] = {}
+
+        for f in fields:
+            if FieldTypeEnum(f.field_type) != FieldTypeEnum.CALCULATED or not f.formula:
+                continue
+            compiled = CompiledFormula(f.formula)
+            unknown = compiled.references - known
+            if unknown:
+                raise FormulaError(
+                    f"Field '{f.field_name}' references unknown fields: {', '.join(sorted(unknown))}"
+                )
+            formulas[f.field_name] = compiled
+            rules = f.validation_rules or {}
+            decimals[f.field_name] = rules.get("decimals")
+
+        self.order = self._topological_order(formulas)
+        self._position = {name: index for index, name in enumerate(self.order)}
+        self._steps = [(name, formulas[name], decimals[name]) for name in self.order]
+        self._affected = self._affected_fields(formulas)
+
+    @staticmethod
+    def _topological_order(formulas: Dict[str, CompiledFormula]) -> List[str]:
+        """Kahn's algorithm over calculated fields"""
+        pending = {
+            name: {ref for ref in formula.references if ref in formulas}
+            for name, formula in formulas.items()
+        }
+        dependents: Dict[str, List[str]] = {name: [] for name in formulas}
+        for name, refs in pending.items():
+            for ref in refs:
+                dependents[ref].append(name)
+
+        ready = [name for name, refs in pending.items() if not refs]
+        order: List[str] = []
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for dependent in dependents[name]:
+                pending[dependent].discard(name)
+                if not pending[dependent]:
+                    ready.append(dependent)
+
+        if len(order) != len(formulas):
+            cyclic = sorted(set(formulas) - set(order))
+            raise FormulaError(f"Calculated fields form a cycle: {', '.join(cyclic)}")
+        return order
+
+    def _affected_fields(self, formulas: Dict[str, CompiledFormula]) -> Dict[str, Set[str]]:
+        """Map every referenced field to the calculated fields it feeds, transitively"""
+        affected: Dict[str, Set[str]] = {name: set() for name in self.order}
+        for name in self.order:
+            for ref in formulas[name].references:
+                affected.setdefault(ref, set()).add(name)
+        for name in reversed(self.order):
+            for ref in formulas[name].references:
+                affected[ref] |= affected[name]
+        return affected
+
+    def __bool__(self) -> bool:
+        return bool(self.order)
+
+    def affected_by(self, changed: Iterable[str]) -> Set[str]:
+        """Calculated fields that need recomputing after the given fields change"""
+        result: Set[str] = set()
+        for name in changed:
+            result |= self._affected.get(name, set())
+            if name in self._position:
+                result.add(name)
+        return result
+
+    def evaluate(self, values: dict, changed: Optional[Iterable[str]] = None) -> dict:
+        """
+        Compute calculated fields
+
+        Args:
+            values: Coerced input values (and any previously calculated values)
+            changed: Names of fields that changed; None recomputes everything
+
+        Returns:
+            Calculated field values that were recomputed
+        """
+        if changed is None:
+            steps = self._steps
+        else:
+            targets = self.affected_by(changed)
+            steps = [step for step in self._steps if step[0] in targets]
+
+        env = dict(values)
+        results = {}
+        for name, formula, digits in steps:
+            result = formula(env)
+            if isinstance(result, float) and not math.isfinite(result):
+                result = None
+            if result is not None and digits is not None:
+                result = round(result, int(digits))
+            env[name] = result
+            results[name] = result
+        return results
@@ -0,0 +1,136 @@
+"""
+Pivoted read model for form records
+
+FormValue is an EAV table, which is the right shape for writes and audit but
+the wrong one for reads. Every FormRecord also carries its values as one
+document in ``form_records.data`` (JSONB on PostgreSQL). Single-record reads
+and per-field reports scan that column through the
+(template_id, created_at) index instead of pivoting form_values rows.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.models.form import FormRecord, FormValue
+from .form_engine import CompiledTemplate
+
+
+def _document_value(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def build_document(values: Dict[str, Any]) -> dict:
+    """Turn coerced field values into the JSON document stored on the record"""
+    return {
+        name: _document_value(value)
+        for name, value in values.items()
+        if value is not None
+    }
+
+
+def record_document(record: FormRecord) -> dict:
+    """Values of a record, read from the document with a fallback for unsynced rows"""
+    if record.data is not None:
+        return record.data
+    return {
+        v.field_name: (v.value_json if v.value_json is not None else v.value)
+        for v in record.values
+    }
+
+
+def rebuild_documents(
+    db: Session,
+    compiled: CompiledTemplate,
+    only_missing: bool = True,
+    batch_size: int = 1000
+) -> int:
+    """
+    Backfill record documents of one template version from form_values
+
+    Stored text values are re-coerced through the version's validators so the
+    documents hold typed values. The caller commits.
+
+    Returns:
+        Number of records rebuilt
+    """
+    rebuilt = 0
+    last_id = 0
+
+    while True:
+        query = db.query(FormRecord).filter(
+            FormRecord.template_id == compiled.template_id,
+            FormRecord.template_version_id == compiled.version_id,
+            FormRecord.id > last_id
+        )
+        if only_missing:
+            query = query.filter(FormRecord.data.is_(None))
+        records = query.order_by(FormRecord.id).limit(batch_size).all()
+        if not records:
+            break
+
+        raw: Dict[int, dict] = {record.id: {} for record in records}
+        for value in db.query(FormValue).filter(FormValue.record_id.in_(list(raw))):
+            raw[value.record_id][value.field_name] = (
+                value.value_json if value.value_json is not None else value.value
+            )
+
+        ids = list(raw)
+        validation = compiled.validator.validate_batch([raw[record_id] for record_id in ids])
+        calculated = set(compiled.formulas.order)
+        for record, values in zip(records, validation.rows):
+            # Calculated values aren't user input; keep what was stored
+            for name in calculated & raw[record.id].keys():
+                try:
+                    values[name] = float(raw[record.id][name])
+                except (TypeError, ValueError):
+                    pass
+            record.data = build_document(values)
+
+        db.flush()
+        rebuilt += len(records)
+        last_id = records[-1].id
+
+    return rebuilt
+
+
+def field_series(
+    db: Session,
+    template_id: int,
+    field_name: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 1000
+) -> List[dict]:
+    """All values of one field for a template over a date range, oldest first"""
+    query = db.query(
+        FormRecord.id,
+        FormRecord.record_number,
+        FormRecord.created_at,
+        FormRecord.data[field_name].label("value")
+    ).filter(
+        FormRecord.template_id == template_id,
+        FormRecord.is_deleted == False
+    )
+
+    if start_date:
+        query = query.filter(FormRecord.created_at >= datetime.combine(start_date, time.min))
+    if end_date:
+        query = query.filter(
+            FormRecord.created_at < datetime.combine(end_date + timedelta(days=1), time.min)
+        )
+
+    rows = query.order_by(FormRecord.created_at, FormRecord.id).offset(skip).limit(limit).all()
+
+    return [
+        {
+            "record_id": row.id,
+            "record_number": row.record_number,
+            "created_at": str(row.created_at),
+            "value": row.value
+        }
+        for row in rows
+    ]
@@ -0,0 +1,174 @@
+"""
+Form record persistence
+
+Record numbering and the bulk write path shared by single submissions and
+NDJSON/CSV batch ingestion. Bulk writes validate the whole batch through the
+compiled template, then insert records and values with multi-row INSERTs in
+the caller's transaction instead of one ORM round trip per value.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend.models.form import FormTemplate, FormRecord, FormValue
+from .form_engine import CompiledTemplate
+from .form_read_model import build_document
+from .form_validation import serialize_value
+
+# Rows per INSERT statement for form values
+VALUE_INSERT_CHUNK = 5000
+
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+CSV_TYPES = {"text/csv", "application/csv"}
+
+
+def allocate_record_numbers(db: Session, template: FormTemplate, count: int) -> List[str]:
+    """
+    Reserve a contiguous block of record numbers for a template
+
+    The template row is locked for the rest of the transaction so concurrent
+    submissions against the same template can't hand out the same numbers.
+    """
+    db.query(FormTemplate.id).filter(FormTemplate.id == template.id).with_for_update().one()
+
+    year = datetime.now().year
+    start = db.query(FormRecord).filter(FormRecord.template_id == template.id).count() + 1
+    return [f"{template.code}-{year}-{seq:04d}" for seq in range(start, start + count)]
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """Return 'csv', 'ndjson' or None for an uploaded file"""
+    name = (filename or "").lower()
+    if content_type in CSV_TYPES or name.endswith(".csv"):
+        return "csv"
+    if content_type in NDJSON_TYPES or name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+
+def parse_records(content: bytes, fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Parse an upload into records
+
+    Yields:
+        (row number, record or None, parse error or None); rows are 1-based
+    """
+    text = io.StringIO(content.decode("utf-8-sig"))
+
+    if fmt == "csv":
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, {k: v for k, v in row.items() if k is not None}, None
+        return
+
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield row_number, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, "Each line must be a JSON object"
+            continue
+        yield row_number, record, None
+
+
+class BulkIngestResult:
+    """Outcome of a bulk ingestion"""
+
+    def __init__(self):
+        self.record_numbers: List[str] = []
+        self.errors: List[dict] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "inserted": len(self.record_numbers),
+            "failed": len(self.errors),
+            "first_record_number": self.record_numbers[0] if self.record_numbers else None,
+            "last_record_number": self.record_numbers[-1] if self.record_numbers else None,
+            "errors": self.errors
+        }
+
+
+def ingest_records(
+    db: Session,
+    template: FormTemplate,
+    compiled: CompiledTemplate,
+    parsed: Iterator[Tuple[int, Optional[dict], Optional[str]]],
+    user_id: int,
+    all_or_nothing: bool = False
+) -> BulkIngestResult:
+    """
+    Validate and insert a batch of records for one template
+
+    Nothing is committed here; the caller owns the transaction. With
+    all_or_nothing, any invalid row means no rows are written.
+    """
+    result = BulkIngestResult()
+    row_numbers: List[int] = []
+    records: List[dict] = []
+
+    for row_number, record, error in parsed:
+        if error:
+            result.errors.append({"row": row_number, "errors": [{"message": error}]})
+            continue
+        row_numbers.append(row_number)
+        records.append(record)
+
+    validation = compiled.validator.validate_batch(records)
+    for index, issues in validation.errors_by_row().items():
+        result.errors.append({"row": row_numbers[index], "errors": issues})
+    result.errors.sort(key=lambda error: error["row"])
+
+    valid = validation.valid_indexes
+    if not valid or (all_or_nothing and result.errors):
+        return result
+
+    computed = [compiled.compute(validation.rows[index]) for index in valid]
+    numbers = allocate_record_numbers(db, template, len(valid))
+    record_rows = [
+        {
+            "template_id": template.id,
+            "template_version_id": compiled.version_id,
+            "record_number": number,
+            "status": "draft",
+            "doer_id": user_id,
+            "created_by_id": user_id,
+            "data": build_document(values)
+        }
+        for number, values in zip(numbers, computed)
+    ]
+    inserted = db.execute(
+        insert(FormRecord).returning(FormRecord.id, sort_by_parameter_order=True),
+        record_rows
+    ).scalars().all()
+
+    field_ids = compiled.field_ids
+    value_rows: List[dict] = []
+    for record_id, values in zip(inserted, computed):
+        for field_name, value in values.items():
+            text_value, json_value = serialize_value(value)
+            value_rows.append({
+                "record_id": record_id,
+                "field_id": field_ids.get(field_name),
+                "field_name": field_name,
+                "value": text_value,
+                "value_json": json_value,
+                "created_by_id": user_id
+            })
+        if len(value_rows) >= VALUE_INSERT_CHUNK:
+            db.execute(insert(FormValue), value_rows)
+            value_rows = []
+    if value_rows:
+        db.execute(insert(FormValue), value_rows)
+
+    result.record_numbers = numbers
+    return result
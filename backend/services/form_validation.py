@@ -0,0 +1,392 @@
+"""
+Server-side validation for dynamic form records
+
+Every FormField is compiled once into a FieldValidator holding its type
+coercion and precompiled rule checks (range, length, pattern, options).
+Validation runs column-wise, so a batch of records costs one pass per field
+and all problems are reported together instead of stopping at the first one.
+"""
+import json
+import math
+import re
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.models.form import FormField, FieldTypeEnum
+
+Check = Callable[[Any], Optional[str]]
+
+# Fields that never take user input
+NON_INPUT_TYPES = {FieldTypeEnum.SECTION, FieldTypeEnum.CALCULATED}
+
+# Fields whose values are validated as plain strings
+TEXT_TYPES = {
+    FieldTypeEnum.TEXT,
+    FieldTypeEnum.DROPDOWN,
+    FieldTypeEnum.RADIO,
+    FieldTypeEnum.FILE,
+    FieldTypeEnum.SIGNATURE,
+}
+
+_TRUE_VALUES = {"true", "1", "yes", "y", "on"}
+_FALSE_VALUES = {"false", "0", "no", "n", "off"}
+
+
+class ValidationIssue:
+    """A single validation problem for one field of one record"""
+    __slots__ = ("field_name", "message", "row")
+
+    def __init__(self, field_name: str, message: str, row: Optional[int] = None):
+        self.field_name = field_name
+        self.message = message
+        self.row = row
+
+    def to_dict(self) -> dict:
+        issue = {"field": self.field_name, "message": self.message}
+        if self.row is not None:
+            issue["row"] = self.row
+        return issue
+
+
+class BatchValidationResult:
+    """Outcome of validating a batch of records against one template"""
+
+    def __init__(self, rows: List[dict], issues: List[ValidationIssue]):
+        self.rows = rows
+        self.issues = issues
+
+    def errors_by_row(self) -> Dict[int, List[dict]]:
+        """Group issues by the index of the offending record"""
+        grouped: Dict[int, List[dict]] = {}
+        for issue in self.issues:
+            grouped.setdefault(issue.row, []).append(
+                {"field": issue.field_name, "message": issue.message}
+            )
+        return grouped
+
+    @property
+    def valid_indexes(self) -> List[int]:
+        invalid = {issue.row for issue in self.issues}
+        return [idx for idx in range(len(self.rows)) if idx not in invalid]
+
+
+def _is_empty(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, (list, tuple, dict, set)):
+        return len(value) == 0
+    return False
+
+
+# ---------------------------------------------------------------------------
+# Coercion
+# ---------------------------------------------------------------------------
+
+def _coerce_text(value: Any, rules: dict) -> str:
+    if isinstance(value, (dict, list, tuple, set)):
+        raise ValueError("Expected a text value")
+    return str(value)
+
+
+def _coerce_number(value: Any, rules: dict):
+    if isinstance(value, bool):
+        raise ValueError("Expected a number")
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        try:
+            number = float(str(value).strip().replace(",", ""))
+        except ValueError:
+            raise ValueError("Expected a number")
+    if isinstance(number, float) and not math.isfinite(number):
+        raise ValueError("Expected a finite number")
+    if rules.get("integer"):
+        if number != int(number):
+            raise ValueError("Expected a whole number")
+        return int(number)
+    return number
+
+
+def _coerce_date(value: Any, rules: dict) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    try:
+        if rules.get("format"):
+            return datetime.strptime(text, rules["format"]).date()
+        # The whole text must parse; a datetime with an offset is taken on its UTC day
+        return _naive_utc(datetime.fromisoformat(text.replace("Z", "+00:00"))).date()
+    except ValueError:
+        raise ValueError("Expected a date")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Values with an offset are converted to UTC, so every value compares with every bound"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _coerce_datetime(value: Any, rules: dict) -> datetime:
+    if isinstance(value, datetime):
+        return _naive_utc(value)
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    text = str(value).strip()
+    try:
+        if rules.get("format"):
+            return _naive_utc(datetime.strptime(text, rules["format"]))
+        return _naive_utc(datetime.fromisoformat(text.replace("Z", "+00:00")))
+    except ValueError:
+        raise ValueError("Expected a date and time")
+
+
+def _coerce_checkbox(value: Any, rules: dict) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError("Expected true or false")
+
+
+def _coerce_multiselect(value: Any, rules: dict) -> List[str]:
+    if isinstance(value, (list, tuple, set)):
+        return [str(item) for item in value]
+    text = str(value).strip()
+    if text.startswith("["):
+        try:
+            items = json.loads(text)
+        except ValueError:
+            raise ValueError("Expected a list of options")
+        if not isinstance(items, list):
+            raise ValueError("Expected a list of options")
+        return [str(item) for item in items]
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+
+def _coerce_table(value: Any, rules: dict) -> List[dict]:
+    rows = value
+    if isinstance(value, str):
+        try:
+            rows = json.loads(value)
+        except ValueError:
+            raise ValueError("Expected a list of table rows")
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError("Expected a list of table rows")
+
+    numeric_columns = [
+        column["name"] for column in rules.get("columns", [])
+        if isinstance(column, dict) and column.get("type") == FieldTypeEnum.NUMBER.value
+    ]
+    if not numeric_columns:
+        return rows
+
+    coerced = []
+    for index, row in enumerate(rows):
+        row = dict(row)
+        for name in numeric_columns:
+            if not _is_empty(row.get(name)):
+                try:
+                    row[name] = _coerce_number(row[name], {})
+                except ValueError:
+                    raise ValueError(f"Row {index + 1}: '{name}' must be a number")
+        coerced.append(row)
+    return coerced
+
+
+_COERCERS: Dict[FieldTypeEnum, Callable[[Any, dict], Any]] = {
+    FieldTypeEnum.TEXT: _coerce_text,
+    FieldTypeEnum.NUMBER: _coerce_number,
+    FieldTypeEnum.DATE: _coerce_date,
+    FieldTypeEnum.DATETIME: _coerce_datetime,
+    FieldTypeEnum.DROPDOWN: _coerce_text,
+    FieldTypeEnum.MULTISELECT: _coerce_multiselect,
+    FieldTypeEnum.CHECKBOX: _coerce_checkbox,
+    FieldTypeEnum.RADIO: _coerce_text,
+    FieldTypeEnum.FILE: _coerce_text,
+    FieldTypeEnum.SIGNATURE: _coerce_text,
+    FieldTypeEnum.TABLE: _coerce_table,
+}
+
+
+# ---------------------------------------------------------------------------
+# Rule compilation
+# ---------------------------------------------------------------------------
+
+def _option_values(options: Optional[list]) -> Optional[set]:
+    if not options:
+        return None
+    values = set()
+    for option in options:
+        if isinstance(option, dict):
+            values.add(str(option.get("value", option.get("label"))))
+        else:
+            values.add(str(option))
+    return values
+
+
+def _build_checks(field_type: FieldTypeEnum, rules: dict, options: Optional[list]) -> List[Check]:
+    """Turn validation_rules into a list of closures over coerced values"""
+    checks: List[Check] = []
+
+    if field_type == FieldTypeEnum.NUMBER:
+        if rules.get("min") is not None:
+            low = float(rules["min"])
+            checks.append(lambda v: None if v >= low else f"Must be at least {rules['min']}")
+        if rules.get("max") is not None:
+            high = float(rules["max"])
+            checks.append(lambda v: None if v <= high else f"Must be at most {rules['max']}")
+
+    elif field_type in (FieldTypeEnum.DATE, FieldTypeEnum.DATETIME):
+        coerce = _COERCERS[field_type]
+        if rules.get("min") is not None:
+            low = coerce(rules["min"], {})
+            checks.append(lambda v: None if v >= low else f"Must be on or after {rules['min']}")
+        if rules.get("max") is not None:
+            high = coerce(rules["max"], {})
+            checks.append(lambda v: None if v <= high else f"Must be on or before {rules['max']}")
+
+    elif field_type == FieldTypeEnum.MULTISELECT:
+        if rules.get("min_items") is not None:
+            low = int(rules["min_items"])
+            checks.append(lambda v: None if len(v) >= low else f"Select at least {low} options")
+        if rules.get("max_items") is not None:
+            high = int(rules["max_items"])
+            checks.append(lambda v: None if len(v) <= high else f"Select at most {high} options")
+
+    elif field_type == FieldTypeEnum.TABLE:
+        if rules.get("min_rows") is not None:
+            low = int(rules["min_rows"])
+            checks.append(lambda v: None if len(v) >= low else f"Enter at least {low} rows")
+        if rules.get("max_rows") is not None:
+            high = int(rules["max_rows"])
+            checks.append(lambda v: None if len(v) <= high else f"Enter at most {high} rows")
+
+    if field_type in TEXT_TYPES:
+        if rules.get("min_length") is not None:
+            low = int(rules["min_length"])
+            checks.append(lambda v: None if len(v) >= low else f"Must be at least {low} characters")
+        if rules.get("max_length") is not None:
+            high = int(rules["max_length"])
+            checks.append(lambda v: None if len(v) <= high else f"Must be at most {high} characters")
+        if rules.get("pattern"):
+            pattern = re.compile(rules["pattern"])
+            message = rules.get("pattern_message") or "Invalid format"
+            checks.append(lambda v: None if pattern.fullmatch(v) else message)
+
+    allowed = _option_values(options)
+    if allowed is not None:
+        if field_type in (FieldTypeEnum.DROPDOWN, FieldTypeEnum.RADIO):
+            checks.append(lambda v: None if v in allowed else f"'{v}' is not a valid option")
+        elif field_type == FieldTypeEnum.MULTISELECT:
+            def check_options(values: List[str]) -> Optional[str]:
+                invalid = [item for item in values if item not in allowed]
+                return f"Invalid options: {', '.join(invalid)}" if invalid else None
+            checks.append(check_options)
+
+    return checks
+
+
+class FieldValidator:
+    """Compiled validator for a single form field"""
+
+    def __init__(self, field: FormField):
+        self.field_id = field.id
+        self.name = field.field_name
+        self.field_type = FieldTypeEnum(field.field_type)
+        self.required = bool(field.is_required)
+        rules = field.validation_rules or {}
+        self._rules = rules
+        self._coerce = _COERCERS.get(self.field_type, _coerce_text)
+        self._checks = _build_checks(self.field_type, rules, field.options)
+
+    def validate_column(self, column: List[Any]) -> Tuple[List[Any], List[Tuple[int, str]]]:
+        """
+        Coerce and check every value of this field across a batch
+
+        Returns:
+            Coerced values (None where empty or invalid) and (row, message) errors
+        """
+        coerce, rules, checks, required = self._coerce, self._rules, self._checks, self.required
+        values: List[Any] = []
+        errors: List[Tuple[int, str]] = []
+
+        for index, raw in enumerate(column):
+            if _is_empty(raw):
+                if required:
+                    errors.append((index, "This field is required"))
+                values.append(None)
+                continue
+            try:
+                value = coerce(raw, rules)
+            except (TypeError, ValueError) as exc:
+                errors.append((index, str(exc)))
+                values.append(None)
+                continue
+            try:
+                messages = [message for message in (check(value) for check in checks) if message]
+            except (TypeError, ValueError) as exc:
+                messages = [f"Can't be checked: {exc}"]
+            errors.extend((index, message) for message in messages)
+            values.append(value)
+
+        return values, errors
+
+
+class TemplateValidator:
+    """Validator for all input fields of a form template"""
+
+    def __init__(self, fields: Iterable[FormField]):
+        fields = list(fields)
+        self.known_fields = {f.field_name for f in fields}
+        self.fields = [
+            FieldValidator(f) for f in fields
+            if FieldTypeEnum(f.field_type) not in NON_INPUT_TYPES
+        ]
+
+    def validate(self, values: dict) -> Tuple[dict, List[ValidationIssue]]:
+        """Validate a single record, returning coerced values and all issues"""
+        result = self.validate_batch([values])
+        for issue in result.issues:
+            issue.row = None
+        return result.rows[0], result.issues
+
+    def validate_batch(self, records: List[dict]) -> BatchValidationResult:
+        """Validate many records with one pass per field"""
+        rows: List[dict] = [{} for _ in records]
+        issues: List[ValidationIssue] = []
+
+        for validator in self.fields:
+            name = validator.name
+            values, errors = validator.validate_column([record.get(name) for record in records])
+            for row, value in zip(rows, values):
+                if value is not None:
+                    row[name] = value
+            issues.extend(ValidationIssue(name, message, index) for index, message in errors)
+
+        known = self.known_fields
+        for index, record in enumerate(records):
+            for name in record.keys() - known:
+                issues.append(ValidationIssue(name, "Unknown field", index))
+
+        return BatchValidationResult(rows, issues)
+
+
+def serialize_value(value: Any) -> Tuple[Optional[str], Any]:
+    """Split a coerced value into the (value, value_json) columns of FormValue"""
+    if value is None:
+        return None, None
+    if isinstance(value, (list, dict)):
+        return None, value
+    if isinstance(value, bool):
+        return ("true" if value else "false"), None
+    if isinstance(value, (date, datetime)):
+        return value.isoformat(), None
+    return str(value), None
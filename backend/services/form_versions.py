@@ -0,0 +1,152 @@
+"""
+Form template versioning
+
+Publishing a template snapshots its working copy of fields as an immutable
+FormTemplateVersion. A version only references FormField rows, so fields
+that didn't change are shared by every version that contains them. Once a
+field belongs to a version it is never edited in place: an edit inserts a
+new row and deactivates the old one (copy-on-write), which leaves the
+schema of every historic record exactly as it was when it was submitted.
+"""
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from backend.models.form import (
+    FormTemplate,
+    FormTemplateVersion,
+    FormField,
+    FormRecord,
+    template_version_fields
+)
+from .form_engine import working_fields_query, invalidate_template
+from .form_formulas import FormulaPlan
+
+# Field attributes that can be edited through the API
+EDITABLE_FIELD_ATTRIBUTES = (
+    "field_name", "field_label", "field_type", "order", "is_required", "is_readonly",
+    "default_value", "placeholder", "help_text", "validation_rules", "options",
+    "section", "parent_field_id", "formula"
+)
+
+
+class VersionUnchanged(ValueError):
+    """The working copy is identical to the current version"""
+
+
+def snapshotted_field_ids(db: Session, field_ids: Iterable[int]) -> Set[int]:
+    """Ids among field_ids that belong to at least one published version"""
+    field_ids = list(field_ids)
+    if not field_ids:
+        return set()
+    return set(db.execute(
+        select(template_version_fields.c.field_id).where(
+            template_version_fields.c.field_id.in_(field_ids)
+        ).distinct()
+    ).scalars())
+
+
+def publish_version(
+    db: Session,
+    template: FormTemplate,
+    user_id: Optional[int],
+    notes: Optional[str] = None
+) -> FormTemplateVersion:
+    """
+    Snapshot the template's working copy as its next version
+
+    The template row is locked so concurrent publishes get distinct numbers.
+    Records submitted before the first version existed are pinned to it.
+    Nothing is committed here.
+
+    Raises:
+        FormulaError: formulas of the working copy don't compile
+        VersionUnchanged: nothing changed since the current version
+    """
+    db.query(FormTemplate.id).filter(FormTemplate.id == template.id).with_for_update().one()
+
+    fields = working_fields_query(db, template.id).all()
+    FormulaPlan(fields)
+    field_ids = [f.id for f in fields]
+
+    current = template.current_version
+    if current is not None and {f.id for f in current.fields} == set(field_ids):
+        raise VersionUnchanged(f"No changes since version {current.version_number}")
+
+    number = (current.version_number if current is not None else 0) + 1
+    version = FormTemplateVersion(
+        template_id=template.id,
+        version_number=number,
+        notes=notes,
+        created_by_id=user_id
+    )
+    db.add(version)
+    db.flush()
+
+    if field_ids:
+        db.execute(insert(template_version_fields), [
+            {"version_id": version.id, "field_id": field_id} for field_id in field_ids
+        ])
+
+    if current is None:
+        db.execute(
+            update(FormRecord)
+            .where(FormRecord.template_id == template.id, FormRecord.template_version_id.is_(None))
+            .values(template_version_id=version.id)
+        )
+
+    template.current_version_id = version.id
+    template.version = f"{number}.0"
+    template.updated_by_id = user_id
+    return version
+
+
+def ensure_current_version(db: Session, template: FormTemplate, user_id: Optional[int]) -> int:
+    """Current version id of a template, publishing version 1 if there is none"""
+    if template.current_version_id is None:
+        publish_version(db, template, user_id, notes="Initial version")
+    return template.current_version_id
+
+
+def update_field(db: Session, field: FormField, changes: dict, user_id: Optional[int]) -> FormField:
+    """
+    Apply changes to a field of a template's working copy
+
+    Fields that belong to a published version are copied and the original
+    is deactivated; unpublished fields are edited in place. Nothing is
+    committed here.
+
+    Returns:
+        The field row now holding the definition
+    """
+    changes = {k: v for k, v in changes.items() if k in EDITABLE_FIELD_ATTRIBUTES}
+
+    if field.id not in snapshotted_field_ids(db, [field.id]):
+        for attribute, value in changes.items():
+            setattr(field, attribute, value)
+        field.updated_by_id = user_id
+        db.flush()
+        invalidate_template(field.template_id)
+        return field
+
+    definition = {attribute: getattr(field, attribute) for attribute in EDITABLE_FIELD_ATTRIBUTES}
+    definition.update(changes)
+    replacement = FormField(template_id=field.template_id, created_by_id=user_id, **definition)
+
+    field.is_active = False
+    field.updated_by_id = user_id
+    db.add(replacement)
+    db.flush()
+    invalidate_template(field.template_id)
+    return replacement
+
+
+def remove_field(db: Session, field: FormField, user_id: Optional[int]) -> None:
+    """Take a field out of the working copy; published versions keep it"""
+    field.is_active = False
+    if field.id not in snapshotted_field_ids(db, [field.id]):
+        field.is_deleted = True
+    field.updated_by_id = user_id
+    db.flush()
+    invalidate_template(field.template_id)
@@ -0,0 +1,431 @@
+"""
+Invoice computation
+
+Invoice amounts are computed on the server from the line items, with
+Decimal arithmetic and ROUND_HALF_UP to the paisa at every step:
+
+    gross    = quantity x unit price
+    discount = gross x discount %
+    taxable  = gross - discount
+    CGST = SGST = taxable x rate / 2      (intra-state supply)
+    IGST        = taxable x rate          (inter-state supply)
+
+Tax is rounded per line. The invoice total is rounded to the rupee and the
+difference is kept as round_off. Supply is intra-state when the place of
+supply (given, or the state code of the customer's GSTIN) matches the state
+code of COMPANY_GSTIN; it is taken as intra-state when either is unknown.
+
+compute_invoices runs a whole batch in one vectorized pass over integer
+paise when numpy is installed. The integer rounding is the same as the
+Decimal path, so the totals are identical. Invoices with a line grossing
+more than VECTORIZED_MAX_GROSS, where the products of the rounding steps
+could overflow int64, are computed with Decimal instead, as is everything
+when numpy is missing.
+
+PDFs are rendered by the invoices.render_pdf job (needs reportlab), so
+issuing invoices never waits on it.
+"""
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.models.crm import Customer
+from backend.models.financial import Invoice, InvoiceTypeEnum
+from .jobs import enqueue
+from .project_costs import post_invoice
+from .receivables import update_receivables
+
+PAISE = Decimal("0.01")
+QUANTITY_STEP = Decimal("0.001")
+HUNDRED = Decimal(100)
+
+MAX_QUANTITY = Decimal(1_000_000)
+MAX_UNIT_PRICE = Decimal(10_000_000)
+# Largest line gross (rupees) for the int64 path: gross paise x 10,000 basis points x 2 stays below 2^63
+VECTORIZED_MAX_GROSS = Decimal(10) ** 12
+# Larger numbers are rejected before any rounding is attempted
+MAX_MAGNITUDE = Decimal(10) ** 12
+
+PDF_JOB = "invoices.render_pdf"
+
+
+class InvoiceError(ValueError):
+    """Invoice lines can't be computed"""
+
+
+def numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def pdf_available() -> bool:
+    try:
+        import reportlab  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class InvoiceLine:
+    """One validated line item; amounts already at their stored precision"""
+
+    def __init__(
+        self,
+        description: str,
+        quantity: Decimal,
+        unit_price: Decimal,
+        discount_pct: Decimal = Decimal(0),
+        gst_rate: Optional[Decimal] = None,
+        hsn_sac: Optional[str] = None
+    ):
+        self.description = description
+        self.quantity = _quantized(quantity, QUANTITY_STEP, "Quantity", description)
+        self.unit_price = _quantized(unit_price, PAISE, "Unit price", description)
+        self.discount_pct = _quantized(discount_pct, PAISE, "Discount", description)
+        rate = Decimal(str(settings.INVOICE_DEFAULT_GST_RATE)) if gst_rate is None else gst_rate
+        self.gst_rate = _quantized(rate, PAISE, "GST rate", description)
+        self.hsn_sac = hsn_sac
+
+        if self.quantity <= 0 or self.quantity > MAX_QUANTITY:
+            raise InvoiceError(f"Quantity of '{description}' must be above 0 and at most {MAX_QUANTITY}")
+        if self.unit_price < 0 or self.unit_price > MAX_UNIT_PRICE:
+            raise InvoiceError(f"Unit price of '{description}' must be between 0 and {MAX_UNIT_PRICE}")
+        if not 0 <= self.discount_pct <= 100:
+            raise InvoiceError(f"Discount of '{description}' must be between 0 and 100 percent")
+        if not 0 <= self.gst_rate <= 100:
+            raise InvoiceError(f"GST rate of '{description}' must be between 0 and 100 percent")
+
+
+def _quantized(value: Decimal, step: Decimal, field: str, description: str) -> Decimal:
+    if not value.is_finite() or abs(value) > MAX_MAGNITUDE:
+        raise InvoiceError(f"{field} of '{description}' is not a usable number")
+    try:
+        return value.quantize(step, ROUND_HALF_UP)
+    except InvalidOperation:
+        raise InvoiceError(f"{field} of '{description}' is not a usable number")
+
+
+def _decimal(value: Any, field: str) -> Decimal:
+    if isinstance(value, bool):
+        raise InvoiceError(f"{field} must be a number")
+    try:
+        number = Decimal(str(value).strip().replace(",", ""))
+    except (InvalidOperation, ValueError):
+        raise InvoiceError(f"{field} must be a number")
+    if not number.is_finite() or abs(number) > MAX_MAGNITUDE:
+        raise InvoiceError(f"{field} must be a finite number of a sensible size")
+    return number
+
+
+def _first(raw: dict, *keys: str) -> Any:
+    for key in keys:
+        if raw.get(key) not in (None, ""):
+            return raw[key]
+    return None
+
+
+def parse_line(raw: dict) -> InvoiceLine:
+    """Line item from a client or order items dict, accepting the usual key spellings"""
+    description = _first(raw, "description", "name", "item") or "Item"
+    quantity = _first(raw, "quantity", "qty")
+    price = _first(raw, "unit_price", "rate", "price")
+    if price is None:
+        raise InvoiceError(f"Line '{description}' has no unit price")
+    discount = _first(raw, "discount_pct", "discount_percent")
+    rate = _first(raw, "gst_rate", "tax_rate")
+    return InvoiceLine(
+        description=str(description),
+        quantity=_decimal(quantity, "Quantity") if quantity is not None else Decimal(1),
+        unit_price=_decimal(price, "Unit price"),
+        discount_pct=_decimal(discount, "Discount") if discount is not None else Decimal(0),
+        gst_rate=_decimal(rate, "GST rate") if rate is not None else None,
+        hsn_sac=_first(raw, "hsn_sac", "hsn", "sac")
+    )
+
+
+def state_code(gstin: Optional[str]) -> Optional[str]:
+    gstin = (gstin or "").strip()
+    return gstin[:2] if len(gstin) >= 2 and gstin[:2].isdigit() else None
+
+
+def is_intra_state(place_of_supply: Optional[str]) -> bool:
+    company_state = state_code(settings.COMPANY_GSTIN)
+    return company_state is None or place_of_supply is None or place_of_supply == company_state
+
+
+def _round(value: Decimal) -> Decimal:
+    return value.quantize(PAISE, ROUND_HALF_UP)
+
+
+def compute_invoice(lines: Sequence[InvoiceLine], intra_state: bool) -> dict:
+    """Line and invoice amounts of one invoice, as Decimals"""
+    if not lines:
+        raise InvoiceError("An invoice needs at least one line")
+
+    computed = []
+    for line in lines:
+        gross = _round(line.quantity * line.unit_price)
+        discount = _round(gross * line.discount_pct / HUNDRED)
+        taxable = gross - discount
+        if intra_state:
+            cgst = sgst = _round(taxable * line.gst_rate / (2 * HUNDRED))
+            igst = Decimal("0.00")
+        else:
+            cgst = sgst = Decimal("0.00")
+            igst = _round(taxable * line.gst_rate / HUNDRED)
+        computed.append({
+            "gross": gross, "discount": discount, "taxable": taxable,
+            "cgst": cgst, "sgst": sgst, "igst": igst,
+            "total": taxable + cgst + sgst + igst
+        })
+    return _invoice_totals(lines, computed)
+
+
+def _invoice_totals(lines: Sequence[InvoiceLine], computed: List[dict]) -> dict:
+    totals = {key: sum((line[key] for line in computed), Decimal("0.00")) for key in
+              ("gross", "discount", "taxable", "cgst", "sgst", "igst", "total")}
+    rounded = totals["total"].quantize(Decimal(1), ROUND_HALF_UP)
+    rates = {line.gst_rate for line in lines}
+    return {
+        "lines": computed,
+        "subtotal": totals["gross"],
+        "discount": totals["discount"],
+        "taxable": totals["taxable"],
+        "cgst": totals["cgst"],
+        "sgst": totals["sgst"],
+        "igst": totals["igst"],
+        "tax": totals["cgst"] + totals["sgst"] + totals["igst"],
+        "tax_rate": rates.pop() if len(rates) == 1 else None,
+        "round_off": rounded - totals["total"],
+        "total": rounded.quantize(PAISE)
+    }
+
+
+def _compute_vectorized(batch: Sequence[Tuple[Sequence[InvoiceLine], bool]]) -> List[dict]:
+    """compute_invoice over a batch, in integer paise with numpy"""
+    import numpy as np
+
+    counts = [len(lines) for lines, _ in batch]
+    flat = [line for lines, _ in batch for line in lines]
+    quantity = np.array([int(line.quantity * 1000) for line in flat], dtype=np.int64)
+    price = np.array([int(line.unit_price * 100) for line in flat], dtype=np.int64)
+    discount_bp = np.array([int(line.discount_pct * 100) for line in flat], dtype=np.int64)
+    rate_bp = np.array([int(line.gst_rate * 100) for line in flat], dtype=np.int64)
+    intra = np.repeat(np.array([intra_state for _, intra_state in batch], dtype=bool), counts)
+
+    def round_div(numerator, denominator):
+        # Half-up division of non-negative integers
+        return (2 * numerator + denominator) // (2 * denominator)
+
+    gross = round_div(quantity * price, 1000)
+    discount = round_div(gross * discount_bp, 10_000)
+    taxable = gross - discount
+    half = round_div(taxable * rate_bp, 20_000)
+    full = round_div(taxable * rate_bp, 10_000)
+    cgst = np.where(intra, half, 0)
+    igst = np.where(intra, 0, full)
+    total = taxable + 2 * cgst + igst
+
+    def paise(value) -> Decimal:
+        return Decimal(int(value)).scaleb(-2)
+
+    results = []
+    start = 0
+    for (lines, _), count in zip(batch, counts):
+        rows = range(start, start + count)
+        computed = [
+            {
+                "gross": paise(gross[i]), "discount": paise(discount[i]), "taxable": paise(taxable[i]),
+                "cgst": paise(cgst[i]), "sgst": paise(cgst[i]), "igst": paise(igst[i]),
+                "total": paise(total[i])
+            }
+            for i in rows
+        ]
+        results.append(_invoice_totals(lines, computed))
+        start += count
+    return results
+
+
+def compute_invoices(batch: Sequence[Tuple[Sequence[InvoiceLine], bool]]) -> List[dict]:
+    """
+    compute_invoice for many invoices at once
+
+    Args:
+        batch: (lines, intra_state) of every invoice
+    """
+    for lines, _ in batch:
+        if not lines:
+            raise InvoiceError("An invoice needs at least one line")
+    if not numpy_available():
+        return [compute_invoice(lines, intra_state) for lines, intra_state in batch]
+
+    fits = [
+        all(line.quantity * line.unit_price <= VECTORIZED_MAX_GROSS for line in lines)
+        for lines, _ in batch
+    ]
+    vectorized = iter(_compute_vectorized([invoice for invoice, fit in zip(batch, fits) if fit]) if any(fits) else [])
+    return [
+        next(vectorized) if fit else compute_invoice(lines, intra_state)
+        for (lines, intra_state), fit in zip(batch, fits)
+    ]
+
+
+def line_items(lines: Sequence[InvoiceLine], computed: dict) -> List[dict]:
+    """Items JSON stored on the invoice"""
+    return [
+        {
+            "description": line.description,
+            "hsn_sac": line.hsn_sac,
+            "quantity": float(line.quantity),
+            "unit_price": float(line.unit_price),
+            "discount_pct": float(line.discount_pct),
+            "gst_rate": float(line.gst_rate),
+            **{key: float(value) for key, value in amounts.items()}
+        }
+        for line, amounts in zip(lines, computed["lines"])
+    ]
+
+
+def invoice_amounts(computed: dict) -> dict:
+    """Invoice columns of a computed invoice"""
+    return {
+        "subtotal": float(computed["subtotal"]),
+        "discount": float(computed["discount"]),
+        "tax_rate": float(computed["tax_rate"]) if computed["tax_rate"] is not None else None,
+        "tax_amount": float(computed["tax"]),
+        "cgst_amount": float(computed["cgst"]),
+        "sgst_amount": float(computed["sgst"]),
+        "igst_amount": float(computed["igst"]),
+        "round_off": float(computed["round_off"]),
+        "total_amount": float(computed["total"])
+    }
+
+
+class InvoiceDraft:
+    """Everything needed to issue one invoice except its amounts"""
+
+    def __init__(
+        self,
+        invoice_type: InvoiceTypeEnum,
+        customer: Customer,
+        lines: Sequence[InvoiceLine],
+        place_of_supply: Optional[str] = None,
+        **fields
+    ):
+        self.invoice_type = invoice_type
+        self.customer = customer
+        self.lines = list(lines)
+        self.place_of_supply = place_of_supply or state_code(customer.gst_number)
+        self.fields = fields
+
+
+def issue_invoices(db: Session, drafts: Sequence[InvoiceDraft], user_id: int) -> List[Invoice]:
+    """
+    Compute and add invoices, post them to the project ledgers and receivables and queue their PDFs; the caller commits
+
+    Raises:
+        InvoiceError: If a draft has no lines
+    """
+    computed = compute_invoices([
+        (draft.lines, is_intra_state(draft.place_of_supply)) for draft in drafts
+    ])
+
+    year = datetime.now().year
+    count = db.query(Invoice).count()
+    invoices = []
+    for offset, (draft, amounts) in enumerate(zip(drafts, computed), start=1):
+        invoice = Invoice(
+            invoice_number=f"INV-{year}-{count + offset:04d}",
+            invoice_type=draft.invoice_type,
+            invoice_date=draft.fields.pop("invoice_date", None) or date.today(),
+            customer_id=draft.customer.id,
+            bill_to_name=draft.customer.company_name,
+            bill_to_address=draft.customer.billing_address,
+            bill_to_gst=draft.customer.gst_number,
+            place_of_supply=draft.place_of_supply,
+            items=line_items(draft.lines, amounts),
+            generated_by_id=user_id,
+            created_by_id=user_id,
+            **invoice_amounts(amounts),
+            **draft.fields
+        )
+        invoices.append(invoice)
+    db.add_all(invoices)
+    db.flush()
+
+    for invoice in invoices:
+        post_invoice(db, invoice)
+    update_receivables(db, [invoice.id for invoice in invoices])
+    if pdf_available():
+        for invoice in invoices:
+            queue_pdf(db, invoice)
+    return invoices
+
+
+def queue_pdf(db: Session, invoice: Invoice) -> int:
+    return enqueue(db, PDF_JOB, {"invoice_id": invoice.id}, dedupe_key=f"invoice-pdf:{invoice.id}")
+
+
+def pdf_path(invoice: Invoice) -> str:
+    return os.path.join(settings.INVOICE_PDF_DIR, f"{invoice.invoice_number}.pdf")
+
+
+def render_invoice_pdf(invoice: Invoice) -> str:
+    """Write the invoice PDF and return its path"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    path = pdf_path(invoice)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    styles = getSampleStyleSheet()
+
+    def money(value: Optional[float]) -> str:
+        return f"{value or 0:,.2f}"
+
+    story = [
+        Paragraph(f"{invoice.invoice_type.value} {invoice.invoice_number}", styles["Title"]),
+        Paragraph(f"Date: {invoice.invoice_date}" + (f" &nbsp; Due: {invoice.due_date}" if invoice.due_date else ""), styles["Normal"]),
+        Paragraph(f"Bill to: {invoice.bill_to_name}", styles["Normal"]),
+    ]
+    if invoice.bill_to_address:
+        story.append(Paragraph(invoice.bill_to_address.replace("\n", "<br/>"), styles["Normal"]))
+    if invoice.bill_to_gst:
+        story.append(Paragraph(f"GSTIN: {invoice.bill_to_gst}", styles["Normal"]))
+    if settings.COMPANY_GSTIN:
+        story.append(Paragraph(f"Our GSTIN: {settings.COMPANY_GSTIN}", styles["Normal"]))
+    story.append(Spacer(1, 12))
+
+    rows = [["Description", "HSN/SAC", "Qty", "Rate", "Disc %", "Taxable", "GST %", "Amount"]]
+    for item in invoice.items or []:
+        rows.append([
+            item.get("description", ""), item.get("hsn_sac") or "", f"{item.get('quantity', 0):g}",
+            money(item.get("unit_price")), f"{item.get('discount_pct', 0):g}", money(item.get("taxable")),
+            f"{item.get('gst_rate', 0):g}", money(item.get("total"))
+        ])
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+    ]))
+    story += [table, Spacer(1, 12)]
+
+    summary = [["Subtotal", money(invoice.subtotal)], ["Discount", money(invoice.discount)]]
+    if invoice.igst_amount:
+        summary.append(["IGST", money(invoice.igst_amount)])
+    else:
+        summary += [["CGST", money(invoice.cgst_amount)], ["SGST", money(invoice.sgst_amount)]]
+    summary += [["Round off", money(invoice.round_off)], ["Total", money(invoice.total_amount)]]
+    story.append(Table(summary, hAlign="RIGHT"))
+
+    SimpleDocTemplate(path, pagesize=A4, title=invoice.invoice_number).build(story)
+    return path
@@ -0,0 +1,129 @@
+"""
+Background job handlers
+
+Registered with the job runner at import time.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.models.job import Job
+from backend.models.financial import Invoice
+from backend.models.procurement import Equipment
+from .calibration import REMINDER_JOB, due_calibrations_query, schedule_reminders
+from .calibration_analytics import backfill_measurements, refresh_fleet_drift
+from .competency import migrate_json_participation
+from .invoicing import PDF_JOB, render_invoice_pdf
+from .jobs import job, SUCCEEDED, FAILED
+from .leave import rebuild_leave_balances
+from .notifications import notify
+from .project_costs import rebuild_project_costs
+from .receivables import update_receivables
+from .task_tree import rebuild_task_paths
+from .work_items import rebuild_work_items
+
+
+@job("inbox.rebuild", cron="30 2 * * *")
+def rebuild_inbox(db: Session) -> dict:
+    """Rebuild the approval inbox from the workflow entities"""
+    return {"items": rebuild_work_items(db)}
+
+
+@job("tasks.rebuild_paths")
+def rebuild_paths(db: Session) -> dict:
+    """Recompute the materialized path of every task from parent_task_id"""
+    return {"tasks": rebuild_task_paths(db)}
+
+
+@job("jobs.purge", cron="15 3 * * *")
+def purge_finished_jobs(db: Session, days: Optional[int] = None) -> dict:
+    """Delete finished jobs older than the retention period"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days or settings.JOB_RETENTION_DAYS)
+    deleted = db.execute(
+        delete(Job).where(Job.status.in_([SUCCEEDED, FAILED]), Job.finished_at < cutoff)
+    ).rowcount
+    return {"deleted": deleted}
+
+
+@job("leave.rebuild_balances", cron="45 2 * * *")
+def rebuild_balances(db: Session, year: Optional[int] = None) -> dict:
+    """Recompute used and pending leave days of a year's balances from the leave records"""
+    year = year or date.today().year
+    return {"year": year, "balances": rebuild_leave_balances(db, year)}
+
+
+@job("projects.rebuild_costs", cron="0 3 * * *")
+def rebuild_costs(db: Session) -> dict:
+    """Recompute the project cost ledgers from expenses, invoices and payments"""
+    return {"projects": rebuild_project_costs(db)}
+
+
+@job(PDF_JOB, max_attempts=5)
+def render_invoice(db: Session, invoice_id: int) -> dict:
+    """Render an invoice PDF and attach it to the invoice"""
+    invoice = db.query(Invoice).filter(Invoice.id == invoice_id, Invoice.is_deleted == False).first()
+    if invoice is None:
+        return {"path": None, "reason": "Invoice deleted"}
+    invoice.file_path = render_invoice_pdf(invoice)
+    return {"path": invoice.file_path}
+
+
+@job(REMINDER_JOB)
+def send_calibration_reminder(db: Session, equipment_id: int, due_date: str, lead_days: int) -> dict:
+    """Remind the custodian that an equipment calibration is coming due"""
+    equipment = db.query(Equipment).filter(Equipment.id == equipment_id).first()
+    if (
+        equipment is None
+        or not equipment.calibration_required
+        or equipment.next_calibration_date is None
+        or equipment.next_calibration_date.isoformat() != due_date
+    ):
+        return {"sent": 0, "reason": "Calibration rescheduled"}
+
+    if lead_days:
+        message = f"Calibration of {equipment.name} is due on {due_date} ({lead_days} days)"
+    else:
+        message = f"Calibration of {equipment.name} is due today"
+    notify(
+        db, [equipment.custodian_id],
+        f"{equipment.equipment_id} calibration due",
+        message,
+        category="calibration",
+        notification_type="warning" if lead_days <= 1 else "info",
+        priority="high" if lead_days <= 1 else "normal",
+        link=f"/procurement/equipment/{equipment.id}",
+        entity=f"equipment:{equipment.id}"
+    )
+    return {"sent": 1 if equipment.custodian_id else 0}
+
+
+@job("calibration.schedule_reminders", cron="0 1 * * *")
+def schedule_calibration_reminders(db: Session) -> dict:
+    """Make sure every equipment due within the longest lead time has its reminders queued"""
+    horizon = max(settings.CALIBRATION_REMINDER_LEAD_DAYS, default=0) + 1
+    scheduled = 0
+    for equipment in due_calibrations_query(db, horizon).filter(Equipment.next_calibration_date >= date.today()):
+        scheduled += len(schedule_reminders(db, equipment))
+    return {"reminders": scheduled}
+
+
+@job("calibration.drift_analysis", cron="30 1 * * *")
+def analyze_calibration_drift(db: Session) -> dict:
+    """Extract new calibration measurements and re-rank the fleet by drift risk"""
+    extracted = backfill_measurements(db)
+    return {"extracted": extracted, **refresh_fleet_drift(db)}
+
+
+@job("training.migrate_participation")
+def migrate_training_participation(db: Session) -> dict:
+    """Move the JSON participant lists of trainings into training_participants and fill the competency matrix"""
+    return migrate_json_participation(db)
+
+
+@job("receivables.refresh", cron="10 0 * * *")
+def refresh_receivables(db: Session) -> dict:
+    """Recompute amounts paid and payment status of every invoice, marking overdue ones, and re-age receivables"""
+    return {"invoices": update_receivables(db)}
@@ -0,0 +1,734 @@
+"""
+Background jobs
+
+Handlers are plain functions registered with @job and called as
+handler(db, **payload) in a worker process, inside their own transaction.
+enqueue() inserts a row into `jobs` in the caller's transaction, so a job
+only runs for changes that commit.
+
+Workers claim the most urgent due job of their queues with
+
+    SELECT id FROM jobs WHERE status = 'queued' AND queue IN (...) AND run_at <= now
+    ORDER BY priority DESC, run_at, id LIMIT 1 FOR UPDATE SKIP LOCKED
+
+so any number of worker processes share the table without blocking each
+other. With JOB_BACKEND=redis, committed job ids are also pushed to Redis
+lists (delayed ones to a sorted set) and idle workers block on BRPOP instead
+of polling; the table stays the source of truth and is still polled as a
+fallback.
+
+Failed jobs are retried with exponential backoff up to max_attempts. While
+a job runs its worker refreshes heartbeat_at every JOB_HEARTBEAT_SECONDS;
+the scheduler requeues running jobs whose heartbeat is older than
+JOB_LOCK_TIMEOUT_SECONDS, or fails them once their attempts are used up, so
+long jobs are never run twice and a job that keeps killing its worker stops
+being retried. Cron
+schedules live in `scheduled_jobs`; handlers may declare a default schedule
+with @job(cron=...), created on the first scheduler run.
+
+Run workers with:
+
+    python -m backend.services.jobs worker --queues default,exports --concurrency 4
+
+The supervisor starts one process per unit of concurrency and runs the
+scheduler loop itself unless --no-scheduler is given.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import event, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.core.database import SessionLocal
+from backend.models.job import Job, ScheduledJob
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+DEFAULT_QUEUE = "default"
+
+# Longest wait between two attempts
+MAX_RETRY_DELAY = 6 * 3600
+
+# Seconds between scheduler runs in the supervisor
+SCHEDULER_INTERVAL = 30
+
+# Session.info key holding jobs to announce to Redis after commit
+_PENDING_KEY = "pending_jobs"
+
+# (lowest, highest) of minute, hour, day of month, month, day of week (0 and 7 = Sunday)
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+class JobError(ValueError):
+    """Unknown job or invalid schedule"""
+
+
+@dataclass
+class JobDefinition:
+    name: str
+    func: Callable
+    queue: str = DEFAULT_QUEUE
+    max_attempts: int = 3
+    cron: Optional[str] = None
+
+
+_registry: Dict[str, JobDefinition] = {}
+
+
+def job(name: str, queue: str = DEFAULT_QUEUE, max_attempts: int = 3, cron: Optional[str] = None):
+    """
+    Register a job handler, called as func(db, **payload)
+
+    The handler's return value (JSON serializable) is stored as the job
+    result. cron gives a default schedule, created if none exists.
+    """
+    if cron:
+        CronExpression(cron)
+
+    def decorator(func: Callable) -> Callable:
+        _registry[name] = JobDefinition(name, func, queue, max_attempts, cron)
+        return func
+    return decorator
+
+
+def _load_handlers() -> None:
+    # Handlers register themselves on import
+    from . import job_handlers  # noqa: F401
+
+
+def get_job_definition(name: str) -> JobDefinition:
+    _load_handlers()
+    definition = _registry.get(name)
+    if definition is None:
+        raise JobError(f"Unknown job '{name}', use one of: {', '.join(sorted(_registry))}")
+    return definition
+
+
+def job_definitions() -> List[JobDefinition]:
+    _load_handlers()
+    return list(_registry.values())
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes; everything here is UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Cron schedules
+# ---------------------------------------------------------------------------
+
+def _parse_cron_field(field: str, lowest: int, highest: int) -> Set[int]:
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"invalid step in '{field}'")
+        if part == "*":
+            start, end = lowest, highest
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            end = highest if step > 1 else start
+        if not lowest <= start <= end <= highest:
+            raise ValueError(f"'{field}' is out of range {lowest}-{highest}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    """Five-field cron expression (minute hour day-of-month month day-of-week), in UTC"""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise JobError(f"Cron expression '{expression}' must have 5 fields")
+        try:
+            self.minutes, self.hours, self.days, self.months, weekdays = (
+                _parse_cron_field(field, lowest, highest)
+                for field, (lowest, highest) in zip(fields, CRON_FIELDS)
+            )
+        except ValueError as exc:
+            raise JobError(f"Invalid cron expression '{expression}': {exc}")
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.expression = expression
+        # Like cron: when both day fields are restricted, either may match
+        self._either_day = fields[2] != "*" and fields[4] != "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        return day_ok or weekday_ok if self._either_day else day_ok and weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after a moment"""
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise JobError(f"Cron expression '{self.expression}' never matches")
+
+
+def schedule(
+    db: Session,
+    name: str,
+    job_name: str,
+    cron: str,
+    payload: Optional[dict] = None,
+    queue: Optional[str] = None
+) -> ScheduledJob:
+    """Create or replace a cron schedule; the caller commits"""
+    get_job_definition(job_name)
+    next_run_at = CronExpression(cron).next_after(_now())
+
+    scheduled = db.query(ScheduledJob).filter(ScheduledJob.name == name).first()
+    if scheduled is None:
+        scheduled = ScheduledJob(name=name)
+        db.add(scheduled)
+    scheduled.job_name = job_name
+    scheduled.cron = cron
+    scheduled.payload = payload
+    scheduled.queue = queue
+    scheduled.next_run_at = next_run_at
+    scheduled.is_active = True
+    db.flush()
+    return scheduled
+
+
+def sync_default_schedules(db: Session) -> int:
+    """Create the schedules declared with @job(cron=...) that don't exist yet"""
+    existing = {name for name, in db.query(ScheduledJob.name)}
+    created = 0
+    for definition in job_definitions():
+        if definition.cron and definition.name not in existing:
+            schedule(db, definition.name, definition.name, definition.cron)
+            created += 1
+    return created
+
+
+def run_due_schedules(db: Session) -> int:
+    """Enqueue one job per due schedule and advance it; the caller commits"""
+    now = _now()
+    due = db.query(ScheduledJob).filter(
+        ScheduledJob.is_active == True,
+        ScheduledJob.next_run_at <= now
+    ).with_for_update(skip_locked=True).all()
+
+    for scheduled in due:
+        slot = _aware(scheduled.next_run_at)
+        scheduled.last_job_id = enqueue(
+            db, scheduled.job_name, scheduled.payload or {},
+            queue=scheduled.queue,
+            dedupe_key=f"schedule:{scheduled.name}:{slot.isoformat()}"
+        )
+        scheduled.last_run_at = now
+        scheduled.next_run_at = CronExpression(scheduled.cron).next_after(now)
+    return len(due)
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class DatabaseBackend:
+    """Workers poll the jobs table"""
+
+    def announce(self, jobs: List[dict]) -> None:
+        pass
+
+    def wait(self, queues: Sequence[str], timeout: float) -> Optional[int]:
+        time.sleep(timeout)
+        return None
+
+
+class RedisBackend:
+    """Job ids are pushed to Redis so idle workers wake up at once"""
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+
+    @staticmethod
+    def _ready_key(queue: str) -> str:
+        return f"lims-qms:jobs:{queue}"
+
+    @staticmethod
+    def _delayed_key(queue: str) -> str:
+        return f"lims-qms:jobs:{queue}:delayed"
+
+    def announce(self, jobs: List[dict]) -> None:
+        now = time.time()
+        pipeline = self.client.pipeline()
+        for item in jobs:
+            run_at = item["run_at"].timestamp()
+            if run_at > now:
+                pipeline.zadd(self._delayed_key(item["queue"]), {item["id"]: run_at})
+            else:
+                pipeline.lpush(self._ready_key(item["queue"]), item["id"])
+        pipeline.execute()
+
+    def wait(self, queues: Sequence[str], timeout: float) -> Optional[int]:
+        now = time.time()
+        for queue in queues:
+            for job_id in self.client.zrangebyscore(self._delayed_key(queue), 0, now):
+                # Only the worker whose ZREM succeeds moves the id
+                if self.client.zrem(self._delayed_key(queue), job_id):
+                    self.client.lpush(self._ready_key(queue), job_id)
+        popped = self.client.brpop([self._ready_key(queue) for queue in queues], timeout=max(int(timeout), 1))
+        return int(popped[1]) if popped else None
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = RedisBackend() if settings.JOB_BACKEND == "redis" else DatabaseBackend()
+    return _backend
+
+
+@event.listens_for(Session, "after_commit")
+def _announce_after_commit(session: Session) -> None:
+    jobs = session.info.pop(_PENDING_KEY, None)
+    if jobs:
+        try:
+            get_backend().announce(jobs)
+        except Exception:
+            # Workers still find the jobs by polling the table
+            pass
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+# ---------------------------------------------------------------------------
+# Enqueue, claim, execute
+# ---------------------------------------------------------------------------
+
+def enqueue(
+    db: Session,
+    name: str,
+    payload: Optional[dict] = None,
+    run_at: Optional[datetime] = None,
+    delay: Optional[float] = None,
+    queue: Optional[str] = None,
+    priority: int = 0,
+    dedupe_key: Optional[str] = None,
+    max_attempts: Optional[int] = None
+) -> int:
+    """
+    Add a job in the caller's transaction
+
+    Args:
+        name: Registered job name
+        payload: Keyword arguments of the handler (JSON serializable)
+        run_at: Earliest start, or delay seconds from now
+        dedupe_key: When a queued or running job has the same key, no new
+            job is added and its id is returned
+
+    Returns:
+        Job id
+    """
+    definition = get_job_definition(name)
+    if run_at is None:
+        run_at = _now() + timedelta(seconds=delay or 0)
+    values = {
+        "name": name,
+        "queue": queue or definition.queue,
+        "payload": payload or {},
+        "status": QUEUED,
+        "priority": priority,
+        "run_at": run_at,
+        "attempts": 0,
+        "max_attempts": max_attempts or definition.max_attempts,
+        "dedupe_key": dedupe_key
+    }
+
+    if dedupe_key:
+        existing = _active_job_id(db, dedupe_key)
+        if existing:
+            return existing
+        try:
+            with db.begin_nested():
+                job_id = db.execute(insert(Job).values(**values).returning(Job.id)).scalar_one()
+        except IntegrityError:
+            # Added concurrently by another transaction
+            return _active_job_id(db, dedupe_key)
+    else:
+        job_id = db.execute(insert(Job).values(**values).returning(Job.id)).scalar_one()
+
+    if settings.JOB_BACKEND == "redis":
+        db.info.setdefault(_PENDING_KEY, []).append({"id": job_id, "queue": values["queue"], "run_at": run_at})
+    return job_id
+
+
+def _active_job_id(db: Session, dedupe_key: str) -> Optional[int]:
+    return db.query(Job.id).filter(Job.dedupe_key == dedupe_key, Job.status.in_([QUEUED, RUNNING])).scalar()
+
+
+def release_stale_jobs(db: Session) -> int:
+    """
+    Requeue running jobs whose worker has been silent too long, or fail them
+    when they have no attempts left; the caller commits
+    """
+    now = _now()
+    cutoff = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    stale = [Job.status == RUNNING, func.coalesce(Job.heartbeat_at, Job.started_at) < cutoff]
+    failed = db.execute(
+        update(Job.__table__)
+        .where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status=FAILED, locked_by=None, finished_at=now, last_error="Worker lost on the last attempt")
+        .returning(Job.id)
+    ).all()
+    released = db.execute(
+        update(Job.__table__)
+        .where(*stale)
+        .values(status=QUEUED, locked_by=None, last_error="Worker lost, requeued")
+        .returning(Job.id)
+    ).all()
+    return len(failed) + len(released)
+
+
+def claim_job(db: Session, queues: Sequence[str], worker: str, job_id: Optional[int] = None):
+    """
+    Lock and start the most urgent due job of some queues, committing the claim
+
+    Returns:
+        Row with id, name, payload, attempts and max_attempts, or None
+    """
+    now = _now()
+    candidate = db.query(Job.id).filter(
+        Job.status == QUEUED,
+        Job.queue.in_(queues),
+        Job.run_at <= now
+    )
+    if job_id is not None:
+        candidate = candidate.filter(Job.id == job_id)
+    candidate = candidate.order_by(Job.priority.desc(), Job.run_at, Job.id).limit(1).with_for_update(skip_locked=True)
+
+    claimed = db.execute(
+        update(Job.__table__)
+        .where(Job.id == candidate.scalar_subquery(), Job.status == QUEUED)
+        .values(status=RUNNING, locked_by=worker, started_at=now, heartbeat_at=now, attempts=Job.attempts + 1)
+        .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+    ).first()
+    db.commit()
+    return claimed
+
+
+class _Heartbeat:
+    """Keeps a running job's heartbeat_at fresh from a background thread"""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"job-{job_id}-heartbeat", daemon=True)
+
+    def _beat(self) -> None:
+        while not self._stop.wait(settings.JOB_HEARTBEAT_SECONDS):
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(Job.__table__)
+                    .where(Job.id == self.job_id, Job.status == RUNNING)
+                    .values(heartbeat_at=_now())
+                )
+                db.commit()
+            except Exception:
+                # Missed beats only matter after JOB_LOCK_TIMEOUT_SECONDS
+                db.rollback()
+            finally:
+                db.close()
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def execute_job(claimed) -> str:
+    """Run a claimed job in its own transaction and record the outcome"""
+    db = SessionLocal()
+    try:
+        try:
+            definition = get_job_definition(claimed.name)
+            with _Heartbeat(claimed.id):
+                result = definition.func(db, **(claimed.payload or {}))
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            retry = claimed.attempts < claimed.max_attempts and not isinstance(exc, JobError)
+            values = {"last_error": traceback.format_exc()[-4000:], "locked_by": None}
+            if retry:
+                delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (claimed.attempts - 1), MAX_RETRY_DELAY)
+                values.update(status=QUEUED, run_at=_now() + timedelta(seconds=delay))
+            else:
+                values.update(status=FAILED, finished_at=_now())
+            db.execute(update(Job.__table__).where(Job.id == claimed.id).values(**values))
+            db.commit()
+            return QUEUED if retry else FAILED
+
+        db.execute(
+            update(Job.__table__)
+            .where(Job.id == claimed.id)
+            .values(status=SUCCEEDED, finished_at=_now(), result=result, last_error=None, locked_by=None)
+        )
+        db.commit()
+        return SUCCEEDED
+    finally:
+        db.close()
+
+
+def run_pending(queues: Sequence[str] = (DEFAULT_QUEUE,), limit: Optional[int] = None, worker: str = "inline") -> int:
+    """Run due jobs in this process until none are left (or limit); returns how many ran"""
+    ran = 0
+    while limit is None or ran < limit:
+        db = SessionLocal()
+        try:
+            claimed = claim_job(db, queues, worker)
+        finally:
+            db.close()
+        if claimed is None:
+            break
+        execute_job(claimed)
+        ran += 1
+    return ran
+
+
+def retry_job(db: Session, job_id: int) -> bool:
+    """Queue a failed job again with fresh attempts; the caller commits"""
+    retried = db.execute(
+        update(Job.__table__)
+        .where(Job.id == job_id, Job.status == FAILED)
+        .values(status=QUEUED, attempts=0, run_at=_now(), finished_at=None)
+        .returning(Job.id, Job.queue, Job.run_at)
+    ).first()
+    if retried and settings.JOB_BACKEND == "redis":
+        db.info.setdefault(_PENDING_KEY, []).append({"id": retried.id, "queue": retried.queue, "run_at": _aware(retried.run_at)})
+    return retried is not None
+
+
+# ---------------------------------------------------------------------------
+# Visibility
+# ---------------------------------------------------------------------------
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(int(len(values) * fraction), len(values) - 1)], 3)
+
+
+def queue_stats(db: Session, window_minutes: int = 60) -> List[Dict[str, Any]]:
+    """
+    Depth, age and latency per queue
+
+    depth counts due queued jobs, delayed counts queued ones not due yet.
+    Latency (run_at to start) and run time are over jobs started within the
+    window.
+    """
+    now = _now()
+    stats: Dict[str, Dict[str, Any]] = {}
+
+    def entry(queue: str) -> Dict[str, Any]:
+        return stats.setdefault(queue, {
+            "queue": queue, "depth": 0, "delayed": 0, "running": 0, "failed": 0,
+            "oldest_queued_seconds": None, "started": 0, "succeeded": 0,
+            "latency_p50_seconds": None, "latency_p95_seconds": None, "run_time_p50_seconds": None
+        })
+
+    for queue, status, due, count, oldest in db.query(
+        Job.queue, Job.status, Job.run_at <= now, func.count(Job.id), func.min(Job.run_at)
+    ).filter(Job.status.in_([QUEUED, RUNNING, FAILED])).group_by(Job.queue, Job.status, Job.run_at <= now):
+        item = entry(queue)
+        if status == QUEUED and due:
+            item["depth"] += count
+            item["oldest_queued_seconds"] = round((now - _aware(oldest)).total_seconds(), 1)
+        elif status == QUEUED:
+            item["delayed"] += count
+        else:
+            item[status] += count
+
+    latencies: Dict[str, List[float]] = {}
+    run_times: Dict[str, List[float]] = {}
+    for queue, status, run_at, started_at, finished_at in db.query(
+        Job.queue, Job.status, Job.run_at, Job.started_at, Job.finished_at
+    ).filter(Job.started_at >= now - timedelta(minutes=window_minutes)):
+        item = entry(queue)
+        item["started"] += 1
+        latencies.setdefault(queue, []).append((_aware(started_at) - _aware(run_at)).total_seconds())
+        if status == SUCCEEDED:
+            item["succeeded"] += 1
+            run_times.setdefault(queue, []).append((_aware(finished_at) - _aware(started_at)).total_seconds())
+
+    for queue, item in stats.items():
+        item["latency_p50_seconds"] = _percentile(latencies.get(queue, []), 0.5)
+        item["latency_p95_seconds"] = _percentile(latencies.get(queue, []), 0.95)
+        item["run_time_p50_seconds"] = _percentile(run_times.get(queue, []), 0.5)
+    return sorted(stats.values(), key=lambda item: item["queue"])
+
+
+# ---------------------------------------------------------------------------
+# Worker processes
+# ---------------------------------------------------------------------------
+
+def _worker_main(queues: List[str], worker: str) -> None:
+    # Workers write out pending digest entries too, so digests go out without the API running
+    from .notifications import digester
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    _load_handlers()
+    backend = get_backend()
+
+    hint = None
+    next_digest = time.monotonic() + settings.NOTIFICATION_DIGEST_SECONDS
+    while not stopping:
+        if time.monotonic() >= next_digest:
+            _flush_digests(digester)
+            next_digest = time.monotonic() + settings.NOTIFICATION_DIGEST_SECONDS
+
+        db = SessionLocal()
+        try:
+            claimed = claim_job(db, queues, worker, job_id=hint)
+        except Exception:
+            claimed = None
+            time.sleep(settings.JOB_POLL_SECONDS)
+        finally:
+            db.close()
+
+        if claimed is not None:
+            execute_job(claimed)
+            hint = None
+        elif hint is not None:
+            # Someone else took the announced job; look for any other
+            hint = None
+        else:
+            try:
+                hint = backend.wait(queues, settings.JOB_POLL_SECONDS)
+            except Exception:
+                time.sleep(settings.JOB_POLL_SECONDS)
+
+    _flush_digests(digester)
+
+
+def _flush_digests(digester) -> None:
+    try:
+        digester.flush()
+    except Exception:
+        # The entries stay pending for the next flush
+        pass
+
+
+def _scheduler_tick() -> None:
+    db = SessionLocal()
+    try:
+        sync_default_schedules(db)
+        release_stale_jobs(db)
+        run_due_schedules(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+
+
+def run_workers(queues: List[str], concurrency: int, scheduler: bool = True) -> None:
+    """Start worker processes and supervise them, restarting any that die"""
+    host = socket.gethostname()
+    processes: Dict[int, multiprocessing.Process] = {}
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    def start(slot: int) -> None:
+        process = multiprocessing.Process(
+            target=_worker_main, args=(queues, f"{host}:{os.getpid()}:{slot}"), daemon=True
+        )
+        process.start()
+        processes[slot] = process
+
+    for slot in range(concurrency):
+        start(slot)
+
+    next_tick = 0.0
+    while not stopping:
+        if scheduler and time.monotonic() >= next_tick:
+            _scheduler_tick()
+            next_tick = time.monotonic() + SCHEDULER_INTERVAL
+        for slot, process in list(processes.items()):
+            if not process.is_alive():
+                start(slot)
+        time.sleep(1)
+
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        process.join(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Background job workers")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="Run worker processes")
+    worker.add_argument("--queues", default=DEFAULT_QUEUE, help="Comma separated queue names")
+    worker.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    worker.add_argument("--no-scheduler", action="store_true", help="Don't enqueue cron schedules")
+    commands.add_parser("scheduler", help="Only enqueue due cron schedules")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        run_workers([queue.strip() for queue in args.queues.split(",") if queue.strip()], args.concurrency,
+                    scheduler=not args.no_scheduler)
+    else:
+        while True:
+            _scheduler_tick()
+            time.sleep(SCHEDULER_INTERVAL)
+
+
+if __name__ == "__main__":
+    # Run through the package module so handlers register in the same registry
+    from backend.services.jobs import main as run_main
+
+    run_main()
@@ -0,0 +1,323 @@
+"""
+Leave engine
+
+Leave days are counted by the server: working weekdays
+(LEAVE_WORKING_WEEKDAYS) between the dates, minus company holidays. A
+request locks the employee row, then checks for overlapping pending or
+approved leave with a range query on ix_leaves_employee_dates, so two
+submissions for the same person can't both get through.
+
+leave_balances is a materialized per employee, type and year tally. A
+request moves its days into pending; the leave workflow hook moves them to
+used on approval, or back out on rejection and cancellation, with
+increments rather than read-modify-write. Leave is charged to the year it
+starts in and may not run into the next year. rebuild_leave_balances
+recomputes the tallies from the leaves if they ever drift.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.models.hr import Employee, Leave, LeaveBalance, Holiday, LeaveTypeEnum, EmploymentStatusEnum
+from backend.models.user import User
+from .workflow_engine import TransitionResult, on_transition
+
+PENDING = "pending"
+APPROVED = "approved"
+
+# Leave in these states blocks the dates and counts as time off
+BLOCKING_STATES = (PENDING, APPROVED)
+
+# Longest range a team capacity query may cover
+CAPACITY_MAX_DAYS = 93
+
+
+class LeaveError(ValueError):
+    """Leave request can't be accepted"""
+
+
+def holidays_between(db: Session, start: date, end: date) -> Set[date]:
+    return {
+        holiday_date for (holiday_date,) in db.query(Holiday.holiday_date).filter(
+            Holiday.holiday_date >= start,
+            Holiday.holiday_date <= end,
+            Holiday.is_deleted == False
+        )
+    }
+
+
+def count_working_days(start: date, end: date, holidays: Set[date] = frozenset()) -> int:
+    """Working weekdays from start to end inclusive, holidays excluded"""
+    if end < start:
+        return 0
+    weekdays = set(settings.LEAVE_WORKING_WEEKDAYS)
+    full_weeks, remainder = divmod((end - start).days + 1, 7)
+    count = full_weeks * len(weekdays)
+    count += sum(1 for offset in range(remainder) if (start.weekday() + offset) % 7 in weekdays)
+    count -= sum(1 for day in holidays if start <= day <= end and day.weekday() in weekdays)
+    return count
+
+
+def working_days(db: Session, start: date, end: date) -> int:
+    return count_working_days(start, end, holidays_between(db, start, end))
+
+
+def overlapping_leaves_query(db: Session, employee_id: int, start: date, end: date):
+    """Pending or approved leave of one employee overlapping start..end"""
+    return db.query(Leave).filter(
+        Leave.employee_id == employee_id,
+        Leave.status.in_(BLOCKING_STATES),
+        Leave.start_date <= end,
+        Leave.end_date >= start,
+        Leave.is_deleted == False
+    ).order_by(Leave.start_date)
+
+
+def get_balance(
+    db: Session,
+    employee_id: int,
+    leave_type: LeaveTypeEnum,
+    year: int,
+    lock: bool = False
+) -> Optional[LeaveBalance]:
+    """
+    Balance row of an employee, leave type and year
+
+    Created from LEAVE_ENTITLEMENTS on first use. None when the type isn't
+    balance-tracked (no entitlement configured and no row set up by HR).
+    """
+    query = db.query(LeaveBalance).filter(
+        LeaveBalance.employee_id == employee_id,
+        LeaveBalance.leave_type == leave_type,
+        LeaveBalance.year == year
+    )
+    if lock:
+        query = query.with_for_update()
+    balance = query.first()
+    if balance is not None:
+        return balance
+
+    entitlement = settings.LEAVE_ENTITLEMENTS.get(leave_type.value)
+    if entitlement is None:
+        return None
+    balance = LeaveBalance(employee_id=employee_id, leave_type=leave_type, year=year, entitled=float(entitlement), used=0.0, pending=0.0)
+    try:
+        with db.begin_nested():
+            db.add(balance)
+    except IntegrityError:
+        # Created concurrently
+        balance = query.first()
+    return balance
+
+
+def request_leave(
+    db: Session,
+    employee_id: int,
+    leave_type: LeaveTypeEnum,
+    start: date,
+    end: date,
+    user_id: int,
+    half_day: bool = False,
+    reason: Optional[str] = None
+) -> Leave:
+    """
+    Submit a leave request routed to the employee's reporting manager; the caller commits
+
+    Raises:
+        LeaveError: If the dates are invalid, overlap other leave, contain
+            no working day or exceed the available balance
+    """
+    if end < start:
+        raise LeaveError("Leave must end on or after its start date")
+    if start.year != end.year:
+        raise LeaveError("Leave can't run into the next year, submit a separate request from January 1")
+    if half_day and start != end:
+        raise LeaveError("A half-day leave covers a single date")
+
+    employee = db.query(Employee).filter(
+        Employee.id == employee_id,
+        Employee.is_deleted == False
+    ).with_for_update().first()
+    if employee is None:
+        raise LeaveError("Employee record not found")
+
+    overlap = overlapping_leaves_query(db, employee.id, start, end).first()
+    if overlap is not None:
+        raise LeaveError(
+            f"Overlaps {overlap.status} {overlap.leave_type.value.lower()} "
+            f"from {overlap.start_date} to {overlap.end_date}"
+        )
+
+    days = working_days(db, start, end)
+    if days == 0:
+        raise LeaveError("The selected dates contain no working days")
+    num_days = 0.5 if half_day else float(days)
+
+    balance = get_balance(db, employee.id, leave_type, start.year, lock=True)
+    if balance is not None and balance.available < num_days:
+        raise LeaveError(
+            f"Insufficient {leave_type.value.lower()} balance: "
+            f"{balance.available:g} days available, {num_days:g} requested"
+        )
+
+    leave = Leave(
+        employee_id=employee.id,
+        leave_type=leave_type,
+        start_date=start,
+        end_date=end,
+        num_days=num_days,
+        reason=reason,
+        status=PENDING,
+        approver_id=employee.reporting_manager_id,
+        created_by_id=user_id
+    )
+    db.add(leave)
+    if balance is not None:
+        balance.pending += num_days
+    db.flush()
+    return leave
+
+
+@on_transition("leave")
+def _update_balances(db: Session, result: TransitionResult) -> None:
+    rows = db.execute(
+        select(Leave.id, Leave.employee_id, Leave.leave_type, Leave.start_date, Leave.num_days)
+        .where(Leave.id.in_(result.succeeded))
+    ).all()
+
+    target = result.transition.target
+    deltas: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0.0])  # key -> [pending, used]
+    for row in rows:
+        delta = deltas[(row.employee_id, row.leave_type, row.start_date.year)]
+        previous = result.previous.get(row.id)
+        if previous == PENDING:
+            delta[0] -= row.num_days
+        elif previous == APPROVED:
+            delta[1] -= row.num_days
+        if target == PENDING:
+            delta[0] += row.num_days
+        elif target == APPROVED:
+            delta[1] += row.num_days
+
+    for (employee_id, leave_type, year), (pending, used) in deltas.items():
+        if pending or used:
+            db.execute(
+                update(LeaveBalance).where(
+                    LeaveBalance.employee_id == employee_id,
+                    LeaveBalance.leave_type == leave_type,
+                    LeaveBalance.year == year
+                ).values(pending=LeaveBalance.pending + pending, used=LeaveBalance.used + used)
+            )
+
+
+def rebuild_leave_balances(db: Session, year: int) -> int:
+    """Recompute used and pending of every balance row of a year from the leaves; the caller commits"""
+    def days_in(state: str):
+        return select(func.coalesce(func.sum(Leave.num_days), 0)).where(
+            Leave.employee_id == LeaveBalance.employee_id,
+            Leave.leave_type == LeaveBalance.leave_type,
+            Leave.status == state,
+            Leave.start_date >= date(year, 1, 1),
+            Leave.start_date <= date(year, 12, 31),
+            Leave.is_deleted == False
+        ).scalar_subquery()
+
+    return db.execute(
+        update(LeaveBalance)
+        .where(LeaveBalance.year == year)
+        .values(used=days_in(APPROVED), pending=days_in(PENDING))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def who_is_out_query(db: Session, department: str, start: date, end: date, include_pending: bool = False):
+    """Leave overlapping start..end of everyone in a department, with the employee's name and code"""
+    states = BLOCKING_STATES if include_pending else (APPROVED,)
+    return db.query(Leave, Employee.employee_code, User.id.label("user_id"), User.full_name).join(
+        Employee, Employee.id == Leave.employee_id
+    ).join(
+        User, User.id == Employee.user_id
+    ).filter(
+        User.department == department,
+        Leave.status.in_(states),
+        Leave.start_date <= end,
+        Leave.end_date >= start,
+        Leave.is_deleted == False
+    ).order_by(Leave.start_date, User.full_name)
+
+
+def team_capacity(
+    db: Session,
+    department: str,
+    start: date,
+    end: date,
+    include_pending: bool = False
+) -> dict:
+    """
+    Who is out in a department between two dates, and how many remain each working day
+
+    Raises:
+        LeaveError: If the range is empty or longer than CAPACITY_MAX_DAYS
+    """
+    if end < start:
+        raise LeaveError("End date must be on or after the start date")
+    if (end - start).days + 1 > CAPACITY_MAX_DAYS:
+        raise LeaveError(f"Range can't exceed {CAPACITY_MAX_DAYS} days")
+
+    rows = who_is_out_query(db, department, start, end, include_pending).all()
+    headcount = db.query(func.count(Employee.id)).join(User, User.id == Employee.user_id).filter(
+        User.department == department,
+        Employee.employment_status == EmploymentStatusEnum.ACTIVE,
+        Employee.is_deleted == False
+    ).scalar()
+    holidays = holidays_between(db, start, end)
+    weekdays = set(settings.LEAVE_WORKING_WEEKDAYS)
+
+    out_by_day: Dict[date, float] = defaultdict(float)
+    for leave, _, _, _ in rows:
+        share = 0.5 if leave.num_days == 0.5 and leave.start_date == leave.end_date else 1.0
+        day = max(leave.start_date, start)
+        while day <= min(leave.end_date, end):
+            out_by_day[day] += share
+            day += timedelta(days=1)
+
+    days = []
+    day = start
+    while day <= end:
+        if day.weekday() in weekdays and day not in holidays:
+            out = out_by_day.get(day, 0.0)
+            days.append({
+                "date": day,
+                "out": out,
+                "available": headcount - out,
+                "capacity": round((headcount - out) / headcount, 3) if headcount else None
+            })
+        day += timedelta(days=1)
+
+    return {
+        "department": department,
+        "start_date": start,
+        "end_date": end,
+        "headcount": headcount,
+        "out": [
+            {
+                "leave_id": leave.id,
+                "employee_id": leave.employee_id,
+                "employee_code": employee_code,
+                "user_id": user_id,
+                "name": full_name,
+                "leave_type": leave.leave_type.value,
+                "start_date": leave.start_date,
+                "end_date": leave.end_date,
+                "num_days": leave.num_days,
+                "status": leave.status
+            }
+            for leave, employee_code, user_id, full_name in rows
+        ],
+        "days": days
+    }
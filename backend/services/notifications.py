@@ -0,0 +1,488 @@
+"""
+Notification delivery
+
+Notifications are written with one multi-row INSERT per batch and pushed to
+connected clients (WebSocket or Server-Sent Events) once the writing
+transaction commits; a rollback drops the pending pushes with the rows.
+
+Delivery goes through an in-process hub. With NOTIFICATION_BROKER=redis each
+worker publishes to a Redis channel (REDIS_URL) and a listener task in every
+worker feeds its local hub, so a client connected to one uvicorn worker sees
+notifications written by another.
+
+Unread counts come from a per-process cache, seeded with one COUNT the first
+time a user is asked about and then adjusted from the same events that drive
+the push, so the badge doesn't scan the table on every poll.
+
+Bursts are cut down in two ways. Notifications about the same entity
+(user_id, category, entity) within NOTIFICATION_COALESCE_SECONDS collapse
+into the open unread row, which only gets its message and event_count
+updated. Categories listed in NOTIFICATION_DIGEST_CATEGORIES aren't written
+per event at all: each event is stored as a pending digest entry in the same
+transaction, and every NOTIFICATION_DIGEST_SECONDS the entries are turned
+into one digest row per user and category.
+With EMAIL_ENABLED, every new row (not a coalesced update) also queues an
+email in the outbox within the same transaction.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, event, func, insert, tuple_, update
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.core.database import SessionLocal
+from backend.models.notification import Notification, NotificationDigestEntry
+from backend.models.user import User
+from .email_outbox import queue_emails
+
+# Event names pushed to clients
+EVENT_NOTIFICATION = "notification"
+EVENT_READ = "read"
+
+REDIS_CHANNEL = "lims-qms:notifications"
+
+# Events buffered per connection; the oldest are dropped for slow clients
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Seconds before a cached unread count is re-read from the table
+UNREAD_CACHE_TTL = 300
+
+# Titles listed in a digest message before "and N more"
+DIGEST_PREVIEW_LINES = 10
+
+# Session.info key holding events to publish after commit
+_PENDING_KEY = "pending_notification_events"
+
+NOTIFICATION_DEFAULTS = {
+    "notification_type": "info",
+    "category": None,
+    "link": None,
+    "priority": "normal",
+    "created_by_id": None,
+}
+
+
+class NotificationHub:
+    """Fan-out of notification events to the connections of this process"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+        self._unread: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def uses_redis(self) -> bool:
+        return settings.NOTIFICATION_BROKER == "redis"
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Queue receiving the events of a user; call from the connection's event loop"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if not subscribers:
+                return
+            subscribers.discard(next((entry for entry in subscribers if entry[1] is queue), None))
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, events: List[dict]) -> None:
+        """Send events to every worker (Redis) or straight to this process's hub"""
+        if not events:
+            return
+        if self.uses_redis:
+            try:
+                self._redis_client().publish(REDIS_CHANNEL, json.dumps(events, default=str))
+                return
+            except Exception:
+                # Broker unavailable: clients connected to this worker still get the events
+                pass
+        self.deliver(events)
+
+    def deliver(self, events: List[dict]) -> None:
+        """Update cached counts and hand events to local subscribers"""
+        for item in events:
+            user_id = item["user_id"]
+            delta = item.get("unread_delta", 0)
+            with self._lock:
+                cached = self._unread.get(user_id)
+                if cached is not None:
+                    self._unread[user_id] = (max(cached[0] + delta, 0), cached[1])
+                    item = {**item, "unread": self._unread[user_id][0]}
+                subscribers = list(self._subscribers.get(user_id, ()))
+            for loop, queue in subscribers:
+                loop.call_soon_threadsafe(_offer, queue, item)
+
+    def unread_count(self, db: Session, user_id: int) -> int:
+        """Unread notifications of a user, from the cache when fresh"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._unread.get(user_id)
+        if cached is not None and now - cached[1] < UNREAD_CACHE_TTL:
+            return cached[0]
+
+        count = db.query(func.count(Notification.id)).filter(
+            Notification.user_id == user_id,
+            Notification.is_read == False,
+            Notification.is_deleted == False
+        ).scalar()
+        with self._lock:
+            self._unread[user_id] = (count, now)
+        return count
+
+    def _redis_client(self):
+        if self._redis is None:
+            import redis
+
+            self._redis = redis.Redis.from_url(settings.REDIS_URL)
+        return self._redis
+
+    async def start(self) -> None:
+        """Start listening on the Redis channel when Redis is the broker"""
+        if self.uses_redis and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self) -> None:
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(settings.REDIS_URL)
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(REDIS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.deliver(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Connection lost: counts may have drifted while disconnected
+                with self._lock:
+                    self._unread.clear()
+                await asyncio.sleep(5)
+            finally:
+                await client.close()
+
+
+def _offer(queue: asyncio.Queue, item: dict) -> None:
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+class NotificationDigester:
+    """Periodic writer of digest notifications from the pending digest entries"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def pending(self) -> int:
+        db = SessionLocal()
+        try:
+            return db.query(func.count(NotificationDigestEntry.id)).scalar()
+        finally:
+            db.close()
+
+    def flush(self) -> int:
+        """Write one digest notification per pending user and category"""
+        db = SessionLocal()
+        try:
+            # Locked rows belong to a concurrent flush in another process
+            entries = db.query(NotificationDigestEntry).order_by(
+                NotificationDigestEntry.id
+            ).with_for_update(skip_locked=True).all()
+            if not entries:
+                return 0
+
+            buffer: Dict[Tuple[int, str], dict] = {}
+            for entry in entries:
+                item = buffer.setdefault((entry.user_id, entry.category), {"count": 0, "titles": []})
+                item["count"] += 1
+                if len(item["titles"]) < DIGEST_PREVIEW_LINES:
+                    item["titles"].append(entry.title)
+                item["priority"] = entry.priority
+
+            rows = []
+            for (user_id, category), item in buffer.items():
+                lines = [f"- {title}" for title in item["titles"]]
+                if item["count"] > len(item["titles"]):
+                    lines.append(f"and {item['count'] - len(item['titles'])} more")
+                rows.append({
+                    **NOTIFICATION_DEFAULTS,
+                    "user_id": user_id,
+                    "title": f"{category.capitalize()} digest",
+                    "message": "\n".join(lines),
+                    "category": category,
+                    "priority": item["priority"],
+                    "group_key": f"{category}:digest",
+                    "event_count": item["count"]
+                })
+
+            _write_notifications(db, rows)
+            db.execute(delete(NotificationDigestEntry).where(
+                NotificationDigestEntry.id.in_([entry.id for entry in entries])
+            ))
+            db.commit()
+        except Exception:
+            # The entries stay in the table for the next run
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.NOTIFICATION_DIGEST_SECONDS)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                # Database unavailable: the entries are picked up on the next run
+                pass
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+hub = NotificationHub()
+digester = NotificationDigester()
+
+
+async def start() -> None:
+    """Start the Redis listener and the digest loop of this process"""
+    await hub.start()
+    await digester.start()
+
+
+async def stop() -> None:
+    """Stop background tasks, writing out any pending digest entries"""
+    await hub.stop()
+    await digester.stop()
+
+
+def _queue_events(db: Session, events: List[dict]) -> None:
+    db.info.setdefault(_PENDING_KEY, []).extend(events)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    hub.publish(session.info.pop(_PENDING_KEY, None))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _event(notification_id: int, row: dict, created_at, unread_delta: int) -> dict:
+    return {
+        "event": EVENT_NOTIFICATION,
+        "id": notification_id,
+        "user_id": row["user_id"],
+        "title": row["title"],
+        "message": row["message"],
+        "notification_type": row["notification_type"],
+        "category": row["category"],
+        "link": row["link"],
+        "priority": row["priority"],
+        "event_count": row["event_count"],
+        "created_at": created_at.isoformat() if created_at else None,
+        "unread_delta": unread_delta
+    }
+
+
+def _write_notifications(db: Session, rows: List[dict]) -> List[int]:
+    """Coalesce rows by (user_id, group_key) into open notifications, insert the rest"""
+    grouped: Dict[Tuple[int, str], dict] = {}
+    ungrouped = []
+    for row in rows:
+        row.setdefault("event_count", 1)
+        key = (row["user_id"], row["group_key"])
+        if row["group_key"] is None:
+            ungrouped.append(row)
+        elif key in grouped:
+            row["event_count"] += grouped[key]["event_count"]
+            grouped[key] = row
+        else:
+            grouped[key] = row
+
+    open_rows = {}
+    if grouped:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.NOTIFICATION_COALESCE_SECONDS)
+        open_rows = {
+            (user_id, group_key): (notification_id, event_count, created_at)
+            for notification_id, user_id, group_key, event_count, created_at in db.query(
+                Notification.id, Notification.user_id, Notification.group_key,
+                Notification.event_count, Notification.created_at
+            ).filter(
+                tuple_(Notification.user_id, Notification.group_key).in_(list(grouped)),
+                Notification.is_read == False,
+                Notification.is_deleted == False,
+                Notification.created_at >= cutoff
+            ).order_by(Notification.id)
+        }
+
+    ids, events, updates = [], [], []
+    for key, row in grouped.items():
+        if key not in open_rows:
+            ungrouped.append(row)
+            continue
+        notification_id, event_count, created_at = open_rows[key]
+        row["event_count"] += event_count
+        updates.append({
+            "id": notification_id,
+            "title": row["title"],
+            "message": row["message"],
+            "link": row["link"],
+            "priority": row["priority"],
+            "event_count": row["event_count"]
+        })
+        ids.append(notification_id)
+        events.append(_event(notification_id, row, created_at, 0))
+    if updates:
+        db.execute(update(Notification), updates)
+
+    if ungrouped:
+        inserted = db.execute(
+            insert(Notification).returning(
+                Notification.id, Notification.created_at, sort_by_parameter_order=True
+            ),
+            ungrouped
+        ).all()
+        for row, (notification_id, created_at) in zip(ungrouped, inserted):
+            ids.append(notification_id)
+            events.append(_event(notification_id, row, created_at, 1))
+        if settings.EMAIL_ENABLED:
+            _queue_notification_emails(db, ungrouped, [notification_id for notification_id, _ in inserted])
+
+    _queue_events(db, events)
+    return ids
+
+
+def _queue_notification_emails(db: Session, rows: List[dict], notification_ids: List[int]) -> None:
+    """Outbox emails for newly written notifications; coalesced updates don't send again"""
+    addresses = dict(
+        db.query(User.id, User.email).filter(
+            User.id.in_({row["user_id"] for row in rows}),
+            User.is_active == True
+        ).all()
+    )
+    queue_emails(db, [
+        {
+            "to_address": addresses.get(row["user_id"]),
+            "subject": row["title"],
+            "body": f"{row['message']}\n\n{row['link']}" if row["link"] else row["message"],
+            "user_id": row["user_id"],
+            "notification_id": notification_id
+        }
+        for row, notification_id in zip(rows, notification_ids)
+    ])
+
+
+def create_notifications(db: Session, rows: List[dict]) -> List[int]:
+    """
+    Persist notifications and push them after commit
+
+    Rows about the same entity within the coalescing window update the open
+    notification instead of adding one, and digest categories are stored as
+    pending entries until the next digest run.
+
+    Args:
+        db: Database session, committed by the caller
+        rows: Dicts with user_id, title and message, plus any other
+            Notification column and an optional `entity` (e.g. "document:12")
+            that identifies repeats
+
+    Returns:
+        Ids of the notifications written or updated
+    """
+    immediate, digest = [], []
+    for row in rows:
+        row = {**NOTIFICATION_DEFAULTS, **row}
+        entity = row.pop("entity", None)
+        if row.get("group_key") is None:
+            row["group_key"] = f"{row['category']}:{entity}" if entity else None
+        if row["category"] in settings.NOTIFICATION_DIGEST_CATEGORIES:
+            digest.append(row)
+        else:
+            immediate.append(row)
+
+    if digest:
+        db.execute(insert(NotificationDigestEntry), [
+            {
+                "user_id": row["user_id"],
+                "category": row["category"],
+                "title": row["title"],
+                "priority": row["priority"]
+            }
+            for row in digest
+        ])
+    if not immediate:
+        return []
+    return _write_notifications(db, immediate)
+
+
+def notify(
+    db: Session,
+    user_ids: Iterable[int],
+    title: str,
+    message: str,
+    **fields
+) -> List[int]:
+    """Send the same notification to several users"""
+    return create_notifications(db, [
+        {"user_id": user_id, "title": title, "message": message, **fields}
+        for user_id in dict.fromkeys(user_ids) if user_id
+    ])
+
+
+def mark_read(db: Session, user_id: int, ids: Optional[List[int]] = None) -> List[int]:
+    """
+    Mark notifications of a user read, all unread ones when no ids are given
+
+    Returns:
+        Ids that were unread and are now read
+    """
+    query = update(Notification.__table__).where(
+        Notification.user_id == user_id,
+        Notification.is_read == False
+    )
+    if ids is not None:
+        if not ids:
+            return []
+        query = query.where(Notification.id.in_(ids))
+
+    read_ids = list(db.execute(
+        query.values(is_read=True, read_at=datetime.utcnow().isoformat()).returning(Notification.id)
+    ).scalars())
+    if read_ids:
+        _queue_events(db, [{"event": EVENT_READ, "user_id": user_id, "ids": read_ids, "unread_delta": -len(read_ids)}])
+    return read_ids
@@ -0,0 +1,222 @@
+"""
+Project cost ledger
+
+project_cost_ledgers keeps one row of running totals per project, so
+budget burn, margin and forecast at completion are read from a single row
+instead of summing expenses, invoices and payments on every request.
+
+Totals move by increments in the same transaction as the change that
+causes them:
+
+- expenses count once approved: the expense workflow hook adds the amount
+  on approval and takes it back if an approved expense is ever moved out
+  of approved/paid;
+- invoices add their net amount (subtotal less discount, credit notes
+  negative, proforma invoices not at all) when issued;
+- payments add their amount when recorded against a project invoice.
+
+Project.actual_cost follows the expense total. rebuild_project_costs
+recomputes every ledger from the raw rows if they ever drift.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.models.financial import (
+    Expense, Invoice, Payment, ProjectCostLedger, ExpenseStatusEnum, InvoiceTypeEnum
+)
+from backend.models.workflow import Project, Task, TaskStatusEnum
+from .workflow_engine import TransitionResult, on_transition
+
+# Expenses in these states are project cost
+COSTED_STATES = (ExpenseStatusEnum.APPROVED, ExpenseStatusEnum.PAID)
+
+LEDGER_COLUMNS = ("expense_cost", "invoiced", "collected")
+
+
+def _ensure_ledger(db: Session, project_id: int) -> None:
+    if db.query(ProjectCostLedger.id).filter(ProjectCostLedger.project_id == project_id).first():
+        return
+    try:
+        with db.begin_nested():
+            db.add(ProjectCostLedger(project_id=project_id, expense_cost=0.0, invoiced=0.0, collected=0.0))
+    except IntegrityError:
+        # Created concurrently
+        pass
+
+
+def post_to_ledger(db: Session, project_id: Optional[int], **deltas: float) -> None:
+    """Add amounts to a project's running totals; part of the caller's transaction"""
+    deltas = {column: amount for column, amount in deltas.items() if amount}
+    if project_id is None or not deltas:
+        return
+    unknown = set(deltas) - set(LEDGER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown ledger columns: {', '.join(sorted(unknown))}")
+
+    _ensure_ledger(db, project_id)
+    db.execute(
+        update(ProjectCostLedger)
+        .where(ProjectCostLedger.project_id == project_id)
+        .values(**{column: getattr(ProjectCostLedger, column) + amount for column, amount in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+    if "expense_cost" in deltas:
+        db.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(actual_cost=select(func.round(ProjectCostLedger.expense_cost)).where(
+                ProjectCostLedger.project_id == project_id
+            ).scalar_subquery())
+            .execution_options(synchronize_session=False)
+        )
+
+
+def invoice_net_amount(invoice_type: InvoiceTypeEnum, subtotal: float, discount: Optional[float]) -> float:
+    """What an invoice adds to a project's billing"""
+    if invoice_type == InvoiceTypeEnum.PROFORMA:
+        return 0.0
+    amount = (subtotal or 0.0) - (discount or 0.0)
+    return -amount if invoice_type == InvoiceTypeEnum.CREDIT_NOTE else amount
+
+
+def post_invoice(db: Session, invoice: Invoice) -> None:
+    post_to_ledger(db, invoice.project_id, invoiced=invoice_net_amount(invoice.invoice_type, invoice.subtotal, invoice.discount))
+
+
+def post_payment(db: Session, payment: Payment) -> None:
+    if payment.invoice_id is None:
+        return
+    project_id = db.query(Invoice.project_id).filter(Invoice.id == payment.invoice_id).scalar()
+    post_to_ledger(db, project_id, collected=payment.amount)
+
+
+@on_transition("expense")
+def _post_expenses(db: Session, result: TransitionResult) -> None:
+    entering = result.transition.target in COSTED_STATES
+    rows = db.execute(
+        select(Expense.id, Expense.project_id, Expense.amount)
+        .where(Expense.id.in_(result.succeeded), Expense.project_id.isnot(None))
+    ).all()
+
+    deltas: Dict[int, float] = defaultdict(float)
+    for row in rows:
+        was_costed = result.previous.get(row.id) in COSTED_STATES
+        if entering and not was_costed:
+            deltas[row.project_id] += row.amount
+        elif was_costed and not entering:
+            deltas[row.project_id] -= row.amount
+
+    for project_id, amount in sorted(deltas.items()):
+        post_to_ledger(db, project_id, expense_cost=amount)
+
+
+def rebuild_project_costs(db: Session, project_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute ledgers from expenses, invoices and payments; the caller commits"""
+    project_query = db.query(Project.id).filter(Project.is_deleted == False)
+    if project_ids is not None:
+        project_query = project_query.filter(Project.id.in_(list(project_ids)))
+    ids = [project_id for (project_id,) in project_query]
+    if not ids:
+        return 0
+
+    totals = {project_id: dict.fromkeys(LEDGER_COLUMNS, 0.0) for project_id in ids}
+    for project_id, amount in db.query(Expense.project_id, func.sum(Expense.amount)).filter(
+        Expense.project_id.in_(ids),
+        Expense.status.in_(COSTED_STATES),
+        Expense.is_deleted == False
+    ).group_by(Expense.project_id):
+        totals[project_id]["expense_cost"] = amount or 0.0
+
+    for project_id, invoice_type, subtotal, discount in db.query(
+        Invoice.project_id, Invoice.invoice_type, func.sum(Invoice.subtotal), func.sum(func.coalesce(Invoice.discount, 0))
+    ).filter(
+        Invoice.project_id.in_(ids),
+        Invoice.is_deleted == False
+    ).group_by(Invoice.project_id, Invoice.invoice_type):
+        totals[project_id]["invoiced"] += invoice_net_amount(invoice_type, subtotal, discount)
+
+    for project_id, amount in db.query(Invoice.project_id, func.sum(Payment.amount)).join(
+        Invoice, Invoice.id == Payment.invoice_id
+    ).filter(
+        Invoice.project_id.in_(ids),
+        Invoice.is_deleted == False,
+        Payment.is_deleted == False
+    ).group_by(Invoice.project_id):
+        totals[project_id]["collected"] = amount or 0.0
+
+    for project_id in ids:
+        _ensure_ledger(db, project_id)
+        db.execute(
+            update(ProjectCostLedger)
+            .where(ProjectCostLedger.project_id == project_id)
+            .values(**totals[project_id])
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(actual_cost=round(totals[project_id]["expense_cost"]))
+            .execution_options(synchronize_session=False)
+        )
+    return len(ids)
+
+
+def _percent_complete(db: Session, project_id: int) -> Optional[float]:
+    """Task progress weighted by estimated hours, from one aggregate over ix_tasks_project"""
+    weighted, hours = db.query(
+        func.sum(func.coalesce(Task.progress, 0) * Task.estimated_hours),
+        func.sum(Task.estimated_hours)
+    ).filter(
+        Task.project_id == project_id,
+        Task.status != TaskStatusEnum.CANCELLED,
+        Task.estimated_hours > 0,
+        Task.is_deleted == False
+    ).one()
+    if not hours:
+        return None
+    return weighted / hours
+
+
+def cost_summary(db: Session, project: Project) -> dict:
+    """
+    Budget burn, margin and forecast at completion of a project
+
+    Costs and billing come from the ledger row. The forecast is the cost
+    performance based estimate at completion: actual cost divided by the
+    share of estimated work done, or the budget while nothing is done yet.
+    """
+    ledger = db.query(ProjectCostLedger).filter(ProjectCostLedger.project_id == project.id).first()
+    cost = ledger.expense_cost if ledger else 0.0
+    invoiced = ledger.invoiced if ledger else 0.0
+    collected = ledger.collected if ledger else 0.0
+    budget = float(project.budget) if project.budget else None
+
+    complete = _percent_complete(db, project.id)
+    if complete:
+        forecast = cost / (complete / 100)
+    else:
+        forecast = budget if budget is not None and budget > cost else cost
+    margin = invoiced - cost
+
+    return {
+        "project_id": project.id,
+        "project_number": project.project_number,
+        "as_of": date.today(),
+        "budget": budget,
+        "cost": round(cost, 2),
+        "invoiced": round(invoiced, 2),
+        "collected": round(collected, 2),
+        "burn": round(cost / budget, 4) if budget else None,
+        "remaining_budget": round(budget - cost, 2) if budget is not None else None,
+        "margin": round(margin, 2),
+        "margin_pct": round(margin / invoiced * 100, 2) if invoiced else None,
+        "percent_complete": round(complete, 1) if complete is not None else None,
+        "forecast_at_completion": round(forecast, 2),
+        "variance_at_completion": round(budget - forecast, 2) if budget is not None else None,
+        "updated_at": ledger.updated_at if ledger else None
+    }
@@ -0,0 +1,646 @@
+"""
+Receivables: payment status, aging and bank reconciliation
+
+Invoice.amount_paid is the sum of the payments recorded against an
+invoice and payment_status follows from it: Paid once the outstanding
+amount is within RECONCILE_AMOUNT_TOLERANCE, Overdue past the due date,
+Partial or Pending otherwise. Both are set for a whole set of invoices
+with two UPDATE statements (update_receivables), whenever invoices are
+issued or paid, and for every invoice by the nightly receivables job,
+which also moves invoices into Overdue as their due dates pass.
+
+receivable_aging keeps each customer's outstanding amount in the buckets
+0-30, 31-60, 61-90 and 90+ days past due, so the AR report is a read of
+one row per customer. Rows are recomputed with one grouped query for the
+customers whose invoices changed, and for everyone when the day changes.
+
+Bank statement credits are matched to open invoices (tax invoices and
+debit notes that aren't paid or cancelled) in two passes:
+
+1. by reference: invoice numbers found in the narration or bank reference
+   are looked up in a hash of normalized invoice numbers. One credit can
+   settle several referenced invoices when it covers all of them;
+2. by amount and date: credits without a referenced invoice are looked up
+   in the open invoices sorted by outstanding amount, taking the window
+   within the amount tolerance by bisection, and kept if the credit falls
+   between the invoice date and RECONCILE_DATE_TOLERANCE_DAYS after the
+   due date. Only a single fitting invoice (or a single exact amount among
+   several) is a match; otherwise the line is left Ambiguous with its
+   candidates for a manual match.
+
+Amounts are compared in integer paise. A match records one Payment per
+invoice it settles, linked to the statement line.
+"""
+import codecs
+import csv
+import hashlib
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, case, delete, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.models.crm import Customer
+from backend.models.financial import (
+    BankStatementLine, Invoice, Payment, ReceivableAging,
+    InvoiceTypeEnum, PaymentStatusEnum, StatementLineStatusEnum
+)
+from .project_costs import post_to_ledger
+
+# Invoice types that are owed by the customer
+RECEIVABLE_TYPES = (InvoiceTypeEnum.TAX_INVOICE, InvoiceTypeEnum.DEBIT_NOTE)
+SETTLED_STATES = (PaymentStatusEnum.PAID, PaymentStatusEnum.CANCELLED)
+
+AGING_BUCKETS = (
+    ("0-30", "days_0_30"),
+    ("31-60", "days_31_60"),
+    ("61-90", "days_61_90"),
+    ("90+", "days_over_90"),
+)
+
+# Errors listed in an import summary; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Accepted header names, lower case with spaces, dashes, dots and underscores removed
+_DATE_COLUMNS = ("valuedate", "date", "txndate", "transactiondate", "postingdate", "trandate")
+_AMOUNT_COLUMNS = ("amount", "amt")
+_CREDIT_COLUMNS = ("credit", "creditamount", "deposit", "deposits", "cr", "depositamt")
+_DEBIT_COLUMNS = ("debit", "debitamount", "withdrawal", "withdrawals", "dr", "withdrawalamt")
+_REFERENCE_COLUMNS = ("reference", "referenceno", "refno", "ref", "chequeno", "chqrefno", "utr", "transactionid")
+_DESCRIPTION_COLUMNS = ("description", "narration", "particulars", "remarks", "details")
+
+_DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%m-%y", "%d-%b-%Y", "%d %b %Y", "%d-%b-%y", "%Y/%m/%d")
+
+
+class ReconcileError(ValueError):
+    """Statement line can't be matched to the invoice"""
+
+
+def _paise(amount: Optional[float]) -> int:
+    return int((Decimal(str(amount or 0)) * 100).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def _status(value: PaymentStatusEnum):
+    return literal(value, type_=Invoice.__table__.c.payment_status.type)
+
+
+def _open_receivables():
+    return and_(
+        Invoice.invoice_type.in_(RECEIVABLE_TYPES),
+        Invoice.payment_status.notin_(SETTLED_STATES),
+        Invoice.is_deleted == False
+    )
+
+
+def update_receivables(db: Session, invoice_ids: Optional[Iterable[int]] = None, today: Optional[date] = None) -> int:
+    """
+    Recompute amount paid and payment status of some invoices, or all, and re-age their customers; the caller commits
+
+    Returns:
+        Number of invoices updated
+    """
+    today = today or date.today()
+    table = Invoice.__table__
+    scope = [table.c.invoice_type.in_(RECEIVABLE_TYPES), table.c.is_deleted == False]
+    if invoice_ids is not None:
+        invoice_ids = sorted(set(invoice_ids))
+        if not invoice_ids:
+            return 0
+        scope.append(table.c.id.in_(invoice_ids))
+
+    paid = select(func.coalesce(func.sum(Payment.__table__.c.amount), 0.0)).where(
+        Payment.__table__.c.invoice_id == table.c.id,
+        Payment.__table__.c.is_deleted == False
+    ).scalar_subquery()
+    db.execute(update(table).where(*scope).values(amount_paid=paid))
+
+    outstanding = table.c.total_amount - table.c.amount_paid
+    updated = db.execute(
+        update(table)
+        .where(*scope, or_(table.c.payment_status.is_(None), table.c.payment_status != PaymentStatusEnum.CANCELLED))
+        .values(payment_status=case(
+            (outstanding <= settings.RECONCILE_AMOUNT_TOLERANCE, _status(PaymentStatusEnum.PAID)),
+            (func.coalesce(table.c.due_date, table.c.invoice_date) < today, _status(PaymentStatusEnum.OVERDUE)),
+            (table.c.amount_paid > 0, _status(PaymentStatusEnum.PARTIAL)),
+            else_=_status(PaymentStatusEnum.PENDING)
+        ))
+    ).rowcount
+
+    if invoice_ids is None:
+        refresh_aging(db, as_of=today)
+    else:
+        customer_ids = {
+            customer_id for (customer_id,) in db.query(Invoice.customer_id).filter(
+                Invoice.id.in_(invoice_ids), Invoice.customer_id.isnot(None)
+            )
+        }
+        refresh_aging(db, customer_ids, as_of=today)
+    return updated
+
+
+def refresh_aging(db: Session, customer_ids: Optional[Iterable[int]] = None, as_of: Optional[date] = None) -> int:
+    """
+    Recompute the aging rows of some customers, or all; the caller commits
+
+    Returns:
+        Number of customers with an outstanding balance
+    """
+    as_of = as_of or date.today()
+    if customer_ids is not None:
+        customer_ids = sorted(set(customer_ids))
+        if not customer_ids:
+            return 0
+
+    aged_from = func.coalesce(Invoice.due_date, Invoice.invoice_date)
+    outstanding = Invoice.total_amount - func.coalesce(Invoice.amount_paid, 0)
+    day_30, day_60, day_90 = (as_of - timedelta(days=days) for days in (30, 60, 90))
+
+    def bucket(condition):
+        return func.coalesce(func.sum(case((condition, outstanding), else_=0.0)), 0.0)
+
+    query = db.query(
+        Invoice.customer_id,
+        func.count(Invoice.id),
+        bucket(aged_from >= day_30),
+        bucket(and_(aged_from < day_30, aged_from >= day_60)),
+        bucket(and_(aged_from < day_60, aged_from >= day_90)),
+        bucket(aged_from < day_90),
+        func.sum(outstanding)
+    ).filter(
+        _open_receivables(),
+        Invoice.customer_id.isnot(None),
+        outstanding > 0
+    )
+    delete_rows = delete(ReceivableAging)
+    if customer_ids is not None:
+        query = query.filter(Invoice.customer_id.in_(customer_ids))
+        delete_rows = delete_rows.where(ReceivableAging.customer_id.in_(customer_ids))
+
+    rows = [
+        {
+            "customer_id": customer_id,
+            "as_of": as_of,
+            "open_invoices": count,
+            "days_0_30": round(days_0_30, 2),
+            "days_31_60": round(days_31_60, 2),
+            "days_61_90": round(days_61_90, 2),
+            "days_over_90": round(days_over_90, 2),
+            "total": round(total, 2)
+        }
+        for customer_id, count, days_0_30, days_31_60, days_61_90, days_over_90, total
+        in query.group_by(Invoice.customer_id)
+    ]
+    db.execute(delete_rows.execution_options(synchronize_session=False))
+    if rows:
+        db.execute(insert(ReceivableAging), rows)
+    return len(rows)
+
+
+def aging_stale(db: Session, today: Optional[date] = None) -> bool:
+    """Whether some aging rows were computed before today"""
+    return db.query(ReceivableAging.id).filter(ReceivableAging.as_of < (today or date.today())).first() is not None
+
+
+def aging_report(db: Session, customer_id: Optional[int] = None, skip: int = 0, limit: int = 100) -> dict:
+    """Outstanding receivables by age bucket, largest balances first"""
+    query = db.query(ReceivableAging, Customer.customer_code, Customer.company_name).join(
+        Customer, Customer.id == ReceivableAging.customer_id
+    )
+    if customer_id is not None:
+        query = query.filter(ReceivableAging.customer_id == customer_id)
+
+    columns = [column for _, column in AGING_BUCKETS] + ["total"]
+    totals = db.query(
+        func.count(ReceivableAging.id),
+        func.min(ReceivableAging.as_of),
+        *(func.coalesce(func.sum(getattr(ReceivableAging, column)), 0.0) for column in columns)
+    )
+    if customer_id is not None:
+        totals = totals.filter(ReceivableAging.customer_id == customer_id)
+    customers, as_of, *sums = totals.one()
+
+    rows = query.order_by(ReceivableAging.total.desc(), ReceivableAging.customer_id).offset(skip).limit(limit).all()
+    return {
+        "as_of": as_of or date.today(),
+        "buckets": [label for label, _ in AGING_BUCKETS],
+        "customers": customers,
+        "totals": {column: round(amount, 2) for column, amount in zip(columns, sums)},
+        "rows": [
+            {
+                "customer_id": aging.customer_id,
+                "customer_code": code,
+                "company_name": name,
+                "open_invoices": aging.open_invoices,
+                **{column: getattr(aging, column) for column in columns}
+            }
+            for aging, code, name in rows
+        ]
+    }
+
+
+# Bank statements
+
+class StatementImport:
+    """Counts and first errors of one statement import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.lines = 0
+        self.duplicates = 0
+        self.ignored = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.line_ids: List[int] = []
+
+    def error(self, row_number: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "message": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "lines": self.lines,
+            "duplicates": self.duplicates,
+            "ignored": self.ignored,
+            "failed": self.failed,
+            "errors": self.errors
+        }
+
+
+def _column(header: Dict[str, int], names: Tuple[str, ...]) -> Optional[int]:
+    for name in names:
+        if name in header:
+            return header[name]
+    return None
+
+
+def _parse_date(value: str) -> date:
+    value = value.strip()
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date '{value}'")
+
+
+def _parse_amount(value: str) -> Optional[Decimal]:
+    value = re.sub(r"[\s,₹]|INR|Rs\.?", "", value or "", flags=re.IGNORECASE)
+    if not value or value == "-":
+        return None
+    sign = 1
+    if value[-2:].upper() in ("CR", "DR"):
+        sign = -1 if value[-2:].upper() == "DR" else 1
+        value = value[:-2]
+    if value.startswith("(") and value.endswith(")"):
+        sign, value = -sign, value[1:-1]
+    try:
+        return sign * Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Unrecognised amount '{value}'")
+
+
+def _cell(row: List[str], column: Optional[int]) -> str:
+    return row[column].strip() if column is not None and column < len(row) else ""
+
+
+def read_statement(stream: BinaryIO) -> Iterator[Tuple[int, Optional[tuple], Optional[str]]]:
+    """
+    Parse a bank statement CSV
+
+    The header names a date column and either a signed amount column or
+    separate credit and debit columns; reference and narration are optional.
+
+    Yields:
+        (row number, (value date, amount, reference, description) or None, error or None)
+    """
+    reader = csv.reader(codecs.iterdecode(stream, "utf-8-sig"))
+    try:
+        header_row = next(reader)
+    except StopIteration:
+        return
+    header = {re.sub(r"[\s_.-]", "", name.lower()): index for index, name in enumerate(header_row)}
+
+    date_column = _column(header, _DATE_COLUMNS)
+    amount_column = _column(header, _AMOUNT_COLUMNS)
+    credit_column = _column(header, _CREDIT_COLUMNS)
+    debit_column = _column(header, _DEBIT_COLUMNS)
+    reference_column = _column(header, _REFERENCE_COLUMNS)
+    description_column = _column(header, _DESCRIPTION_COLUMNS)
+    if date_column is None or (amount_column is None and credit_column is None):
+        yield 0, None, "Header needs a date column and an amount (or credit) column"
+        return
+
+    for row_number, row in enumerate(reader, start=1):
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            value_date = _parse_date(row[date_column])
+            if amount_column is not None:
+                amount = _parse_amount(_cell(row, amount_column))
+            else:
+                credit = _parse_amount(_cell(row, credit_column))
+                debit = _parse_amount(_cell(row, debit_column))
+                amount = (credit or 0) - abs(debit or 0) if credit is not None or debit is not None else None
+        except IndexError:
+            yield row_number, None, "Missing columns"
+            continue
+        except ValueError as exc:
+            yield row_number, None, str(exc)
+            continue
+        if amount is None:
+            yield row_number, None, "Missing amount"
+            continue
+        reference = _cell(row, reference_column)[:200] or None
+        description = _cell(row, description_column) or None
+        yield row_number, (value_date, float(amount), reference, description), None
+
+
+def _line_hash(bank_account: Optional[str], value_date: date, amount: float, reference: Optional[str],
+               description: Optional[str], occurrence: int) -> str:
+    key = "|".join([bank_account or "", value_date.isoformat(), f"{amount:.2f}", reference or "", description or "", str(occurrence)])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def import_statement(db: Session, stream: BinaryIO, user_id: int, bank_account: Optional[str] = None) -> StatementImport:
+    """
+    Store the lines of a statement CSV; the caller commits
+
+    Lines already imported are skipped, so overlapping statements can be
+    imported again. Identical lines within one file are told apart by
+    their order.
+    """
+    summary = StatementImport()
+    lines: Dict[str, dict] = {}
+    occurrences: Dict[tuple, int] = defaultdict(int)
+    for row_number, line, error in read_statement(stream):
+        summary.rows += 1 if row_number else 0
+        if error:
+            summary.error(row_number, error)
+            continue
+        value_date, amount, reference, description = line
+        occurrences[line] += 1
+        line_hash = _line_hash(bank_account, value_date, amount, reference, description, occurrences[line])
+        lines[line_hash] = {
+            "line_hash": line_hash,
+            "bank_account": bank_account,
+            "value_date": value_date,
+            "amount": amount,
+            "reference": reference,
+            "description": description,
+            "status": StatementLineStatusEnum.UNMATCHED if amount > 0 else StatementLineStatusEnum.IGNORED,
+            "created_by_id": user_id
+        }
+
+    hashes = list(lines)
+    existing: Set[str] = set()
+    for start in range(0, len(hashes), 1000):
+        existing.update(
+            line_hash for (line_hash,) in db.query(BankStatementLine.line_hash).filter(
+                BankStatementLine.line_hash.in_(hashes[start:start + 1000])
+            )
+        )
+    summary.duplicates = len(existing)
+
+    new_lines = [BankStatementLine(**values) for line_hash, values in lines.items() if line_hash not in existing]
+    db.add_all(new_lines)
+    db.flush()
+    summary.lines = len(new_lines)
+    summary.ignored = sum(1 for line in new_lines if line.status == StatementLineStatusEnum.IGNORED)
+    summary.line_ids = [line.id for line in new_lines if line.status == StatementLineStatusEnum.UNMATCHED]
+    return summary
+
+
+def _normalize(number: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "", number.upper())
+
+
+def _reference_keys(text: str) -> List[str]:
+    """Candidate invoice numbers in a narration: every token and every run of two or three tokens, joined"""
+    tokens = re.findall(r"[A-Z0-9]+", text.upper())
+    keys = []
+    for size in (1, 2, 3):
+        keys.extend("".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+    return keys
+
+
+def match_lines(
+    lines: Sequence[Tuple[int, date, int, str]],
+    invoices: Sequence[Tuple[int, Optional[int], str, date, Optional[date], int]],
+    amount_tolerance: int,
+    date_tolerance_days: int
+) -> Dict[int, Tuple[StatementLineStatusEnum, Optional[str], List[Tuple[int, int]], List[int]]]:
+    """
+    Match statement credits to open invoices
+
+    Settled invoices are passed with nothing outstanding: a credit naming one
+    is a duplicate or refund to look at, not a payment for another invoice
+    of the same amount. Matching by amount alone only picks between
+    invoices of one customer.
+
+    Args:
+        lines: (line id, value date, amount in paise, reference and narration text)
+        invoices: (invoice id, customer id, invoice number, invoice date, due date, outstanding paise)
+        amount_tolerance: Paise a credit may differ from what's due
+        date_tolerance_days: Days past the due date still matched by amount
+
+    Returns:
+        For every line: (status, rule, [(invoice id, paise allocated)], candidate invoice ids)
+    """
+    by_number = {_normalize(number): invoice_id for invoice_id, _, number, _, _, _ in invoices}
+    details = {invoice[0]: invoice for invoice in invoices}
+    remaining = {invoice_id: outstanding for invoice_id, _, _, _, _, outstanding in invoices}
+    results = {}
+    by_amount = []
+
+    # Pass 1: hash join on invoice numbers in the text
+    for line_id, value_date, amount, text in sorted(lines, key=lambda line: (line[1], line[0])):
+        referenced = list(dict.fromkeys(
+            by_number[key] for key in _reference_keys(text) if key in by_number
+        ))
+        if not referenced:
+            by_amount.append((line_id, value_date, amount))
+            continue
+        referenced = [invoice_id for invoice_id in referenced if remaining[invoice_id] > 0]
+        if not referenced:
+            # Names settled invoices; not for another invoice of the same amount
+            results[line_id] = (StatementLineStatusEnum.UNMATCHED, None, [], [])
+            continue
+
+        due = sum(remaining[invoice_id] for invoice_id in referenced)
+        if len(referenced) == 1 and amount <= due + amount_tolerance:
+            allocations = [(referenced[0], amount)]
+        elif len(referenced) > 1 and abs(amount - due) <= amount_tolerance:
+            allocations = [(invoice_id, remaining[invoice_id]) for invoice_id in referenced[:-1]]
+            allocations.append((referenced[-1], amount - sum(paise for _, paise in allocations)))
+        else:
+            exact = [invoice_id for invoice_id in referenced if abs(remaining[invoice_id] - amount) <= amount_tolerance]
+            if len(exact) != 1:
+                results[line_id] = (StatementLineStatusEnum.AMBIGUOUS, None, [], referenced)
+                continue
+            allocations = [(exact[0], amount)]
+        for invoice_id, paise in allocations:
+            remaining[invoice_id] -= paise
+        results[line_id] = (StatementLineStatusEnum.MATCHED, "reference", allocations, [])
+
+    # Pass 2: sorted window on the outstanding amount, then the date range
+    pool = sorted((outstanding, invoice_id) for invoice_id, outstanding in remaining.items() if outstanding > 0)
+    amounts = [outstanding for outstanding, _ in pool]
+    taken: Set[int] = set()
+    for line_id, value_date, amount in by_amount:
+        low = bisect_left(amounts, amount - amount_tolerance)
+        high = bisect_right(amounts, amount + amount_tolerance)
+        candidates = []
+        for outstanding, invoice_id in pool[low:high]:
+            _, _, _, invoice_date, due_date, _ = details[invoice_id]
+            latest = (due_date or invoice_date) + timedelta(days=date_tolerance_days)
+            if invoice_id not in taken and invoice_date <= value_date <= latest:
+                candidates.append((outstanding, invoice_id))
+        if len(candidates) > 1 and len({details[invoice_id][1] for _, invoice_id in candidates}) == 1:
+            exact = [candidate for candidate in candidates if candidate[0] == amount]
+            if len(exact) == 1:
+                candidates = exact
+        if len(candidates) == 1:
+            invoice_id = candidates[0][1]
+            taken.add(invoice_id)
+            results[line_id] = (StatementLineStatusEnum.MATCHED, "amount", [(invoice_id, amount)], [])
+        elif candidates:
+            results[line_id] = (StatementLineStatusEnum.AMBIGUOUS, None, [], sorted(invoice_id for _, invoice_id in candidates))
+        else:
+            results[line_id] = (StatementLineStatusEnum.UNMATCHED, None, [], [])
+    return results
+
+
+def _record_payments(db: Session, matches: List[Tuple[BankStatementLine, List[Tuple[int, int]]]], user_id: int) -> List[Payment]:
+    """Payments for matched lines, posted to project ledgers, with the invoices' receivables updated"""
+    invoice_ids = {invoice_id for _, allocations in matches for invoice_id, _ in allocations}
+    invoices = {
+        invoice.id: invoice for invoice in db.query(Invoice.id, Invoice.project_id, Invoice.currency).filter(
+            Invoice.id.in_(invoice_ids)
+        )
+    } if invoice_ids else {}
+
+    year = datetime.now().year
+    count = db.query(Payment).count()
+    payments = []
+    collected: Dict[int, float] = defaultdict(float)
+    for line, allocations in matches:
+        for invoice_id, paise in allocations:
+            amount = paise / 100
+            payments.append(Payment(
+                payment_number=f"PAY-{year}-{count + len(payments) + 1:04d}",
+                invoice_id=invoice_id,
+                payment_date=line.value_date,
+                amount=amount,
+                currency=invoices[invoice_id].currency,
+                payment_method="Bank Transfer",
+                reference_number=line.reference,
+                bank_name=line.bank_account,
+                statement_line_id=line.id,
+                received_by_id=user_id,
+                created_by_id=user_id
+            ))
+            if invoices[invoice_id].project_id is not None:
+                collected[invoices[invoice_id].project_id] += amount
+    db.add_all(payments)
+    db.flush()
+
+    for project_id, amount in sorted(collected.items()):
+        post_to_ledger(db, project_id, collected=amount)
+    update_receivables(db, invoice_ids)
+    return payments
+
+
+def _receivable_invoice_rows(db: Session, latest: Optional[date] = None) -> List[tuple]:
+    """Every receivable invoice for matching, settled ones with nothing outstanding"""
+    query = db.query(
+        Invoice.id, Invoice.customer_id, Invoice.invoice_number, Invoice.invoice_date, Invoice.due_date,
+        Invoice.total_amount, Invoice.amount_paid, Invoice.payment_status
+    ).filter(
+        Invoice.invoice_type.in_(RECEIVABLE_TYPES),
+        Invoice.is_deleted == False
+    )
+    if latest is not None:
+        query = query.filter(Invoice.invoice_date <= latest)
+    return [
+        (
+            invoice_id, customer_id, number, invoice_date, due_date,
+            0 if payment_status in SETTLED_STATES else _paise(total) - _paise(paid)
+        )
+        for invoice_id, customer_id, number, invoice_date, due_date, total, paid, payment_status in query
+    ]
+
+
+def reconcile(db: Session, user_id: int, line_ids: Optional[Iterable[int]] = None) -> dict:
+    """
+    Match unmatched and ambiguous statement credits, or the given ones, to open invoices; the caller commits
+
+    Returns:
+        Counts of matched, ambiguous and unmatched lines and payments recorded
+    """
+    query = db.query(BankStatementLine).filter(
+        BankStatementLine.status.in_([StatementLineStatusEnum.UNMATCHED, StatementLineStatusEnum.AMBIGUOUS]),
+        BankStatementLine.amount > 0,
+        BankStatementLine.is_deleted == False
+    )
+    if line_ids is not None:
+        query = query.filter(BankStatementLine.id.in_(list(line_ids)))
+    lines = {line.id: line for line in query.with_for_update()}
+    counts = {"matched": 0, "ambiguous": 0, "unmatched": 0, "payments": 0}
+    if not lines:
+        return counts
+
+    results = match_lines(
+        [
+            (line.id, line.value_date, _paise(line.amount), f"{line.reference or ''} {line.description or ''}")
+            for line in lines.values()
+        ],
+        _receivable_invoice_rows(db, max(line.value_date for line in lines.values())),
+        _paise(settings.RECONCILE_AMOUNT_TOLERANCE),
+        settings.RECONCILE_DATE_TOLERANCE_DAYS
+    )
+
+    matches = []
+    for line_id, (line_status, rule, allocations, candidates) in results.items():
+        line = lines[line_id]
+        line.status = line_status
+        line.match_rule = rule
+        line.candidate_invoice_ids = candidates or None
+        line.updated_by_id = user_id
+        counts[line_status.value.lower()] += 1
+        if allocations:
+            matches.append((line, allocations))
+    if matches:
+        counts["payments"] = len(_record_payments(db, matches, user_id))
+    db.flush()
+    return counts
+
+
+def match_manually(db: Session, line: BankStatementLine, invoice: Invoice, user_id: int) -> Payment:
+    """
+    Settle an invoice with a statement credit; the caller commits
+
+    Raises:
+        ReconcileError: If the line isn't an open credit or the invoice isn't open
+    """
+    if line.status not in (StatementLineStatusEnum.UNMATCHED, StatementLineStatusEnum.AMBIGUOUS) or line.amount <= 0:
+        raise ReconcileError("Only unmatched or ambiguous credits can be matched")
+    if invoice.invoice_type not in RECEIVABLE_TYPES or invoice.payment_status in SETTLED_STATES or invoice.is_deleted:
+        raise ReconcileError("Invoice is not open for payment")
+
+    line.status = StatementLineStatusEnum.MATCHED
+    line.match_rule = "manual"
+    line.candidate_invoice_ids = None
+    line.updated_by_id = user_id
+    payment, = _record_payments(db, [(line, [(invoice.id, _paise(line.amount))])], user_id)
+    return payment
@@ -0,0 +1,351 @@
+"""
+Project scheduling (critical path method)
+
+A project's tasks and finish-to-start dependencies form a DAG. The schedule
+is computed with one topological pass (Kahn's algorithm) for the early
+start/finish of every task and one pass in reverse order for the late
+start/finish, so the cost is linear in tasks plus dependencies. Durations
+are working days (estimated_hours / SCHEDULE_HOURS_PER_DAY, rounded up;
+cancelled and unestimated tasks take none) counted from the project start
+on the company calendar: LEAVE_WORKING_WEEKDAYS minus holidays.
+
+Computed schedules are cached per process as encoded JSON, keyed by
+Project.schedule_version. A before_flush listener bumps that version for
+every project whose tasks or dependencies are added, changed or removed
+through the ORM; bulk Core updates call bump_schedule_version themselves.
+The version lives in the database, so every worker sees the change.
+"""
+import json
+import math
+import threading
+from collections import OrderedDict, deque
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, inspect, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.models.hr import Holiday
+from backend.models.workflow import Project, Task, TaskDependency, TaskStatusEnum
+from .leave import count_working_days, holidays_between
+
+# Computed schedules kept per process
+SCHEDULE_CACHE_SIZE = 64
+
+_schedule_cache: "OrderedDict[int, Tuple[tuple, bytes]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class ScheduleError(ValueError):
+    """Dependency can't be added or the project can't be scheduled"""
+
+
+def bump_schedule_version(db: Session, project_ids: Iterable[Optional[int]]) -> None:
+    """Mark the schedules of some projects as stale; part of the caller's transaction"""
+    project_ids = sorted({project_id for project_id in project_ids if project_id is not None})
+    if project_ids:
+        db.connection().execute(
+            update(Project.__table__)
+            .where(Project.__table__.c.id.in_(project_ids))
+            .values(schedule_version=Project.__table__.c.schedule_version + 1)
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _track_schedule_changes(session: Session, flush_context, instances) -> None:
+    project_ids: Set[int] = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TaskDependency):
+            project_ids.add(obj.project_id)
+        elif isinstance(obj, Task) and (obj in session.new or obj in session.deleted or session.is_modified(obj)):
+            history = inspect(obj).attrs.project_id.history
+            project_ids.update(history.added or ())
+            project_ids.update(history.deleted or ())
+            project_ids.update(history.unchanged or ())
+    bump_schedule_version(session, project_ids)
+
+
+def task_duration(task_status: TaskStatusEnum, estimated_hours: Optional[int]) -> int:
+    """Working days a task takes"""
+    if task_status == TaskStatusEnum.CANCELLED or not estimated_hours:
+        return 0
+    return math.ceil(estimated_hours / settings.SCHEDULE_HOURS_PER_DAY)
+
+
+def critical_path(
+    durations: List[int],
+    edges: Iterable[Tuple[int, int, int]]
+) -> Tuple[List[int], List[int], List[int], List[int], List[int], int]:
+    """
+    Early and late schedule of a task network
+
+    Args:
+        durations: Duration of every node, in working days
+        edges: (predecessor index, successor index, lag) triples
+
+    Returns:
+        Topological order, early starts, late starts, total slack, free
+        slack, and the project length
+
+    Raises:
+        ScheduleError: If the dependencies contain a cycle
+    """
+    count = len(durations)
+    successors: List[List[Tuple[int, int]]] = [[] for _ in range(count)]
+    indegree = [0] * count
+    for predecessor, successor, lag in edges:
+        successors[predecessor].append((successor, lag))
+        indegree[successor] += 1
+
+    early_start = [0] * count
+    order = []
+    ready = deque(i for i in range(count) if indegree[i] == 0)
+    while ready:
+        i = ready.popleft()
+        order.append(i)
+        finish = early_start[i] + durations[i]
+        for j, lag in successors[i]:
+            if finish + lag > early_start[j]:
+                early_start[j] = finish + lag
+            indegree[j] -= 1
+            if indegree[j] == 0:
+                ready.append(j)
+    if len(order) < count:
+        raise ScheduleError("Task dependencies contain a cycle")
+
+    length = max((early_start[i] + durations[i] for i in range(count)), default=0)
+    late_finish = [length] * count
+    free_slack = [0] * count
+    for i in reversed(order):
+        early_finish = early_start[i] + durations[i]
+        next_start = length
+        for j, lag in successors[i]:
+            late_finish[i] = min(late_finish[i], late_finish[j] - durations[j] - lag)
+            next_start = min(next_start, early_start[j] - lag)
+        free_slack[i] = next_start - early_finish
+
+    late_start = [late_finish[i] - durations[i] for i in range(count)]
+    slack = [late_start[i] - early_start[i] for i in range(count)]
+    return order, early_start, late_start, slack, free_slack, length
+
+
+def working_calendar(db: Session, start: date, days: int) -> List[date]:
+    """The first `days` working dates from start on"""
+    weekdays = set(settings.LEAVE_WORKING_WEEKDAYS) or set(range(7))
+    calendar: List[date] = []
+    day = start
+    while len(calendar) < days:
+        # Fetch holidays a chunk at a time, generously sized for the days still needed
+        chunk_end = day + timedelta(days=(days - len(calendar)) * 7 // len(weekdays) + 14)
+        holidays = holidays_between(db, day, chunk_end)
+        while day <= chunk_end and len(calendar) < days:
+            if day.weekday() in weekdays and day not in holidays:
+                calendar.append(day)
+            day += timedelta(days=1)
+    return calendar
+
+
+def compute_schedule(db: Session, project: Project) -> dict:
+    """
+    Critical path schedule of a project
+
+    Raises:
+        ScheduleError: If the dependencies contain a cycle
+    """
+    tasks = db.query(
+        Task.id, Task.task_number, Task.title, Task.status, Task.parent_task_id,
+        Task.assigned_to_id, Task.due_date, Task.estimated_hours, Task.progress
+    ).filter(
+        Task.project_id == project.id,
+        Task.is_deleted == False
+    ).order_by(Task.id).all()
+    index = {task.id: i for i, task in enumerate(tasks)}
+
+    edges = []
+    predecessors: Dict[int, List[int]] = {}
+    for predecessor_id, successor_id, lag_days in db.query(
+        TaskDependency.predecessor_id, TaskDependency.successor_id, TaskDependency.lag_days
+    ).filter(
+        TaskDependency.project_id == project.id,
+        TaskDependency.is_deleted == False
+    ):
+        if predecessor_id in index and successor_id in index:
+            edges.append((index[predecessor_id], index[successor_id], lag_days or 0))
+            predecessors.setdefault(successor_id, []).append(predecessor_id)
+
+    durations = [task_duration(task.status, task.estimated_hours) for task in tasks]
+    order, early_start, late_start, slack, free_slack, length = critical_path(durations, edges)
+
+    start = project.start_date or date.today()
+    calendar = working_calendar(db, start, length + 1)
+
+    def start_date(offset: int) -> date:
+        return calendar[offset]
+
+    def finish_date(offset: int, duration: int) -> date:
+        return calendar[offset + duration - 1] if duration else calendar[offset]
+
+    finish = finish_date(0, length)
+    rows = []
+    for i in sorted(range(len(tasks)), key=lambda i: (early_start[i], tasks[i].id)):
+        task = tasks[i]
+        early_finish_date = finish_date(early_start[i], durations[i])
+        rows.append({
+            "id": task.id,
+            "task_number": task.task_number,
+            "title": task.title,
+            "status": task.status.value,
+            "parent_task_id": task.parent_task_id,
+            "assigned_to_id": task.assigned_to_id,
+            "progress": task.progress,
+            "estimated_hours": task.estimated_hours,
+            "duration_days": durations[i],
+            "predecessors": sorted(predecessors.get(task.id, ())),
+            "early_start": start_date(early_start[i]),
+            "early_finish": early_finish_date,
+            "late_start": start_date(late_start[i]),
+            "late_finish": finish_date(late_start[i], durations[i]),
+            "slack_days": slack[i],
+            "free_slack_days": free_slack[i],
+            "critical": slack[i] == 0 and durations[i] > 0,
+            "due_date": task.due_date,
+            "late": task.due_date is not None and early_finish_date > task.due_date
+        })
+
+    return {
+        "project_id": project.id,
+        "project_number": project.project_number,
+        "start_date": start,
+        "finish_date": finish,
+        "end_date": project.end_date,
+        "duration_days": length,
+        # Working days to spare before the planned end date; negative when it will be missed
+        "end_date_slack_days": (
+            None if project.end_date is None
+            else _working_days_between(db, finish, project.end_date)
+        ),
+        "critical_path": [tasks[i].id for i in order if slack[i] == 0 and durations[i] > 0],
+        "tasks": rows
+    }
+
+
+def _working_days_between(db: Session, finish: date, end_date: date) -> int:
+    """Signed working days from finish to end_date"""
+    if end_date >= finish:
+        first, last, sign = finish + timedelta(days=1), end_date, 1
+    else:
+        first, last, sign = end_date + timedelta(days=1), finish, -1
+    return sign * count_working_days(first, last, holidays_between(db, first, last))
+
+
+def _cache_key(db: Session, project: Project) -> tuple:
+    holidays = db.query(func.max(Holiday.updated_at), func.count(Holiday.id)).one()
+    return (
+        project.schedule_version,
+        project.start_date or date.today(),
+        project.end_date,
+        tuple(holidays),
+        settings.SCHEDULE_HOURS_PER_DAY,
+        tuple(settings.LEAVE_WORKING_WEEKDAYS)
+    )
+
+
+def get_schedule_json(db: Session, project: Project) -> bytes:
+    """Encoded schedule of a project, computed on first use after a change"""
+    key = _cache_key(db, project)
+    with _cache_lock:
+        cached = _schedule_cache.get(project.id)
+        if cached is not None and cached[0] == key:
+            _schedule_cache.move_to_end(project.id)
+            return cached[1]
+
+    body = json.dumps(compute_schedule(db, project), default=str).encode()
+    with _cache_lock:
+        _schedule_cache[project.id] = (key, body)
+        _schedule_cache.move_to_end(project.id)
+        while len(_schedule_cache) > SCHEDULE_CACHE_SIZE:
+            _schedule_cache.popitem(last=False)
+    return body
+
+
+def _reaches(successors: Dict[int, List[int]], source: int, target: int) -> bool:
+    seen = {source}
+    stack = [source]
+    while stack:
+        node = stack.pop()
+        if node == target:
+            return True
+        for following in successors.get(node, ()):
+            if following not in seen:
+                seen.add(following)
+                stack.append(following)
+    return False
+
+
+def add_dependency(
+    db: Session,
+    project: Project,
+    predecessor_id: int,
+    successor_id: int,
+    user_id: int,
+    lag_days: int = 0
+) -> TaskDependency:
+    """
+    Link two tasks of a project; the caller commits
+
+    The project row is locked, so concurrent edits can't close a cycle
+    between them.
+
+    Raises:
+        ScheduleError: If a task isn't in the project, the link exists or
+            it would create a cycle
+    """
+    if predecessor_id == successor_id:
+        raise ScheduleError("A task can't depend on itself")
+    if lag_days < 0:
+        raise ScheduleError("Lag can't be negative")
+
+    db.query(Project.id).filter(Project.id == project.id).with_for_update().first()
+    found = {
+        task_id for (task_id,) in db.query(Task.id).filter(
+            Task.id.in_([predecessor_id, successor_id]),
+            Task.project_id == project.id,
+            Task.is_deleted == False
+        )
+    }
+    missing = [task_id for task_id in (predecessor_id, successor_id) if task_id not in found]
+    if missing:
+        raise ScheduleError(f"Task {missing[0]} is not part of this project")
+
+    successors: Dict[int, List[int]] = {}
+    for predecessor, successor in db.query(TaskDependency.predecessor_id, TaskDependency.successor_id).filter(
+        TaskDependency.project_id == project.id,
+        TaskDependency.is_deleted == False
+    ):
+        successors.setdefault(predecessor, []).append(successor)
+    if successor_id in successors.get(predecessor_id, ()):
+        raise ScheduleError("These tasks are already linked")
+    if _reaches(successors, successor_id, predecessor_id):
+        raise ScheduleError("This dependency would create a cycle")
+
+    dependency = TaskDependency(
+        project_id=project.id,
+        predecessor_id=predecessor_id,
+        successor_id=successor_id,
+        lag_days=lag_days,
+        created_by_id=user_id
+    )
+    try:
+        with db.begin_nested():
+            db.add(dependency)
+    except IntegrityError:
+        raise ScheduleError("These tasks are already linked")
+    return dependency
+
+
+def remove_dependency(db: Session, dependency: TaskDependency) -> None:
+    """Unlink two tasks; the caller commits"""
+    db.delete(dependency)
+    db.flush()
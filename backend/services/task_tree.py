@@ -0,0 +1,239 @@
+"""
+Task trees as materialized paths
+
+Every task stores the ids from its root down to itself in Task.path
+("/12/45/78/") and its depth. A subtree is then a single prefix query,
+path LIKE '/12/45/%', served by ix_tasks_path, and roll-ups are one
+GROUP BY over it instead of a recursive walk.
+
+Paths are set by an after_insert mapper hook, so any task created through
+the ORM gets one. Re-parenting rewrites the moved subtree's prefix with a
+single UPDATE. rebuild_task_paths fills in rows written before paths
+existed, one tree level per statement.
+"""
+from typing import Optional
+
+from sqlalchemy import Float, String, and_, case, cast, event, func, literal, select, update
+from sqlalchemy.orm import Session, aliased
+
+from backend.models.workflow import Task, TaskStatusEnum
+
+# Walk guard for legacy rows with a parent cycle
+MAX_DEPTH = 100
+
+
+class TaskTreeError(ValueError):
+    """Task can't be moved"""
+
+
+def subtree_filter(path: str):
+    """Tasks in the subtree rooted at the task with this path, the root included"""
+    # Paths hold only digits and slashes, nothing to escape
+    return Task.path.like(path + "%")
+
+
+def _path_of(connection, task_id: int) -> Optional[str]:
+    """Path of a task, derived from its ancestors when it hasn't got one yet"""
+    table = Task.__table__
+    ids = []
+    current = task_id
+    while current is not None and len(ids) < MAX_DEPTH:
+        row = connection.execute(
+            select(table.c.path, table.c.parent_task_id).where(table.c.id == current)
+        ).first()
+        if row is None:
+            return None
+        if row.path:
+            return row.path + "".join(f"{ancestor}/" for ancestor in reversed(ids))
+        ids.append(current)
+        current = row.parent_task_id
+    if current is not None:
+        return None
+    return "/" + "".join(f"{ancestor}/" for ancestor in reversed(ids))
+
+
+@event.listens_for(Task, "after_insert")
+def _set_path(mapper, connection, target: Task) -> None:
+    parent_path = _path_of(connection, target.parent_task_id) if target.parent_task_id else "/"
+    if parent_path is None:
+        return
+    path = f"{parent_path}{target.id}/"
+    depth = path.count("/") - 1
+    connection.execute(
+        update(Task.__table__).where(Task.__table__.c.id == target.id).values(path=path, depth=depth)
+    )
+    # Keep the instance in step without expiring it
+    target.__dict__["path"] = path
+    target.__dict__["depth"] = depth
+
+
+def move_task(db: Session, task: Task, parent_id: Optional[int], user_id: int) -> Task:
+    """
+    Re-parent a task together with its subtree; the caller commits
+
+    Raises:
+        TaskTreeError: If the new parent doesn't exist, is in another
+            project or lies inside the task's own subtree
+    """
+    task = db.query(Task).filter(Task.id == task.id).with_for_update().one()
+    if task.path is None:
+        task.path = _path_of(db.connection(), task.id)
+
+    if parent_id is None:
+        new_path = f"/{task.id}/"
+    else:
+        parent = db.query(Task).filter(Task.id == parent_id, Task.is_deleted == False).first()
+        if parent is None:
+            raise TaskTreeError("Parent task not found")
+        if parent.project_id != task.project_id:
+            raise TaskTreeError("Parent task belongs to another project")
+        parent_path = parent.path or _path_of(db.connection(), parent.id)
+        if parent.id == task.id or (task.path and parent_path.startswith(task.path)):
+            raise TaskTreeError("A task can't be moved under itself or one of its subtasks")
+        new_path = f"{parent_path}{task.id}/"
+
+    old_path = task.path
+    task.parent_task_id = parent_id
+    task.updated_by_id = user_id
+    db.flush()
+
+    if old_path and old_path != new_path:
+        shift = (new_path.count("/") - 1) - (old_path.count("/") - 1)
+        db.execute(
+            update(Task)
+            .where(subtree_filter(old_path))
+            .values(
+                path=literal(new_path) + func.substr(Task.path, len(old_path) + 1),
+                depth=Task.depth + shift
+            )
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        task.path, task.depth = new_path, new_path.count("/") - 1
+        db.flush()
+    db.refresh(task)
+    return task
+
+
+def _rollup_columns(task_table):
+    """Aggregates of a set of tasks; progress is weighted by estimated hours when there are any"""
+    active = task_table.status != TaskStatusEnum.CANCELLED
+    estimated = func.coalesce(task_table.estimated_hours, 0)
+    total_estimated = func.sum(case((active, estimated), else_=0))
+    weighted = func.sum(case((active, estimated * func.coalesce(task_table.progress, 0)), else_=0))
+    return [
+        func.count(task_table.id).label("tasks"),
+        func.sum(case((task_table.status == TaskStatusEnum.COMPLETED, 1), else_=0)).label("completed"),
+        total_estimated.label("estimated_hours"),
+        func.coalesce(func.sum(task_table.actual_hours), 0).label("actual_hours"),
+        case(
+            (total_estimated > 0, cast(weighted, Float) / total_estimated),
+            else_=func.avg(case((active, func.coalesce(task_table.progress, 0)))),
+        ).label("progress")
+    ]
+
+
+def _rollup_dict(row) -> dict:
+    return {
+        "tasks": row.tasks or 0,
+        "completed": int(row.completed or 0),
+        "estimated_hours": int(row.estimated_hours or 0),
+        "actual_hours": int(row.actual_hours or 0),
+        "progress": round(float(row.progress), 1) if row.progress is not None else None
+    }
+
+
+def subtree(db: Session, task: Task) -> dict:
+    """A task with all its descendants in depth-first order, and their roll-up"""
+    path = task.path or _path_of(db.connection(), task.id)
+    if path is None:
+        raise TaskTreeError("Task tree is inconsistent, rebuild the task paths")
+    condition = and_(subtree_filter(path), Task.is_deleted == False)
+
+    tasks = db.query(Task).filter(condition).order_by(Task.path).all()
+    totals = db.query(*_rollup_columns(Task)).filter(condition).one()
+    base_depth = path.count("/") - 1
+    return {
+        "id": task.id,
+        "rollup": _rollup_dict(totals),
+        "tasks": [
+            {
+                "id": node.id,
+                "task_number": node.task_number,
+                "title": node.title,
+                "parent_task_id": node.parent_task_id,
+                "level": (node.depth or base_depth) - base_depth,
+                "status": node.status.value,
+                "progress": node.progress,
+                "estimated_hours": node.estimated_hours,
+                "actual_hours": node.actual_hours
+            }
+            for node in tasks
+        ]
+    }
+
+
+def project_rollup(db: Session, project_id: int, max_depth: int = 1) -> dict:
+    """
+    Project totals, plus the roll-up of every task down to max_depth over its subtree
+
+    The per-task figures come from one self-join on the path prefix.
+    """
+    totals = db.query(*_rollup_columns(Task)).filter(
+        Task.project_id == project_id,
+        Task.is_deleted == False
+    ).one()
+
+    node = aliased(Task)
+    member = aliased(Task)
+    rows = db.query(node.id, node.task_number, node.title, node.depth, *_rollup_columns(member)).join(
+        member,
+        and_(
+            member.path.like(node.path + "%"),
+            member.project_id == project_id,
+            member.is_deleted == False
+        )
+    ).filter(
+        node.project_id == project_id,
+        node.depth <= max_depth,
+        node.is_deleted == False
+    ).group_by(node.id, node.task_number, node.title, node.depth, node.path).order_by(node.path).all()
+
+    return {
+        "project_id": project_id,
+        "rollup": _rollup_dict(totals),
+        "tasks": [
+            {"id": row.id, "task_number": row.task_number, "title": row.title, "depth": row.depth, **_rollup_dict(row)}
+            for row in rows
+        ]
+    }
+
+
+def rebuild_task_paths(db: Session) -> int:
+    """Recompute every task path from parent_task_id, one level at a time; the caller commits"""
+    table = Task.__table__
+    # Rows caught in a parent cycle are never reached again and stay without a path
+    db.execute(update(table).values(path=None, depth=None))
+    updated = db.execute(
+        update(table).where(table.c.parent_task_id.is_(None)).values(
+            path=literal("/") + cast(table.c.id, String) + "/",
+            depth=1
+        )
+    ).rowcount
+    parent = table.alias("parent")
+    for level in range(1, MAX_DEPTH):
+        parent_path = select(parent.c.path).where(
+            parent.c.id == table.c.parent_task_id
+        ).scalar_subquery()
+        changed = db.execute(
+            update(table).where(
+                table.c.parent_task_id.in_(select(parent.c.id).where(parent.c.depth == level))
+            ).values(
+                path=parent_path + cast(table.c.id, String) + "/",
+                depth=level + 1
+            )
+        ).rowcount
+        if not changed:
+            break
+        updated += changed
+    return updated
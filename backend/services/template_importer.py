@@ -0,0 +1,576 @@
+"""
+Excel/Word form template importer
+
+Legacy Level 4 formats are parsed into FormTemplate/FormField definitions:
+
+* Excel (.xlsx/.xlsm): "Label:" cells followed by an input cell become
+  fields, single merged/bold rows become sections, a row of column headings
+  over blank rows becomes a TABLE field, list data validations become
+  dropdown options and cell formulas are translated into CALCULATED fields.
+* Word (.docx): headings become sections, "Label: ____" paragraphs and
+  label/blank table rows become fields, and tables with a heading row over
+  blank rows become TABLE fields.
+
+Parsing is CPU-bound and side-effect free, so a batch parses files in a
+process pool and only the parent process writes to the database, inserting
+all fields of a template with one multi-row INSERT.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.core.database import SessionLocal
+from backend.models.form import FormTemplate, FormField, FieldTypeEnum, TemplateImportBatch
+from .form_formulas import CompiledFormula, FormulaPlan, FormulaError
+
+SUPPORTED_EXTENSIONS = {".xlsx", ".xlsm", ".docx"}
+
+_EXCEL_FUNCTIONS = {
+    "SUM": "sum",
+    "AVERAGE": "avg",
+    "MIN": "min",
+    "MAX": "max",
+    "ABS": "abs",
+    "ROUND": "round",
+    "SQRT": "sqrt",
+    "COUNT": "count",
+    "STDEV": "stdev",
+    "STDEV.S": "stdev",
+}
+
+_REF = r"\$?[A-Z]{1,3}\$?\d+"
+# Lookbehind rather than \b, which can't sit in front of an absolute reference's "$"
+_REF_START = r"(?<![A-Za-z0-9_$])"
+_FORMULA_TOKEN = re.compile(
+    rf"(?P<func>\b[A-Z][A-Z0-9.]*)(?=\s*\()|(?P<range>{_REF_START}{_REF}:{_REF}\b)|(?P<ref>{_REF_START}{_REF}\b)"
+)
+_DOCX_FIELD = re.compile(r"^\s*(?P<label>[^:]{2,80}?)\s*:\s*(?:_{2,}|\.{3,}|\s)*$")
+_CHECKBOX_MARKS = ("☐", "□", "[ ]")
+
+
+class UnsupportedFormula(ValueError):
+    """Raised when an Excel formula can't be expressed in the formula engine"""
+
+
+# ---------------------------------------------------------------------------
+# Shared helpers
+# ---------------------------------------------------------------------------
+
+def template_code_for(path: str) -> str:
+    """Derive a template code from a file name"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[^A-Z0-9]+", "-", stem.upper()).strip("-")[:100] or "TEMPLATE"
+
+
+def _field_name(label: str, taken: set) -> str:
+    base = re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")[:180] or "field"
+    if base[0].isdigit():
+        base = f"f_{base}"
+    name, suffix = base, 2
+    while name in taken:
+        name = f"{base}_{suffix}"
+        suffix += 1
+    taken.add(name)
+    return name
+
+
+def _clean_label(text: str) -> str:
+    return re.sub(r"\s+", " ", str(text)).strip().rstrip(":").strip()
+
+
+def _infer_type(label: str) -> FieldTypeEnum:
+    lowered = label.lower()
+    if "signature" in lowered or re.search(r"\bsign(ed)?\b", lowered):
+        return FieldTypeEnum.SIGNATURE
+    if "date" in lowered and "time" in lowered:
+        return FieldTypeEnum.DATETIME
+    if "date" in lowered:
+        return FieldTypeEnum.DATE
+    return FieldTypeEnum.TEXT
+
+
+def _field(
+    label: str,
+    taken: set,
+    field_type: FieldTypeEnum,
+    section: Optional[str],
+    **extra
+) -> dict:
+    field = {
+        "field_name": _field_name(label, taken),
+        "field_label": label[:500],
+        "field_type": field_type,
+        "section": section[:200] if section else None,
+    }
+    field.update(extra)
+    return field
+
+
+# ---------------------------------------------------------------------------
+# Excel
+# ---------------------------------------------------------------------------
+
+def _translate_formula(
+    formula: str,
+    cell_fields: Dict[str, str],
+    table_columns: Dict[Tuple[int, int, int], Tuple[str, str]]
+) -> str:
+    """Rewrite an Excel formula in terms of field names"""
+    from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, range_boundaries
+
+    text = formula.lstrip("=").strip()
+    if "!" in text or '"' in text or "&" in text or "<" in text or ">" in text:
+        raise UnsupportedFormula(formula)
+
+    def replace(match: re.Match) -> str:
+        if match.group("func"):
+            name = match.group("func").upper()
+            if name not in _EXCEL_FUNCTIONS:
+                raise UnsupportedFormula(formula)
+            return _EXCEL_FUNCTIONS[name]
+
+        if match.group("range"):
+            min_col, min_row, max_col, max_row = range_boundaries(match.group("range").replace("$", ""))
+            if min_col == max_col:
+                for (column, first_row, last_row), target in table_columns.items():
+                    if column == min_col and first_row <= min_row and max_row <= last_row:
+                        return f"{target[0]}.{target[1]}"
+            names = [
+                cell_fields[f"{col}:{row}"]
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+                if f"{col}:{row}" in cell_fields
+            ]
+            if not names:
+                raise UnsupportedFormula(formula)
+            return ", ".join(names)
+
+        column_letter, row = coordinate_from_string(match.group("ref").replace("$", ""))
+        key = f"{column_index_from_string(column_letter)}:{row}"
+        if key not in cell_fields:
+            raise UnsupportedFormula(formula)
+        return cell_fields[key]
+
+    translated = _FORMULA_TOKEN.sub(replace, text).replace("^", "**")
+    try:
+        CompiledFormula(translated)
+    except FormulaError:
+        raise UnsupportedFormula(formula)
+    return translated
+
+
+def _list_options(workbook, validation) -> Optional[List[str]]:
+    """Options of a list data validation, inline or from a cell range"""
+    source = (validation.formula1 or "").strip()
+    if not source:
+        return None
+    if source.startswith('"'):
+        return [option.strip() for option in source.strip('"').split(",") if option.strip()]
+
+    source = source.lstrip("=")
+    if "!" in source:
+        sheet_name, cell_range = source.rsplit("!", 1)
+        sheet_name = sheet_name.strip("'")
+        if sheet_name not in workbook.sheetnames:
+            return None
+        sheet = workbook[sheet_name]
+    else:
+        sheet, cell_range = workbook.active, source
+    try:
+        cells = sheet[cell_range.replace("$", "")]
+    except (KeyError, ValueError):
+        return None
+    if not isinstance(cells, tuple):
+        cells = ((cells,),)
+    options = []
+    for row in cells:
+        for cell in (row if isinstance(row, tuple) else (row,)):
+            if cell.value not in (None, ""):
+                options.append(str(cell.value))
+    return options or None
+
+
+def _parse_workbook(path: str) -> dict:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, data_only=False)
+    sheet = workbook.worksheets[0]
+    warnings: List[str] = []
+    taken: set = set()
+    fields: List[dict] = []
+    title: Optional[str] = None
+    section: Optional[str] = None
+
+    merged_until: Dict[Tuple[int, int], int] = {}
+    for merged in sheet.merged_cells.ranges:
+        merged_until[(merged.min_row, merged.min_col)] = merged.max_col
+
+    list_validations = [
+        validation for validation in sheet.data_validations.dataValidation
+        if validation.type == "list"
+    ]
+
+    def options_for(coordinate: str) -> Optional[List[str]]:
+        for validation in list_validations:
+            if coordinate in validation.sqref:
+                return _list_options(workbook, validation)
+        return None
+
+    def is_text(cell) -> bool:
+        return isinstance(cell.value, str) and not cell.value.startswith("=") and cell.value.strip() != ""
+
+    def is_input(cell) -> bool:
+        return not is_text(cell)
+
+    # (row, col) -> field index, and pending formulas to translate afterwards
+    cell_fields: Dict[str, str] = {}
+    table_columns: Dict[Tuple[int, int, int], Tuple[str, str]] = {}
+    formulas: List[Tuple[int, str]] = []
+
+    max_row, max_col = sheet.max_row, sheet.max_column
+    rows = list(sheet.iter_rows(min_row=1, max_row=max_row, max_col=max_col))
+    row_index = 0
+
+    while row_index < len(rows):
+        row = rows[row_index]
+        row_number = row_index + 1
+        filled = [cell for cell in row if cell.value not in (None, "")]
+        if not filled:
+            row_index += 1
+            continue
+
+        # Title / section: a single text cell spanning columns or in bold
+        if len(filled) == 1 and is_text(filled[0]):
+            cell = filled[0]
+            spans = merged_until.get((row_number, cell.column), cell.column) > cell.column
+            if spans or (cell.font is not None and cell.font.b):
+                label = _clean_label(cell.value)
+                if title is None and not fields:
+                    title = label
+                else:
+                    section = label
+                row_index += 1
+                continue
+
+        # Table: three or more consecutive headings over a body of input rows
+        texts = [cell for cell in row if is_text(cell)]
+        if len(texts) >= 3 and len(texts) == len(filled) and row_index + 1 < len(rows):
+            body = rows[row_index + 1]
+            heading_cols = [cell.column for cell in texts]
+            if all(is_input(body[col - 1]) for col in heading_cols):
+                body_end = row_index + 1
+                while body_end + 1 < len(rows):
+                    candidate = rows[body_end + 1]
+                    if any(is_text(candidate[col - 1]) for col in heading_cols):
+                        break
+                    if all(candidate[col - 1].value in (None, "") for col in heading_cols) and \
+                            all(rows[body_end][col - 1].value in (None, "") for col in heading_cols):
+                        break
+                    body_end += 1
+                while body_end > row_index + 1 and \
+                        all(rows[body_end][col - 1].value in (None, "") for col in heading_cols):
+                    body_end -= 1
+
+                table_label = section or _clean_label(texts[0].value)
+                table = _field(table_label, taken, FieldTypeEnum.TABLE, section)
+                column_taken: set = set()
+                columns = []
+                for cell in texts:
+                    column_name = _field_name(_clean_label(cell.value), column_taken)
+                    numeric = any(
+                        isinstance(rows[r][cell.column - 1].value, (int, float))
+                        for r in range(row_index + 1, body_end + 1)
+                    )
+                    columns.append({
+                        "name": column_name,
+                        "label": _clean_label(cell.value),
+                        "type": FieldTypeEnum.NUMBER.value if numeric else FieldTypeEnum.TEXT.value
+                    })
+                    table_columns[(cell.column, row_number + 1, body_end + 1)] = (
+                        table["field_name"], column_name
+                    )
+                table["validation_rules"] = {"columns": columns, "max_rows": body_end - row_index}
+                fields.append(table)
+                row_index = body_end + 1
+                continue
+
+        # Label/input pairs across the row
+        col = 0
+        while col < len(row):
+            cell = row[col]
+            if not is_text(cell):
+                col += 1
+                continue
+            input_col = merged_until.get((row_number, cell.column), cell.column)
+            if input_col >= len(row) or not is_input(row[input_col]):
+                col = input_col
+                continue
+
+            target = row[input_col]
+            label = _clean_label(cell.value)
+            options = options_for(target.coordinate)
+            value = target.value
+
+            if options:
+                field = _field(label, taken, FieldTypeEnum.DROPDOWN, section, options=options)
+            elif isinstance(value, str) and value.startswith("="):
+                field = _field(label, taken, FieldTypeEnum.CALCULATED, section, is_readonly=True)
+                formulas.append((len(fields), value))
+            elif target.is_date:
+                field = _field(label, taken, FieldTypeEnum.DATE, section)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                field = _field(label, taken, FieldTypeEnum.NUMBER, section, default_value=str(value))
+            else:
+                field = _field(label, taken, _infer_type(label), section)
+
+            cell_fields[f"{target.column}:{row_number}"] = field["field_name"]
+            fields.append(field)
+            col = merged_until.get((row_number, target.column), target.column)
+        row_index += 1
+
+    for index, formula in formulas:
+        try:
+            fields[index]["formula"] = _translate_formula(formula, cell_fields, table_columns)
+        except UnsupportedFormula:
+            fields[index]["help_text"] = f"Excel formula: {formula}"
+            warnings.append(f"Could not translate formula for '{fields[index]['field_label']}': {formula}")
+
+    return {"title": title, "fields": fields, "warnings": warnings}
+
+
+# ---------------------------------------------------------------------------
+# Word
+# ---------------------------------------------------------------------------
+
+def _parse_document(path: str) -> dict:
+    from docx import Document as WordDocument
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = WordDocument(path)
+    taken: set = set()
+    fields: List[dict] = []
+    title: Optional[str] = None
+    section: Optional[str] = None
+
+    for element in document.element.body.iterchildren():
+        tag = element.tag.rsplit("}", 1)[-1]
+
+        if tag == "p":
+            paragraph = Paragraph(element, document)
+            text = paragraph.text.strip()
+            if not text:
+                continue
+            style = (paragraph.style.name if paragraph.style is not None else "") or ""
+            if style.startswith(("Heading", "Title")):
+                if title is None and not fields:
+                    title = _clean_label(text)
+                else:
+                    section = _clean_label(text)
+                continue
+            if text.startswith(_CHECKBOX_MARKS):
+                label = _clean_label(text.lstrip("".join(_CHECKBOX_MARKS)).strip())
+                if label:
+                    fields.append(_field(label, taken, FieldTypeEnum.CHECKBOX, section))
+                continue
+            match = _DOCX_FIELD.match(text)
+            if match:
+                label = _clean_label(match.group("label"))
+                fields.append(_field(label, taken, _infer_type(label), section))
+            continue
+
+        if tag != "tbl":
+            continue
+
+        table = Table(element, document)
+        grid = [[cell.text.strip() for cell in row.cells] for row in table.rows]
+        if not grid:
+            continue
+
+        header, body = grid[0], grid[1:]
+        if len(header) >= 2 and all(header) and body and all(not any(row) for row in body):
+            column_taken: set = set()
+            columns = [
+                {"name": _field_name(_clean_label(heading), column_taken), "label": _clean_label(heading)}
+                for heading in header
+            ]
+            label = section or _clean_label(header[0])
+            fields.append(_field(
+                label, taken, FieldTypeEnum.TABLE, section,
+                validation_rules={"columns": columns, "max_rows": len(body)}
+            ))
+            continue
+
+        for row in grid:
+            # Label cell followed by a blank cell, possibly several pairs per row
+            for index in range(0, len(row) - 1):
+                if row[index] and not row[index + 1] and (index == 0 or not row[index - 1] or index % 2 == 0):
+                    label = _clean_label(row[index])
+                    if label:
+                        fields.append(_field(label, taken, _infer_type(label), section))
+
+    return {"title": title, "fields": fields, "warnings": []}
+
+
+# ---------------------------------------------------------------------------
+# Batch processing
+# ---------------------------------------------------------------------------
+
+def parse_template_file(path: str) -> dict:
+    """
+    Parse one Excel/Word file into a template definition
+
+    Runs in worker processes, so it only returns plain data.
+    """
+    result = {
+        "file": os.path.basename(path),
+        "path": path,
+        "code": template_code_for(path),
+        "status": "failed",
+    }
+    extension = os.path.splitext(path)[1].lower()
+
+    try:
+        if extension in (".xlsx", ".xlsm"):
+            parsed = _parse_workbook(path)
+        elif extension == ".docx":
+            parsed = _parse_document(path)
+        else:
+            result["error"] = f"Unsupported file type '{extension}'"
+            return result
+    except ImportError as exc:
+        result["error"] = f"Missing parser dependency: {exc.name}"
+        return result
+    except Exception as exc:  # Corrupt or unexpected files must not stop the batch
+        result["error"] = f"Could not parse file: {exc}"
+        return result
+
+    if not parsed["fields"]:
+        result["error"] = "No form fields found"
+        return result
+
+    result.update(parsed)
+    result["status"] = "parsed"
+    return result
+
+
+def list_template_files(directory: str) -> List[str]:
+    """Supported files in a directory tree, in a stable order"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.startswith("~$"):  # Office lock files
+                continue
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def save_parsed_template(db: Session, parsed: dict, user_id: Optional[int]) -> FormTemplate:
+    """Create the template and insert all of its fields in one statement"""
+    fields = parsed["fields"]
+
+    # Drop formulas that only fail when checked together (e.g. cycles)
+    try:
+        FormulaPlan([FormField(**field) for field in fields])
+    except FormulaError as exc:
+        parsed["warnings"].append(f"Formulas dropped: {exc}")
+        for field in fields:
+            field.pop("formula", None)
+
+    template = FormTemplate(
+        name=(parsed.get("title") or parsed["code"])[:500],
+        code=parsed["code"],
+        source_file=parsed["path"][:500],
+        is_published=False,
+        created_by_id=user_id
+    )
+    db.add(template)
+    db.flush()
+
+    db.execute(insert(FormField), [
+        {
+            **field,
+            "template_id": template.id,
+            "order": order,
+            "created_by_id": user_id
+        }
+        for order, field in enumerate(fields)
+    ])
+    return template
+
+
+def run_import_batch(batch_id: int, paths: List[str], user_id: Optional[int]) -> None:
+    """
+    Parse files in a process pool and save each template as it completes
+
+    Progress is committed after every file so the status API reflects it.
+    """
+    db = SessionLocal()
+    try:
+        batch = db.query(TemplateImportBatch).filter(TemplateImportBatch.id == batch_id).one()
+        batch.status = 'running'
+        batch.started_at = datetime.now()
+        batch.total_files = len(paths)
+        db.commit()
+
+        results: List[dict] = []
+        existing = {
+            code for (code,) in db.query(FormTemplate.code).filter(
+                FormTemplate.code.in_([template_code_for(path) for path in paths])
+            )
+        }
+
+        with ProcessPoolExecutor(max_workers=max(1, settings.TEMPLATE_IMPORT_WORKERS)) as pool:
+            futures = [pool.submit(parse_template_file, path) for path in paths]
+            for future in as_completed(futures):
+                parsed = future.result()
+                summary = {"file": parsed["file"], "template_code": parsed["code"]}
+
+                if parsed["status"] == "parsed" and parsed["code"] in existing:
+                    parsed["status"], parsed["error"] = "failed", "Template code already exists"
+
+                if parsed["status"] == "parsed":
+                    try:
+                        template = save_parsed_template(db, parsed, user_id)
+                        db.commit()
+                    except Exception as exc:
+                        db.rollback()
+                        parsed["status"], parsed["error"] = "failed", f"Could not save template: {exc}"
+                    else:
+                        existing.add(parsed["code"])
+                        summary.update({
+                            "status": "imported",
+                            "template_id": template.id,
+                            "fields": len(parsed["fields"]),
+                            "warnings": parsed["warnings"]
+                        })
+
+                if parsed["status"] == "failed":
+                    summary.update({"status": "failed", "error": parsed.get("error")})
+
+                results.append(summary)
+                batch.processed_files = len(results)
+                batch.succeeded = sum(1 for r in results if r["status"] == "imported")
+                batch.failed = batch.processed_files - batch.succeeded
+                batch.results = list(results)
+                db.commit()
+
+        batch.status = 'completed'
+        batch.finished_at = datetime.now()
+        db.commit()
+    except Exception:
+        db.rollback()
+        db.query(TemplateImportBatch).filter(TemplateImportBatch.id == batch_id).update(
+            {"status": "failed", "finished_at": datetime.now()}
+        )
+        db.commit()
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,207 @@
+"""
+Unified approval inbox
+
+work_items holds one row per open workflow item per assignee, across
+documents, form records, leaves, expenses and CAPAs. The workflow engine
+refreshes the rows of every entity it transitions, and ORM flushes that
+create a workflow entity or change its assignees, status or due date
+refresh that entity too (delete + multi-row INSERT in the same
+transaction), so an inbox page is one query on (assignee_id, priority,
+due_date) instead of a scan per module.
+
+Items whose assignee column is empty go to every active holder of the
+roles the workflow queues them to (queue_roles), e.g. finance for
+unassigned expenses. Role membership changes reach those rows with the
+nightly rebuild.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.models.user import Role, User, user_roles
+from backend.models.work_item import WorkItem
+from .workflow_engine import TransitionResult, WorkflowDefinition, get_workflow, workflows, on_transition
+
+# Ids refreshed per round trip when rebuilding the table
+REBUILD_BATCH_SIZE = 1000
+
+# Session.info key holding {workflow name: ids} changed in the current flush
+_SYNC_KEY = "pending_work_item_sync"
+
+# model -> (workflow, attribute keys whose changes move inbox rows), built on first use
+_watched: Optional[Dict[type, Tuple[WorkflowDefinition, Set[str]]]] = None
+
+
+def _state_value(state):
+    return getattr(state, "value", state)
+
+
+def _role_holders(db: Session, definition: WorkflowDefinition) -> Dict[str, List[int]]:
+    """Active users per assignee column that stand in while the column is empty"""
+    holders = {}
+    for column, roles in definition.queue_roles.items():
+        holders[column] = [
+            user_id for user_id, in db.query(User.id).join(
+                user_roles, user_roles.c.user_id == User.id
+            ).join(Role, Role.id == user_roles.c.role_id).filter(
+                Role.code.in_(roles),
+                User.is_active == True
+            ).distinct()
+        ]
+    return holders
+
+
+def _item_rows(definition: WorkflowDefinition, rows, holders: Dict[str, List[int]]) -> List[dict]:
+    items = []
+    for row in rows:
+        assignees = set()
+        for column, states in definition.queue:
+            if row["status"] not in states:
+                continue
+            if row[column]:
+                assignees.add(row[column])
+            else:
+                assignees.update(holders.get(column, ()))
+        for assignee_id in sorted(assignees):
+            items.append({
+                "assignee_id": assignee_id,
+                "entity_type": definition.name,
+                "entity_id": row["id"],
+                "title": definition.label_for(row["id"], row.get("number"))[:500],
+                "status": _state_value(row["status"]),
+                "priority": definition.priority,
+                "due_date": row.get("due_date"),
+                "link": definition.link.format(id=row["id"]) if definition.link else None
+            })
+    return items
+
+
+def _queue_select(definition: WorkflowDefinition):
+    model = definition.model
+    columns = [model.id, definition.status.label("status")]
+    columns.extend(getattr(model, column) for column in {column for column, _ in definition.queue})
+    if definition.number_column:
+        columns.append(getattr(model, definition.number_column).label("number"))
+    if definition.due_column:
+        columns.append(getattr(model, definition.due_column).label("due_date"))
+
+    states = {state for _, queue_states in definition.queue for state in queue_states}
+    return select(*columns).where(definition.status.in_(states), model.is_deleted == False)
+
+
+def sync_work_items(db: Session, entity: str, ids: Iterable[int]) -> int:
+    """
+    Refresh the inbox rows of some entities after their state or assignees changed
+
+    Nothing is committed here.
+
+    Returns:
+        Number of work items now open for those entities
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    definition = get_workflow(entity)
+
+    db.execute(delete(WorkItem).where(WorkItem.entity_type == entity, WorkItem.entity_id.in_(ids)))
+    if not definition.queue:
+        return 0
+
+    rows = db.execute(_queue_select(definition).where(definition.model.id.in_(ids))).mappings().all()
+    items = _item_rows(definition, rows, _role_holders(db, definition) if rows else {})
+    if items:
+        db.execute(insert(WorkItem), items)
+    return len(items)
+
+
+@on_transition()
+def _refresh_after_transition(db: Session, result: TransitionResult) -> None:
+    sync_work_items(db, result.definition.name, result.succeeded)
+
+
+def _watched_models() -> Dict[type, Tuple[WorkflowDefinition, Set[str]]]:
+    global _watched
+    if _watched is None:
+        _watched = {}
+        for definition in workflows():
+            if not definition.queue:
+                continue
+            keys = {column for column, _ in definition.queue}
+            keys.update({definition.status.key, "is_deleted"})
+            if definition.number_column:
+                keys.add(definition.number_column)
+            if definition.due_column:
+                keys.add(definition.due_column)
+            _watched[definition.model] = (definition, keys)
+    return _watched
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_entities(session: Session, flush_context) -> None:
+    """Note workflow entities created, deleted or reassigned by this flush"""
+    watched = _watched_models()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        entry = watched.get(type(obj))
+        if entry is None:
+            continue
+        definition, keys = entry
+        state = inspect(obj)
+        if obj in session.dirty and not any(state.attrs[key].history.has_changes() for key in keys):
+            continue
+        session.info.setdefault(_SYNC_KEY, {}).setdefault(definition.name, set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _sync_changed_entities(session: Session, flush_context) -> None:
+    for entity, ids in session.info.pop(_SYNC_KEY, {}).items():
+        sync_work_items(session, entity, ids)
+
+
+def rebuild_work_items(db: Session) -> int:
+    """Rebuild the whole table from the workflow entities; the caller commits"""
+    db.execute(delete(WorkItem))
+    total = 0
+    for definition in workflows():
+        if not definition.queue:
+            continue
+        holders = _role_holders(db, definition)
+        last_id = 0
+        while True:
+            rows = db.execute(
+                _queue_select(definition)
+                .where(definition.model.id > last_id)
+                .order_by(definition.model.id)
+                .limit(REBUILD_BATCH_SIZE)
+            ).mappings().all()
+            if not rows:
+                break
+            items = _item_rows(definition, rows, holders)
+            if items:
+                db.execute(insert(WorkItem), items)
+            total += len(items)
+            last_id = rows[-1]["id"]
+    return total
+
+
+def inbox_query(db: Session, user_id: int, entity: Optional[str] = None):
+    """Open items of a user, most urgent first"""
+    query = db.query(WorkItem).filter(WorkItem.assignee_id == user_id)
+    if entity:
+        query = query.filter(WorkItem.entity_type == entity)
+    return query.order_by(
+        WorkItem.priority.desc(),
+        WorkItem.due_date.is_(None),
+        WorkItem.due_date,
+        WorkItem.id
+    )
+
+
+def inbox_counts(db: Session, user_id: int) -> Dict[str, int]:
+    """Open item counts of a user per entity type"""
+    return dict(
+        db.query(WorkItem.entity_type, func.count(WorkItem.id))
+        .filter(WorkItem.assignee_id == user_id)
+        .group_by(WorkItem.entity_type)
+        .all()
+    )
@@ -0,0 +1,526 @@
+"""
+Workflow state machine engine
+
+Each workflow-enabled entity declares a transition table (action, allowed
+source states, target state, guard, column stamps and who to notify). The
+table is compiled once into a per-action lookup when the definition is
+registered.
+
+A transition is applied to any number of ids with one SELECT snapshot and
+one conditional UPDATE:
+
+    UPDATE ... SET status = :target, row_version = row_version + 1, ...
+    WHERE (id, row_version) IN (:snapshot) AND status IN (:sources) AND <guard>
+    RETURNING id, ...
+
+The row_version match makes concurrent transitions on the same row
+optimistic: the loser gets a "conflict" outcome instead of overwriting the
+winner. Audit log entries and notifications for every changed row are
+written with one multi-row INSERT each (notifications are pushed to
+connected clients after commit), and after-hooks receive the changed
+ids as a batch. Nothing is committed here; the caller owns the transaction.
+"""
+import enum
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import Request
+from sqlalchemy import and_, case, false, literal, or_, select, true, tuple_, update
+from sqlalchemy.orm import Session
+
+from backend.models.traceability import EntityTypeEnum, ActionTypeEnum
+from backend.models.user import User
+from .audit import log_actions
+from .notifications import create_notifications
+
+# Outcome codes of a transition for one id
+OK = "ok"
+NOT_FOUND = "not_found"
+INVALID_STATE = "invalid_state"
+FORBIDDEN = "forbidden"
+CONFLICT = "conflict"
+
+# Stamp sources resolved when a transition is applied
+STAMP_USER = "user"
+STAMP_NOW = "now"
+STAMP_TODAY = "today"
+STAMP_COMMENTS = "comments"
+
+
+class WorkflowError(ValueError):
+    """Unknown workflow or action"""
+
+
+def _state_value(state: Any) -> Any:
+    return state.value if isinstance(state, enum.Enum) else state
+
+
+class Guard:
+    """
+    Permission check for a transition
+
+    Roles are checked once per request against the user; row_clause is a
+    SQL condition that becomes part of the conditional UPDATE. Superusers
+    pass every guard.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        row_clause: Optional[Callable[[Any, User], Any]] = None,
+        roles: Sequence[str] = ()
+    ):
+        self.name = name
+        self.row_clause = row_clause
+        self.roles = set(roles)
+
+    def allows_user(self, user: User) -> bool:
+        if user.is_superuser or not self.roles:
+            return True
+        return any(role.code in self.roles for role in user.roles)
+
+    def clause(self, model, user: User):
+        if user.is_superuser or self.row_clause is None:
+            return None
+        return self.row_clause(model, user)
+
+
+def assigned_to(column_name: str) -> Guard:
+    """Unassigned rows, or rows assigned to the user through column_name"""
+    def clause(model, user):
+        column = getattr(model, column_name)
+        return or_(column.is_(None), column == user.id)
+    return Guard(f"assigned:{column_name}", clause)
+
+
+def assigned_user(column_name: str) -> Guard:
+    """Rows assigned to the user through column_name; unassigned rows don't pass"""
+    return Guard(f"assignee:{column_name}", lambda model, user: getattr(model, column_name) == user.id)
+
+
+def not_user(*column_names: str) -> Guard:
+    """Rows where none of column_names is the user, so nobody signs off their own work"""
+    def clause(model, user):
+        return and_(*(
+            or_(getattr(model, column_name).is_(None), getattr(model, column_name) != user.id)
+            for column_name in column_names
+        ))
+    return Guard(f"not:{','.join(column_names)}", clause)
+
+
+def owned_by(column_name: str = "created_by_id") -> Guard:
+    """Rows whose column_name is the user"""
+    return Guard(f"owner:{column_name}", lambda model, user: getattr(model, column_name) == user.id)
+
+
+def has_role(*role_codes: str) -> Guard:
+    """Users holding one of the given role codes"""
+    return Guard(f"role:{','.join(role_codes)}", roles=role_codes)
+
+
+def any_of(*guards: Guard) -> Guard:
+    """Pass if any of the guards pass"""
+    def clause(model, user):
+        clauses = []
+        for guard in guards:
+            if not guard.allows_user(user):
+                continue
+            row_clause = guard.clause(model, user)
+            if row_clause is None:
+                return true()
+            clauses.append(row_clause)
+        return or_(*clauses) if clauses else false()
+    return Guard("|".join(guard.name for guard in guards), clause)
+
+
+def all_of(*guards: Guard) -> Guard:
+    """Pass only if every guard passes"""
+    def clause(model, user):
+        clauses = []
+        for guard in guards:
+            if not guard.allows_user(user):
+                return false()
+            row_clause = guard.clause(model, user)
+            if row_clause is not None:
+                clauses.append(row_clause)
+        return and_(*clauses) if clauses else true()
+    return Guard("&".join(guard.name for guard in guards), clause)
+
+
+class Transition:
+    """One row of a transition table"""
+
+    def __init__(
+        self,
+        action: str,
+        sources: Iterable[Any],
+        target: Any,
+        guard: Optional[Guard] = None,
+        stamps: Optional[Dict[str, str]] = None,
+        notify: Sequence[str] = (),
+        audit_action: ActionTypeEnum = ActionTypeEnum.UPDATE,
+        label: Optional[str] = None
+    ):
+        self.action = action
+        self.sources = tuple(sources)
+        self.target = target
+        self.guard = guard
+        self.stamps = stamps or {}
+        self.notify = tuple(notify)
+        self.audit_action = audit_action
+        self.label = label or action.replace("_", " ").title()
+
+
+class WorkflowDefinition:
+    """Compiled transition table of one entity type"""
+
+    def __init__(
+        self,
+        name: str,
+        model,
+        entity_type: EntityTypeEnum,
+        transitions: List[Transition],
+        title: str,
+        number_column: Optional[str] = None,
+        link: Optional[str] = None,
+        status_column: str = "status",
+        queue: Sequence[Tuple[str, Sequence[Any]]] = (),
+        queue_roles: Optional[Dict[str, Sequence[str]]] = None,
+        priority: int = 0,
+        due_column: Optional[str] = None
+    ):
+        self.name = name
+        self.model = model
+        self.table = model.__table__
+        self.entity_type = entity_type
+        self.title = title
+        self.number_column = number_column
+        self.link = link
+        self.status = getattr(model, status_column)
+        # (assignee column, states) pairs meaning "waiting for that user"
+        self.queue = [(column, tuple(states)) for column, states in queue]
+        # assignee column -> role codes whose holders get the item while the column is empty
+        self.queue_roles = {column: tuple(roles) for column, roles in (queue_roles or {}).items()}
+        # Inbox ordering: higher priority first, then earliest due date
+        self.priority = priority
+        self.due_column = due_column
+        self.transitions: Dict[str, Transition] = {}
+
+        for transition in transitions:
+            if transition.action in self.transitions:
+                raise WorkflowError(f"Duplicate action '{transition.action}' in workflow '{name}'")
+            for column in list(transition.stamps) + list(transition.notify):
+                if column not in self.table.c:
+                    raise WorkflowError(f"Workflow '{name}' references unknown column '{column}'")
+            self.transitions[transition.action] = transition
+        for column in [column for column, _ in self.queue] + list(self.queue_roles) + ([due_column] if due_column else []):
+            if column not in self.table.c:
+                raise WorkflowError(f"Workflow '{name}' references unknown column '{column}'")
+
+        # state -> actions leaving it, in declaration order
+        self.actions_from: Dict[Any, List[str]] = defaultdict(list)
+        for transition in transitions:
+            for source in transition.sources:
+                self.actions_from[source].append(transition.action)
+
+        self.states = sorted(
+            {_state_value(t.target) for t in transitions} |
+            {_state_value(s) for t in transitions for s in t.sources}
+        )
+
+    def get(self, action: str) -> Transition:
+        transition = self.transitions.get(action)
+        if transition is None:
+            raise WorkflowError(
+                f"Unknown action '{action}' for {self.name}, use one of: {', '.join(self.transitions)}"
+            )
+        return transition
+
+    def available_actions(self, state: Any, user: User) -> List[str]:
+        """Actions leaving state whose user-level guard passes"""
+        return [
+            action for action in self.actions_from.get(state, [])
+            if self.transitions[action].guard is None or self.transitions[action].guard.allows_user(user)
+        ]
+
+    def queue_clause(self, user: User):
+        """
+        Rows waiting for a user, including unassigned ones queued to a role
+        the user holds; each branch is served by an (assignee, status) index
+        """
+        role_codes = {role.code for role in user.roles}
+        clauses = []
+        for column, states in self.queue:
+            assignee = getattr(self.model, column)
+            if role_codes.intersection(self.queue_roles.get(column, ())):
+                assignee_clause = or_(assignee == user.id, assignee.is_(None))
+            else:
+                assignee_clause = assignee == user.id
+            clauses.append(and_(assignee_clause, self.status.in_(states)))
+        return or_(*clauses) if clauses else false()
+
+    def label_for(self, entity_id: int, number: Optional[str]) -> str:
+        return f"{self.title} {number}" if number else f"{self.title} #{entity_id}"
+
+    def describe(self) -> dict:
+        return {
+            "entity": self.name,
+            "states": self.states,
+            "transitions": [
+                {
+                    "action": t.action,
+                    "label": t.label,
+                    "from": [_state_value(s) for s in t.sources],
+                    "to": _state_value(t.target),
+                    "guard": t.guard.name if t.guard else None
+                }
+                for t in self.transitions.values()
+            ]
+        }
+
+
+class TransitionResult:
+    """Per-id outcome of applying one action to a batch of ids"""
+
+    def __init__(self, definition: WorkflowDefinition, transition: Transition, user_id: int):
+        self.definition = definition
+        self.transition = transition
+        self.user_id = user_id
+        self.outcomes: Dict[int, Tuple[str, Optional[str]]] = {}
+        # id -> returned columns (number, notify targets) of changed rows
+        self.changed: Dict[int, dict] = {}
+        self.previous: Dict[int, Any] = {}
+
+    @property
+    def succeeded(self) -> List[int]:
+        return list(self.changed)
+
+    @property
+    def failed(self) -> Dict[int, Tuple[str, Optional[str]]]:
+        return {entity_id: outcome for entity_id, outcome in self.outcomes.items() if outcome[0] != OK}
+
+    def to_dict(self) -> dict:
+        return {
+            "action": self.transition.action,
+            "status": _state_value(self.transition.target),
+            "succeeded": len(self.changed),
+            "failed": len(self.failed),
+            "results": [
+                {"id": entity_id, "outcome": code, "message": message}
+                for entity_id, (code, message) in self.outcomes.items()
+            ]
+        }
+
+
+_registry: Dict[str, WorkflowDefinition] = {}
+_hooks: Dict[Tuple[str, Optional[str]], List[Callable]] = defaultdict(list)
+
+
+def register_workflow(definition: WorkflowDefinition) -> WorkflowDefinition:
+    _registry[definition.name] = definition
+    return definition
+
+
+def _load_definitions() -> None:
+    # Transition tables and hooks register themselves on import; which modules, is listed in the services package
+    from . import load_workflow_modules
+    load_workflow_modules()
+
+
+def get_workflow(name: str) -> WorkflowDefinition:
+    _load_definitions()
+    definition = _registry.get(name)
+    if definition is None:
+        raise WorkflowError(f"Unknown workflow '{name}', use one of: {', '.join(sorted(_registry))}")
+    return definition
+
+
+def workflows() -> List[WorkflowDefinition]:
+    _load_definitions()
+    return list(_registry.values())
+
+
+def on_transition(entity: Optional[str] = None, action: Optional[str] = None):
+    """
+    Register an after-hook, called as hook(db, result) once per batch
+
+    entity=None hooks run for every workflow; action=None for every action.
+    Hooks run inside the transaction, after the UPDATE and side effects.
+    """
+    def decorator(func: Callable) -> Callable:
+        _hooks[(entity, action)].append(func)
+        return func
+    return decorator
+
+
+def _stamp_values(transition: Transition, user: User, comments: Optional[str]) -> dict:
+    values = {}
+    for column, source in transition.stamps.items():
+        if source == STAMP_USER:
+            values[column] = user.id
+        elif source == STAMP_NOW:
+            values[column] = str(datetime.now())
+        elif source == STAMP_TODAY:
+            values[column] = date.today()
+        elif source == STAMP_COMMENTS:
+            if comments is not None:
+                values[column] = comments
+        else:
+            raise WorkflowError(f"Unknown stamp source '{source}'")
+    return values
+
+
+def apply_transition(
+    db: Session,
+    entity: str,
+    ids: Sequence[int],
+    action: str,
+    user: User,
+    comments: Optional[str] = None,
+    expected_versions: Optional[Dict[int, int]] = None,
+    request: Optional[Request] = None
+) -> TransitionResult:
+    """
+    Apply an action to a batch of ids in one conditional UPDATE
+
+    Args:
+        db: Database session (not committed)
+        entity: Workflow name
+        ids: Entity ids
+        action: Transition action
+        user: Acting user
+        comments: Stored in the transition's comments column, if any
+        expected_versions: Optional {id: row_version} the client last saw
+        request: HTTP request, for the audit trail
+
+    Returns:
+        TransitionResult with an outcome for every id
+    """
+    definition = get_workflow(entity)
+    transition = definition.get(action)
+    model = definition.model
+    result = TransitionResult(definition, transition, user.id)
+
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return result
+
+    guard = transition.guard
+    if guard is not None and not guard.allows_user(user):
+        for entity_id in ids:
+            result.outcomes[entity_id] = (FORBIDDEN, f"Requires {guard.name}")
+        return result
+
+    guard_clause = guard.clause(model, user) if guard is not None else None
+    permitted = case((guard_clause, True), else_=False) if guard_clause is not None else literal(True)
+
+    snapshot = {
+        row.id: row for row in db.execute(
+            select(model.id, definition.status.label("status"), model.row_version, permitted.label("permitted"))
+            .where(model.id.in_(ids), model.is_deleted == False)
+        )
+    }
+
+    eligible: List[Tuple[int, int]] = []
+    for entity_id in ids:
+        row = snapshot.get(entity_id)
+        if row is None:
+            result.outcomes[entity_id] = (NOT_FOUND, f"{definition.title} not found")
+        elif row.status not in transition.sources:
+            result.outcomes[entity_id] = (
+                INVALID_STATE,
+                f"Cannot {action} from status '{_state_value(row.status)}'"
+            )
+        elif not row.permitted:
+            result.outcomes[entity_id] = (FORBIDDEN, f"Requires {guard.name}")
+        elif expected_versions and entity_id in expected_versions and \
+                expected_versions[entity_id] != row.row_version:
+            result.outcomes[entity_id] = (CONFLICT, "Modified by someone else, reload and retry")
+        else:
+            eligible.append((entity_id, row.row_version))
+            result.previous[entity_id] = row.status
+
+    if not eligible:
+        return result
+
+    table = definition.table
+    conditions = [
+        tuple_(table.c.id, table.c.row_version).in_(eligible),
+        table.c[definition.status.key].in_(transition.sources),
+    ]
+    if guard_clause is not None:
+        conditions.append(guard_clause)
+
+    returning = [table.c.id]
+    if definition.number_column:
+        returning.append(table.c[definition.number_column].label("number"))
+    returning.extend(table.c[column] for column in transition.notify)
+
+    values = _stamp_values(transition, user, comments)
+    values[definition.status.key] = transition.target
+    values["row_version"] = table.c.row_version + 1
+    values["updated_by_id"] = user.id
+
+    rows = db.execute(
+        update(table).where(and_(*conditions)).values(**values).returning(*returning)
+    ).mappings().all()
+
+    for row in rows:
+        result.changed[row["id"]] = dict(row)
+        result.outcomes[row["id"]] = (OK, None)
+    for entity_id, _ in eligible:
+        if entity_id not in result.changed:
+            result.previous.pop(entity_id, None)
+            result.outcomes[entity_id] = (CONFLICT, "Modified by someone else, reload and retry")
+
+    # Keep outcomes in request order
+    result.outcomes = {entity_id: result.outcomes[entity_id] for entity_id in ids}
+
+    if result.changed:
+        _write_side_effects(db, result, comments, request)
+        for key in ((None, None), (entity, None), (None, action), (entity, action)):
+            for hook in _hooks.get(key, ()):
+                hook(db, result)
+
+    return result
+
+
+def _write_side_effects(
+    db: Session,
+    result: TransitionResult,
+    comments: Optional[str],
+    request: Optional[Request]
+) -> None:
+    """Audit entries and notifications for every changed row, one INSERT each"""
+    definition, transition = result.definition, result.transition
+    target = _state_value(transition.target)
+
+    audit_entries = []
+    notification_rows = []
+    for entity_id, row in result.changed.items():
+        label = definition.label_for(entity_id, row.get("number"))
+        audit_entries.append({
+            "entity_id": entity_id,
+            "description": f"{transition.label}: {label}",
+            "old_values": {"status": _state_value(result.previous.get(entity_id))},
+            "new_values": {"status": target, "comments": comments} if comments else {"status": target}
+        })
+
+        recipients = {row[column] for column in transition.notify if row.get(column)}
+        recipients.discard(result.user_id)
+        for recipient in sorted(recipients):
+            notification_rows.append({
+                "user_id": recipient,
+                "title": f"{label} {target}",
+                "message": comments or f"{label} moved to {target}",
+                "notification_type": "info",
+                "category": "approval",
+                "link": definition.link.format(id=entity_id) if definition.link else None,
+                "priority": "normal",
+                "entity": f"{definition.name}:{entity_id}",
+                "created_by_id": result.user_id
+            })
+
+    log_actions(db, result.user_id, definition.entity_type, transition.audit_action, audit_entries, request)
+    create_notifications(db, notification_rows)
@@ -0,0 +1,254 @@
+"""
+Workflow transition tables
+
+Doer/checker/approver flows of documents, form records, leaves, expenses and
+CAPAs, registered with the workflow engine at import time.
+"""
+from backend.models.document import Document, DocumentStatusEnum
+from backend.models.form import FormRecord
+from backend.models.hr import Leave
+from backend.models.financial import Expense, ExpenseStatusEnum
+from backend.models.quality import CAPA, CAPAStatusEnum
+from backend.models.traceability import EntityTypeEnum, ActionTypeEnum
+from .workflow_engine import (
+    WorkflowDefinition,
+    Transition,
+    register_workflow,
+    assigned_to,
+    assigned_user,
+    not_user,
+    owned_by,
+    has_role,
+    any_of,
+    all_of,
+    STAMP_USER,
+    STAMP_NOW,
+    STAMP_TODAY,
+    STAMP_COMMENTS
+)
+
+# Role codes allowed to act on finance, HR and quality steps without being assigned
+FINANCE_ROLES = ("finance", "accounts")
+HR_ROLES = ("hr_manager",)
+QUALITY_ROLES = ("quality_manager",)
+
+
+def sign_off(column_name: str, roles, *makers: str):
+    """Sign-off guard (check, approve, verify): the assigned user or a role holder, and never one of the makers of the item"""
+    return all_of(any_of(assigned_user(column_name), has_role(*roles)), not_user(*makers))
+
+DOCUMENT = register_workflow(WorkflowDefinition(
+    "document", Document, EntityTypeEnum.DOCUMENT,
+    title="Document",
+    number_column="document_number",
+    link="/documents/{id}",
+    queue=[("approver_id", [DocumentStatusEnum.IN_REVIEW])],
+    queue_roles={"approver_id": QUALITY_ROLES},
+    priority=2,
+    transitions=[
+        Transition(
+            "submit", [DocumentStatusEnum.DRAFT], DocumentStatusEnum.IN_REVIEW,
+            guard=any_of(owned_by(), assigned_to("doer_id")),
+            stamps={"doer_id": STAMP_USER},
+            notify=("checker_id", "approver_id"),
+            audit_action=ActionTypeEnum.SUBMIT,
+            label="Submit for review"
+        ),
+        Transition(
+            "approve", [DocumentStatusEnum.IN_REVIEW], DocumentStatusEnum.APPROVED,
+            guard=sign_off("approver_id", QUALITY_ROLES, "created_by_id", "doer_id"),
+            stamps={"approver_id": STAMP_USER, "approved_at": STAMP_NOW},
+            notify=("doer_id", "created_by_id"),
+            audit_action=ActionTypeEnum.APPROVE
+        ),
+        Transition(
+            "reject", [DocumentStatusEnum.IN_REVIEW], DocumentStatusEnum.DRAFT,
+            guard=any_of(assigned_user("checker_id"), assigned_user("approver_id"), has_role(*QUALITY_ROLES)),
+            stamps={"reviewed_at": STAMP_NOW},
+            notify=("doer_id", "created_by_id"),
+            audit_action=ActionTypeEnum.REJECT
+        ),
+        Transition(
+            "obsolete", [DocumentStatusEnum.APPROVED], DocumentStatusEnum.OBSOLETE,
+            guard=any_of(has_role(*QUALITY_ROLES), assigned_to("approver_id")),
+            notify=("doer_id",),
+            label="Mark obsolete"
+        ),
+        Transition(
+            "archive", [DocumentStatusEnum.OBSOLETE], DocumentStatusEnum.ARCHIVED,
+            guard=has_role(*QUALITY_ROLES)
+        ),
+    ]
+))
+
+FORM_RECORD = register_workflow(WorkflowDefinition(
+    "form_record", FormRecord, EntityTypeEnum.FORM_RECORD,
+    title="Record",
+    number_column="record_number",
+    link="/forms/records/{id}",
+    queue=[("checker_id", ["submitted"]), ("approver_id", ["reviewed"])],
+    queue_roles={"checker_id": QUALITY_ROLES, "approver_id": QUALITY_ROLES},
+    priority=2,
+    transitions=[
+        Transition(
+            "submit", ["draft"], "submitted",
+            guard=any_of(owned_by(), assigned_to("doer_id")),
+            stamps={"doer_id": STAMP_USER, "submitted_at": STAMP_NOW},
+            notify=("checker_id",),
+            audit_action=ActionTypeEnum.SUBMIT
+        ),
+        Transition(
+            "check", ["submitted"], "reviewed",
+            guard=sign_off("checker_id", QUALITY_ROLES, "created_by_id", "doer_id"),
+            stamps={"checker_id": STAMP_USER, "checked_at": STAMP_NOW, "checker_comments": STAMP_COMMENTS},
+            notify=("approver_id",),
+            audit_action=ActionTypeEnum.REVIEW
+        ),
+        Transition(
+            "approve", ["reviewed"], "approved",
+            guard=sign_off("approver_id", QUALITY_ROLES, "created_by_id", "doer_id", "checker_id"),
+            stamps={"approver_id": STAMP_USER, "approved_at": STAMP_NOW, "approver_comments": STAMP_COMMENTS},
+            notify=("doer_id",),
+            audit_action=ActionTypeEnum.APPROVE
+        ),
+        Transition(
+            "reject", ["submitted", "reviewed"], "rejected",
+            guard=any_of(assigned_user("checker_id"), assigned_user("approver_id"), has_role(*QUALITY_ROLES)),
+            stamps={"approver_comments": STAMP_COMMENTS},
+            notify=("doer_id",),
+            audit_action=ActionTypeEnum.REJECT
+        ),
+        Transition(
+            "reopen", ["rejected"], "draft",
+            guard=any_of(owned_by(), assigned_to("doer_id"))
+        ),
+    ]
+))
+
+LEAVE = register_workflow(WorkflowDefinition(
+    "leave", Leave, EntityTypeEnum.LEAVE,
+    title="Leave request",
+    link="/hr/leave/{id}",
+    queue=[("approver_id", ["pending"])],
+    queue_roles={"approver_id": HR_ROLES},
+    priority=3,
+    due_column="start_date",
+    transitions=[
+        Transition(
+            "approve", ["pending"], "approved",
+            guard=sign_off("approver_id", HR_ROLES, "created_by_id"),
+            stamps={"approver_id": STAMP_USER, "approved_at": STAMP_NOW, "approver_comments": STAMP_COMMENTS},
+            notify=("created_by_id",),
+            audit_action=ActionTypeEnum.APPROVE
+        ),
+        Transition(
+            "reject", ["pending"], "rejected",
+            guard=any_of(assigned_user("approver_id"), has_role(*HR_ROLES)),
+            stamps={"approver_id": STAMP_USER, "approver_comments": STAMP_COMMENTS},
+            notify=("created_by_id",),
+            audit_action=ActionTypeEnum.REJECT
+        ),
+        Transition(
+            "cancel", ["pending", "approved"], "cancelled",
+            guard=owned_by(),
+            notify=("approver_id",)
+        ),
+    ]
+))
+
+EXPENSE = register_workflow(WorkflowDefinition(
+    "expense", Expense, EntityTypeEnum.EXPENSE,
+    title="Expense",
+    number_column="expense_number",
+    link="/financial/expenses/{id}",
+    queue=[("approver_id", [ExpenseStatusEnum.SUBMITTED])],
+    queue_roles={"approver_id": FINANCE_ROLES},
+    priority=1,
+    transitions=[
+        Transition(
+            "submit", [ExpenseStatusEnum.DRAFT], ExpenseStatusEnum.SUBMITTED,
+            guard=owned_by(),
+            notify=("approver_id",),
+            audit_action=ActionTypeEnum.SUBMIT
+        ),
+        Transition(
+            "approve", [ExpenseStatusEnum.SUBMITTED], ExpenseStatusEnum.APPROVED,
+            guard=sign_off("approver_id", FINANCE_ROLES, "created_by_id"),
+            stamps={"approver_id": STAMP_USER, "approved_at": STAMP_NOW, "approver_comments": STAMP_COMMENTS},
+            notify=("created_by_id",),
+            audit_action=ActionTypeEnum.APPROVE
+        ),
+        Transition(
+            "reject", [ExpenseStatusEnum.SUBMITTED], ExpenseStatusEnum.REJECTED,
+            guard=any_of(assigned_user("approver_id"), has_role(*FINANCE_ROLES)),
+            stamps={"approver_id": STAMP_USER, "approver_comments": STAMP_COMMENTS},
+            notify=("created_by_id",),
+            audit_action=ActionTypeEnum.REJECT
+        ),
+        Transition(
+            "pay", [ExpenseStatusEnum.APPROVED], ExpenseStatusEnum.PAID,
+            guard=has_role(*FINANCE_ROLES),
+            stamps={"reimbursement_date": STAMP_TODAY},
+            notify=("created_by_id",),
+            label="Mark paid"
+        ),
+    ]
+))
+
+CAPA_WORKFLOW = register_workflow(WorkflowDefinition(
+    "capa", CAPA, EntityTypeEnum.CAPA,
+    title="CAPA",
+    number_column="capa_number",
+    link="/quality/capa/{id}",
+    queue=[
+        ("responsible_person_id", [CAPAStatusEnum.OPEN, CAPAStatusEnum.IN_PROGRESS]),
+        ("verified_by_id", [CAPAStatusEnum.IMPLEMENTED]),
+    ],
+    queue_roles={"verified_by_id": QUALITY_ROLES},
+    priority=3,
+    due_column="target_completion_date",
+    transitions=[
+        Transition(
+            "start", [CAPAStatusEnum.OPEN], CAPAStatusEnum.IN_PROGRESS,
+            guard=assigned_to("responsible_person_id"),
+            stamps={"responsible_person_id": STAMP_USER}
+        ),
+        Transition(
+            "implement", [CAPAStatusEnum.IN_PROGRESS], CAPAStatusEnum.IMPLEMENTED,
+            guard=assigned_to("responsible_person_id"),
+            stamps={"actual_completion_date": STAMP_TODAY},
+            notify=("verified_by_id", "created_by_id"),
+            audit_action=ActionTypeEnum.SUBMIT,
+            label="Mark implemented"
+        ),
+        Transition(
+            "verify", [CAPAStatusEnum.IMPLEMENTED], CAPAStatusEnum.VERIFIED,
+            guard=sign_off("verified_by_id", QUALITY_ROLES, "responsible_person_id"),
+            stamps={"verified_by_id": STAMP_USER, "verification_date": STAMP_TODAY,
+                    "verification_result": STAMP_COMMENTS},
+            notify=("responsible_person_id", "created_by_id"),
+            audit_action=ActionTypeEnum.REVIEW
+        ),
+        Transition(
+            "rework", [CAPAStatusEnum.IMPLEMENTED], CAPAStatusEnum.IN_PROGRESS,
+            guard=sign_off("verified_by_id", QUALITY_ROLES, "responsible_person_id"),
+            stamps={"verification_result": STAMP_COMMENTS},
+            notify=("responsible_person_id",),
+            audit_action=ActionTypeEnum.REJECT,
+            label="Send back for rework"
+        ),
+        Transition(
+            "close", [CAPAStatusEnum.VERIFIED], CAPAStatusEnum.CLOSED,
+            guard=any_of(has_role(*QUALITY_ROLES), owned_by()),
+            stamps={"closed_by_id": STAMP_USER, "closed_at": STAMP_NOW, "closure_notes": STAMP_COMMENTS},
+            notify=("responsible_person_id",),
+            audit_action=ActionTypeEnum.APPROVE
+        ),
+        Transition(
+            "cancel", [CAPAStatusEnum.OPEN, CAPAStatusEnum.IN_PROGRESS], CAPAStatusEnum.CANCELLED,
+            guard=any_of(has_role(*QUALITY_ROLES), owned_by()),
+            stamps={"closure_notes": STAMP_COMMENTS},
+            notify=("responsible_person_id",)
+        ),
+    ]
+))